@@ -0,0 +1,245 @@
+"""
+Read-only JSON API for student progress, mastery and help-request status.
+
+Runs next to app.py on the same store (SLP_BACKEND, SLP_SHARDS, ...), so
+integrations such as a school's SIS don't have to scrape the dashboards:
+
+    pip install uvicorn
+    SLP_API_TOKEN=... uvicorn api:app --port 8600
+
+Endpoints (GET, JSON; ?school=<code> picks the school, default "default"):
+
+    /v1/students/{student}/progress        quiz results, oldest first
+    /v1/students/{student}/help-requests   help requests and their status, oldest first
+    /v1/students/{student}/mastery         per-topic mastery (mastery.py)
+    /healthz
+
+Lists are paginated: ?limit= (default 100, max 1000) and ?cursor= set to
+the previous page's "next_cursor" (null on the last page). A cursor is a
+position in the store, so rows written later never shift a page.
+Progress is served from the hot store; months compacted into the archive
+(archive.py) are not listed, but they still count towards mastery.
+
+Every response has an ETag made from the version of the table it reads
+(backend version(): file stat for CSV, a counter bumped by every write for
+SQLite and Redis, the last event number for the journal). If-None-Match with that ETag gets a 304 without the rows
+being touched, and rendered bodies are cached in memory under their ETag,
+so a write makes the old entries unreachable and the next request renders
+fresh data.
+
+Send "Authorization: Bearer $SLP_API_TOKEN". Without SLP_API_TOKEN set the
+API answers 503, like the Admin page without a password.
+"""
+import asyncio
+import base64
+import bisect
+import hashlib
+import hmac
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote
+
+from notes_index import request_key
+from tenants import DEFAULT_SCHOOL, get_tenant_backend, school_id
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+CACHE_ENTRIES = 10000
+HELP_FIELDS = ("time", "grade", "subject", "mode", "topic", "message", "status", "resolved_time", "resolved_by")
+RESOURCES = {"progress": "progress", "help-requests": "help_requests", "mastery": "progress"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _clean(value):
+    return "" if value is None or value != value else value   # value != value: NaN from pandas
+
+
+def encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))))
+    except (ValueError, TypeError):
+        raise ApiError(400, "invalid cursor")
+
+
+class TableView:
+    """One school's table held in memory and grouped by student, reloaded when its version changes."""
+
+    def __init__(self, table):
+        self.table = table
+        self.version = None
+        self.offset = 0          # rows of this table already moved into the archive
+        self.loaded = 0          # hot rows read so far
+        self.by_student = {}     # student -> ([sort key], [item]), sorted by key
+        self._lock = threading.Lock()
+
+    def refresh(self, store, version):
+        with self._lock:
+            if version == self.version:
+                return self
+            offset = 0
+            if self.table == "progress":
+                from archive import archive_dir_for, archived_rows
+                offset = archived_rows("progress", archive_dir_for(store))
+            if self.table == "progress" and offset == self.offset and self.version is not None:
+                # Progress is append-only: fold in just the new rows
+                self._add(store.rows("progress", start=self.loaded), self.loaded)
+            else:
+                self.by_student, self.offset, self.loaded = {}, offset, 0
+                self._add(store.rows(self.table), 0)
+            self.version = version
+            return self
+
+    def _add(self, rows, start):
+        touched = set()
+        for i, row in enumerate(rows, start):
+            student = str(_clean(row.get("student")))
+            if self.table == "progress":
+                # Position in the whole table (archive + hot); compaction only moves a prefix, so it is stable
+                key = (self.offset + i,)
+                item = {k: _clean(v) for k, v in row.items() if k not in ("student", "school")}
+            else:
+                key = (str(_clean(row.get("time"))), request_key(row))
+                item = {f: _clean(row.get(f, "")) for f in HELP_FIELDS}
+            keys, items = self.by_student.setdefault(student, ([], []))
+            keys.append(key)
+            items.append(item)
+            touched.add(student)
+        self.loaded = start + len(rows)
+        if self.table != "progress":
+            for student in touched:
+                keys, items = self.by_student[student]
+                order = sorted(range(len(keys)), key=keys.__getitem__)
+                self.by_student[student] = ([keys[i] for i in order], [items[i] for i in order])
+
+    def page(self, student, cursor, limit):
+        keys, items = self.by_student.get(student, ([], []))
+        try:
+            start = bisect.bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+        except TypeError:
+            raise ApiError(400, "cursor is from a different list")
+        end = start + limit
+        next_cursor = encode_cursor(list(keys[end - 1])) if end < len(keys) else None
+        return items[start:end], next_cursor
+
+
+class Api:
+    def __init__(self, token=None):
+        self.token = token if token is not None else os.getenv("SLP_API_TOKEN", "")
+        self._views = {}
+        self._engines = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "cache_hits": 0, "rendered": 0}
+
+    # ---------- ASGI ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        headers = dict(scope["headers"])
+        try:
+            status, etag, body = self.lookup(scope["method"], scope["path"], scope["query_string"], headers)
+            if status is None:
+                # Not cached for this version: render off the event loop (it may read the whole table)
+                status, etag, body = await asyncio.to_thread(self.render, scope["path"], scope["query_string"])
+        except ApiError as e:
+            status, etag, body = e.status, None, json.dumps({"error": str(e)}).encode()
+        response_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if etag:
+            response_headers += [(b"etag", etag.encode()), (b"cache-control", b"private, no-cache")]
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    # ---------- request handling ----------
+    def _parse(self, path, query_string):
+        query = {k: v[-1] for k, v in parse_qs(query_string.decode("latin-1")).items()}
+        parts = path.strip("/").split("/")
+        if len(parts) != 4 or parts[:2] != ["v1", "students"] or parts[3] not in RESOURCES:
+            raise ApiError(404, "not found")
+        try:
+            limit = int(query.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise ApiError(400, "limit must be a number")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ApiError(400, f"limit must be between 1 and {MAX_LIMIT}")
+        school = school_id(query.get("school", DEFAULT_SCHOOL))
+        return parts[3], unquote(parts[2]), school, query.get("cursor", ""), limit
+
+    def _etag(self, resource, student, school, cursor, limit):
+        """(store, version, etag). The version is read once, so the ETag always matches the rows rendered."""
+        store = get_tenant_backend(school)
+        version = store.version(RESOURCES[resource])
+        raw = f"{resource}|{student}|{school}|{cursor}|{limit}|{version}"
+        return store, version, '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24] + '"'
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def lookup(self, method, path, query_string, headers):
+        """Fast path: (304 | cached 200) or (None, None, None) when the response has to be rendered."""
+        self._count("requests")
+        if path == "/healthz":
+            return 200, None, b'{"ok": true}'
+        if not self.token:
+            raise ApiError(503, "set SLP_API_TOKEN to enable the API")
+        supplied = headers.get(b"authorization", b"").decode("latin-1").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode(), self.token.encode()):
+            raise ApiError(401, "missing or wrong API token")
+        if method != "GET":
+            raise ApiError(405, "read-only API")
+        _, _, etag = self._etag(*self._parse(path, query_string))
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            self._count("not_modified")
+            return 304, etag, b""
+        with self._lock:
+            body = self._cache.get(etag)
+            if body is not None:
+                self._cache.move_to_end(etag)
+                self.stats["cache_hits"] += 1
+                return 200, etag, body
+        return None, None, None
+
+    def render(self, path, query_string):
+        resource, student, school, cursor, limit = self._parse(path, query_string)
+        store, version, etag = self._etag(resource, student, school, cursor, limit)
+        if resource == "mastery":
+            from mastery import MasteryEngine
+            with self._lock:
+                engine = self._engines.setdefault(school, MasteryEngine(store))
+            topics = engine.refresh().student_mastery(student)
+            payload = {"student": student, "school": school, "topics": topics.to_dict("records")}
+        else:
+            with self._lock:
+                view = self._views.setdefault((school, resource), TableView(RESOURCES[resource]))
+            items, next_cursor = view.refresh(store, version).page(student, cursor, limit)
+            payload = {"student": student, "school": school, "items": items, "next_cursor": next_cursor}
+        body = json.dumps(payload, default=str).encode("utf-8")
+        with self._lock:
+            self.stats["rendered"] += 1
+            self._cache[etag] = body
+            while len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return 200, etag, body
+
+
+app = Api()
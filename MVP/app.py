@@ -1,48 +1,100 @@
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import streamlit as st
 import os
 import random
-import base64
 import json
-from streamlit_drawable_canvas import st_canvas
-from openai import OpenAI
+import time
+import hashlib
+# Heavy modules (pandas, openai, numpy, pyarrow, the canvas component, OCR)
+# are imported where they are first needed, so the landing page renders fast.
+from solver import solve_locally
+from jobs import JobPool
+from backend import get_backend
+from tenants import DEFAULT_SCHOOL, SchoolMoving, get_shard_router, get_tenant_backend, school_id
+from router import get_router
+import session_memory
 
 def play_audio_if_exists(path: str):
     if os.path.exists(path):
         st.audio(path, format="audio/mp3")
         return True
     return False
+@st.cache_resource
+def get_mastery_engine(school=DEFAULT_SCHOOL):
+    # One engine per school per server; refresh() only reads that school's new progress rows
+    from mastery import MasteryEngine
+    return MasteryEngine(get_tenant_backend(school))
+@st.cache_resource
+def get_kg_scheduler():
+    # KG counting items come back within minutes, not days
+    from scheduler import MINUTE, Scheduler
+    return Scheduler(unit_seconds=MINUTE)
+
+PRACTICE_SCHEDULE_FILE = "practice_schedule.npz"
+GENERATION_CACHE_TTL = 7 * 24 * 3600
+GENERATE_PER_MINUTE = 5
+
+@st.cache_resource
+def get_practice_scheduler():
+    from scheduler import Scheduler
+    return Scheduler.load(PRACTICE_SCHEDULE_FILE)
+@st.cache_resource
+def get_job_pool():
+    # One bounded worker pool per server process, shared by all sessions
+    return JobPool()
+@st.cache_resource
+def get_prefetcher():
+    # Low-priority pool that pre-generates the likely next lesson into the cache
+    from prefetch import Prefetcher
+    return Prefetcher(
+        lambda *args: generate_help(*args),
+        generation_cache_key,
+        busy=lambda: get_job_pool().pending() > 20,
+    )
+@st.cache_resource
+def get_notes_index():
+    # Catch up once per process on requests resolved elsewhere; after that "Mark as Resolved" adds
+    from notes_index import get_notes_index as shared_index
+    index = shared_index()
+    index.sync()
+    for school in get_shard_router().schools():
+        index.sync(get_tenant_backend(school))
+    return index
+@st.cache_resource
+def get_rollups():
+    # Same pattern: catch up once per process, then every request/resolve updates the aggregates
+    from rollups import get_rollups as shared_rollups
+    rollups = shared_rollups()
+    sync_rollups(rollups)
+    return rollups
+def sync_rollups(rollups) -> int:
+    """Apply help-request events the rollups haven't seen, from the shared store and every school's shard."""
+    applied = rollups.sync()
+    for school in get_shard_router().schools():
+        applied += rollups.sync(get_tenant_backend(school))
+    return applied
+@st.cache_resource
+def get_client():
+    # openai is only imported on the first generation
+    from openai import OpenAI
+    # One retry only — the router's circuit breakers handle repeated failures
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY") or "", max_retries=1)
+@st.cache_resource
+def load_stylesheet():
+    with open("assets/styles.css", encoding="utf-8") as fh:
+        return f"<style>\n{fh.read()}</style>"
 # ✅ ADD THIS HERE (RIGHT BELOW THE ABOVE FUNCTION)
 def play_click():
     st.audio("assets/sounds/click.mp3", format="audio/mp3")
 st.set_page_config(
     page_title="SLP | Smart Learning Platform",
+    page_icon="📘",
     layout="wide"
 )
-# ---------- KG BUTTON STYLING (COLORED) ----------
-st.markdown("""
-<style>
-/* Base button style */
-button[kind="secondary"] {
-    height: 95px;
-    font-size: 18px;
-    border-radius: 18px;
-    font-weight: 600;
-}
-
-/* Individual activity colors */
-.kg-animals button { background-color: #ffe4e1; }   /* soft pink */
-.kg-numbers button { background-color: #e6f0ff; }   /* soft blue */
-.kg-alphabet button { background-color: #fff6d6; }  /* soft yellow */
-.kg-draw button { background-color: #e8f8f5; }      /* mint */
-.kg-videos button { background-color: #f0e6ff; }    /* lavender */
-.kg-shapes button { background-color: #e6ffe6; }    /* light green */
-.kg-math button { background-color: #fff0e6; }      /* peach */
-.kg-puzzles button { background-color: #f5f5f5; }   /* grey */
-.kg-world button { background-color: #e6f7ff; }     /* sky blue */
-</style>
-""", unsafe_allow_html=True)
+# Per-session memory accounting: size every key, spill big blobs, sweep idle sessions
+session_memory.track()
+# ---------- ALL APP STYLES (assets/styles.css, read once per process) ----------
+st.markdown(load_stylesheet(), unsafe_allow_html=True)
 st.markdown("### SLP — Smart Learning Platform")
 st.caption("Step‑by‑step learning for every grade")
 st.divider()
@@ -146,45 +198,8 @@ if grade == 0:
     # ================================
 # KG UI GLOBAL STYLES
 # ================================
-  st.markdown(
-    """
-    <style>
-    /* General spacing */
-    .block-container {
-        padding-top: 2rem;
-        padding-bottom: 3rem;
-    }
-
-    /* Section spacing */
-    .kg-section {
-        margin-top: 2.5rem;
-        margin-bottom: 2.5rem;
-    }
-
-    /* Headings */
-    h2, h3 {
-        margin-bottom: 1.2rem !important;
-    }
-
-    /* Images */
-    img {
-        border-radius: 18px;
-    }
-
-    /* Buttons (already big, just cleaner) */
-    .stButton > button {
-        margin-top: 0.6rem;
-        margin-bottom: 1.2rem;
-    }
-
-    /* Info / success boxes */
-    .stAlert {
-        margin-top: 1.5rem;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+  # Marker that switches on the KG-only rules in assets/styles.css
+  st.markdown('<div class="kg-grade"></div>', unsafe_allow_html=True)
     # ================================
 # KG HOME MENU
 # ================================
@@ -378,8 +393,12 @@ if st.session_state["kg_mode"] == "MathFun":
     st.subheader("➕ Math Fun")
     st.write("Count and choose the correct number 👆")
 
-    import random
-    count = random.randint(1, 5)
+    # Spaced repetition: counts the child misses come back sooner
+    kg_student = st.session_state.get("student_name", "Student")
+    kg_scheduler = get_kg_scheduler()
+    if "kg_count" not in st.session_state:
+        st.session_state["kg_count"] = kg_scheduler.next_item(kg_student, new_items=range(1, 6))
+    count = st.session_state["kg_count"]
     st.write("⭐ " * count)
 
     cols = st.columns(5, gap="large")
@@ -387,9 +406,12 @@ if st.session_state["kg_mode"] == "MathFun":
         with cols[n - 1]:
             if st.button(str(n), key=f"kg_math_{n}", use_container_width=True):
                 if n == count:
+                    kg_scheduler.review(kg_student, count, 5)
+                    del st.session_state["kg_count"]
                     st.success("Correct! 🎉")
                     st.balloons()
                 else:
+                    kg_scheduler.review(kg_student, count, 1)
                     st.info("Nice try 😊 Try again!")
 
     st.markdown("</div>", unsafe_allow_html=True)
@@ -458,6 +480,7 @@ if st.session_state["kg_mode"] == "Draw":
 
     st.write("Use your finger or mouse to draw 👇")
 
+    from streamlit_drawable_canvas import st_canvas
     canvas = st_canvas(
         fill_color="rgba(255, 255, 255, 0)",
         stroke_width=8,
@@ -479,20 +502,7 @@ st.markdown('<div class="kg-section">', unsafe_allow_html=True)
 st.subheader("🔢 Numbers 1 to 10")
 st.write("### Tap a number 👆")
 
-# Make number buttons big
-st.markdown(
-    """
-    <style>
-    .stButton > button {
-        font-size: 44px !important;
-        padding: 30px 20px !important;
-        height: 140px !important;
-        border-radius: 20px !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+# Number buttons are made big in assets/styles.css
 
 praise = ["Good job! ⭐", "Excellent! 🌟", "Keep it up! 👍", "Well done! 🎉"]
 
@@ -546,32 +556,58 @@ with colC:
 # ==========================
 if st.session_state.get("mode") == "lesson":
     st.subheader("Today’s Lesson")
-    st.info("Topic: Fractions – Parts of a Whole")
-
-    # Cached syllabus content (NO AI)
-    st.write("""
-    A fraction shows a part of a whole.
-
-    If a pizza is cut into 4 equal parts,
-    each part is one‑fourth (1/4).
-    """)
-    if st.session_state.get("mode") == "practice":
-        st.subheader("Practice")
-
-    st.write("What is 1/4 of 8?")
-    answer = st.text_input("Your answer")
 
-    if st.button("Check"):
-        if answer == "2":
-            st.success("Correct! ⭐")
+    # Cached syllabus content (NO AI) — compiled curriculum pack, see curriculum.py
+    from curriculum import get_pack
+    pack = get_pack()
+    entry = None
+    nothing_close = False
+    if pack is not None:
+        lesson_grade = selected_grade
+        pack_subjects = [s for s in allowed_subjects_for_grade(lesson_grade) if pack.nearest_grade(lesson_grade, s)]
+        if pack_subjects:
+            lesson_subject = st.selectbox("Lesson subject", pack_subjects, key="pack_subject")
+            # Grades without their own lesson for this subject borrow one from a grade next to theirs
+            lesson_grade = pack.nearest_grade(lesson_grade, lesson_subject)
+            lesson_topic = st.selectbox("Lesson topic", pack.topics(lesson_grade, lesson_subject), key="pack_topic")
+            entry = pack.lesson(lesson_grade, lesson_subject, lesson_topic)
         else:
-            st.warning("Try again.")
+            # Nothing within a grade of theirs: a lesson written for them (below) beats a far-off one
+            nothing_close = True
+            st.info("There's no ready-made lesson for your grade yet. Type a topic below and press "
+                    "“Generate Help / Explanation” to get one written for you.")
+    if entry is None and not nothing_close:
+        entry = {
+            "title": "Fractions – Parts of a Whole",
+            "lesson": "A fraction shows a part of a whole.\n\nIf a pizza is cut into 4 equal parts,\neach part is one‑fourth (1/4).",
+            "examples": [],
+            "checks": [{"question": "What is 1/4 of 8?", "answers": ["2"], "explanation": "8 ÷ 4 = 2, so one-fourth of 8 is 2."}],
+        }
 
-    if st.button("Explain"):
-        st.info("Explanation will be shown here (AI only when needed).")
+    def _clean(text):
+        return str(text).strip().lower().replace(" ", "").replace("−", "-")
+
+    if entry is not None:
+        st.info(f"Topic: {entry['title']}")
+        st.write(entry["lesson"])
+        if entry["examples"]:
+            with st.expander("Worked examples"):
+                for example in entry["examples"]:
+                    st.markdown(f"**{example['problem']}**")
+                    st.write(example["solution"])
+
+        for i, check in enumerate(entry["checks"]):
+            st.write(check["question"])
+            answer = st.text_input("Your answer", key=f"pack_answer_{i}")
+
+            if st.button("Check", key=f"pack_check_{i}"):
+                if _clean(answer) in [_clean(a) for a in check["answers"]]:
+                    st.success("Correct! ⭐")
+                else:
+                    st.warning("Try again.")
 
-        if st.session_state.get("mode") == "homework":
-         st.subheader("Homework Help")
+            if st.button("Explain", key=f"pack_explain_{i}"):
+                st.info(check["explanation"])
 
     st.caption(
         "SLP explains homework step by step to help learning. "
@@ -587,7 +623,7 @@ if st.session_state.get("mode") == "lesson":
         st.info("Homework explanation will be generated here.")
 
 MODE_OPTIONS = ["Learn a Topic", "Practice Problems", "Homework Help"]
-def analyze_homework_photo(image_bytes: bytes) -> dict:
+def analyze_homework_photo(image_bytes: bytes, grade_label: str = "", subject: str = "Math") -> dict:
     """
     Uses a vision-capable model to:
     - check readability
@@ -597,73 +633,13 @@ def analyze_homework_photo(image_bytes: bytes) -> dict:
     Returns dict:
       {
         "ok": bool,
-        "reason": "blurry|multiple|worksheet|invalid|not_math|ok",
+        "reason": "blurry|multiple|worksheet|invalid|not_math|unavailable|ok",
         "question_text": str
       }
     """
-    # Convert to base64 data URL
-    b64 = base64.b64encode(image_bytes).decode("utf-8")
-    data_url = f"data:image/jpeg;base64,{b64}"
-
-    # Ask for STRICT JSON only
-    prompt = """
-You are a strict homework-photo validator for a K–12 learning app.
-
-MVP RULES:
-- Allow ONLY one handwritten math question.
-- Reject if: blurry/unreadable, multiple questions, worksheet/test/exam page, not a math question, or no question found.
-- If allowed, extract the SINGLE question text clearly.
-
-Return ONLY valid JSON in this exact schema:
-{
-  "readable": true/false,
-  "multiple_questions": true/false,
-  "worksheet_or_exam": true/false,
-  "looks_like_math": true/false,
-  "question_text": "..."
-}
-No extra keys. No markdown. No commentary.
-""".strip()
-
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": prompt},
-                        {"type": "input_image", "image_url": data_url},
-                    ],
-                }
-            ],
-            temperature=0
-        )
-        raw = resp.choices[0].message.content.strip()
-        data = json.loads(raw)
-    except Exception:
-        # If anything fails, treat as invalid
-        return {"ok": False, "reason": "invalid", "question_text": ""}
-
-    readable = bool(data.get("readable"))
-    multiple = bool(data.get("multiple_questions"))
-    worksheet = bool(data.get("worksheet_or_exam"))
-    looks_math = bool(data.get("looks_like_math"))
-    qtext = (data.get("question_text") or "").strip()
-
-    # Apply MVP rejection rules
-    if not readable:
-        return {"ok": False, "reason": "blurry", "question_text": ""}
-    if worksheet:
-        return {"ok": False, "reason": "worksheet", "question_text": ""}
-    if multiple:
-        return {"ok": False, "reason": "multiple", "question_text": ""}
-    if not looks_math:
-        return {"ok": False, "reason": "not_math", "question_text": ""}
-    if not qtext:
-        return {"ok": False, "reason": "invalid", "question_text": ""}
-
-    return {"ok": True, "reason": "ok", "question_text": qtext}
+    # Local OCR first — only unclear/ambiguous photos go to the vision model
+    from homework_pipeline import check_photo
+    return check_photo(get_client(), image_bytes, grade_label, subject)
 def build_system_prompt(subject: str, grade_label: str, mode: str) -> str:
     g = grade_to_number(grade_label)
 
@@ -792,17 +768,218 @@ SAFETY / QUALITY:
 - Do not overwhelm the student with long paragraphs.
 - Keep steps explicit and easy to follow.
 """.strip()
-resolved = pd.DataFrame()
-help_message = ""
 
-# Page configuration
-st.set_page_config(page_title="Smart Tutor AI", page_icon="📘", layout="centered")
+
+PHOTO_REJECT_MESSAGES = {
+    "blurry": "I couldn’t read the question clearly. Please upload a clearer photo.",
+    "multiple": "Please upload a photo with just ONE question.",
+    "worksheet": "Worksheets and exam pages aren’t supported — please upload one question.",
+    "not_math": "That doesn’t look like a math question. Please upload a math question.",
+}
+NO_QUIZ_MESSAGE = (
+    "There’s no practice quiz for this topic right now. "
+    "Ask a tutor below if you’d like some questions to try."
+)
+QUEUED_MESSAGE = (
+    "Our AI tutor is very busy right now. We’ve saved your question and sent it "
+    "to the tutor team — check back soon, or try again in a few minutes."
+)
+
+def generation_cache_key(subject, grade_label, mode, topic, homework_text) -> str:
+    # Topic case/spacing doesn't change the lesson, so "Fractions " and "fractions" share an entry
+    topic = " ".join(str(topic).lower().split())
+    return "gen:" + hashlib.sha256(
+        json.dumps([subject, grade_label, mode, topic, homework_text]).encode("utf-8")
+    ).hexdigest()
+
+def generate_help(subject: str, grade_label: str, mode: str, topic: str, homework_text: str, photo_bytes=None) -> dict:
+    """
+    Photo check + lesson + quiz, with no Streamlit calls so it can run on the
+    background job pool.
+
+    For a homework photo the explanation starts as soon as the question has
+    been read, while the photo check is still running, and is thrown away if
+    the photo is rejected (see homework_pipeline.py).
+
+    While the model API is failing (circuit breaker open, timeouts) it
+    degrades instead of erroring: the closest cached lesson, a bank quiz, or
+    a "queued" answer that the page turns into a tutor help request.
+
+    Returns dict:
+      {"ok": bool, "message": str, "lesson_text": str, "quiz_text": str,
+       "topic": str, "homework_text": str, "degraded": str, "queued": bool}
+    """
+    if mode == "homework" and photo_bytes is not None:
+        from homework_pipeline import pipelined_help
+        result, answer = pipelined_help(
+            get_client(), photo_bytes, grade_label, subject,
+            lambda question, cancel: explain_help(subject, grade_label, mode, topic, question, cancel),
+        )
+
+        if result["reason"] == "unavailable":
+            # The photo couldn't be checked — not the student's fault
+            if not homework_text:
+                return {"ok": False, "queued": True, "message": QUEUED_MESSAGE,
+                        "topic": topic, "homework_text": homework_text}
+        elif not result["ok"]:
+            return {"ok": False, "message": PHOTO_REJECT_MESSAGES.get(
+                result["reason"], "I couldn’t find a question in that photo. Please try another photo.")}
+        else:
+            # ✅ explained from the extracted question
+            return answer
+
+    return explain_help(subject, grade_label, mode, topic, homework_text)
+
+
+def ask_model(grade_label: str, subject: str, mode: str, task: str, messages: list, cancel=None) -> str:
+    """One routed model call; streamed when it may be cancelled, so cancelling stops the generation."""
+    if cancel is None:
+        resp = get_router().complete(get_client(), grade_label, subject, mode, task, messages=messages)
+        return resp.choices[0].message.content
+    from homework_pipeline import stream_text
+    return stream_text(get_client(), grade_label, subject, mode, task, cancel, messages=messages)
+
+
+def explain_help(subject: str, grade_label: str, mode: str, topic: str, homework_text: str, cancel=None) -> dict:
+    """
+    Lesson + quiz for a topic or an already-checked homework question (same
+    return dict as generate_help). The quiz is generated alongside the lesson.
+
+    `cancel` is set when a speculative explanation turns out to be for a
+    rejected photo: the model calls stop and Cancelled is raised. The cache
+    write and the last cancel check happen together (homework_pipeline.commit).
+    """
+    from fallback import bank_quiz, closest_cached_lesson, remember_lesson
+    from homework_pipeline import Cancelled, commit, run_alongside
+
+    system_prompt = build_system_prompt(subject, grade_label, mode)
+    queued = {"ok": False, "queued": True, "message": QUEUED_MESSAGE,
+              "topic": topic, "homework_text": homework_text}
+
+    # Shared across replicas — the same question at the same grade is generated once
+    cache_key = generation_cache_key(subject, grade_label, mode, topic, homework_text)
+    cached = get_backend().get(cache_key)
+    if cached:
+        from prefetch import record_hit
+        record_hit(cache_key)
+        return json.loads(cached)
+
+    # The quiz only needs the topic/question, so it doesn't wait for the lesson
+    quiz_prompt = f"Create 5 multiple choice questions about {topic or homework_text} with answers."
+    quiz_future = run_alongside(ask_model, grade_label, subject, mode, "quiz",
+                                [{"role": "user", "content": quiz_prompt}], cancel)
+
+    # Simple math homework (equations, fractions, %) is solved locally — no AI call
+    local_solution = None
+    if mode == "homework" and subject == "Math":
+        local_solution = solve_locally(homework_text, grade_label)
+
+    degraded = ""
+    if local_solution is not None:
+        lesson_text = local_solution["lesson_text"]
+    else:
+        if mode == "homework":
+            user_prompt = f"""Homework question/problem:
+{homework_text}
+
+Please follow the required format and show every step."""
+        else:
+            user_prompt = f"""Topic: {topic}
+
+Please follow the required format."""
+
+        try:
+            # Model tier depends on grade band / subject / mode and current latency
+            lesson_text = ask_model(grade_label, subject, mode, "lesson", [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ], cancel)
+            if mode != "homework":
+                remember_lesson(subject, grade_label, topic, lesson_text)
+        except Cancelled:
+            raise
+        except Exception:
+            lesson_text, lesson_grade = closest_cached_lesson(subject, grade_label, topic)
+            if lesson_text is None:
+                return queued
+            degraded = f"cached lesson ({lesson_grade})"
+
+    try:
+        quiz_text = quiz_future.result()
+    except Cancelled:
+        raise
+    except Exception:
+        # Calibrated questions from earlier quizzes first (see irt.py), then the static bank
+        from irt import pool_quiz
+        quiz_text = pool_quiz(subject, grade_label, topic or homework_text) \
+            or bank_quiz(subject, grade_label, topic or homework_text)
+        if quiz_text is None:
+            # No questions for this subject: the page points the student to a tutor instead
+            quiz_text = ""
+            degraded = ", ".join(filter(None, [degraded, "no practice quiz"]))
+        else:
+            degraded = ", ".join(filter(None, [degraded, "bank quiz"]))
+
+    result = {
+        "ok": True,
+        "message": "",
+        "lesson_text": lesson_text,
+        "quiz_text": quiz_text,
+        "topic": topic,
+        "homework_text": homework_text,
+        "degraded": degraded,
+    }
+    def write():
+        # Degraded answers aren't cached, so the next request gets a fresh one
+        if not degraded:
+            get_backend().set(cache_key, json.dumps(result), ttl=GENERATION_CACHE_TTL)
+
+    # Checks `cancel` and caches in one step, so a photo rejected meanwhile never leaves an answer behind
+    commit(cancel, write)
+    return result
+
+
+def show_markdown(text) -> None:
+    """Lesson/quiz markdown, prepared once per content (see render_cache.py)."""
+    from render_cache import get_render_cache
+    st.markdown(get_render_cache().markdown(str(text)))
+
+
+def show_session_markdown(name: str) -> None:
+    """
+    show_markdown() for a session_state blob. The content hash is kept next
+    to it, so a spilled lesson isn't reloaded on every rerun while it is
+    still cached.
+    """
+    from render_cache import content_key, get_render_cache
+    cache = get_render_cache()
+    key = st.session_state.get(f"{name}_key")
+    text = cache.get(key) if key else None
+    if text is None:
+        raw = session_memory.get(name, "")
+        key = content_key(raw)
+        text = cache.markdown(raw, key)
+        st.session_state[f"{name}_key"] = key
+    st.markdown(text)
+help_message = ""
 
 # Sidebar navigation
-page = st.sidebar.selectbox("Navigate", ["Tutor", "Parent Dashboard", "Tutor Dashboard", "Why Parents Trust Us"])
+page = st.sidebar.selectbox("Navigate", ["Tutor", "Parent Dashboard", "Tutor Dashboard", "Why Parents Trust Us", "Admin"])
+# Progress, help requests and tutors are stored per school (see tenants.py)
+school = school_id(st.sidebar.text_input("School code", value=st.query_params.get("school", DEFAULT_SCHOOL)))
+school_records = get_tenant_backend(school)
+SCHOOL_MOVING_MESSAGE = "Your school's records are being moved to a new server. Please try again in a minute."
+
+
+def save_record(table: str, record: dict) -> bool:
+    """Append to this school's records; False (and a message) while the school is being moved."""
+    try:
+        school_records.append(table, record)
+        return True
+    except SchoolMoving:
+        st.warning(SCHOOL_MOVING_MESSAGE)
+        return False
 
-# OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY") or "")
 # -------------------------
 # Tutor Page
 # -------------------------
@@ -825,7 +1002,15 @@ if mode is None:
     st.stop()
 # ---- MODE-BASED UI ---
 if mode in ["lesson", "practice"]:
-     topic = st.text_input("Topic (e.g. fractions, linear equations)")
+     suggested_topic = None
+     if mode == "practice":
+         # Topics due for review first, then the weakest topic
+         suggested_topic = get_practice_scheduler().next_item(student_name, early=False)
+         if suggested_topic is None:
+             suggested_topic = get_mastery_engine(school).refresh().next_topic(student_name)
+     topic = st.text_input("Topic (e.g. fractions, linear equations)", value=suggested_topic or "")
+     if suggested_topic:
+         st.caption(f"Suggested next practice topic: {suggested_topic}")
 else:
      st.info(
          "Upload one homework question only.\n"
@@ -837,7 +1022,8 @@ else:
 
      homework_photo = st.file_uploader(
          "Upload a photo of ONE handwritten math question (optional)",
-         type=["png", "jpg", "jpeg"]
+         type=["png", "jpg", "jpeg"],
+         key="homework_photo"
      )
 
      homework_text = st.text_area(
@@ -846,9 +1032,6 @@ else:
      )
 
 
-# --- Safe default so Streamlit reruns never crash ---
-resolved = pd.DataFrame()
-
 if st.button("Generate Help / Explanation"):
 
     if mode in ["lesson", "practice"] and not topic:
@@ -859,63 +1042,93 @@ if st.button("Generate Help / Explanation"):
         st.warning("Please upload a photo or paste the homework question.")
         st.stop()
 
-    system_prompt = build_system_prompt(subject, grade, mode)
-
-    if mode == "homework" and homework_photo is not None:
-        result = analyze_homework_photo(homework_photo.getvalue())
-
-        if not result["ok"]:
-            st.warning("I couldn’t read the question clearly. Please upload a clearer photo.")
-            st.stop()
-
-        homework_text = result["question_text"]
-
-            # ✅ overwrite homework_text with extracted question
-        homework_text = result["question_text"]
-
-        if mode == "Homework Help":
-          user_prompt = f"""Homework question/problem:
-        {homework_text}
-
-    Please follow the required format and show every step."""
-        else:
-          user_prompt = f"""Topic: {topic}
-
-    Please follow the required format."""
-
-        lesson = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-
-        lesson_text = lesson.choices[0].message.content
-        st.session_state.lesson_text = lesson_text
-        st.markdown(lesson_text)
-
-    if "lesson_text" in st.session_state:
-
-        quiz_prompt = f"Create 5 multiple choice questions about {topic} with answers."
-        quiz = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": quiz_prompt}]
-        )
+    # Per-student rate limit, counted in the shared backend so every replica agrees
+    minute = int(time.time() // 60)
+    if get_backend().incr(f"rate:generate:{school}:{student_name}:{minute}", ttl=120) > GENERATE_PER_MINUTE:
+        st.warning("You’re asking very fast 🙂 Please wait a minute and try again.")
+        st.stop()
 
-        quiz_text = quiz.choices[0].message.content
+    photo_bytes = homework_photo.getvalue() if mode == "homework" and homework_photo is not None else None
 
-# ✅ ADD THIS LINE
-        st.session_state.quiz_text = quiz_text
+    # Runs on the shared worker pool; this script thread only polls
+    job_id = get_job_pool().submit(
+        "generate_help", generate_help, subject, grade, mode, topic, homework_text, photo_bytes
+    )
+    if job_id is None:
+        st.warning("Lots of students are asking right now — please try again in a minute.")
+        st.stop()
 
-        st.write(quiz_text)
+    for name in ("lesson_text", "quiz_text", "lesson_text_key", "quiz_text_key"):
+        st.session_state.pop(name, None)
+    st.query_params["job"] = job_id
+
+# ---- Resume the generation job (the ID in the URL survives a browser refresh) ----
+job_id = st.query_params.get("job")
+if job_id and "lesson_text" not in st.session_state:
+    job = get_job_pool().status(job_id)
+
+    if job["status"] in ("queued", "running"):
+        st.info("⏳ Preparing your explanation…")
+        time.sleep(1)
+        st.rerun()
+    elif job["status"] == "done" and job["result"]["ok"]:
+        st.session_state.lesson_text = job["result"]["lesson_text"]
+        st.session_state.quiz_text = job["result"]["quiz_text"]
+        st.session_state.job_topic = job["result"]["topic"]
+        st.session_state.job_homework_text = job["result"]["homework_text"]
+        st.session_state.job_degraded = job["result"].get("degraded", "")
+        # While the student reads, warm the cache for their likely next step
+        get_prefetcher().after_generation(subject, grade, mode, job["result"]["topic"])
+    elif job["status"] == "done" and job["result"].get("queued"):
+        # AI unavailable: hand the question to the tutor team (once per job, on any replica)
+        if get_backend().incr(f"queued:{job_id}", ttl=24 * 3600) == 1:
+            queued_request = {
+                "school": school,
+                "student": student_name,
+                "grade": grade,
+                "subject": subject,
+                "mode": mode,
+                "topic": job["result"]["topic"],
+                "homework_text": job["result"]["homework_text"],
+                "message": "Queued automatically: the AI tutor was unavailable.",
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "status": "Open",
+                "lesson_text": "",
+                "quiz_text": "",
+            }
+            if save_record("help_requests", queued_request):
+                get_rollups().observe(queued_request)
+        st.info(job["result"]["message"])
+    elif job["status"] == "done":
+        st.warning(job["result"]["message"])
+    else:
+        st.warning("Sorry, something went wrong while preparing your explanation. Please try again.")
+    if "lesson_text" not in st.session_state:
+        # Reported once: drop the ID so later reruns (and refreshes) don't show it again
+        del st.query_params["job"]
+
+if "lesson_text" in st.session_state and "quiz_text" in st.session_state:
+    # After a refresh the widgets are empty again — fall back to what the job used
+    topic = topic or st.session_state.get("job_topic", "")
+    homework_text = homework_text or st.session_state.get("job_homework_text", "")
+
+    if st.session_state.get("job_degraded"):
+        st.caption(f"⚠️ Our AI tutor is busy right now, so you’re seeing: {st.session_state.job_degraded}.")
+    # Prepared once; answer changes rerun the page without reloading a spilled lesson
+    show_session_markdown("lesson_text")
+    if st.session_state.quiz_text == "":
+        # The model was down and the bank has no questions for this subject (a spilled quiz isn't "")
+        st.info(NO_QUIZ_MESSAGE)
+    else:
+        show_session_markdown("quiz_text")
 
         answers = []
         for i in range(5):
             answers.append(st.selectbox(f"Answer Q{i+1}", ["A", "B", "C", "D"], key=f"a{i}"))
 
         if st.button("Submit Quiz"):
-
+            # Large blobs may have been spilled out of memory; get() reloads them
+            quiz_text = session_memory.get("quiz_text", "")
             lines = quiz_text.splitlines()
             correct = []
 
@@ -930,6 +1143,16 @@ if st.button("Generate Help / Explanation"):
 
             st.success(f"Your score: {score}/5")
 
+            # Keep each answer too, so irt.py can tell which questions are too easy, too hard or broken
+            try:
+                from responses import record_quiz
+                # Filed under the key pool_quiz() is asked for: the job's topic, or its homework question
+                quiz_topic = (st.session_state.get("job_topic", topic)
+                              or st.session_state.get("job_homework_text", homework_text))
+                record_quiz(school, student_name, quiz_text, answers, subject, grade, quiz_topic)
+            except (OSError, ValueError):
+                pass
+
             # Feedback comment
             if score == 5:
                 comment = "🌟 Excellent — You’ve mastered this topic!"
@@ -944,7 +1167,7 @@ if st.button("Generate Help / Explanation"):
 
             st.info(comment)
 
-            # Save to CSV
+            # Save progress (CSV, SQLite or Redis — see backend.py)
             record = {
                 "student": student_name,
                 "grade": grade,
@@ -954,14 +1177,13 @@ if st.button("Generate Help / Explanation"):
                 "date": datetime.now().strftime("%Y-%m-%d %H:%M")
             }
 
-            try:
-                df = pd.read_csv("progress.csv")
-                df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
-            except:
-                df = pd.DataFrame([record])
-
-            df.to_csv("progress.csv", index=False)
-            st.info("Progress saved successfully.")
+            if save_record("progress", record):
+                if mode == "practice" and topic:
+                    # SM-2 quality is 0–5, same scale as the quiz score
+                    practice_scheduler = get_practice_scheduler()
+                    practice_scheduler.review(student_name, topic, score)
+                    practice_scheduler.save(PRACTICE_SCHEDULE_FILE)
+                st.info("Progress saved successfully.")
     st.subheader("Need Live Help from a Tutor?")
 
     help_message = st.text_area(
@@ -973,8 +1195,11 @@ student_name = st.session_state.get("student_name", "").strip()
 if not student_name:
     student_name = st.text_input("Student name", value="Student").strip()
     st.session_state.student_name = student_name
+need_tutor = st.checkbox("I want a tutor to reply, even if a similar question was answered before")
 if st.button("Request Live Help"):
+    import pandas as pd
     help_request = {
+    "school": school,
     "student": student_name,
     "grade": grade,
     "subject": subject,
@@ -984,22 +1209,34 @@ if st.button("Request Live Help"):
     "message": help_message,
     "time": datetime.now().strftime("%Y-%m-%d %H:%M"),
     "status": "Open",
-    "lesson_text": st.session_state.get("lesson_text",""),
-    "quiz_text": st.session_state.get("quiz_text","")
+    "lesson_text": session_memory.get("lesson_text",""),
+    "quiz_text": session_memory.get("quiz_text","")
 }
 
-    try:
-        df = pd.read_csv("help_requests.csv")
-        df = pd.concat([df, pd.DataFrame([help_request])], ignore_index=True)
-    except:
-        df = pd.DataFrame([help_request])
-
-    df.to_csv("help_requests.csv", index=False)
-    st.success("Your request has been sent to the tutor team.")
+    # A tutor may already have explained this exact confusion — reuse their notes
+    match = None
+    if not need_tutor:
+        match = get_notes_index().strong_match(f"{topic} {homework_text} {help_message}", subject, grade)
+    if match:
+        help_request.update({
+            "status": "Resolved",
+            "resolved_by": "auto-match",
+            "tutor_notes": match["tutor_notes"],
+            "resolved_time": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        })
+
+    if save_record("help_requests", help_request):
+        get_rollups().observe(help_request)
+    if match:
+        st.success("A tutor already explained a very similar question:")
+        st.info(match["tutor_notes"])
+        st.caption("Still stuck? Tick the box above and send your request again — a tutor will reply.")
+    else:
+        st.success("Your request has been sent to the tutor team.")
     # Show progress
     st.subheader("Your Progress")
     try:
-        df = pd.read_csv("progress.csv")
+        df = pd.DataFrame(school_records.rows("progress"))
         if student_name:
             st.dataframe(df[df["student"] == student_name])
         else:
@@ -1010,6 +1247,7 @@ if st.button("Request Live Help"):
 # Tutor Dashboard
 # -------------------------
 elif page == "Tutor Dashboard":
+    import pandas as pd
 
     st.title("Tutor Application & Dashboard")
 
@@ -1032,26 +1270,20 @@ elif page == "Tutor Dashboard":
             "status": "Pending"
         }
 
-        try:
-            df = pd.read_csv("tutors.csv")
-            df = pd.concat([df, pd.DataFrame([tutor_record])], ignore_index=True)
-        except:
-            df = pd.DataFrame([tutor_record])
-
-        df.to_csv("tutors.csv", index=False)
-        st.success("Application submitted successfully!")
+        if save_record("tutors", tutor_record):
+            st.success("Application submitted successfully!")
 
     st.subheader("Approved Tutors")
 
     try:
-        df = pd.read_csv("tutors.csv")
+        df = pd.DataFrame(school_records.rows("tutors"))
         approved = df[df["status"] == "Approved"]
         st.dataframe(approved)
     except:
         st.write("No tutors approved yet.")
         st.subheader("Live Help Requests from Students")
     try:
-        requests_df = pd.read_csv("help_requests.csv")
+        requests_df = pd.DataFrame(school_records.rows("help_requests"))
         st.dataframe(requests_df)
         if len(requests_df) > 0:
             selected_index = st.selectbox(
@@ -1074,23 +1306,53 @@ elif page == "Tutor Dashboard":
             st.write(f"**Time:** {selected.get('time','')}")
             st.write(f"**Message:** {selected.get('message','')}")
 
+            st.markdown("### Similar Resolved Requests")
+            search_started = time.perf_counter()
+            similar = get_notes_index().search(
+                f"{selected.get('topic','')} {selected.get('homework_text','')} {selected.get('message','')}",
+                subject=selected.get("subject") or None,
+            )
+            st.caption(f"{len(similar)} matches in {(time.perf_counter() - search_started) * 1000:.0f} ms")
+            for hit in similar[:3]:
+                with st.expander(f"{hit['grade']} · {hit['topic']} — {hit['message'][:60]}"):
+                    st.write(hit["tutor_notes"])
+
             st.markdown("### Lesson Student Saw")
-            st.markdown(selected.get("lesson_text", "No lesson context available"))
+            show_markdown(selected.get("lesson_text", "No lesson context available"))
 
             st.markdown("### Quiz Student Saw")
-            st.markdown(selected.get("quiz_text", "No quiz context available"))
+            show_markdown(selected.get("quiz_text", "No quiz context available"))
             st.markdown("### Tutor Notes (How you helped)")
 
             tutor_notes = st.text_area(
             "Write how you explained the concept, steps, tips, or mistakes to avoid",
             value=selected.get("tutor_notes", "")
 )
+            resolver_name = st.text_input("Your name (for tutor workload stats)", key="resolver_name")
             if st.button("Mark as Resolved"):
-             requests_df.loc[selected_index, "tutor_notes"] = tutor_notes
-             requests_df.loc[selected_index, "status"] = "Resolved"
-             requests_df.loc[selected_index, "resolved_time"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-             requests_df.to_csv("help_requests.csv", index=False)
-            st.success("Help request resolved and tutor notes saved.")           
+             resolution = {
+                 "tutor_notes": tutor_notes,
+                 "status": "Resolved",
+                 "resolved_by": resolver_name.strip() or "unknown",
+                 "resolved_time": datetime.now().strftime("%Y-%m-%d %H:%M"),
+             }
+             # Found again by its key: archive.py may have moved rows since this page was drawn
+             from backend import update_matching
+             from notes_index import request_key
+             selected_key = request_key(selected.to_dict())
+             try:
+                 resolved = update_matching(school_records, "help_requests",
+                                            lambda row: request_key(row) == selected_key, resolution)
+             except SchoolMoving:
+                 st.warning(SCHOOL_MOVING_MESSAGE)
+                 resolved = None
+             if resolved:
+                 # Make these notes searchable for the next tutor right away
+                 get_notes_index().add({**selected.to_dict(), **resolution})
+                 get_rollups().observe({**selected.to_dict(), **resolution})
+                 st.success("Help request resolved and tutor notes saved.")
+             elif resolved is False:
+                 st.warning("This request was archived or changed meanwhile. Please reload the page.")
     except:
      st.write("No live help requests yet.")
 
@@ -1113,16 +1375,28 @@ elif page == "Why Parents Trust Us":
 # Parent Dashboard
 # -------------------------
 elif page == "Parent Dashboard":
+    import pandas as pd
+    from archive import list_students, load_history
 
     st.title("Parent Dashboard")
 
     try:
-        df = pd.read_csv("progress.csv")
-        students = df["student"].unique().tolist()
+        students = list_students("progress", backend=school_records)
         selected = st.selectbox("Select Student", students)
+        period = st.selectbox("Period", ["Last 30 days", "Last 90 days", "Last 12 months", "All time"])
+        period_days = {"Last 30 days": 30, "Last 90 days": 90, "Last 12 months": 365}.get(period)
+        start = datetime.now() - timedelta(days=period_days) if period_days else None
 
+        # Archived months outside the period are never opened
         st.subheader(f"Results for {selected}")
-        st.dataframe(df[df["student"] == selected])
+        st.dataframe(load_history("progress", start=start, student=selected, backend=school_records))
+
+        st.subheader("Topic Mastery")
+        engine = get_mastery_engine(school).refresh()
+        st.dataframe(engine.student_mastery(selected))
+        next_topic = engine.next_topic(selected)
+        if next_topic:
+            st.info(f"Suggested next practice topic: {next_topic}")
 
     except:
         st.write("No results available yet.")
@@ -1130,7 +1404,7 @@ elif page == "Parent Dashboard":
     st.subheader("Meet Our Tutor Team")
 
     try:
-        tutors_df = pd.read_csv("tutors.csv")
+        tutors_df = pd.DataFrame(school_records.rows("tutors"))
         approved_tutors = tutors_df[tutors_df["status"] == "Approved"]
 
         if len(approved_tutors) > 0:
@@ -1140,4 +1414,101 @@ elif page == "Parent Dashboard":
         else:
             st.write("No tutors approved yet.")
     except:
-        st.write("Tutor team information not available yet.")
\ No newline at end of file
+        st.write("Tutor team information not available yet.")
+# -------------------------
+# Admin: session memory
+# -------------------------
+elif page == "Admin":
+    import pandas as pd
+
+    st.title("Admin: Session Memory")
+
+    admin_password = os.getenv("SLP_ADMIN_PASSWORD")
+    if not admin_password:
+        st.info("Set SLP_ADMIN_PASSWORD to enable this page.")
+    elif st.text_input("Admin password", type="password") == admin_password:
+        report = session_memory.report()
+        col1, col2 = st.columns(2)
+        col1.metric("Tracked sessions", report["sessions"])
+        col2.metric("Session state total", f"{report['total_kb'] / 1024:.1f} MB")
+
+        st.subheader("Top memory consumers")
+        st.dataframe(pd.DataFrame(report["top"]))
+        st.caption(
+            f"Sessions over {session_memory.SESSION_CAP_BYTES // (1024 * 1024)} MB spill their lessons and quizzes; "
+            f"idle sessions spill after {session_memory.IDLE_SECONDS // 60} minutes."
+        )
+
+        if st.button("Spill all other sessions now"):
+            session_memory.spill_idle_now()
+            st.success("Done — lessons and quizzes will reload when those students come back.")
+
+        st.subheader("Model routing (this server)")
+        routing = get_router().metrics()
+        st.metric("Failovers to a faster tier", routing["failovers"])
+        st.dataframe(pd.DataFrame(routing["models"]).T)
+        if routing["time_to_first_chunk"]:
+            st.caption("Streamed replies, time to first chunk (not part of the failover p95):")
+            st.dataframe(pd.DataFrame(routing["time_to_first_chunk"]).T[["calls", "p50_ms", "p95_ms"]])
+
+        from homework_pipeline import pipeline_stats
+        pipeline = pipeline_stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Homework photos", pipeline["photos"])
+        col2.metric("Early explanations used", f"{pipeline['hit_rate']:.0%}")
+        col3.metric("Early explanations cancelled", pipeline["cancelled"])
+
+        from render_cache import get_render_cache
+        st.caption("Lesson display cache: {hit_rate:.0%} hits, {entries} cached ({mb} MB), {evictions} evicted"
+                   .format(**get_render_cache().metrics()))
+
+        st.subheader("Quiz question quality")
+        from irt import flagged_items, load_calibration
+        calibration = load_calibration()
+        if calibration is None:
+            st.info("No calibration yet. Run `python irt.py` once quiz answers have come in.")
+        else:
+            bad_questions = flagged_items(calibration)
+            st.caption(f"{len(calibration['items']):,} questions calibrated ({calibration['model'].upper()}); "
+                       f"{len(bad_questions)} flagged. Re-run `python irt.py` to refresh.")
+            if bad_questions:
+                st.dataframe(pd.DataFrame(bad_questions))
+
+        st.subheader("Prefetch (all servers)")
+        prefetch_stats = get_prefetcher().metrics()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Hit rate", f"{prefetch_stats['hit_rate']:.0%}")
+        col2.metric("Prefetch spend", f"${prefetch_stats['spend_usd']:.2f}")
+        col3.metric("Wasted spend", f"${prefetch_stats['wasted_usd']:.2f}")
+        st.json(prefetch_stats)
+
+        from breaker import breaker_metrics
+        st.subheader("Circuit breakers")
+        breakers = breaker_metrics()
+        if breakers:
+            st.dataframe(pd.DataFrame(breakers).T)
+        else:
+            st.write("No model calls yet.")
+
+        st.subheader("Tutor SLA and workload")
+        # Windows are whole calendar days, today included (the rollups are kept per day)
+        window = st.selectbox("Window", ["Today", "Last 7 days", "Last 30 days", "All time"], index=1)
+        days = {"Today": 1, "Last 7 days": 7, "Last 30 days": 30}.get(window)
+        rollups = get_rollups()
+        queue = rollups.queue_depth()
+        ttr = rollups.time_to_resolve("all", days)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Open requests", queue["open"])
+        col2.metric("Median time to resolve", f"{ttr[0]['p50_min']:.0f} min" if ttr else "—")
+        col3.metric("p90 time to resolve", f"{ttr[0]['p90_min']:.0f} min" if ttr else "—")
+        if queue["by_subject"]:
+            st.bar_chart(pd.Series(queue["by_subject"], name="open"))
+        by = st.selectbox("Time to resolve by", ["school", "subject", "grade", "hour", "tutor"])
+        st.dataframe(pd.DataFrame(rollups.time_to_resolve(by, days)))
+        st.markdown("**Tutor throughput**")
+        st.dataframe(pd.DataFrame(rollups.tutor_throughput(days)))
+        daily = pd.DataFrame(rollups.daily(days))
+        if len(daily):
+            st.line_chart(daily.set_index("day")[["opened", "resolved"]])
+        if st.button("Catch up from other servers"):
+            st.success(f"Applied {sync_rollups(rollups)} events from other servers and school shards.")
@@ -0,0 +1,323 @@
+"""
+Columnar archive for progress.csv and help_requests.csv.
+
+Old rows are compacted out of the hot CSVs into a Parquet dataset
+partitioned by month and grade:
+
+    archive/progress/month=2025-01/grade=Grade 7/part-....parquet
+
+Columns are typed (datetime, categorical student/topic), and queries pass
+their filters to pyarrow so a month-range query only opens the matching
+partitions. The hot CSV keeps recent rows, so app writes stay as they are.
+
+Each record store has its own archive: the shared store's is ARCHIVE_DIR,
+a school's (tenants.py) is ARCHIVE_DIR/schools/<school>, wherever its shard
+is, so moving a school between shards leaves its archive in place. Pass the
+store as `backend`. Compaction applies to local (CSV) stores; with the
+SQLite or Redis backends all rows stay hot. A school that is being moved is
+skipped and compacted on the next run.
+
+compact() holds the backend's table lock (backend.LocalBackend.locked), so
+rows the app appends meanwhile wait instead of being lost in the swap. New
+Parquet files are written as "_part-..." (hidden from readers), the manifest
+records the pending move atomically, then the hot CSV is swapped and the
+files renamed into view. A run that dies half way is rolled back (CSV not
+swapped yet) or finished (already swapped) by the next compact().
+
+Run periodically (e.g. nightly cron):
+    python archive.py
+pyarrow is optional; without it everything stays in the CSVs.
+"""
+import glob
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from backend import TABLE_FILES, LocalBackend, get_backend
+from tenants import SchoolMoving, TenantBackend, get_shard_router, get_tenant_backend
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # archive tier disabled
+    pa = None
+
+ARCHIVE_DIR = "archive"
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+KEEP_HOT_DAYS = 30
+
+# table -> (date column, categorical columns)
+TABLES = {
+    "progress": ("date", ["student", "grade", "topic"]),
+    "help_requests": ("time", ["student", "grade", "subject", "mode", "topic", "status"]),
+}
+
+
+def archive_available() -> bool:
+    return pa is not None
+
+
+def archive_dir_for(backend=None, archive_dir=ARCHIVE_DIR):
+    """The archive of a record store (None = the shared store); None if it has none."""
+    if backend is None or backend is get_backend():
+        return archive_dir
+    if isinstance(backend, TenantBackend):
+        return os.path.join(archive_dir, "schools", backend.school)
+    return None
+
+
+def _hot_table(backend, table, write=False):
+    """(store, table name) holding the hot rows: a school's table sits on its shard."""
+    if isinstance(backend, TenantBackend):
+        return backend.shard_table(table, write=write)
+    return backend, table
+
+
+def _table_dir(table, archive_dir):
+    return os.path.join(archive_dir, table)
+
+
+def _manifest_path(table, archive_dir):
+    return os.path.join(_table_dir(table, archive_dir), "_manifest.json")
+
+
+def _read_manifest(table, archive_dir):
+    try:
+        with open(_manifest_path(table, archive_dir)) as fh:
+            manifest = json.load(fh)
+        return manifest if isinstance(manifest.get("rows"), int) else {"rows": 0}
+    except (FileNotFoundError, ValueError, AttributeError):
+        return {"rows": 0}
+
+
+def _write_manifest(table, archive_dir, manifest):
+    path = _manifest_path(table, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as fh:
+        json.dump(manifest, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def archived_rows(table, archive_dir=ARCHIVE_DIR) -> int:
+    """How many rows of `table` have been moved out of the hot CSV so far."""
+    if archive_dir is None:
+        return 0
+    manifest = _read_manifest(table, archive_dir)
+    pending = manifest.get("pending")
+    if pending and os.path.exists(pending["hot"]):
+        # Mid-compaction: the hot CSV hasn't been swapped yet, so those rows are still in it
+        return manifest["rows"] - pending["rows"]
+    return manifest["rows"]
+
+
+def _pending_parts(table, archive_dir, stamp):
+    return glob.glob(os.path.join(_table_dir(table, archive_dir), "**", f"_part-{stamp}-*.parquet"), recursive=True)
+
+
+def _finish(table, archive_dir):
+    """Complete or undo a compaction that stopped half way. Call with the table lock held."""
+    manifest = _read_manifest(table, archive_dir)
+    pending = manifest.pop("pending", None)
+    if not pending:
+        return
+    if os.path.exists(pending["hot"]):
+        # The hot CSV was never swapped: drop the new files and forget the move
+        for path in _pending_parts(table, archive_dir, pending["stamp"]):
+            os.remove(path)
+        os.remove(pending["hot"])
+        manifest["rows"] -= pending["rows"]
+    else:
+        # Swapped: the rows now live only in the new files, so make them visible
+        for path in _pending_parts(table, archive_dir, pending["stamp"]):
+            os.replace(path, os.path.join(os.path.dirname(path), os.path.basename(path)[1:]))
+    _write_manifest(table, archive_dir, manifest)
+
+
+def _typed(df, table):
+    """Parse dates and make repeated string columns categorical."""
+    date_col, categories = TABLES[table]
+    df = df.copy()
+    df[date_col] = pd.to_datetime(df[date_col], format=DATE_FORMAT, errors="coerce")
+    if "score" in df:
+        # The shared store hands back strings
+        df["score"] = pd.to_numeric(df["score"], errors="coerce")
+    for col in categories:
+        if col in df:
+            df[col] = df[col].astype(str).astype("category")
+    return df
+
+
+def compact(table, keep_days=KEEP_HOT_DAYS, archive_dir=ARCHIVE_DIR, now=None, backend=None):
+    """Move rows older than keep_days from a store's hot CSV into its Parquet archive."""
+    backend = backend or get_backend()
+    archive_dir = archive_dir_for(backend, archive_dir)
+    if pa is None or archive_dir is None:
+        return 0
+    try:
+        store, name = _hot_table(backend, table, write=True)
+    except SchoolMoving:
+        return 0
+    if not isinstance(store, LocalBackend):
+        return 0
+    csv_path = os.path.join(store.data_dir, TABLE_FILES.get(name, f"{name}.csv"))
+    date_col, _ = TABLES[table]
+
+    # The lock is held to read and to swap, not while Parquet is written: appends
+    # made in between are carried over to the new hot file below.
+    with store.locked(name):
+        _finish(table, archive_dir)
+        try:
+            with open(csv_path, "rb") as fh:
+                inode, data = os.fstat(fh.fileno()).st_ino, fh.read()
+            hot = pd.read_csv(io.BytesIO(data))
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return 0
+
+    cutoff = (now or datetime.now()) - timedelta(days=keep_days)
+    dates = pd.to_datetime(hot[date_col], format=DATE_FORMAT, errors="coerce")
+    old = (dates < cutoff).to_numpy()
+
+    if table == "progress":
+        # Progress is append-only; move only the old prefix so row order (and
+        # MasteryEngine's row offset) stays valid.
+        keep_from = int(old.argmin()) if not old.all() else len(old)
+        move = pd.Series(False, index=hot.index)
+        move.iloc[:keep_from] = True
+    else:
+        # Open requests still get edited by tutors — only archive resolved ones
+        move = pd.Series(old, index=hot.index) & (hot.get("status") == "Resolved")
+
+    moving = hot[move]
+    if moving.empty:
+        return 0
+
+    typed = _typed(moving, table)
+    typed["month"] = typed[date_col].dt.strftime("%Y-%m")
+    typed["grade"] = typed["grade"].astype(str)
+
+    # "_" files are skipped by readers (pyarrow ignores that prefix) until the swap is done
+    stamp = int(time.time() * 1000)
+    ds.write_dataset(
+        pa.Table.from_pandas(typed, preserve_index=False),
+        _table_dir(table, archive_dir),
+        format="parquet",
+        partitioning=["month", "grade"],
+        partitioning_flavor="hive",
+        basename_template=f"_part-{stamp}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+    with store.locked(name):
+        try:
+            # A school whose move started meanwhile is being copied as it is: leave it
+            still_here = _hot_table(backend, table, write=True) == (store, name)
+        except SchoolMoving:
+            still_here = False
+        with open(csv_path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_ino != inode or not still_here:
+                # Rewritten meanwhile (a tutor resolved a request): try again next run
+                for path in _pending_parts(table, archive_dir, stamp):
+                    os.remove(path)
+                return 0
+            fh.seek(len(data))
+            appended = fh.read()
+        # Only shrink the hot file after the archive write succeeded, and only once the
+        # manifest says what is being moved, so a crash at any point can be resolved
+        hot_tmp = csv_path + ".compact.tmp"
+        hot[~move].to_csv(hot_tmp, index=False)
+        with open(hot_tmp, "ab") as fh:
+            fh.write(appended)
+        manifest = _read_manifest(table, archive_dir)
+        manifest["rows"] += len(moving)
+        _write_manifest(table, archive_dir,
+                        dict(manifest, pending={"stamp": stamp, "rows": len(moving), "hot": hot_tmp}))
+        os.replace(hot_tmp, csv_path)
+        _finish(table, archive_dir)
+    return len(moving)
+
+
+def query_archive(table, start=None, end=None, grade=None, student=None, columns=None,
+                  archive_dir=ARCHIVE_DIR) -> pd.DataFrame:
+    """
+    Read archived rows with predicate pushdown.
+
+    start/end are datetimes (end exclusive). Partition pruning on `month`
+    means only the partitions in range are opened at all.
+    """
+    if pa is None or archive_dir is None or not os.path.isdir(_table_dir(table, archive_dir)):
+        return pd.DataFrame()
+
+    date_col, _ = TABLES[table]
+    dataset = ds.dataset(_table_dir(table, archive_dir), format="parquet", partitioning="hive")
+
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if start is not None:
+        _and(ds.field("month") >= start.strftime("%Y-%m"))
+        _and(ds.field(date_col) >= pa.scalar(pd.Timestamp(start), type=pa.timestamp("ns")))
+    if end is not None:
+        _and(ds.field("month") <= end.strftime("%Y-%m"))
+        _and(ds.field(date_col) < pa.scalar(pd.Timestamp(end), type=pa.timestamp("ns")))
+    if grade is not None:
+        _and(ds.field("grade") == str(grade))
+    if student is not None:
+        _and(ds.field("student") == student)
+
+    df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+    return df.drop(columns=["month"], errors="ignore")
+
+
+def load_history(table, start=None, end=None, grade=None, student=None, archive_dir=ARCHIVE_DIR,
+                 backend=None) -> pd.DataFrame:
+    """Archived + hot rows for `table`, filtered the same way, typed columns."""
+    date_col, _ = TABLES[table]
+    parts = [query_archive(table, start, end, grade, student, archive_dir=archive_dir_for(backend, archive_dir))]
+    hot = pd.DataFrame((backend or get_backend()).rows(table))
+    if not hot.empty:
+        hot = _typed(hot, table)
+        if start is not None:
+            hot = hot[hot[date_col] >= start]
+        if end is not None:
+            hot = hot[hot[date_col] < end]
+        if grade is not None:
+            hot = hot[hot["grade"].astype(str) == str(grade)]
+        if student is not None:
+            hot = hot[hot["student"].astype(str) == student]
+        parts.append(hot)
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame()
+    # Categories from the two sources differ, so concat as strings and re-type
+    df = pd.concat([p.astype({c: str for c in p.select_dtypes("category")}) for p in parts], ignore_index=True)
+    for col in TABLES[table][1]:
+        if col in df:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def list_students(table="progress", archive_dir=ARCHIVE_DIR, backend=None):
+    """Distinct student names across the archive (one column read) and the hot store."""
+    names = set()
+    archived = query_archive(table, columns=["student"], archive_dir=archive_dir_for(backend, archive_dir))
+    if not archived.empty:
+        names.update(archived["student"].astype(str).unique())
+    names.update(str(row.get("student", "")) for row in (backend or get_backend()).rows(table))
+    names.discard("")
+    return sorted(names)
+
+
+if __name__ == "__main__":
+    for name in TABLES:
+        print(f"{name}: archived {compact(name)} rows")
+        for school in get_shard_router().schools():
+            print(f"{school}/{name}: archived {compact(name, backend=get_tenant_backend(school))} rows")
@@ -0,0 +1,540 @@
+"""
+Shared storage backends: key/value cache, counters and record tables.
+
+Everything that must look the same on every app.py replica goes through
+get_backend(): generation caches, rate-limit counters and the progress /
+help-request / tutor records. Pick the backend with SLP_BACKEND:
+
+    local   (default) in-process cache + CSV files in the working directory.
+            Same behaviour as before — fine for a single replica.
+    sqlite  one SQLite file (SLP_SQLITE_PATH, default slp.db) in WAL mode,
+            for replicas on one host or a shared volume.
+    redis   any Redis-protocol server at SLP_REDIS_URL. RedisBackend takes a
+            client object, so tests can pass an in-process fake.
+    journal journal.py: records as fsynced events in a write-ahead log plus
+            snapshots (SLP_JOURNAL_DIR, default journal/), for one host.
+
+All backends expose the same small interface:
+    get(key) / set(key, value, ttl=None) / incr(key, amount=1, ttl=None)
+    append(table, record) -> row index
+    rows(table, start=0, limit=None) -> list of dicts (row index order);
+                              with a limit, at most that many from a start >= 0
+    update(table, index, fields)
+    count(table)
+    replace(table, records)   (bulk rewrite; used to move a school between shards)
+    version(table) -> str     (changes whenever the table is written; for ETags)
+
+Row indices are positions, and archive.py moves old rows out of the local
+CSVs, so code that holds on to a row from an earlier read should find it
+again with update_matching() rather than reuse the index.
+
+Table names may contain "/" (tenants.py keeps each school's tables under
+"<school>/<table>"); the local backend stores those in a subdirectory.
+
+Expired keys don't outlive their TTL: MemoryKV prunes them from a heap on
+every write and caps its total size (MEMORY_KV_MAX_BYTES), SQLite deletes
+them every PRUNE_EVERY writes, and Redis expires them itself.
+"""
+import csv
+import heapq
+import io
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: the local backend's table lock is per process only
+    fcntl = None
+
+# Record tables and the CSV file the local backend keeps them in
+TABLE_FILES = {
+    "progress": "progress.csv",
+    "help_requests": "help_requests.csv",
+    "tutors": "tutors.csv",
+}
+
+MEMORY_KV_MAX_BYTES = 256 * 1024 * 1024   # oldest writes are dropped past this
+PRUNE_EVERY = 1000                        # SQLite: delete expired keys every this many writes
+INDEX_EVERY = 1024                        # LocalBackend: remember where every 1024th CSV row starts
+
+
+class MemoryKV:
+    """
+    In-process key/value cache and counters (the local and journal backends).
+
+    Keys that are never read again (per-minute rate counters, one-off cache
+    entries) still go away: every write pops the expired ones off a heap, and
+    past max_bytes the least recently written keys are dropped.
+    """
+
+    def __init__(self, max_bytes=MEMORY_KV_MAX_BYTES):
+        self._kv = {}            # key -> (value, expires, bytes), oldest write first
+        self._expiry = []        # heap of (expires, key); stale entries are skipped
+        self._bytes = 0
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._kv.get(key)
+            if item is None:
+                return None
+            value, expires, _ = item
+            if expires is not None and expires < time.time():
+                self._drop(key)
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._put(key, value, time.time() + ttl if ttl else None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            value, expires, _ = self._kv.get(key, (0, None, 0))
+            if expires is not None and expires < time.time():
+                value, expires = 0, None
+            if expires is None and ttl:
+                expires = time.time() + ttl
+            value = int(value) + amount
+            self._put(key, value, expires)
+            return value
+
+    def __len__(self):
+        return len(self._kv)
+
+    # Callers hold self._lock
+    def _drop(self, key):
+        item = self._kv.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def _put(self, key, value, expires):
+        self._drop(key)                      # re-insert, so dict order is write order
+        size = len(key) + (len(value) if isinstance(value, (str, bytes)) else 8) + 64
+        self._kv[key] = (value, expires, size)
+        self._bytes += size
+        if expires is not None:
+            heapq.heappush(self._expiry, (expires, key))
+        self._prune(time.time())
+
+    def _prune(self, now):
+        while self._expiry and self._expiry[0][0] < now:
+            expires, key = heapq.heappop(self._expiry)
+            item = self._kv.get(key)
+            if item is not None and item[1] == expires:
+                self._drop(key)
+        if len(self._expiry) > 2 * len(self._kv) + 1024:
+            # Keys rewritten with a new TTL leave stale heap entries behind; rebuild now and then
+            self._expiry = [(item[1], k) for k, item in self._kv.items() if item[1] is not None]
+            heapq.heapify(self._expiry)
+        while self._bytes > self.max_bytes and self._kv:
+            self._drop(next(iter(self._kv)))
+
+
+class _CsvIndex:
+    """What LocalBackend knows about one CSV file, so appends and reads don't rescan it."""
+
+    __slots__ = ("inode", "scanned", "header", "rows", "marks", "tail")
+
+    def __init__(self, inode):
+        self.inode = inode
+        self.scanned = 0        # bytes read so far (always at a row boundary)
+        self.header = None
+        self.rows = 0
+        self.marks = []         # byte offset of row 0, INDEX_EVERY, 2 * INDEX_EVERY, ...
+        self.tail = []          # byte offset of every row from the last mark on
+
+
+class LocalBackend(MemoryKV):
+    """
+    In-process cache + CSV files. Not shared between replicas.
+
+    Each CSV gets a _CsvIndex that is extended from the last byte read, so
+    count() and append() don't rescan the file and rows(table, start) only
+    parses from the nearest INDEX_EVERY mark; from the last mark on every
+    row's offset is kept, so reading just the new rows parses nothing else.
+    A file swapped in by update() or another process is re-indexed on the
+    next read.
+    """
+
+    def __init__(self, data_dir="."):
+        super().__init__()
+        self.data_dir = data_dir
+        self._indexes = {}
+        self._records_lock = threading.RLock()
+        self._flocks = {}                      # table -> lock file fd, while this process holds it
+
+    # ---- records ----
+    def _path(self, table):
+        return os.path.join(self.data_dir, TABLE_FILES.get(table, f"{table}.csv"))
+
+    def _read_all(self, table):
+        try:
+            with open(self._path(table), newline="", encoding="utf-8") as fh:
+                return list(csv.DictReader(fh))
+        except FileNotFoundError:
+            return []
+
+    def _write_all(self, table, rows):
+        columns = []
+        for row in rows:
+            columns += [c for c in row if c not in columns]
+        tmp = self._path(table) + ".tmp"
+        os.makedirs(os.path.dirname(tmp) or ".", exist_ok=True)
+        with open(tmp, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, self._path(table))
+
+    def _open(self, table):
+        """(binary file handle, up-to-date index), or (None, None) if the table has no file yet."""
+        try:
+            fh = open(self._path(table), "rb")
+        except FileNotFoundError:
+            self._indexes.pop(table, None)
+            return None, None
+        stat = os.fstat(fh.fileno())
+        index = self._indexes.get(table)
+        if index is None or index.inode != stat.st_ino or stat.st_size < index.scanned:
+            index = self._indexes[table] = _CsvIndex(stat.st_ino)
+        if stat.st_size > index.scanned:
+            fh.seek(index.scanned)
+            row, start = b"", index.scanned
+            for line in fh:
+                row += line
+                if not line.endswith(b"\n") or row.count(b'"') % 2:
+                    continue          # a quoted newline inside a field, or a row still being written
+                if index.header is None:
+                    index.header = next(csv.reader([row.decode("utf-8")]), [])
+                else:
+                    if index.rows % INDEX_EVERY == 0:
+                        index.marks.append(start)
+                        index.tail = []
+                    index.tail.append(start)
+                    index.rows += 1
+                start += len(row)
+                row = b""
+            index.scanned = start
+        return fh, index
+
+    @contextmanager
+    def locked(self, table):
+        """
+        Hold the table's write lock around a block: this process's lock plus an
+        flock on "<csv>.lock", so archive.py (another process) and the app never
+        rewrite the file under each other. Re-entrant within a thread.
+        """
+        with self._records_lock:
+            if table in self._flocks:
+                yield
+                return
+            path = self._path(table) + ".lock"
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._flocks[table] = fd
+                yield
+            finally:
+                self._flocks.pop(table, None)
+                os.close(fd)                   # closing releases the flock
+
+    def append(self, table, record):
+        with self.locked(table):
+            fh, index = self._open(table)
+            if fh is not None:
+                fh.close()
+            if index is not None and index.header is not None and set(record) <= set(index.header):
+                # Common case: plain append, no full rewrite
+                with open(self._path(table), "a", newline="", encoding="utf-8") as out:
+                    csv.DictWriter(out, fieldnames=index.header).writerow(record)
+                return self.count(table) - 1
+            rows = self._read_all(table) + [record]
+            self._write_all(table, rows)
+            return len(rows) - 1
+
+    def rows(self, table, start=0, limit=None):
+        with self._records_lock:
+            # Another thread's read may extend the index, so take what we need from it under the lock
+            fh, index = self._open(table)
+            if fh is None:
+                return []
+            if start < 0:
+                start = max(0, index.rows + start)      # same as list slicing
+            n = index.rows - start if limit is None else min(limit, index.rows - start)
+            header, skip = index.header, start % INDEX_EVERY
+            if n <= 0:
+                offset = None
+            elif start // INDEX_EVERY == len(index.marks) - 1:
+                # Rows after the last mark (where incremental readers ask) are located exactly
+                offset, skip = index.tail[skip], 0
+            else:
+                offset = index.marks[start // INDEX_EVERY]
+        with fh:
+            if offset is None:
+                return []
+            fh.seek(offset)
+            # Parse lazily and stop after n rows: never past the indexed end, and no further than asked
+            reader = csv.DictReader(io.TextIOWrapper(fh, encoding="utf-8", newline=""), fieldnames=header)
+            return list(itertools.islice(reader, skip, skip + n))
+
+    def update(self, table, index, fields):
+        with self.locked(table):
+            rows = self._read_all(table)
+            rows[index].update(fields)
+            self._write_all(table, rows)
+
+    def count(self, table):
+        with self._records_lock:
+            fh, index = self._open(table)
+            if fh is None:
+                return 0
+            fh.close()
+            return index.rows
+
+    def version(self, table):
+        # Writes append (size changes) or swap in a new file (inode changes), so the stat is the version
+        try:
+            st = os.stat(self._path(table))
+        except FileNotFoundError:
+            return "0"
+        return f"{st.st_ino}-{st.st_mtime_ns}-{st.st_size}"
+
+    def replace(self, table, records):
+        with self.locked(table):
+            if records:
+                self._write_all(table, list(records))
+            elif os.path.exists(self._path(table)):
+                os.remove(self._path(table))
+
+
+class SQLiteBackend:
+    """Cache, counters and records in one SQLite file (WAL, safe across processes)."""
+
+    def __init__(self, path="slp.db"):
+        self.path = path
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "tbl TEXT, idx INTEGER, data TEXT, PRIMARY KEY (tbl, idx))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires) WHERE expires IS NOT NULL")
+
+    def _conn(self, write=True):
+        """A transaction: IMMEDIATE (takes the write lock up front) for writes, DEFERRED for reads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return _Tx(conn, "IMMEDIATE" if write else "DEFERRED")
+
+    def _prune(self, conn):
+        # Keys nobody reads again (old rate counters, cache entries) would otherwise stay forever
+        if next(self._writes) % PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+
+    def get(self, key):
+        with self._conn(write=False) as conn:
+            row = conn.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl if ttl else None),
+            )
+            self._prune(conn)
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                value, expires = amount, (now + ttl if ttl else None)
+            else:
+                value, expires = int(row[0]) + amount, row[1]
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+            self._prune(conn)
+        return value
+
+    def append(self, table, record):
+        with self._conn() as conn:
+            idx = conn.execute("SELECT COALESCE(MAX(idx) + 1, 0) FROM records WHERE tbl = ?", (table,)).fetchone()[0]
+            conn.execute("INSERT INTO records (tbl, idx, data) VALUES (?, ?, ?)", (table, idx, json.dumps(record)))
+            self._bump(conn, table)
+        return idx
+
+    def rows(self, table, start=0, limit=None):
+        with self._conn(write=False) as conn:
+            cur = conn.execute("SELECT data FROM records WHERE tbl = ? AND idx >= ? ORDER BY idx LIMIT ?",
+                               (table, start, -1 if limit is None else limit))
+            return [json.loads(d) for (d,) in cur]
+
+    def update(self, table, index, fields):
+        with self._conn() as conn:
+            (data,) = conn.execute("SELECT data FROM records WHERE tbl = ? AND idx = ?", (table, index)).fetchone()
+            record = json.loads(data)
+            record.update(fields)
+            conn.execute("UPDATE records SET data = ? WHERE tbl = ? AND idx = ?", (json.dumps(record), table, index))
+            self._bump(conn, table)
+
+    def count(self, table):
+        with self._conn(write=False) as conn:
+            return conn.execute("SELECT COUNT(*) FROM records WHERE tbl = ?", (table,)).fetchone()[0]
+
+    def replace(self, table, records):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM records WHERE tbl = ?", (table,))
+            conn.executemany(
+                "INSERT INTO records (tbl, idx, data) VALUES (?, ?, ?)",
+                ((table, i, json.dumps(record)) for i, record in enumerate(records)),
+            )
+            self._bump(conn, table)
+
+    def _bump(self, conn, table):
+        # Same transaction as the write, so a reader never sees new rows with an old version
+        conn.execute(
+            "INSERT INTO kv (key, value, expires) VALUES (?, 1, NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+            (f"table_version:{table}",),
+        )
+
+    def version(self, table):
+        return self.get(f"table_version:{table}") or "0"
+
+
+class _Tx:
+    """
+    BEGIN ... COMMIT around a block. IMMEDIATE makes read-modify-writes atomic
+    across processes; DEFERRED reads see one consistent snapshot without
+    waiting for (or blocking) writers on other replicas.
+    """
+
+    def __init__(self, conn, mode="IMMEDIATE"):
+        self.conn = conn
+        self.mode = mode
+
+    def __enter__(self):
+        self.conn.execute(f"BEGIN {self.mode}")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class RedisBackend:
+    """Any Redis-protocol client (redis-py, or an in-process fake for tests)."""
+
+    def __init__(self, client, prefix="slp:"):
+        self.r = client
+        self.prefix = prefix
+
+    def _k(self, key):
+        return f"{self.prefix}{key}"
+
+    def get(self, key):
+        value = self.r.get(self._k(key))
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl=None):
+        self.r.set(self._k(key), value, ex=int(ttl) if ttl else None)
+
+    def incr(self, key, amount=1, ttl=None):
+        pipe = self.r.pipeline()
+        pipe.incrby(self._k(key), amount)
+        pipe.ttl(self._k(key))
+        value, remaining = pipe.execute()
+        if ttl and remaining == -1:
+            # A new counter (no expiry yet). Checked here rather than with EXPIRE NX, which needs Redis 7
+            self.r.expire(self._k(key), int(ttl))
+        return int(value)
+
+    def append(self, table, record):
+        pipe = self.r.pipeline()
+        pipe.rpush(self._k(f"rows:{table}"), json.dumps(record))
+        pipe.incr(self._k(f"table_version:{table}"))
+        return pipe.execute()[0] - 1
+
+    def rows(self, table, start=0, limit=None):
+        end = -1 if limit is None else start + limit - 1
+        return [json.loads(d) for d in self.r.lrange(self._k(f"rows:{table}"), start, end)]
+
+    def update(self, table, index, fields):
+        key = self._k(f"rows:{table}")
+        # Optimistic transaction: retry if another replica edits the list meanwhile
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    record = json.loads(pipe.lindex(key, index))
+                    record.update(fields)
+                    pipe.multi()
+                    pipe.lset(key, index, json.dumps(record))
+                    pipe.incr(self._k(f"table_version:{table}"))
+                    pipe.execute()
+                    return
+                except Exception as e:
+                    if type(e).__name__ != "WatchError":
+                        raise
+
+    def count(self, table):
+        return self.r.llen(self._k(f"rows:{table}"))
+
+    def replace(self, table, records):
+        key, records = self._k(f"rows:{table}"), list(records)
+        pipe = self.r.pipeline()
+        pipe.delete(key)
+        for start in range(0, len(records), 1000):
+            pipe.rpush(key, *(json.dumps(r) for r in records[start:start + 1000]))
+        pipe.incr(self._k(f"table_version:{table}"))
+        pipe.execute()
+
+    def version(self, table):
+        return self.get(f"table_version:{table}") or "0"
+
+
+def update_matching(store, table, match, fields) -> bool:
+    """
+    update() the first row where match(row) is true, finding its index under
+    the table lock (when the store has one) so nothing can move it in between.
+    False if no row matches (e.g. it has been archived).
+    """
+    locked = getattr(store, "locked", None)
+    with locked(table) if locked else nullcontext():
+        for index, row in enumerate(store.rows(table)):
+            if match(row):
+                store.update(table, index, fields)
+                return True
+    return False
+
+
+@lru_cache(maxsize=1)
+def get_backend():
+    """The configured backend, one per process."""
+    kind = os.getenv("SLP_BACKEND", "local").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("SLP_SQLITE_PATH", "slp.db"))
+    if kind == "redis":
+        import redis
+        return RedisBackend(redis.Redis.from_url(os.getenv("SLP_REDIS_URL", "redis://localhost:6379/0")))
+    if kind == "journal":
+        from journal import JournalBackend
+        return JournalBackend(os.getenv("SLP_JOURNAL_DIR", "journal"), import_from=".")
+    return LocalBackend()
@@ -0,0 +1,169 @@
+"""
+Benchmark: read-only JSON API throughput on one core.
+
+Fills a temp store with progress and help requests for N students, then:
+
+  1. drives api.app in-process (no sockets) to measure the handler itself:
+     first request per student (render), repeat requests (cache hit),
+     If-None-Match revalidation (304), and the first request after a write;
+  2. if uvicorn is installed, serves the app from a process pinned to one
+     CPU and hits it over keep-alive HTTP/1.1 connections.
+
+Run from the MVP folder:
+    python benchmarks/bench_api.py [students] [rows_per_student]
+"""
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOKEN = "bench-token"
+HTTP_SECONDS = 5
+HTTP_CONNECTIONS = 32
+etags = {}                 # path -> last ETag seen, for the If-None-Match run
+
+
+def fill(students, per_student):
+    from backend import get_backend
+    rng = random.Random(2)
+    backend = get_backend()
+    backend.replace("progress", [
+        {"student": f"s{i % students}", "grade": "Grade 5", "topic": rng.choice(["fractions", "area"]),
+         "score": rng.randrange(6), "comment": "", "date": f"2025-03-{1 + n // students % 28:02d} 10:00"}
+        for n, i in enumerate(range(students * per_student))
+    ])
+    backend.replace("help_requests", [
+        {"student": f"s{i}", "time": "2025-03-01 10:00", "subject": "Math", "grade": "Grade 5",
+         "topic": "fractions", "message": "stuck", "status": "Open"}
+        for i in range(students)
+    ])
+
+
+def asgi_request(path, headers=()):
+    """scope/receive/send for one in-process ASGI request; responses land in the returned list."""
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+             "headers": [(b"authorization", f"Bearer {TOKEN}".encode()), *headers]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    return scope, receive, send, sent
+
+
+async def run_requests(app, paths, headers_for=lambda p: ()):
+    statuses = {}
+    t0 = time.perf_counter()
+    for path in paths:
+        scope, receive, send, sent = asgi_request(path, headers_for(path))
+        await app(scope, receive, send)
+        statuses[sent[0]["status"]] = statuses.get(sent[0]["status"], 0) + 1
+        etag = dict(sent[0]["headers"]).get(b"etag")
+        if etag:
+            etags[path] = etag
+    return len(paths) / (time.perf_counter() - t0), statuses
+
+
+def in_process(students, per_student):
+    import api
+    app = api.Api(token=TOKEN)
+    paths = [f"/v1/students/s{i}/progress?limit=50" for i in range(students)]
+    loop = asyncio.new_event_loop()
+
+    def report(label, rate, statuses):
+        print(f"  {label:<28} {rate:>10,.0f} req/s   {statuses}")
+
+    report("render (first request)", *loop.run_until_complete(run_requests(app, paths)))
+    report("cache hit", *loop.run_until_complete(run_requests(app, paths * 5)))
+    report("If-None-Match -> 304", *loop.run_until_complete(
+        run_requests(app, paths * 5, lambda p: [(b"if-none-match", etags[p])])))
+    from backend import get_backend
+    get_backend().append("progress", {"student": "s0", "grade": "Grade 5", "topic": "area", "score": 5,
+                                      "comment": "", "date": "2025-04-01 10:00"})
+    report("after a write (re-render)", *loop.run_until_complete(run_requests(app, paths)))
+    report("help-requests, cache hit", *loop.run_until_complete(
+        run_requests(app, [f"/v1/students/s{i}/help-requests" for i in range(students)] * 3)))
+    print(f"  {app.stats}")
+    loop.close()
+
+
+async def http_client(port, paths, deadline, conditional, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    etag_seen = {}
+    n = 0
+    while time.perf_counter() < deadline:
+        path = paths[n % len(paths)]
+        n += 1
+        extra = f"If-None-Match: {etag_seen[path]}\r\n" if conditional and path in etag_seen else ""
+        t0 = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\nAuthorization: Bearer {TOKEN}\r\n{extra}\r\n".encode())
+        head = await reader.readuntil(b"\r\n\r\n")
+        length, etag = 0, None
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+            elif name.lower() == b"etag":
+                etag = value.strip().decode()
+        if length:
+            await reader.readexactly(length)
+        etag_seen[path] = etag or etag_seen.get(path)
+        latencies.append(time.perf_counter() - t0)
+    writer.close()
+
+
+def over_http(students):
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        print("uvicorn not installed; skipping the HTTP run")
+        return
+    port = 8765
+    env = dict(os.environ, SLP_API_TOKEN=TOKEN)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log", "--app-dir", os.path.dirname(os.path.dirname(os.path.abspath(__file__)))],
+        env=env, preexec_fn=lambda: os.sched_setaffinity(0, {0}),
+    )
+    try:
+        time.sleep(2)
+        paths = [f"/v1/students/s{i}/progress?limit=50" for i in range(students)]
+        for conditional in (False, True):
+            latencies = []
+            deadline = time.perf_counter() + HTTP_SECONDS
+
+            async def run():
+                await asyncio.gather(*(http_client(port, paths, deadline, conditional, latencies)
+                                       for _ in range(HTTP_CONNECTIONS)))
+            asyncio.run(run())
+            latencies.sort()
+            label = "If-None-Match (304s)" if conditional else "plain GET (200s)"
+            print(f"  {label:<28} {len(latencies) / HTTP_SECONDS:>10,.0f} req/s   "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms  "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(students=2000, per_student=50):
+    os.chdir(tempfile.mkdtemp())           # the local backend keeps its CSVs in the working directory
+    fill(students, per_student)
+    print(f"{students:,} students, {students * per_student:,} progress rows (CSV backend)")
+    print("in-process ASGI:")
+    in_process(students, per_student)
+    print(f"uvicorn, 1 worker pinned to one core, {HTTP_CONNECTIONS} connections:")
+    over_http(students)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
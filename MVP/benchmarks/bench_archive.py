@@ -0,0 +1,62 @@
+"""
+Benchmark: one-month query on the flat CSV vs the partitioned Parquet archive.
+
+Run from the MVP folder (works in a temporary directory):
+    python benchmarks/bench_archive.py [rows]
+Default is 10M progress rows spread over 24 months and 6 grades.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive  # noqa: E402
+
+
+def main(rows=10_000_000):
+    rng = np.random.default_rng(0)
+    minutes = np.sort(rng.integers(0, 60 * 24 * 730, rows))
+    df = pd.DataFrame({
+        "student": pd.Categorical.from_codes(rng.integers(0, 50_000, rows), [f"student{i}" for i in range(50_000)]),
+        "grade": pd.Categorical.from_codes(rng.integers(0, 6, rows), ["Kindergarten"] + [f"Grade {g}" for g in range(1, 6)]),
+        "topic": pd.Categorical.from_codes(rng.integers(0, 200, rows), [f"topic{i}" for i in range(200)]),
+        "score": rng.integers(0, 6, rows),
+        "comment": "🙂 Good — Practice a bit more.",
+        "date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(minutes, unit="m")).strftime(archive.DATE_FORMAT),
+    })
+
+    start, end = datetime(2025, 3, 1), datetime(2025, 4, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        df.to_csv("progress.csv", index=False)
+        del df
+
+        t0 = time.perf_counter()
+        csv = pd.read_csv("progress.csv")
+        dates = pd.to_datetime(csv["date"], format=archive.DATE_FORMAT)
+        csv_rows = int(((dates >= start) & (dates < end)).sum())
+        csv_time = time.perf_counter() - t0
+        del csv, dates
+
+        t0 = time.perf_counter()
+        archive.compact("progress", keep_days=0, now=datetime(2030, 1, 1))
+        compact_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        parquet_rows = len(archive.query_archive("progress", start=start, end=end))
+        parquet_time = time.perf_counter() - t0
+
+    print(f"Rows: {rows:,}  month query matched {csv_rows:,} (csv) / {parquet_rows:,} (parquet)")
+    print(f"CSV full parse + filter: {csv_time:.2f} s")
+    print(f"Parquet month query:     {parquet_time:.3f} s  ({csv_time / parquet_time:.0f}x faster)")
+    print(f"One-off compaction:      {compact_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
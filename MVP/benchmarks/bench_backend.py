@@ -0,0 +1,103 @@
+"""
+Benchmark: shared backend throughput and consistency at 1, 4 and 16 replicas.
+
+Each replica is a separate process running a mix of cache reads/writes,
+rate-limit increments and record appends against the same store, then the
+shared counter and row count are checked.
+
+Run from the MVP folder:
+    python benchmarks/bench_backend.py sqlite        # temp SQLite file
+    python benchmarks/bench_backend.py redis         # needs SLP_REDIS_URL
+    python benchmarks/bench_backend.py fakeredis     # in-process fake, replicas are threads
+"""
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend  # noqa: E402
+
+OPS_PER_REPLICA = 2000
+
+
+def make_backend(kind, path):
+    if kind == "sqlite":
+        return backend.SQLiteBackend(path)
+    if kind == "redis":
+        import redis
+        return backend.RedisBackend(redis.Redis.from_url(os.environ["SLP_REDIS_URL"]), prefix=f"bench:{path}:")
+    raise ValueError(kind)
+
+
+def replica(b, seed, ops):
+    rng = random.Random(seed)
+    incrs = appends = 0
+    for i in range(ops):
+        roll = rng.random()
+        key = f"gen:{rng.randrange(200)}"
+        if roll < 0.7:
+            b.get(key)
+        elif roll < 0.8:
+            b.set(key, "lesson text " * 50, ttl=600)
+        elif roll < 0.9:
+            b.incr("rate:bench", ttl=600)
+            incrs += 1
+        else:
+            b.append("progress", {"student": f"s{seed}", "topic": "fractions", "score": i % 6})
+            appends += 1
+    return incrs, appends
+
+
+def _process_main(kind, path, seed, ops, out):
+    out.put(replica(make_backend(kind, path), seed, ops))
+
+
+def run(kind, replicas, path, fake=None):
+    t0 = time.perf_counter()
+    if kind == "fakeredis":
+        results = []
+        threads = [threading.Thread(target=lambda s=s: results.append(replica(fake, s, OPS_PER_REPLICA)))
+                   for s in range(replicas)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        b = fake
+    else:
+        out = mp.Queue()
+        procs = [mp.Process(target=_process_main, args=(kind, path, s, OPS_PER_REPLICA, out)) for s in range(replicas)]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        b = make_backend(kind, path)
+    took = time.perf_counter() - t0
+
+    incrs = sum(r[0] for r in results)
+    appends = sum(r[1] for r in results)
+    counter_ok = int(b.get("rate:bench") or 0) == incrs
+    rows_ok = b.count("progress") == appends
+    total = replicas * OPS_PER_REPLICA
+    print(f"{replicas:>2} replicas: {total / took:8.0f} ops/s   counter {'OK' if counter_ok else 'MISMATCH'}"
+          f"   rows {'OK' if rows_ok else 'MISMATCH'}")
+
+
+def main(kind="sqlite"):
+    print(f"Backend: {kind}, {OPS_PER_REPLICA} ops per replica")
+    for replicas in (1, 4, 16):
+        with tempfile.TemporaryDirectory() as tmp:
+            fake = None
+            if kind == "fakeredis":
+                import fakeredis
+                fake = backend.RedisBackend(fakeredis.FakeRedis())
+            run(kind, replicas, os.path.join(tmp, "bench.db") if kind == "sqlite" else str(replicas), fake)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,72 @@
+"""
+Benchmark: circuit breaker during an API outage, against the stub server.
+
+Phases for a Grade 6 lesson request (single tier, gpt-4o-mini):
+
+    healthy   stub answers normally
+    outage    stub returns HTTP 500 on every call; after FAILURE_THRESHOLD
+              failures the breaker opens and calls fail fast (no API wait),
+              so the degraded answer (bank quiz) is immediate
+    recovery  stub is healthy again; after RESET_SECONDS the half-open probe
+              succeeds and the breaker closes
+
+Reports per-phase latency and how many calls reached the API.
+
+Run from the MVP folder (needs the openai package):
+    python benchmarks/bench_breaker.py [calls_per_phase]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+import breaker  # noqa: E402
+from fallback import bank_quiz  # noqa: E402
+from loadtest.stub_openai import StubState, serve  # noqa: E402
+from router import FAST, Router  # noqa: E402
+
+PORT = 8792
+RESET_SECONDS = 2
+
+
+def ask(router, client):
+    """One quiz request the way generate_help makes it, with the bank fallback."""
+    t0 = time.perf_counter()
+    try:
+        router.complete(client, "Grade 6", "Science", "lesson", "quiz",
+                        messages=[{"role": "user", "content": "5 multiple choice questions"}])
+        served = "model"
+    except Exception:
+        bank_quiz("Science", "Grade 6", "plants")
+        served = "bank"
+    return served, (time.perf_counter() - t0) * 1000
+
+
+def main(calls=30):
+    state = StubState(latency_ms=150, jitter=0.1)
+    server = serve(PORT, state, background=True)
+    client = OpenAI(base_url=f"http://127.0.0.1:{PORT}/v1", api_key="stub", max_retries=0)
+    router = Router()
+    breaker._breakers[FAST] = breaker.CircuitBreaker(FAST, reset_seconds=RESET_SECONDS)
+
+    for name, error_rate in [("healthy", 0.0), ("outage", 1.0), ("recovery", 0.0)]:
+        state.error_rate = error_rate
+        if name == "recovery":
+            time.sleep(RESET_SECONDS + 0.2)
+        api_before = state.calls
+        results = [ask(router, client) for _ in range(calls)]
+        lat = sorted(ms for _, ms in results)
+        bank = sum(1 for served, _ in results if served == "bank")
+        print(f"{name:<9} api calls {state.calls - api_before:>3}/{calls}  bank answers {bank:>3}  "
+              f"p50 {lat[len(lat) // 2]:6.1f} ms  p95 {lat[int(len(lat) * 0.95) - 1]:6.1f} ms  "
+              f"breaker {breaker.get_breaker(FAST).state}")
+
+    print(breaker.breaker_metrics())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,86 @@
+"""
+Benchmark: curriculum pack lookups vs. loading the JSON sources.
+
+Builds a synthetic pack (13 grades x 6 subjects x N topics), then measures
+how long it takes to open, the per-lesson lookup latency, and the same
+lookups against the plain JSON loaded into a dict.
+
+Run from the MVP folder:
+    python benchmarks/bench_curriculum.py [topics_per_subject]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from curriculum import ContentPack, build  # noqa: E402
+
+GRADES = ["Kindergarten"] + [f"Grade {g}" for g in range(1, 13)]
+SUBJECTS = ["Math", "Science", "Biology", "Physics", "Chemistry", "Coding"]
+
+
+def synthetic(topics):
+    lesson = "A short explanation paragraph. " * 30
+    for grade in GRADES:
+        for subject in SUBJECTS:
+            for t in range(topics):
+                yield {
+                    "grade": grade, "subject": subject, "topic": f"topic {t}", "title": f"Topic {t}",
+                    "lesson": lesson,
+                    "examples": [{"problem": "2x + 5 = 17", "solution": "x = 6"}] * 2,
+                    "checks": [{"question": "What is 1/4 of 8?", "answers": ["2"], "explanation": "8 ÷ 4 = 2"}],
+                }
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main(topics=250):
+    entries = list(synthetic(topics))
+    with tempfile.TemporaryDirectory() as tmp:
+        pack_path = os.path.join(tmp, "bench.pack")
+        json_path = os.path.join(tmp, "bench.json")
+
+        t0 = time.perf_counter()
+        build(entries, pack_path)
+        build_s = time.perf_counter() - t0
+        with open(json_path, "w", encoding="utf-8") as fh:
+            json.dump(entries, fh)
+        del entries
+
+        t0 = time.perf_counter()
+        pack = ContentPack(pack_path)
+        open_ms = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        with open(json_path, encoding="utf-8") as fh:
+            by_key = {(e["grade"], e["subject"], e["topic"]): e for e in json.load(fh)}
+        json_ms = (time.perf_counter() - t0) * 1000
+
+        rng = random.Random(1)
+        keys = [(rng.choice(GRADES), rng.choice(SUBJECTS), f"topic {rng.randrange(topics)}") for _ in range(20000)]
+        lookups = []
+        for key in keys:
+            t0 = time.perf_counter()
+            entry = pack.lesson(*key)
+            lookups.append((time.perf_counter() - t0) * 1e6)
+            assert entry is not None
+        assert pack.lesson("Grade 5", "Math", "no such topic") is None
+
+        print(f"{pack.count} lessons, pack {os.path.getsize(pack_path) / 1e6:.1f} MB "
+              f"(JSON {os.path.getsize(json_path) / 1e6:.1f} MB), built in {build_s:.1f} s")
+        print(f"open pack (mmap + toc):    {open_ms:8.2f} ms")
+        print(f"load JSON into a dict:     {json_ms:8.2f} ms")
+        print(f"lookup p50 {pct(lookups, 0.5):6.1f} us   p99 {pct(lookups, 0.99):6.1f} us   "
+              f"max {max(lookups):7.1f} us")
+        pack._mm.close()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
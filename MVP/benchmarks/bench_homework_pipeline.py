@@ -0,0 +1,110 @@
+"""
+Benchmark: end-to-end homework-photo latency, sequential vs. pipelined.
+
+Against the stub OpenAI server (gpt-4o for the Grade 8 homework lesson,
+gpt-4o-mini for the photo check and the quiz; REJECT_RATE of photos are
+rejected for having several questions), times one homework photo from
+upload to lesson + quiz:
+
+  sequential  photo check, then the lesson, then the quiz (the old flow)
+  pipelined   homework_pipeline.pipelined_help: the lesson starts when the
+              streamed check has read the question, the quiz runs alongside
+              it, and the speculative work is cancelled for rejected photos
+
+Reports the median and p95 for accepted and rejected photos, and how many
+streams the stub saw cancelled. The generation cache is left out so every
+request goes to the stub.
+
+Run from the MVP folder (needs the openai package):
+    python benchmarks/bench_homework_pipeline.py [photos]
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+from homework_pipeline import check_photo, pipelined_help, run_alongside, stream_text  # noqa: E402
+from loadtest.stub_openai import StubState, serve  # noqa: E402
+from router import FAST, STRONG, get_router  # noqa: E402
+
+PORT = 8792
+GRADE, SUBJECT = "Grade 8", "Math"
+LATENCY_MS = {STRONG: 2000, FAST: 800}
+REJECT_RATE = 0.25
+CONCURRENCY = 8
+PHOTO = random.Random(1).randbytes(50_000)       # not an image, so OCR always escalates
+
+
+def lesson_messages(question):
+    return [{"role": "system", "content": "You are a tutor."},
+            {"role": "user", "content": f"Homework question/problem:\n{question}\n\nShow every step."}]
+
+
+def quiz_messages(question):
+    return [{"role": "user", "content": f"Create 5 multiple choice questions about {question} with answers."}]
+
+
+def sequential(client):
+    """The old generate_help: check, then lesson, then quiz, each waiting for the last."""
+    check = check_photo(client, PHOTO, GRADE, SUBJECT)
+    if not check["ok"]:
+        return check["ok"]
+    router = get_router()
+    router.complete(client, GRADE, SUBJECT, "homework", "lesson", messages=lesson_messages(check["question_text"]))
+    router.complete(client, GRADE, SUBJECT, "homework", "quiz", messages=quiz_messages(check["question_text"]))
+    return True
+
+
+def pipelined(client):
+    def explain(question, cancel):
+        # What explain_help does for a homework question, minus the cache
+        quiz = run_alongside(stream_text, client, GRADE, SUBJECT, "homework", "quiz", cancel,
+                             messages=quiz_messages(question))
+        lesson = stream_text(client, GRADE, SUBJECT, "homework", "lesson", cancel,
+                             messages=lesson_messages(question))
+        return lesson, quiz.result()
+
+    check, answer = pipelined_help(client, PHOTO, GRADE, SUBJECT, explain)
+    return check["ok"]
+
+
+def run(flow, client, photos):
+    def one(_):
+        t0 = time.perf_counter()
+        ok = flow(client)
+        return ok, (time.perf_counter() - t0) * 1000
+
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        return list(pool.map(one, range(photos)))
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return "-"
+    return (f"median {latencies[len(latencies) // 2]:6.0f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.0f} ms"
+            f"  ({len(latencies)})")
+
+
+def main(photos=80):
+    state = StubState(jitter=0.15, model_latency=dict(LATENCY_MS), reject_rate=REJECT_RATE)
+    serve(PORT, state, background=True)
+    client = OpenAI(base_url=f"http://127.0.0.1:{PORT}/v1", api_key="stub", max_retries=0)
+
+    print(f"{photos} photos, {CONCURRENCY} at a time; stub latency {LATENCY_MS}, {REJECT_RATE:.0%} rejected")
+    for name, flow in (("sequential", sequential), ("pipelined", pipelined)):
+        state.cancelled = 0
+        results = run(flow, client, photos)
+        time.sleep(0.5)                              # let cancelled streams notice the hang-up
+        print(f"{name:>10}  accepted: {summary([ms for ok, ms in results if ok])}")
+        print(f"{'':>10}  rejected: {summary([ms for ok, ms in results if not ok])}")
+        print(f"{'':>10}  streams cancelled at the stub: {state.cancelled}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,134 @@
+"""
+Benchmark: IRT calibration on simulated quiz responses.
+
+Simulates STUDENTS students answering ITEMS questions from a known 2PL model
+(P(correct) = 1 / (1 + exp(-a (theta - b)))), with some bad questions mixed in:
+
+    wrong key      strong students pick the real answer, which the key marks wrong
+    no signal      a ~ 0: right or wrong regardless of ability
+    too easy/hard  b at ±3.5
+
+writes them through the responses.py file format, then times irt.calibrate
+(1PL and 2PL) on the memory-mapped file. Reports how well b and a are
+recovered, the flag precision/recall for each kind of bad question, peak
+memory, and ItemPool.pick() time for pools of 1k and 100k questions.
+
+Run from the MVP folder:
+    python benchmarks/bench_irt.py [responses]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import irt  # noqa: E402
+from responses import RECORD, load_responses  # noqa: E402
+
+STUDENTS = 200_000
+ITEMS = 5_000
+RESPONSES = 10_000_000
+BAD = {"wrong key": 0.03, "no signal": 0.03, "too easy": 0.02, "too hard": 0.02}
+FLAG_FOR = {"wrong key": "wrong key?", "no signal": "doesn't discriminate",
+            "too easy": "too easy", "too hard": "too hard"}
+
+
+def simulate(path, responses, rng):
+    theta = rng.normal(0, 1, STUDENTS)
+    b = rng.normal(0, 1.0, ITEMS).clip(-2.2, 2.2)
+    a = rng.lognormal(0, 0.25, ITEMS)
+    kind = np.full(ITEMS, "ok", dtype=object)
+    order = rng.permutation(ITEMS)
+    start = 0
+    for name, share in BAD.items():
+        chosen = order[start:start + int(ITEMS * share)]
+        kind[chosen] = name
+        start += len(chosen)
+    a[kind == "no signal"] = 0.0
+    b[kind == "too easy"], b[kind == "too hard"] = -3.5, 3.5
+    answer = rng.integers(0, 4, ITEMS)                          # the real answer
+    key = answer.copy()
+    wrong = kind == "wrong key"
+    key[wrong] = (answer[wrong] + rng.integers(1, 4, wrong.sum())) % 4
+
+    with open(path, "wb") as fh:
+        for lo in range(0, responses, 1_000_000):
+            m = min(1_000_000, responses - lo)
+            s = rng.integers(0, STUDENTS, m)
+            i = rng.integers(0, ITEMS, m)
+            knows = rng.random(m) < 1 / (1 + np.exp(-a[i] * (theta[s] - b[i])))
+            other = (answer[i] + rng.integers(1, 4, m)) % 4
+            choice = np.where(knows, answer[i], other)
+            records = np.zeros(m, dtype=RECORD)
+            records["student"] = s.astype(np.uint64) * 2654435761 + 17       # any 64-bit ids will do
+            records["item"] = i.astype(np.uint64) * 40503 + 11
+            records["time"] = 1_700_000_000
+            records["choice"] = choice
+            records["correct"] = choice == key[i]
+            records.tofile(fh)
+    return {"b": b, "a": a, "kind": kind, "item_ids": np.arange(ITEMS, dtype=np.uint64) * 40503 + 11}
+
+
+def peak_rss_mb():
+    return int(open("/proc/self/status").read().split("VmHWM:")[1].split()[0]) // 1024
+
+
+def pick_timing(rng):
+    for pool_size in (1_000, 100_000):
+        b = rng.normal(0, 1.5, pool_size)
+        zeros = np.zeros(pool_size)
+        cal = {"items": np.arange(pool_size, dtype=np.uint64), "b": b, "c": -b, "a": np.ones(pool_size),
+               "n": np.full(pool_size, 100), "strong_n": zeros, "strong_top": zeros, "strong_key": zeros,
+               "weak_n": zeros, "weak_key": zeros, "model": "1pl"}
+        meta = {i: {"question": f"q{i}", "options": [], "key": "A", "subject": "Math", "grade": "Grade 5",
+                    "topic": "fractions"} for i in range(pool_size)}
+        pool = irt.ItemPool(cal, meta)
+        picker = random.Random(1)
+        t0 = time.perf_counter()
+        for _ in range(10_000):
+            pool.pick("Math", "Grade 5", "fractions", picker.uniform(-2, 2), 5, picker)
+        print(f"  pool of {pool_size:>7,}: {(time.perf_counter() - t0) / 10_000 * 1e6:.1f} µs per 5-question pick")
+
+
+def main(responses=RESPONSES):
+    rng = np.random.default_rng(7)
+    path = os.path.join(tempfile.mkdtemp(), "item_responses.bin")
+    t0 = time.perf_counter()
+    truth = simulate(path, responses, rng)
+    print(f"{responses:,} responses ({os.path.getsize(path) / 1e6:.0f} MB), {STUDENTS:,} students, "
+          f"{ITEMS:,} items; simulated in {time.perf_counter() - t0:.0f} s")
+
+    data = load_responses(path)
+    for model in ("1pl", "2pl"):
+        t0 = time.perf_counter()
+        cal = irt.calibrate(data, model)
+        took = time.perf_counter() - t0
+        order = np.searchsorted(truth["item_ids"], cal["items"])
+        kind = truth["kind"][order]
+        ok = kind == "ok"
+        line = (f"{model}: {took:5.1f} s, {cal['iterations']} iterations; "
+                f"corr(b, true b) {np.corrcoef(cal['b'][ok], truth['b'][order][ok])[0, 1]:.3f}")
+        if model == "2pl":
+            line += f", corr(a, true a) {np.corrcoef(cal['a'][ok], truth['a'][order][ok])[0, 1]:.3f}"
+        print(line)
+        flags = irt.flag_items(cal)
+        for bad, flag in FLAG_FOR.items():
+            if flag not in flags:
+                continue
+            hit = flags[flag]
+            recall = (hit & (kind == bad)).sum() / max(1, (kind == bad).sum())
+            precision = (hit & (kind == bad)).sum() / max(1, hit.sum())
+            print(f"    {flag:<22} recall {recall:5.0%}  precision {precision:5.0%}  ({hit.sum()} flagged)")
+        print(f"    flagged in all: {flags['any'].sum()} of {len(cal['items']):,}; "
+              f"false alarms on good items: {(flags['any'] & ok).sum()}")
+    print(f"peak RSS {peak_rss_mb():,} MB")
+    print("ItemPool.pick (constant time in the pool size):")
+    pick_timing(rng)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
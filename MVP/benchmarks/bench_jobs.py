@@ -0,0 +1,54 @@
+"""
+Benchmark: 500 simultaneous "Generate Help" clicks on the job pool.
+
+Each fake job sleeps like a slow completion. Reports peak thread count,
+time to drain the burst and how long a job waits in the queue.
+
+Run from the MVP folder:
+    python benchmarks/bench_jobs.py [clicks] [seconds_per_job]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import SQLiteBackend  # noqa: E402
+from jobs import JobPool  # noqa: E402
+
+
+def fake_generation(seconds):
+    time.sleep(seconds)
+    return {"ok": True, "lesson_text": "...", "quiz_text": "..."}
+
+
+def main(clicks=500, seconds=0.2):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Job state in a shared store, as with several replicas
+        pool = JobPool(store=SQLiteBackend(os.path.join(tmp, "jobs.db")))
+        baseline_threads = threading.active_count()
+
+        t0 = time.perf_counter()
+        ids = [pool.submit("generate_help", fake_generation, seconds) for _ in range(clicks)]
+        submit_time = time.perf_counter() - t0
+
+        peak = 0
+        while pool.pending():
+            peak = max(peak, threading.active_count() - baseline_threads)
+            time.sleep(0.01)
+        drain = time.perf_counter() - t0
+
+        jobs = [pool.status(i) for i in ids]
+        done = sum(j["status"] == "done" for j in jobs)
+        waits = sorted(j["finished"] - j["created"] for j in jobs if j["status"] == "done")
+
+    print(f"{clicks} clicks submitted in {1000 * submit_time:.0f} ms, {done} done in {drain:.1f} s")
+    print(f"Peak extra threads: {peak} (pool size {pool.executor._max_workers})")
+    print(f"Job latency p50 {waits[len(waits) // 2]:.1f} s, max {waits[-1]:.1f} s")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    main(int(args[0]) if args else 500, float(args[1]) if len(args) > 1 else 0.2)
@@ -0,0 +1,160 @@
+"""
+Benchmark: journal backend write throughput (group commit) and recovery.
+
+  1. writes: N threads each save quiz results with fsync on; events/s and
+     events per fsync. One thread is the no-group-commit case (one fsync per
+     event). Also resolving one help request in a 100k-row table, CSV
+     (whole-file rewrite) vs. journal (one event).
+  2. recovery: writes EVENTS events (quiz results, help requests and their
+     resolutions) without snapshots, then times a fresh process opening
+     the journal: full replay of the log, then snapshot + TAIL_EVENTS of log
+     (the snapshot is written in the background while the tail goes in).
+
+Runs in a temp directory on the same disk as the working directory (set
+TMPDIR to pick another). Run from the MVP folder:
+    python benchmarks/bench_journal.py [events]
+"""
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MVP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MVP)
+
+import journal  # noqa: E402
+from backend import LocalBackend  # noqa: E402
+from journal import JournalBackend  # noqa: E402
+
+THREADS = [1, 4, 16, 64]
+WRITE_SECONDS = 3
+EVENTS = 10_000_000
+TAIL_EVENTS = 1_000_000
+TOPICS = ["fractions", "decimals", "area", "perimeter", "ratios"]
+
+OPEN_SCRIPT = """
+import resource, sys, time
+sys.path.insert(0, {mvp!r})
+t0 = time.perf_counter()
+from journal import JournalBackend
+j = JournalBackend({path!r})
+took = time.perf_counter() - t0
+print(f"{{took:.2f}} {{j.count('progress')}} {{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}}")
+"""
+
+
+def quiz(rng, n):
+    return {"student": f"s{rng.randrange(50_000)}", "grade": "Grade 5", "topic": rng.choice(TOPICS),
+            "score": rng.randrange(6), "comment": "", "date": f"2025-03-{1 + n % 28:02d} 10:00"}
+
+
+def help_request(rng, n):
+    return {"student": f"s{rng.randrange(50_000)}", "time": f"2025-03-{1 + n % 28:02d} 10:00",
+            "subject": "Math", "grade": "Grade 5", "topic": rng.choice(TOPICS),
+            "message": "I am stuck on question 3", "status": "Open"}
+
+
+def writes(tmp):
+    print(f"writes with fsync ({WRITE_SECONDS} s per run):")
+    print(f"{'threads':>8} {'events/s':>10} {'events/fsync':>13}")
+    for threads in THREADS:
+        path = os.path.join(tmp, f"w{threads}")
+        store = JournalBackend(path)
+        stop = time.perf_counter() + WRITE_SECONDS
+
+        def writer(seed):
+            rng, n = random.Random(seed), 0
+            while time.perf_counter() < stop:
+                store.append("progress", quiz(rng, n))
+                n += 1
+        pool = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+        t0 = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        took = time.perf_counter() - t0
+        print(f"{threads:>8} {store.stats['events'] / took:>10,.0f} "
+              f"{store.stats['events'] / store.stats['commits']:>13.1f}")
+        store.close()
+        shutil.rmtree(path)
+
+    rng = random.Random(3)
+    requests = [help_request(rng, n) for n in range(100_000)]
+    csv_store, log_store = LocalBackend(os.path.join(tmp, "csv")), JournalBackend(os.path.join(tmp, "r"))
+    csv_store.replace("help_requests", requests)
+    log_store.replace("help_requests", requests)
+    for label, store in (("CSV", csv_store), ("journal", log_store)):
+        t0 = time.perf_counter()
+        for i in range(20):
+            store.update("help_requests", rng.randrange(100_000), {"status": "Resolved", "tutor_notes": "ok"})
+        print(f"resolve 1 of 100k help requests, {label}: {(time.perf_counter() - t0) / 20 * 1000:.1f} ms")
+    log_store.close()
+
+
+def open_in_new_process(path):
+    out = subprocess.run([sys.executable, "-c", OPEN_SCRIPT.format(mvp=MVP, path=path)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1]), int(out[2])
+
+
+def recovery(tmp, events):
+    path = os.path.join(tmp, "recovery")
+    default_min_bytes = journal.SNAPSHOT_MIN_BYTES
+    journal.SNAPSHOT_MIN_BYTES = 1 << 62          # log only, so the first open replays everything
+    store = JournalBackend(path, sync=False)
+    rng, open_requests = random.Random(5), []
+    t0 = time.perf_counter()
+    for n in range(events - TAIL_EVENTS):
+        kind = n % 20
+        if kind == 0:
+            open_requests.append(store.append("help_requests", help_request(rng, n)))
+        elif kind == 1 and open_requests:
+            store.update("help_requests", open_requests.pop(rng.randrange(len(open_requests))),
+                         {"status": "Resolved", "resolved_by": "tutor", "tutor_notes": "drew it out"})
+        else:
+            store.append("progress", quiz(rng, n))
+    log_bytes = store.tail_bytes
+    print(f"recovery: wrote {events - TAIL_EVENTS:,} events ({log_bytes / 1e9:.2f} GB of log) "
+          f"in {time.perf_counter() - t0:.0f} s")
+    took, rows, rss = open_in_new_process(path)
+    print(f"  full replay of {events - TAIL_EVENTS:,} events:        {took:6.2f} s  "
+          f"({rows:,} quiz rows, peak RSS {rss:,} MB)")
+
+    # The next write cuts a snapshot, which is saved in the background while the tail is written
+    journal.SNAPSHOT_MIN_BYTES = 0
+    store.append("progress", quiz(rng, 0))
+    journal.SNAPSHOT_MIN_BYTES = default_min_bytes
+    slowest, t0 = 0.0, time.perf_counter()
+    for n in range(1, TAIL_EVENTS):
+        started = time.perf_counter()
+        store.append("progress", quiz(rng, n))
+        slowest = max(slowest, time.perf_counter() - started)
+        if n % 1000 == 0 and store.stats["snapshots"]:
+            break
+    print(f"  snapshot: {store.snapshot_bytes / 1e9:.2f} GB in {time.perf_counter() - t0:.1f} s in the background; "
+          f"slowest append meanwhile {slowest * 1000:.1f} ms")
+    for n in range(n + 1, TAIL_EVENTS):
+        store.append("progress", quiz(rng, n))
+    tail_bytes = store.tail_bytes
+    store.close()
+    took, rows, rss = open_in_new_process(path)
+    print(f"  snapshot + {tail_bytes / 1e6:.0f} MB of log ({events:,} events in all): {took:6.2f} s  "
+          f"({rows:,} quiz rows, peak RSS {rss:,} MB)")
+
+
+def main(events=EVENTS):
+    tmp = tempfile.mkdtemp(dir=os.getenv("TMPDIR") or os.getcwd(), prefix="bench_journal-")
+    try:
+        writes(tmp)
+        recovery(tmp, events)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
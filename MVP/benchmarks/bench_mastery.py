@@ -0,0 +1,59 @@
+"""
+Benchmark: full mastery recompute and incremental update.
+
+Run from the MVP folder:
+    python benchmarks/bench_mastery.py [students] [topics] [records]
+Defaults are 100k students × 200 topics with 5M quiz records.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mastery import MasteryEngine  # noqa: E402
+
+
+def synthetic_progress(students, topics, records, seed=0):
+    rng = np.random.default_rng(seed)
+    student_names = pd.Categorical.from_codes(
+        rng.integers(0, students, records), [f"student{i}" for i in range(students)]
+    )
+    topic_names = pd.Categorical.from_codes(
+        rng.integers(0, topics, records), [f"topic{i}" for i in range(topics)]
+    )
+    minutes = np.sort(rng.integers(0, 60 * 24 * 365, records))
+    dates = (pd.Timestamp("2025-01-01") + pd.to_timedelta(minutes, unit="m")).strftime("%Y-%m-%d %H:%M")
+    return pd.DataFrame({
+        "student": student_names,
+        "topic": topic_names,
+        "score": rng.integers(0, 6, records),
+        "date": dates,
+    })
+
+
+def main(students=100_000, topics=200, records=5_000_000):
+    df = synthetic_progress(students, topics, records)
+
+    engine = MasteryEngine()
+    t0 = time.perf_counter()
+    engine.update(df)
+    full = time.perf_counter() - t0
+    print(f"Full recompute: {records:,} quizzes, {len(engine.pairs):,} student-topic pairs in {full:.2f} s")
+
+    batch = synthetic_progress(students, topics, 1_000, seed=1)
+    t0 = time.perf_counter()
+    engine.update(batch)
+    inc = time.perf_counter() - t0
+    print(f"Incremental update of 1,000 new quizzes: {1000 * inc:.1f} ms")
+
+    t0 = time.perf_counter()
+    engine.next_topic("student42")
+    print(f"next_topic lookup: {1000 * (time.perf_counter() - t0):.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
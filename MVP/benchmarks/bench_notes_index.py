@@ -0,0 +1,82 @@
+"""
+Benchmark: building and querying the resolved-notes index at scale.
+
+Generates N synthetic resolved help requests (topics, student messages and
+tutor notes drawn from a vocabulary with a realistic long tail), indexes
+them in batches, then runs free-text queries like a tutor opening a new
+request would.
+
+Run from the MVP folder:
+    python benchmarks/bench_notes_index.py [resolved_requests]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notes_index import NotesIndex  # noqa: E402
+
+TOPICS = ["fractions", "decimals", "percentages", "linear equations", "quadratics", "area", "volume",
+          "photosynthesis", "cells", "forces", "atoms", "loops", "ratios", "integers", "derivatives"]
+CONFUSIONS = ["common denominator", "negative sign", "order of operations", "carry the one", "units",
+              "move the term across", "square root", "factor out", "cross multiply", "place value",
+              "chlorophyll", "mitochondria", "newton second law", "electron shells", "off by one"]
+FILLER = ("i dont understand why we need to how do you get the answer step teacher said but "
+          "my homework question is confusing when can you explain again please").split()
+GRADES = [f"Grade {g}" for g in range(1, 13)]
+SUBJECTS = ["Math", "Science", "Physics", "Chemistry", "Biology", "Coding"]
+BATCH = 10000
+
+
+def fake_request(rng, i):
+    topic, confusion = rng.choice(TOPICS), rng.choice(CONFUSIONS)
+    words = rng.sample(FILLER, 8)
+    return {
+        "student": f"s{i}", "time": f"2025-01-01 00:{i % 60:02d}", "status": "Resolved",
+        "subject": rng.choice(SUBJECTS), "grade": rng.choice(GRADES), "topic": topic,
+        "message": f"{' '.join(words[:4])} {confusion} in {topic} {' '.join(words[4:])} #{rng.randrange(10**6)}",
+        "homework_text": f"{topic} problem {rng.randrange(1000)}",
+        "tutor_notes": f"Explained {confusion} for {topic} with a worked example and a quick check",
+    }
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main(n=1_000_000):
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "notes.db")
+        index = NotesIndex(path)
+
+        t0 = time.perf_counter()
+        for start in range(0, n, BATCH):
+            index.add_many(fake_request(rng, i) for i in range(start, min(n, start + BATCH)))
+        build_s = time.perf_counter() - t0
+        size_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+        print(f"indexed {index.count():,} resolved requests in {build_s:.1f} s "
+              f"({n / build_s:,.0f}/s), {size_mb:.0f} MB on disk")
+
+        # One more resolution on a full index: the per-click cost of "Mark as Resolved"
+        t0 = time.perf_counter()
+        index.add(fake_request(rng, n + 1))
+        print(f"incremental add: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        for label, kwargs in [("any subject", {}), ("subject + grade", {"subject": "Math", "grade": "Grade 7"})]:
+            lat = []
+            for _ in range(300):
+                query = f"{rng.choice(FILLER)} {rng.choice(CONFUSIONS)} {rng.choice(TOPICS)} homework"
+                t0 = time.perf_counter()
+                hits = index.search(query, limit=5, **kwargs)
+                lat.append((time.perf_counter() - t0) * 1000)
+            print(f"search top-5 ({label:<15}): p50 {pct(lat, 0.5):7.1f} ms  p95 {pct(lat, 0.95):7.1f} ms  "
+                  f"top score {hits[0]['score'] if hits else 0:.1f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
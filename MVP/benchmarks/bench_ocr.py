@@ -0,0 +1,35 @@
+"""
+Benchmark: local OCR pre-pass latency and escalation rate.
+
+Run from the MVP folder with a folder of sample homework photos:
+    python benchmarks/bench_ocr.py path/to/photos
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr import ocr_available, ocr_prepass, ocr_stats  # noqa: E402
+
+
+def main(folder):
+    if not ocr_available():
+        print("pytesseract/Pillow not installed — every photo would be escalated.")
+        return
+
+    photos = sorted(
+        f for f in os.listdir(folder) if f.lower().endswith((".png", ".jpg", ".jpeg"))
+    )
+    for name in photos:
+        with open(os.path.join(folder, name), "rb") as fh:
+            out = ocr_prepass(fh.read())
+        verdict = out["result"]["reason"] if out["decided"] else "escalate"
+        print(f"{name:40s} {out['latency_ms']:8.1f} ms  {verdict}")
+
+    stats = ocr_stats()
+    print(f"\nPhotos: {stats['photos']}  escalated: {stats['escalated']} "
+          f"({100 * stats['escalation_rate']:.0f}%)  p50: {stats['p50_ms']:.1f} ms  p95: {stats['p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "assets")
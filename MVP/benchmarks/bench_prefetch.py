@@ -0,0 +1,102 @@
+"""
+Benchmark: prefetch hit rate and wasted spend on simulated learning paths.
+
+Students follow a per-grade topic path (lesson, practice the same topic,
+next topic, ...) and wander off it with some probability. The transition
+model is trained on a history of such students, then new students walk
+their paths with prefetch on. Generation is faked (instant, no API), and
+each miss is charged GEN_SECONDS of waiting.
+
+Reports hit rate, prefetch spend vs. wasted spend, and student wait saved.
+
+Run from the MVP folder:
+    python benchmarks/bench_prefetch.py [history_students] [new_students] [wander]
+"""
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefetch import Prefetcher, TransitionModel  # noqa: E402
+
+PATHS = {
+    "Grade 5": ["fractions", "fractions", "decimals", "decimals", "percentages", "area", "volume"],
+    "Grade 8": ["linear equations", "linear equations", "slope", "systems of equations", "functions"],
+}
+ALL_TOPICS = sorted({t for path in PATHS.values() for t in path} | {"place value", "time", "money", "angles"})
+GEN_SECONDS = 4.0
+BUDGET_USD = 5.0
+
+
+class Inline:
+    """Runs prefetch jobs immediately so the benchmark is deterministic."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def walk(rng, grade, wander):
+    for topic in PATHS[grade]:
+        yield rng.choice(ALL_TOPICS) if rng.random() < wander else topic
+
+
+def main(history_students=2000, new_students=500, wander=0.2):
+    os.chdir(tempfile.mkdtemp())           # the local backend writes nothing here, but be safe
+    rng = random.Random(7)
+
+    model = TransitionModel()
+    history = []
+    for s in range(history_students):
+        grade = rng.choice(list(PATHS))
+        history += [{"student": f"h{s}", "grade": grade, "topic": t} for t in walk(rng, grade, wander)]
+    model.update(history)
+
+    cache = {}
+
+    def cache_key(subject, grade, mode, topic, homework_text):
+        return (subject, grade, mode, topic)
+
+    def generate(subject, grade, mode, topic, homework_text):
+        cache[cache_key(subject, grade, mode, topic, homework_text)] = "lesson"
+        return {"ok": True}
+
+    model.refresh = lambda: model        # trained above, no progress store here
+    prefetcher = Prefetcher(generate, cache_key, model=model, daily_budget_usd=BUDGET_USD)
+    prefetcher.executor = Inline()
+    prefetched, requests, hits = set(), 0, 0
+
+    for s in range(new_students):
+        cache.clear()
+        prefetched.clear()
+        grade = rng.choice(list(PATHS))
+        previous = None
+        for topic in walk(rng, grade, wander):
+            mode = "practice" if topic == previous else "lesson"
+            key = ("Math", grade, mode, topic)
+            requests += 1
+            if key in cache and key in prefetched:
+                hits += 1
+            cache[key] = "lesson"
+            before = set(cache)
+            prefetcher.after_generation("Math", grade, mode, topic)
+            prefetched |= set(cache) - before
+            previous = topic
+
+    stats = prefetcher.metrics()
+    issued = stats["issued"]
+    cost = prefetcher.cost_usd
+    print(f"{new_students} students, {requests} requests, wander {wander:.0%}")
+    print(f"hit rate: {hits / requests:.1%} of requests served from prefetch")
+    print(f"prefetches: {issued}  useful {hits}  wasted {issued - hits}")
+    print(f"skipped: {stats['skipped_budget']} over the ${BUDGET_USD:.0f} cap, {stats['skipped_cached']} already cached")
+    print(f"spend: ${issued * cost:.2f}  wasted: ${(issued - hits) * cost:.2f} "
+          f"({(issued - hits) / max(issued, 1):.0%} of prefetch spend)")
+    print(f"student wait saved: {hits * GEN_SECONDS / 60:.0f} min "
+          f"({hits * GEN_SECONDS / requests:.2f} s per request)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    main(*(int(a) for a in args[:2]), *(float(a) for a in args[2:3]))
@@ -0,0 +1,129 @@
+"""
+Benchmark: reruns with a 5,000-token lesson on the page.
+
+  1. prepare_markdown() on the lesson (a cache miss) vs. a cache hit.
+  2. A page with the lesson, the quiz and the five answer selectboxes,
+     rerun once per answer change (Streamlit AppTest, server side):
+       plain      st.markdown(session_memory.get(...)), the old page
+       cached     show_session_markdown() from app.py (st.markdown of the
+                  cached, prepared markdown)
+     both with the lesson in memory and with it spilled to disk
+     (session_memory), which the old page reloaded on every rerun.
+
+Run from the MVP folder:
+    python benchmarks/bench_render_cache.py [reruns]
+"""
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+MVP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MVP)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from loadtest.stub_openai import LESSON, QUIZ  # noqa: E402
+from render_cache import RenderCache, prepare_markdown  # noqa: E402
+
+TARGET_TOKENS = 5000
+SKETCH = """
+Look at the box:
+  +----+
+ /    /|
++----+ |
+|    | +
+|    |/
++----+
+It has **length**, *breadth* and `height`; the space inside is its volume.
+"""
+
+PAGE = """
+import sys
+sys.path.insert(0, {mvp!r})
+import streamlit as st
+import session_memory
+from render_cache import content_key, get_render_cache
+
+def show_session_markdown(name):
+    # As in app.py
+    cache = get_render_cache()
+    key = st.session_state.get(f"{{name}}_key")
+    text = cache.get(key) if key else None
+    if text is None:
+        raw = session_memory.get(name, "")
+        key = content_key(raw)
+        text = cache.markdown(raw, key)
+        st.session_state[f"{{name}}_key"] = key
+    st.markdown(text)
+
+if {spill}:
+    for name in ("lesson_text", "quiz_text"):
+        if not isinstance(st.session_state.get(name), session_memory.Spilled):
+            st.session_state[name] = session_memory.Spilled("bench", name, st.session_state[name])
+
+if {cached}:
+    show_session_markdown("lesson_text")
+    show_session_markdown("quiz_text")
+else:
+    st.markdown(session_memory.get("lesson_text", ""))
+    st.write(session_memory.get("quiz_text", ""))
+for i in range(5):
+    st.selectbox(f"Answer Q{{i+1}}", ["A", "B", "C", "D"], key=f"a{{i}}")
+"""
+
+
+def make_lesson(tokens=TARGET_TOKENS):
+    parts, n = [], 0
+    while sum(len(p) for p in parts) // 4 < tokens:
+        n += 1
+        parts.append(LESSON.replace("STUB LESSON", f"## Part {n}") + SKETCH)
+    return "\n\n".join(parts)
+
+
+def reruns(cached, spill, lesson, n):
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)    # bare-mode ScriptRunContext warnings
+    at = AppTest.from_string(PAGE.format(mvp=MVP, spill=spill, cached=cached),
+                             default_timeout=60)
+    at.session_state["lesson_text"] = lesson
+    at.session_state["quiz_text"] = QUIZ
+    at.run()
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        at.selectbox[i % 5].set_value("ABCD"[i % 4]).run()
+        times.append((time.perf_counter() - t0) * 1000)
+        assert not at.exception, at.exception
+    return statistics.median(times)
+
+
+def main(n=40):
+    os.chdir(tempfile.mkdtemp())          # the local backend keeps its files in the working directory
+    lesson = make_lesson()
+    print(f"lesson: {len(lesson):,} chars (~{len(lesson) // 4:,} tokens)")
+
+    t0 = time.perf_counter()
+    prepare_markdown(lesson)
+    cold = (time.perf_counter() - t0) * 1000
+    cache = RenderCache()
+    cache.markdown(lesson)
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        cache.markdown(lesson)
+    hit = (time.perf_counter() - t0) * 1000
+    print(f"prepare_markdown: {cold:.1f} ms; cache hit (hash + lookup): {hit:.0f} µs")
+
+    print(f"rerun on an answer change, median of {n} (server side):")
+    for spill in (False, True):
+        for cached in (False, True):
+            median = reruns(cached, spill, lesson, n)
+            print(f"  {'cached' if cached else 'plain':<7} lesson {'spilled' if spill else 'in memory':<9} "
+                  f"{median:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,109 @@
+"""
+Benchmark: weekly parent reports for 100k students.
+
+Fills progress.csv with WEEKS weeks of quizzes (QUIZZES_PER_WEEK per
+student on average) and help_requests.csv with a week of requests, then
+times:
+
+  per-student  the Parent Dashboard's read (archive.load_history for one
+               student) for a sample of students, scaled to all of them
+  batch        reports.generate(): the streaming summary, then HTML (and
+               HTML + PDF) rendering in a process pool
+
+and reports the peak memory of the batch process.
+Uses the local CSV backend in a temp directory.
+
+Run from the MVP folder:
+    python benchmarks/bench_reports.py [students]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STUDENTS = 100_000
+WEEKS = 6
+QUIZZES_PER_WEEK = 5
+SAMPLE = 10
+WEEK_START = datetime(2025, 3, 3)
+TOPICS = np.array(["fractions", "decimals", "area", "perimeter", "ratios", "angles"])
+
+
+def fill(students):
+    rng = np.random.default_rng(4)
+    first = WEEK_START - timedelta(days=7 * (WEEKS - 1))
+    n = students * WEEKS * QUIZZES_PER_WEEK
+    minutes = np.sort(rng.integers(0, WEEKS * 7 * 24 * 60, n))
+    pd.DataFrame({
+        "student": np.char.add("student-", rng.integers(0, students, n).astype(str)),
+        "grade": "Grade 5",
+        "topic": TOPICS[rng.integers(0, len(TOPICS), n)],
+        "score": rng.integers(0, 6, n),
+        "comment": "",
+        "date": (pd.Timestamp(first) + pd.to_timedelta(minutes, unit="min")).strftime("%Y-%m-%d %H:%M"),
+    }).to_csv("progress.csv", index=False)
+    k = students // 2
+    pd.DataFrame({
+        "student": np.char.add("student-", rng.integers(0, students, k).astype(str)),
+        "time": (pd.Timestamp(WEEK_START) + pd.to_timedelta(rng.integers(0, 7 * 24 * 60, k), unit="min"))
+        .strftime("%Y-%m-%d %H:%M"),
+        "subject": "Math", "grade": "Grade 5", "topic": TOPICS[rng.integers(0, len(TOPICS), k)],
+        "message": "stuck on question 3", "status": np.where(rng.random(k) < 0.8, "Resolved", "Open"),
+        "tutor_notes": "Drew the shapes on a grid and counted the squares together before using the formula.",
+    }).to_csv("help_requests.csv", index=False)
+    return n
+
+
+def main(students=STUDENTS):
+    os.chdir(tempfile.mkdtemp())            # the local backend keeps its CSVs in the working directory
+    from archive import load_history
+
+    rows = fill(students)
+    print(f"{students:,} students, {rows:,} progress rows over {WEEKS} weeks "
+          f"({os.path.getsize('progress.csv') / 1e6:.0f} MB), {students // 2:,} help requests")
+
+    # Start from a fresh process so peak memory is the batch's own, not the data generation's
+    code = f"""
+import os, sys, time
+sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})
+import reports
+from backend import get_backend
+from datetime import datetime
+week = datetime({WEEK_START.year}, {WEEK_START.month}, {WEEK_START.day})
+t0 = time.perf_counter()
+students, topics = reports.weekly_summary(get_backend(), week)
+summary = time.perf_counter() - t0
+t0 = time.perf_counter()
+written = reports.generate(week, schools=["default"], out_dir=sys.argv[1], pdf=sys.argv[2] == "pdf")
+render = time.perf_counter() - t0
+files = sum(len(f) for _, _, f in os.walk(sys.argv[1]))
+# VmHWM starts over at exec, unlike ru_maxrss, which Linux carries over from the parent
+peak = int(open("/proc/self/status").read().split("VmHWM:")[1].split()[0]) // 1024
+print(f"{{summary:.1f}} {{render:.1f}} {{written['default']}} {{files}} {{peak}}")
+"""
+    workers = len(os.sched_getaffinity(0))
+    print(f"batch ({workers} worker process(es); the generate() time includes its own summary pass):")
+    for fmt in ("html", "pdf"):
+        out = subprocess.run([sys.executable, "-c", code, f"out-{fmt}", fmt], capture_output=True, text=True,
+                             check=True).stdout.split()
+        summary, render, written, files, rss = float(out[0]), float(out[1]), *map(int, out[2:])
+        print(f"  {'HTML' if fmt == 'html' else 'HTML + PDF':<11} summary {summary:5.1f} s, generate {render:6.1f} s "
+              f"-> {written:,} reports, {files:,} files; peak RSS {rss:,} MB")
+    t0 = time.perf_counter()
+    for i in range(SAMPLE):
+        load_history("progress", start=WEEK_START - timedelta(days=7), end=WEEK_START + timedelta(days=7),
+                     student=f"student-{i}")
+    per_student = (time.perf_counter() - t0) / SAMPLE
+    print(f"per-student dashboard read: {per_student * 1000:.0f} ms each -> "
+          f"{per_student * students / 3600:.1f} h for all {students:,}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
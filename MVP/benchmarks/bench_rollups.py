@@ -0,0 +1,115 @@
+"""
+Benchmark: tutor SLA rollups vs. recomputing them from the help requests.
+
+Generates N help requests spread over a year (most resolved, some still
+open), folds them into the rollups in batches, then compares:
+
+  - the per-event cost of observe() (what each request / resolve now pays)
+  - the ops view read from the rollups (queue depth, time-to-resolve
+    percentiles by subject / grade / hour / tutor, tutor throughput)
+  - the same numbers computed ad hoc with pandas from the raw rows,
+    re-parsing every date string
+
+and checks the bucketed percentiles against the exact ones.
+
+Run from the MVP folder:
+    python benchmarks/bench_rollups.py [help_requests]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rollups import DATE_FORMAT, Rollups  # noqa: E402
+
+SUBJECTS = ["Math", "Science", "Physics", "Chemistry", "Biology", "Coding"]
+GRADES = [f"Grade {g}" for g in range(1, 13)]
+TUTORS = [f"tutor {t}" for t in range(40)]
+BATCH = 10000
+
+
+def fake_requests(rng, n):
+    start = datetime.now() - timedelta(days=365)
+    for i in range(n):
+        opened = start + timedelta(minutes=i * 365 * 24 * 60 // n)
+        record = {
+            "student": f"s{i % 5000}", "time": opened.strftime(DATE_FORMAT), "message": f"help {i}",
+            "homework_text": "", "subject": rng.choice(SUBJECTS), "grade": rng.choice(GRADES), "status": "Open",
+        }
+        if rng.random() < 0.97:
+            wait = rng.lognormvariate(3.0, 1.0)      # median ~20 min with a long tail
+            record.update(status="Resolved", resolved_by=rng.choice(TUTORS),
+                          resolved_time=(opened + timedelta(minutes=wait)).strftime(DATE_FORMAT))
+        yield record
+
+
+def ad_hoc(rows, days=7):
+    """What an ops page would do without rollups."""
+    df = pd.DataFrame(rows)
+    opened = pd.to_datetime(df["time"], format=DATE_FORMAT)
+    resolved = pd.to_datetime(df["resolved_time"], format=DATE_FORMAT, errors="coerce")
+    done = df.assign(minutes=(resolved - opened).dt.total_seconds() / 60, hour=opened.dt.hour)
+    done = done[resolved >= datetime.now() - timedelta(days=days)]
+    out = {"open": int((df["status"] == "Open").sum())}
+    for dim in ("subject", "grade", "hour", "resolved_by"):
+        out[dim] = done.groupby(dim)["minutes"].quantile([0.5, 0.9, 0.95]).unstack()
+    out["all"] = done["minutes"].quantile([0.5, 0.9, 0.95])
+    out["tutors"] = done.groupby("resolved_by")["minutes"].agg(["count", "mean"])
+    return out
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def main(n=1_000_000):
+    rng = random.Random(5)
+    rows = list(fake_requests(rng, n))
+    with tempfile.TemporaryDirectory() as tmp:
+        rollups = Rollups(os.path.join(tmp, "rollups.db"))
+
+        t0 = time.perf_counter()
+        for start in range(0, n, BATCH):
+            rollups.observe_many(rows[start:start + BATCH])
+        build_s = time.perf_counter() - t0
+        print(f"folded {n:,} help requests into the rollups in {build_s:.1f} s")
+
+        # The live path: one observe() per request and per resolve
+        lat = []
+        for record in fake_requests(random.Random(6), 500):
+            record["message"] += " live"
+            rows.append(record)
+            t0 = time.perf_counter()
+            rollups.observe(record)
+            lat.append((time.perf_counter() - t0) * 1000)
+        lat.sort()
+        print(f"observe() per event: p50 {lat[len(lat) // 2]:.2f} ms  p99 {lat[int(len(lat) * 0.99)]:.2f} ms")
+
+        view_ms, report = timed(lambda: rollups.report(days=7))
+        month_ms, _ = timed(lambda: rollups.report(days=30))
+        all_ms, _ = timed(lambda: rollups.report(days=None))
+        adhoc_ms, exact = timed(lambda: ad_hoc(rows, days=7), repeat=2)
+        print(f"ops view from rollups, 7 days:   {view_ms:8.1f} ms")
+        print(f"ops view from rollups, 30 days:  {month_ms:8.1f} ms")
+        print(f"ops view from rollups, all time: {all_ms:8.1f} ms")
+        print(f"ad hoc from {len(rows):,} rows:  {adhoc_ms:8.1f} ms")
+
+        approx = report["time_to_resolve"]["all"][0]
+        for q, col in ((0.5, "p50_min"), (0.9, "p90_min"), (0.95, "p95_min")):
+            print(f"  {col}: rollup {approx[col]:6.1f}  exact {exact['all'][q]:6.1f}")
+        print(f"  open requests: rollup {report['queue']['open']}  exact {exact['open']}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
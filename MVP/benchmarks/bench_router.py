@@ -0,0 +1,74 @@
+"""
+Benchmark: model router failover against the stub OpenAI server.
+
+The stub gives each model its own latency. The run has three phases for a
+Grade 11 homework lesson (tiers: gpt-4o, then gpt-4o-mini):
+
+    normal     gpt-4o is within the SLO, so it serves everything
+    slow       gpt-4o slows down past the SLO; traffic moves to gpt-4o-mini
+    recovered  gpt-4o is fast again; once its old samples age out it is used again
+
+Reports which model served each phase and the end-to-end p95.
+
+Run from the MVP folder (needs the openai package):
+    python benchmarks/bench_router.py [calls_per_phase]
+"""
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+from loadtest.stub_openai import StubState, serve  # noqa: E402
+from router import FAST, STRONG, Router  # noqa: E402
+
+PORT = 8791
+SLO_MS = 600
+WINDOW_SECONDS = 3
+
+
+def run_phase(router, client, calls, threads=8):
+    used = Counter()
+    latencies = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        resp = router.complete(client, "Grade 11", "Physics", "homework", "lesson",
+                               messages=[{"role": "user", "content": "lesson"}])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        used[resp.model] += 1
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(calls)))
+    latencies.sort()
+    return used, latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main(calls=80):
+    state = StubState(latency_ms=100, jitter=0.2, model_latency={STRONG: 300, FAST: 60})
+    server = serve(PORT, state, background=True)
+    client = OpenAI(base_url=f"http://127.0.0.1:{PORT}/v1", api_key="stub", max_retries=0)
+    router = Router(slo_ms={"lesson": SLO_MS}, window_seconds=WINDOW_SECONDS)
+
+    print(f"SLO p95 {SLO_MS} ms, window {WINDOW_SECONDS} s, {calls} calls per phase")
+    phases = [("normal", 300), ("slow", 1500), ("recovered", 300)]
+    for name, strong_ms in phases:
+        state.model_latency[STRONG] = strong_ms
+        if name == "recovered":
+            time.sleep(WINDOW_SECONDS + 0.5)   # let the slow samples age out
+        used, p95 = run_phase(router, client, calls)
+        share = ", ".join(f"{m} {n}" for m, n in used.most_common())
+        print(f"{name:<10} gpt-4o at {strong_ms:>5} ms -> {share:<32} p95 {p95:6.0f} ms")
+
+    print(f"failovers: {router.metrics()['failovers']}")
+    for model, summary in router.metrics()["models"].items():
+        print(f"  {model:<12} {summary}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,55 @@
+"""
+Benchmark: SM-2 scheduler with a million student-item pairs.
+
+Run from the MVP folder:
+    python benchmarks/bench_scheduler.py [students] [items_per_student]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Scheduler  # noqa: E402
+
+
+def main(students=20_000, items=50):
+    sched = Scheduler()
+    rng = random.Random(0)
+    now = time.time()
+
+    t0 = time.perf_counter()
+    for s in range(students):
+        for i in range(items):
+            sched.review(f"student{s}", f"item{i}", rng.randint(0, 5), now=now - rng.random() * 30 * 86400)
+    build = time.perf_counter() - t0
+    pairs = students * items
+    state_mb = (sched.ease.nbytes + sched.interval.nbytes + sched.reps.nbytes + sched.due.nbytes) / 1e6
+    print(f"{pairs:,} pairs reviewed in {build:.1f} s ({1e6 * build / pairs:.1f} µs/review), "
+          f"array state {state_mb:.0f} MB")
+
+    lookups = 100_000
+    t0 = time.perf_counter()
+    for _ in range(lookups):
+        student = f"student{rng.randrange(students)}"
+        item = sched.next_item(student, now=now)
+        sched.review(student, item, rng.randint(0, 5), now=now)
+    took = time.perf_counter() - t0
+    print(f"next_item + review: {1e6 * took / lookups:.1f} µs per pick")
+
+    path = os.path.join(tempfile.mkdtemp(), "schedule.npz")
+    sched.save(path)
+    sched.compact(path)
+    saves = 200
+    t0 = time.perf_counter()
+    for _ in range(saves):
+        sched.review(f"student{rng.randrange(students)}", "item0", 4, now=now)
+        sched.save(path)
+    took = time.perf_counter() - t0
+    print(f"save after one review: {1e3 * took / saves:.2f} ms (appends to the log, whatever the size)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
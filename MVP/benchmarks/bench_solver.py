@@ -0,0 +1,77 @@
+"""
+Benchmark: how much homework traffic the local solver absorbs, and how fast.
+
+Run from the MVP folder:
+    python benchmarks/bench_solver.py
+Set OPENAI_API_KEY to also time a few real gpt-4o-mini calls for comparison.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solver import solve_locally  # noqa: E402
+
+# A mix shaped like real homework-box input: simple math plus word problems,
+# science and coding questions that must still go to the model.
+SAMPLE_TRAFFIC = [
+    "Solve 2x + 5 = 17",
+    "What is 1/4 of 8?",
+    "20% of 50",
+    "3(x + 1) = 2x - 4",
+    "6 + 4 × 2",
+    "Solve for y: 5y - 3 = 2y + 9",
+    "1/2 + 1/3",
+    "What is 15% of 80?",
+    "12 ÷ 4 + 7",
+    "x/3 = 5",
+    "Find the area of a rectangle 4 cm by 6 cm",
+    "Explain photosynthesis",
+    "What is a prime number?",
+    "Solve x^2 - 5x + 6 = 0",
+    "A train travels 60 km in 1.5 hours. What is its speed?",
+    "Why does ice float?",
+    "Write a for loop in Python that prints 1 to 10",
+    "Differentiate sin(x) * x^2",
+    "What is 3/5 of 25?",
+    "7 × 8",
+]
+
+
+def main(repeat=2000):
+    solved = [q for q in SAMPLE_TRAFFIC if solve_locally(q, "Grade 6") is not None]
+
+    timings = []
+    for _ in range(repeat):
+        for q in SAMPLE_TRAFFIC:
+            t0 = time.perf_counter()
+            solve_locally(q, "Grade 6")
+            timings.append(time.perf_counter() - t0)
+    timings.sort()
+
+    print(f"Absorbed locally: {len(solved)}/{len(SAMPLE_TRAFFIC)} "
+          f"({100 * len(solved) / len(SAMPLE_TRAFFIC):.0f}%)")
+    print(f"Local p50: {1e6 * timings[len(timings) // 2]:.0f} µs, "
+          f"p99: {1e6 * timings[int(len(timings) * 0.99)]:.0f} µs")
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("API comparison skipped (set OPENAI_API_KEY to time gpt-4o-mini).")
+        return
+
+    from openai import OpenAI
+    client = OpenAI()
+    api = []
+    for q in solved[:5]:
+        t0 = time.perf_counter()
+        client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": f"Solve step by step: {q}"}],
+        )
+        api.append(time.perf_counter() - t0)
+    print(f"API median over {len(api)} calls: {1000 * statistics.median(api):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
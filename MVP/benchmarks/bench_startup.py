@@ -0,0 +1,87 @@
+"""
+Startup budget check for app.py, based on `python -X importtime`.
+
+Collects the imports app.py runs at module top level (imports inside page
+branches and functions are lazy and not counted), times them in a fresh
+interpreter and fails if they exceed the budget or pull in a heavy module.
+Streamlit itself is the unavoidable baseline and is reported separately.
+
+Run from the MVP folder:
+    python benchmarks/bench_startup.py [budget_ms]
+"""
+import ast
+import os
+import subprocess
+import sys
+
+MVP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = 100
+# Must not load before a page actually needs them
+HEAVY = {"pandas", "numpy", "openai", "pyarrow", "streamlit_drawable_canvas", "PIL", "pytesseract"}
+
+
+def top_level_imports(path):
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read())
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(ast.unparse(node))
+    return lines
+
+
+def importtime(code):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=MVP_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Only count top-level entries; nested ones are already in their parent's total
+        modules[name.strip()] = (int(cumulative_us), not name[1:].startswith(" "))
+    return modules
+
+
+def main(budget_ms=BUDGET_MS):
+    imports = top_level_imports(os.path.join(MVP_DIR, "app.py"))
+    app_imports = [i for i in imports if "streamlit" not in i]
+
+    # app.py imports streamlit first, so modules it already loaded (also when a
+    # local module imports streamlit again) are the baseline, not app cost
+    st_prelude = "import streamlit\n" if len(app_imports) < len(imports) else ""
+    baseline = importtime(st_prelude or "pass")
+    modules = importtime(st_prelude + "\n".join(app_imports))
+    loaded = {name.split(".")[0] for name in modules if name not in baseline}
+    own_ms = sum(us for name, (us, top) in modules.items() if top and name not in baseline) / 1000
+
+    print("Top-level imports in app.py:")
+    for line in imports:
+        print(f"  {line}")
+    print(f"App imports (excluding streamlit): {own_ms:.1f} ms (budget {budget_ms} ms)")
+
+    try:
+        st_ms = importtime("import streamlit")["streamlit"][0] / 1000
+        print(f"streamlit baseline: {st_ms:.0f} ms")
+    except RuntimeError:
+        print("streamlit not installed here — baseline skipped")
+
+    heavy = sorted(HEAVY & loaded)
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules loaded at startup: {', '.join(heavy)}")
+        failed = True
+    if own_ms > budget_ms:
+        print("FAIL: over startup budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[float(a) for a in sys.argv[1:2]]))
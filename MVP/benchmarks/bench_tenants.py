@@ -0,0 +1,109 @@
+"""
+Benchmark: a small school's dashboard read, shared store vs. per-school shards.
+
+For growing platform sizes (total progress rows across all schools), times
+what the Parent Dashboard does for one small school (~2,000 rows):
+
+  shared   one progress table for everyone, filtered by school (the old layout)
+  sharded  tenants.py: the school's own table on its shard
+
+then plans and runs a rebalance after one school grows much bigger than
+the rest. Uses the local CSV backend (the default) in a temp directory;
+pass "sqlite" to use SQLite files instead.
+
+Run from the MVP folder:
+    python benchmarks/bench_tenants.py [local|sqlite]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import LocalBackend, SQLiteBackend  # noqa: E402
+from tenants import ShardRouter, TenantBackend  # noqa: E402
+
+SIZES = [100_000, 300_000, 1_000_000]
+SMALL_SCHOOL_ROWS = 2000
+SCHOOL_ROWS = 20_000
+SHARDS = ["shard0", "shard1", "shard2", "shard3"]
+
+
+def progress_rows(rng, school, n):
+    return [{"school": school, "student": f"{school}-s{rng.randrange(200)}", "grade": "Grade 5",
+             "topic": rng.choice(["fractions", "decimals", "area"]), "score": rng.randrange(6),
+             "date": f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} 10:00"} for _ in range(n)]
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def dashboard(store, table, school=None):
+    df = pd.DataFrame(store.rows(table))
+    return df[df["school"] == school] if school else df
+
+
+def main(kind="local"):
+    rng = random.Random(11)
+    small = progress_rows(rng, "small-school", SMALL_SCHOOL_ROWS)
+    print(f"{kind} backend; small school has {SMALL_SCHOOL_ROWS:,} progress rows")
+    print(f"{'platform rows':>14} {'shared':>10} {'sharded':>10}")
+    for total in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            if kind == "sqlite":
+                base = SQLiteBackend(os.path.join(tmp, "base.db"))
+
+                def opener(s):
+                    return SQLiteBackend(os.path.join(tmp, f"{s}.db"))
+            else:
+                base = LocalBackend(tmp)
+
+                def opener(s):
+                    return LocalBackend(os.path.join(tmp, s))
+            router = ShardRouter(base=base, shards=SHARDS, opener=opener)
+
+            everyone = list(small)
+            schools = {"small-school": small}
+            for i in range((total - SMALL_SCHOOL_ROWS) // SCHOOL_ROWS):
+                schools[f"school-{i}"] = progress_rows(rng, f"school-{i}", SCHOOL_ROWS)
+                everyone += schools[f"school-{i}"]
+            base.replace("progress", everyone)
+            for school, rows in schools.items():
+                TenantBackend(school, router).append("progress", rows[0])   # registers the school
+                router.store(router.locate(school)).replace(f"{school}/progress", rows)
+
+            shared_ms = timed(lambda: dashboard(base, "progress", "small-school"), repeat=3)
+            sharded_ms = timed(lambda: dashboard(TenantBackend("small-school", router), "progress"))
+            print(f"{len(everyone):>14,} {shared_ms:>8.1f}ms {sharded_ms:>8.1f}ms")
+
+            if total == SIZES[-1]:
+                # One school grows 20x; rebalance spreads the load again
+                big = progress_rows(rng, "school-0", SCHOOL_ROWS * 20)
+                router.store(router.locate("school-0")).replace("school-0/progress", big)
+                before = {s: 0 for s in SHARDS}
+                for row in router.status():
+                    before[row["shard"]] += row["progress"]
+                moves = router.plan()
+                t0 = time.perf_counter()
+                copied = sum(router.move(school, target, pause=0) for school, _, target in moves)
+                move_s = time.perf_counter() - t0
+                after = {s: 0 for s in SHARDS}
+                for row in router.status():
+                    after[row["shard"]] += row["progress"]
+                print(f"rebalance: {len(moves)} moves, {copied:,} rows copied in {move_s:.1f} s")
+                print(f"  rows per shard before: {before}")
+                print(f"  rows per shard after:  {after}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
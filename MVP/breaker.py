@@ -0,0 +1,132 @@
+"""
+Circuit breakers for model calls.
+
+One breaker per model. After FAILURE_THRESHOLD failures in a row (timeouts,
+connection errors, 429 and 5xx; see is_outage) the breaker opens and calls
+fail fast with CircuitOpen instead of waiting on a struggling API. After
+RESET_SECONDS it goes half-open and lets a single probe call through:
+success closes it, failure opens it again.
+
+    breaker = get_breaker("gpt-4o-mini")
+    if breaker.allow():
+        try:
+            ...
+            breaker.success()
+        except Exception as e:
+            if is_outage(e):
+                breaker.failure(e)
+            else:
+                breaker.success()      # the API answered; the request itself was bad
+            raise
+
+Per-process state, like the router stats. breaker_metrics() is shown on the
+Admin page.
+"""
+import threading
+import time
+
+FAILURE_THRESHOLD = 5
+RESET_SECONDS = 30
+
+# Per-request timeouts (seconds) passed to the OpenAI client, by task
+TIMEOUTS = {"lesson": 45, "quiz": 20, "photo": 20}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a model whose breaker is open."""
+
+
+# openai's connection/timeout errors carry no status code; matched by name so
+# this module doesn't import openai (see the cold-start notes in app.py)
+OUTAGE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "TimeoutException", "ConnectError"}
+
+
+def is_outage(error) -> bool:
+    """
+    True for errors that say the model is struggling: timeouts, connection
+    errors, 429 and 5xx. A 400/401/404 is the request's fault and would fail
+    the same way on a healthy API, so it doesn't count toward opening.
+    """
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in OUTAGE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.counts = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def allow(self, now=None) -> bool:
+        """True if a call may go ahead (in half-open, only one probe at a time)."""
+        now = now or time.time()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self.probing):
+                if self.state == HALF_OPEN:
+                    self.probing = True
+                self.counts["calls"] += 1
+                return True
+            self.counts["rejected"] += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def release(self):
+        """The call ended without telling us anything (e.g. the caller stopped a stream before any reply)."""
+        with self._lock:
+            self.probing = False
+
+    def failure(self, error=None, now=None):
+        with self._lock:
+            self.failures += 1
+            self.counts["failures"] += 1
+            if error is not None:
+                self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counts["opened"] += 1
+                self.state = OPEN
+                self.opened_at = now or time.time()
+                self.probing = False
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return dict(self.counts, state=self.state, consecutive_failures=self.failures,
+                        last_error=self.last_error)
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_breaker(name) -> CircuitBreaker:
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_metrics() -> dict:
+    with _lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.metrics() for b in breakers}
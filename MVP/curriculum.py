@@ -0,0 +1,186 @@
+"""
+Curriculum content pack for "Today's Lesson" (no AI).
+
+Lessons, worked examples and check questions are written as JSON in
+curriculum/*.json (one list of entries per subject) and compiled offline
+into one read-only file:
+
+    python curriculum.py build          # curriculum/*.json -> curriculum/curriculum.pack
+    python curriculum.py show           # version and table of contents
+
+Pack layout (little-endian):
+
+    header   magic, format version, entry count, content version,
+             index offset, table-of-contents offset/length
+    entries  one UTF-8 JSON document per lesson
+    index    fixed-size (key hash, offset, length) records sorted by hash
+    toc      JSON {grade: {subject: [topic, ...]}}
+
+The app memory-maps the pack on first use, so every session and every
+process on the host share the same read-only pages. A lookup is a binary
+search over the index plus one small JSON decode.
+"""
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from functools import lru_cache
+
+SOURCE_DIR = "curriculum"
+PACK_FILE = os.path.join(SOURCE_DIR, "curriculum.pack")
+
+MAGIC = b"SLPPACK\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII16sQQI")   # magic, format, count, content version, index, toc, toc length
+INDEX_RECORD = struct.Struct("<QQI")    # key hash, entry offset, entry length
+
+REQUIRED_FIELDS = ("grade", "subject", "topic", "title", "lesson")
+MAX_GRADE_DISTANCE = 1    # a lesson from further away than this is the wrong level; use the model instead
+
+
+def _norm(text):
+    return " ".join(str(text).lower().split())
+
+
+def _key_hash(grade, subject, topic) -> int:
+    key = f"{grade}|{subject}|{_norm(topic)}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _grade_number(grade_label):
+    return 0 if grade_label == "Kindergarten" else int(str(grade_label).split()[-1])
+
+
+# ---------- compile ----------
+def load_sources(source_dir=SOURCE_DIR):
+    entries = []
+    for path in sorted(glob.glob(os.path.join(source_dir, "*.json"))):
+        with open(path, encoding="utf-8") as fh:
+            for entry in json.load(fh):
+                missing = [f for f in REQUIRED_FIELDS if not entry.get(f)]
+                if missing:
+                    raise ValueError(f"{path}: entry {entry.get('title')!r} is missing {', '.join(missing)}")
+                entry.setdefault("examples", [])
+                entry.setdefault("checks", [])
+                entries.append(entry)
+    return entries
+
+
+def build(entries, out_path=PACK_FILE):
+    """Write a pack from a list of entry dicts. Returns the content version (hex)."""
+    blobs, toc, seen = [], {}, {}
+    for entry in entries:
+        h = _key_hash(entry["grade"], entry["subject"], entry["topic"])
+        if h in seen:
+            raise ValueError(f"duplicate lesson: {entry['grade']} / {entry['subject']} / {entry['topic']}")
+        seen[h] = True
+        blobs.append((h, json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+        toc.setdefault(entry["grade"], {}).setdefault(entry["subject"], []).append(entry["topic"])
+
+    version = hashlib.sha256(b"".join(blob for _, blob in sorted(blobs))).digest()[:16]
+
+    offset = HEADER.size
+    index = []
+    for h, blob in blobs:
+        index.append((h, offset, len(blob)))
+        offset += len(blob)
+    index.sort()
+    index_offset = offset
+    toc_offset = index_offset + len(index) * INDEX_RECORD.size
+    toc_bytes = json.dumps(toc, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(blobs), version, index_offset, toc_offset, len(toc_bytes)))
+        for _, blob in blobs:
+            fh.write(blob)
+        for record in index:
+            fh.write(INDEX_RECORD.pack(*record))
+        fh.write(toc_bytes)
+    os.replace(tmp, out_path)
+    return version.hex()
+
+
+# ---------- read ----------
+class ContentPack:
+    """Read-only, memory-mapped view of a compiled pack."""
+
+    def __init__(self, path=PACK_FILE):
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, self.count, version, self._index, toc_offset, toc_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a format-{FORMAT_VERSION} curriculum pack — rebuild it")
+        self.version = version.hex()
+        self.toc = json.loads(self._mm[toc_offset:toc_offset + toc_len])
+
+    def _find(self, h):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_hash, offset, length = INDEX_RECORD.unpack_from(self._mm, self._index + mid * INDEX_RECORD.size)
+            if mid_hash < h:
+                lo = mid + 1
+            elif mid_hash > h:
+                hi = mid
+            else:
+                return offset, length
+        return None
+
+    def lesson(self, grade, subject, topic):
+        """The entry dict for (grade, subject, topic), or None."""
+        found = self._find(_key_hash(grade, subject, topic))
+        if found is None:
+            return None
+        offset, length = found
+        entry = json.loads(self._mm[offset:offset + length])
+        # Guard against a hash collision
+        if entry["grade"] != grade or entry["subject"] != subject or _norm(entry["topic"]) != _norm(topic):
+            return None
+        return entry
+
+    def subjects(self, grade):
+        return sorted(self.toc.get(grade, {}))
+
+    def topics(self, grade, subject):
+        return list(self.toc.get(grade, {}).get(subject, []))
+
+    def nearest_grade(self, grade, subject, max_distance=MAX_GRADE_DISTANCE):
+        """
+        This grade if it has lessons for subject, else the closest lower (then
+        higher) grade within max_distance that does; None if there is none.
+        """
+        target = _grade_number(grade)
+        have = [g for g, subjects in self.toc.items()
+                if subject in subjects and abs(_grade_number(g) - target) <= max_distance]
+        if not have:
+            return None
+        return min(have, key=lambda g: (abs(_grade_number(g) - target), _grade_number(g) > target))
+
+
+@lru_cache(maxsize=1)
+def get_pack(path=PACK_FILE):
+    """The shared pack, opened on first use; None if it hasn't been built."""
+    try:
+        return ContentPack(path)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        entries = load_sources()
+        version = build(entries)
+        print(f"{PACK_FILE}: {len(entries)} lessons, version {version}, {os.path.getsize(PACK_FILE)} bytes")
+    elif command == "show":
+        pack = ContentPack()
+        print(f"version {pack.version}, {pack.count} lessons")
+        for grade, subjects in sorted(pack.toc.items(), key=lambda kv: _grade_number(kv[0])):
+            for subject, topics in sorted(subjects.items()):
+                print(f"  {grade:<13} {subject:<10} {', '.join(topics)}")
+    else:
+        print("usage: python curriculum.py [build|show]")
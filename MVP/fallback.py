@@ -0,0 +1,120 @@
+"""
+Degraded-mode content, used while the model API is slow or down.
+
+- closest_cached_lesson(): a lesson generated earlier for the same topic
+  and subject, at this grade or the nearest grade that has one.
+- bank_quiz(): a 5-question quiz in the usual "1: B" answer-key format.
+  Math questions are generated for the grade band; other subjects draw
+  from assets/quiz_bank.json, and get no quiz (None) if it has fewer than
+  five of their questions.
+
+Nothing here calls the API.
+"""
+import json
+import random
+from functools import lru_cache
+
+from backend import get_backend
+
+QUIZ_BANK_FILE = "assets/quiz_bank.json"
+LESSON_TTL = 30 * 24 * 3600
+MAX_GRADE_DISTANCE = 2
+
+
+def _grade_number(grade_label):
+    return 0 if grade_label == "Kindergarten" else int(str(grade_label).split()[-1])
+
+
+def _grade_label(g):
+    return "Kindergarten" if g == 0 else f"Grade {g}"
+
+
+def _lesson_key(subject, grade_label, topic):
+    return f"lesson:{subject}:{grade_label}:{' '.join(str(topic).lower().split())}"
+
+
+def remember_lesson(subject, grade_label, topic, lesson_text):
+    """Keep a generated lesson where closest_cached_lesson() can find it."""
+    if topic and lesson_text:
+        get_backend().set(_lesson_key(subject, grade_label, topic), lesson_text, ttl=LESSON_TTL)
+
+
+def closest_cached_lesson(subject, grade_label, topic):
+    """(lesson_text, grade it was written for), or (None, None)."""
+    if not topic:
+        return None, None
+    g = _grade_number(grade_label)
+    for distance in range(MAX_GRADE_DISTANCE + 1):
+        for other in sorted({g - distance, g + distance}):
+            if 0 <= other <= 12:
+                text = get_backend().get(_lesson_key(subject, _grade_label(other), topic))
+                if text:
+                    return text, _grade_label(other)
+    return None, None
+
+
+# ---------- bank quizzes ----------
+def _math_question(rng, g):
+    if g <= 2:
+        a, b = rng.randint(1, 10), rng.randint(1, 10)
+        return f"What is {a} + {b}?", a + b
+    if g <= 5:
+        a, b = rng.randint(2, 12), rng.randint(2, 12)
+        return f"What is {a} × {b}?", a * b
+    if g <= 8:
+        pct, base = rng.choice([10, 20, 25, 50]), rng.choice([40, 60, 80, 120, 200])
+        return f"What is {pct}% of {base}?", pct * base // 100
+    x, a, b = rng.randint(2, 9), rng.randint(2, 6), rng.randint(1, 15)
+    return f"Solve {a}x + {b} = {a * x + b}. What is x?", x
+
+
+def _math_quiz(rng, g):
+    questions = []
+    for _ in range(5):
+        text, answer = _math_question(rng, g)
+        wrong = set()
+        while len(wrong) < 3:
+            guess = answer + rng.choice([-3, -2, -1, 1, 2, 3, 10])
+            if guess >= 0 and guess != answer:
+                wrong.add(guess)
+        options = [answer] + sorted(wrong)
+        rng.shuffle(options)
+        questions.append((text, [str(o) for o in options], options.index(answer)))
+    return questions
+
+
+@lru_cache(maxsize=1)
+def _load_bank():
+    try:
+        with open(QUIZ_BANK_FILE, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def bank_quiz(subject, grade_label, topic="", seed=None):
+    """Five multiple-choice questions with an answer key, no API call; None if the bank can't make one."""
+    rng = random.Random(seed if seed is not None else f"{subject}:{grade_label}:{topic}")
+    g = _grade_number(grade_label)
+    bank = _load_bank().get(subject, [])
+    if subject == "Math":
+        questions = _math_quiz(rng, g)
+    elif len(bank) < 5:
+        return None   # a Math quiz would be the wrong subject; the caller hands off to a tutor
+    else:
+        questions = []
+        for q in rng.sample(bank, 5):
+            options = list(q["options"])
+            correct = options[q["answer"]]
+            rng.shuffle(options)
+            questions.append((q["q"], options, options.index(correct)))
+
+    lines = [f"Practice quiz ({subject}, {grade_label})"]
+    for i, (text, options, _) in enumerate(questions, 1):
+        lines.append(f"Q{i}. {text}")
+        lines.append("  ".join(f"{letter}) {opt}" for letter, opt in zip("ABCD", options)))
+    lines.append("")
+    lines.append("Answers")
+    for i, (_, _, correct) in enumerate(questions, 1):
+        lines.append(f"{i}: {'ABCD'[correct]}")
+    return "\n".join(lines)
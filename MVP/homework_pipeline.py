@@ -0,0 +1,263 @@
+"""
+Pipelined homework-photo flow.
+
+A homework photo used to go through four steps one after the other: OCR,
+the vision model's verdict, the lesson, then the quiz. Here the explanation
+starts as soon as there is a likely question:
+
+  - from the OCR pre-pass, when it read exactly one math-looking line but
+    wasn't confident enough to decide on its own, or
+  - from the vision model's streamed reply. The prompt puts question_text
+    first, so the question arrives well before the verdict flags.
+
+If the verdict rejects the photo, or the checked question isn't the one we
+guessed, the speculative explanation is cancelled. Its streamed lesson is
+closed mid-generation, so it stops costing tokens, and nothing from it is
+cached: the cache write and the cancel take the same lock (CancelEvent.commit),
+so a cancel can't land between the last check and the write. The quiz only needs the question, so it runs alongside the lesson.
+"""
+import base64
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import MAX_WORKERS
+from ocr import MATH_HINT, ocr_prepass
+from router import get_router
+
+# The vision model's JSON, with question_text first so it can be used before the rest arrives
+PHOTO_PROMPT = """
+You are a strict homework-photo validator for a K–12 learning app.
+
+MVP RULES:
+- Allow ONLY one handwritten math question.
+- Reject if: blurry/unreadable, multiple questions, worksheet/test/exam page, not a math question, or no question found.
+- If allowed, extract the SINGLE question text clearly.
+
+Return ONLY valid JSON in this exact schema, keys in this order:
+{
+  "question_text": "...",
+  "readable": true/false,
+  "multiple_questions": true/false,
+  "worksheet_or_exam": true/false,
+  "looks_like_math": true/false
+}
+No extra keys. No markdown. No commentary.
+""".strip()
+
+QUESTION_FIELD = re.compile(r'"question_text"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+# One speculative explanation per generation job, plus one quiz per lesson (jobs and prefetch)
+_speculation_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="slp-speculate")
+_quiz_pool = ThreadPoolExecutor(max_workers=2 * MAX_WORKERS, thread_name_prefix="slp-quiz")
+
+# Rolling counts for reporting (per process)
+_counts = {"photos": 0, "speculated": 0, "used": 0, "cancelled": 0}
+_counts_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    """A speculative explanation was cancelled; whatever it made is thrown away."""
+
+
+class CancelEvent(threading.Event):
+    """An Event that can't be set while commit() is writing a speculative result."""
+
+    def __init__(self):
+        super().__init__()
+        self._commit_lock = threading.Lock()
+
+    def set(self):
+        with self._commit_lock:
+            super().set()
+
+    def commit(self, write):
+        """Call write() unless cancelled (then raise Cancelled). set() waits for it to finish."""
+        with self._commit_lock:
+            if self.is_set():
+                raise Cancelled()
+            write()
+
+
+def commit(cancel, write):
+    """write() now if nothing can cancel it, else only if `cancel` hasn't been set."""
+    if cancel is None:
+        write()
+    elif isinstance(cancel, CancelEvent):
+        cancel.commit(write)
+    else:
+        if cancel.is_set():
+            raise Cancelled()
+        write()
+
+
+def _count(name):
+    with _counts_lock:
+        _counts[name] += 1
+
+
+def same_question(a, b) -> bool:
+    """Same question up to case, spacing and punctuation ("Solve 3x+4=19." vs "solve 3x + 4 = 19")."""
+    def norm(text):
+        return re.sub(r"[^0-9a-z]", "", (text or "").lower())
+    return bool(norm(a)) and norm(a) == norm(b)
+
+
+def stream_text(client, grade_label, subject, mode, task, cancel=None, on_text=None, **kwargs) -> str:
+    """
+    Router completion, streamed. Returns the full reply text.
+
+    on_text(text_so_far) is called after every chunk. Once `cancel` is set
+    the stream is closed (the server stops generating) and Cancelled is raised.
+    """
+    stream = get_router().complete(client, grade_label, subject, mode, task, stream=True, **kwargs)
+    parts = []
+    try:
+        for chunk in stream:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                if on_text is not None:
+                    on_text("".join(parts))
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+def run_alongside(fn, *args, **kwargs):
+    """Start fn(*args, **kwargs) on the quiz pool; returns a Future."""
+    return _quiz_pool.submit(fn, *args, **kwargs)
+
+
+def _verdict(data: dict) -> dict:
+    """Apply the MVP rejection rules to the vision model's JSON."""
+    qtext = (data.get("question_text") or "").strip()
+    if not data.get("readable"):
+        return {"ok": False, "reason": "blurry", "question_text": ""}
+    if data.get("worksheet_or_exam"):
+        return {"ok": False, "reason": "worksheet", "question_text": ""}
+    if data.get("multiple_questions"):
+        return {"ok": False, "reason": "multiple", "question_text": ""}
+    if not data.get("looks_like_math"):
+        return {"ok": False, "reason": "not_math", "question_text": ""}
+    if not qtext:
+        return {"ok": False, "reason": "invalid", "question_text": ""}
+    return {"ok": True, "reason": "ok", "question_text": qtext}
+
+
+def _ocr_guess(details: dict):
+    """The OCR text, if it looks like one math question; else None."""
+    lines = [line for line in (details.get("text") or "").splitlines() if line.strip()]
+    if details.get("question_lines") == 1 and len(lines) <= 3 and MATH_HINT.search(" ".join(lines)):
+        return " ".join(lines)
+    return None
+
+
+def check_photo(client, image_bytes, grade_label="", subject="Math", on_question=None) -> dict:
+    """
+    OCR pre-pass, then (if OCR couldn't decide) the vision model, streamed.
+
+    on_question(text) is called with a likely question as soon as there is
+    one: the OCR guess first, then the model's question_text the moment its
+    closing quote arrives. The photo may still be rejected after that.
+
+    Returns {"ok": bool, "reason": "blurry|multiple|worksheet|invalid|not_math|unavailable|ok",
+             "question_text": str}
+    """
+    _count("photos")
+    local = ocr_prepass(image_bytes)
+    if local["decided"]:
+        return local["result"]
+
+    if on_question is not None:
+        guess = _ocr_guess(local["details"])
+        if guess:
+            on_question(guess)
+
+    seen = []
+
+    def watch(text):
+        if seen or on_question is None:
+            return
+        match = QUESTION_FIELD.search(text)
+        if match:
+            seen.append(True)
+            question = json.loads(match.group(1)).strip()
+            if question:
+                on_question(question)
+
+    data_url = "data:image/jpeg;base64," + base64.b64encode(image_bytes).decode("utf-8")
+    try:
+        reply = stream_text(
+            client, grade_label, subject, "homework", "photo", on_text=watch,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": PHOTO_PROMPT},
+                        {"type": "image_url", "image_url": {"url": data_url}},
+                    ],
+                }
+            ],
+            temperature=0,
+        )
+    except Exception:
+        # API down, timed out or circuit open — say so instead of blaming the photo
+        return {"ok": False, "reason": "unavailable", "question_text": ""}
+
+    try:
+        data = json.loads(reply.strip())
+    except ValueError:
+        # The model didn't follow the JSON schema
+        return {"ok": False, "reason": "invalid", "question_text": ""}
+    if not isinstance(data, dict):
+        return {"ok": False, "reason": "invalid", "question_text": ""}
+    return _verdict(data)
+
+
+def pipelined_help(client, image_bytes, grade_label, subject, explain):
+    """
+    Photo check with the explanation overlapped.
+
+    explain(question_text, cancel) builds the answer (lesson + quiz) for a
+    question and raises Cancelled if the `cancel` CancelEvent gets set; it
+    should cache through commit(cancel, ...) so a rejected photo's answer is
+    never stored. It is called with cancel=None when nothing was speculated.
+
+    Returns (check, answer): check is check_photo()'s result; answer is
+    explain()'s result for the checked question, or None if the photo was
+    rejected or couldn't be checked.
+    """
+    guess = {"text": None, "future": None, "cancel": None}
+
+    def speculate(text):
+        if guess["future"] is not None:
+            if same_question(guess["text"], text):
+                return
+            guess["cancel"].set()             # the model read a different question than OCR did
+            _count("cancelled")
+        cancel = CancelEvent()
+        guess.update(text=text, cancel=cancel, future=_speculation_pool.submit(explain, text, cancel))
+        _count("speculated")
+
+    check = check_photo(client, image_bytes, grade_label, subject, on_question=speculate)
+
+    if guess["future"] is not None:
+        if check["ok"] and same_question(guess["text"], check["question_text"]):
+            _count("used")
+            return check, guess["future"].result()
+        guess["cancel"].set()
+        _count("cancelled")
+    if not check["ok"]:
+        return check, None
+    return check, explain(check["question_text"], None)
+
+
+def pipeline_stats() -> dict:
+    """How often the speculative explanation was started, used and thrown away."""
+    with _counts_lock:
+        counts = dict(_counts)
+    counts["hit_rate"] = counts["used"] / counts["speculated"] if counts["speculated"] else 0.0
+    return counts
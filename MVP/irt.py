@@ -0,0 +1,308 @@
+"""
+Item Response Theory calibration for quiz questions.
+
+Fits the item-level responses (responses.py) with one ability theta per
+student and, per question, a difficulty b and (2PL only) a discrimination a:
+
+    P(correct) = 1 / (1 + exp(-a * (theta - b)))        1PL: a = 1
+
+The fit is a joint MAP estimate. Normal priors keep students and items
+with all-right or all-wrong answers finite. Each iteration takes one
+Newton step per parameter, with the gradients and curvatures summed by
+np.bincount over all responses at once. So an iteration is a few passes
+over the arrays, and millions of responses take seconds to minutes.
+
+flag_items() marks questions that are too easy, too hard, don't separate
+strong from weak students, or whose answer key looks wrong (strong students
+mostly pick a different option). ItemPool keeps the rest in difficulty bins
+per subject / grade / topic, so pick() finds questions near a target
+difficulty in constant time, however big the pool is.
+
+Run the job (writes CALIBRATION_FILE and prints the flagged questions):
+    python irt.py [--model 1pl|2pl]
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+
+from responses import load_items, load_responses
+
+CALIBRATION_FILE = "irt_calibration.npz"
+
+MAX_ITER = 200
+TOL = 1e-3                   # stop when no parameter moves more than this
+MAX_STEP = 1.0               # clip Newton steps (logits)
+PRIOR_SD = {"theta": 1.0, "c": 3.0, "a": 0.75}   # a ~ N(1, 0.75²)
+A_RANGE = (-2.0, 4.0)        # a < 0 is allowed: it points at a wrong answer key
+B_LIMITS = (-6.0, 6.0)
+
+# Flagging
+MIN_RESPONSES = 30
+EASY_P = 0.95                # an average student gets it right more often than this
+HARD_P = 0.05                # ... or less often than this
+MIN_DISCRIMINATION = 0.3
+
+# Selection
+B_RANGE = (-4.0, 4.0)
+BIN_WIDTH = 0.25
+TARGET_SUCCESS = 0.7         # aim for questions the student gets right 70% of the time
+
+
+def _expit(z):
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+def calibrate(responses, model="2pl", max_iter=MAX_ITER, tol=TOL) -> dict:
+    """
+    Fit responses (a responses.RECORD array). Returns a dict of arrays,
+    one entry per item unless noted:
+      items, a, b, c (intercept), n, p_correct, strong_n / strong_key (answers and correct ones from students
+      above average ability), weak_n / weak_key (the rest), strong_top, top_choice,
+      students / theta (per student), model, iterations
+    """
+    students, s = np.unique(responses["student"], return_inverse=True)
+    items, i = np.unique(responses["item"], return_inverse=True)
+    s, i = s.astype(np.int32), i.astype(np.int32)
+    y = responses["correct"].astype(np.float64)
+    n_students, n_items = len(students), len(items)
+
+    n = np.bincount(i, minlength=n_items)
+    right = np.bincount(i, y, n_items)
+    p_correct = right / np.maximum(n, 1)
+    # Fitted as a * theta + c (well-behaved when a is near 0); b = -c / a at the end.
+    # Intercepts start at the logit of the share who got the item right.
+    smoothed = (right + 0.5) / (n + 1.0)
+    c = np.log(smoothed / (1 - smoothed))
+    a = np.ones(n_items)
+    theta = np.zeros(n_students)
+    var_t, var_c, var_a = PRIOR_SD["theta"] ** 2, PRIOR_SD["c"] ** 2, PRIOR_SD["a"] ** 2
+
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        ai, ci = a[i], c[i]
+
+        # Students: one Newton step each, (log-posterior gradient) / (negative curvature)
+        p = _expit(ai * theta[s] + ci)
+        step_t = (np.bincount(s, ai * (y - p), n_students) - theta / var_t) / \
+                 (np.bincount(s, ai * ai * p * (1 - p), n_students) + 1 / var_t)
+        before = theta.copy(), a.copy(), c.copy()
+        theta += np.clip(step_t, -MAX_STEP, MAX_STEP)
+        # Abilities are only known up to a shift; keep their mean at 0
+        shift = theta.mean()
+        theta -= shift
+        c += a * shift
+        ci = c[i]
+
+        # Items, given the new abilities: a Fisher-scoring step on (a, c) together
+        t = theta[s]
+        p = _expit(ai * t + ci)
+        r, w = y - p, p * (1 - p)
+        grad_c = np.bincount(i, r, n_items) - c / var_c
+        hess_c = np.bincount(i, w, n_items) + 1 / var_c
+        if model == "2pl":
+            grad_a = np.bincount(i, t * r, n_items) - (a - 1) / var_a
+            hess_a = np.bincount(i, t * t * w, n_items) + 1 / var_a
+            cross = np.bincount(i, t * w, n_items)
+            det = hess_a * hess_c - cross * cross
+            step_a = (hess_c * grad_a - cross * grad_c) / det
+            step_c = (hess_a * grad_c - cross * grad_a) / det
+            a = np.clip(a + np.clip(step_a, -MAX_STEP, MAX_STEP), *A_RANGE)
+        else:
+            step_c = grad_c / hess_c
+        c += np.clip(step_c, -MAX_STEP, MAX_STEP)
+
+        # Judge by what actually moved: the re-centring and the steps can cancel out,
+        # and items held at the A_RANGE edge keep asking for a bigger step
+        if max(np.abs(new - old).max(initial=0) for new, old in zip((theta, a, c), before)) < tol:
+            break
+
+    if model == "2pl" and theta.std() > 0:
+        # With free slopes abilities are also only known up to a scale, and the joint fit
+        # shrinks them; report them with spread 1 (a * theta unchanged) so b is on the
+        # scale target_difficulty() assumes
+        scale = theta.std()
+        theta, a = theta / scale, a * scale
+
+    # Difficulty: where P = 0.5. With a near 0 the item has no real difficulty (and gets flagged)
+    b = np.clip(-c / np.where(np.abs(a) < 1e-3, 1e-3, a), *B_LIMITS)
+
+    # Answer-key check: how often students above and below average ability picked each option.
+    # Ability here leaves out the item being checked (one Newton step back), so a student who
+    # "missed" an item with a wrong key isn't counted as weak because of that same item.
+    ai = a[i]
+    p = _expit(ai * theta[s] + c[i])
+    info = np.bincount(s, ai * ai * p * (1 - p), n_students) + 1 / var_t
+    strong = theta[s] - ai * (y - p) / info[s] > 0
+    by_choice = np.bincount(i[strong] * 4 + responses["choice"][strong].astype(np.int32),
+                            minlength=n_items * 4).reshape(n_items, 4)
+    return {
+        "items": items, "a": a, "b": b, "c": c, "n": n, "p_correct": p_correct,
+        "strong_n": by_choice.sum(axis=1),
+        "strong_key": np.bincount(i[strong], y[strong], n_items),
+        "weak_n": n - by_choice.sum(axis=1), "weak_key": right - np.bincount(i[strong], y[strong], n_items),
+        "strong_top": by_choice.max(axis=1), "top_choice": by_choice.argmax(axis=1),
+        "students": students, "theta": theta, "model": model, "iterations": iterations,
+    }
+
+
+def flag_items(cal) -> dict:
+    """Boolean arrays (one entry per item) for each problem, plus "any"."""
+    enough = cal["n"] >= MIN_RESPONSES
+    average_p = 1 / (1 + np.exp(-cal["c"]))          # P(correct) at theta = 0, whatever the slope's scale
+    flags = {
+        # Strong students pick another option more than the key, and the key less often than weak students do
+        "wrong key?": enough & (cal["strong_n"] >= MIN_RESPONSES // 2) & (cal["strong_top"] > cal["strong_key"])
+        & (cal["strong_key"] * cal["weak_n"] < cal["weak_key"] * cal["strong_n"]),
+    }
+    if cal["model"] == "2pl":
+        flags["doesn't discriminate"] = enough & ~flags["wrong key?"] & (cal["a"] < MIN_DISCRIMINATION)
+        # Difficulty only means something for items that do discriminate
+        enough = enough & ~flags["wrong key?"] & ~flags["doesn't discriminate"]
+    flags["too easy"] = enough & (average_p > EASY_P)
+    flags["too hard"] = enough & (average_p < HARD_P)
+    flags["any"] = np.logical_or.reduce(list(flags.values()))
+    return flags
+
+
+def flagged_items(cal, items_meta=None) -> list:
+    """One row per flagged item, worst first, for the admin page and the CLI."""
+    items_meta = load_items() if items_meta is None else items_meta
+    flags = flag_items(cal)
+    rows = []
+    for idx in np.flatnonzero(flags["any"]):
+        meta = items_meta.get(int(cal["items"][idx]), {})
+        rows.append({
+            "question": meta.get("question", f"item {int(cal['items'][idx]):016x}"),
+            "key": meta.get("key", ""),
+            "problems": ", ".join(name for name, flag in flags.items() if name != "any" and flag[idx]),
+            "strong students chose": "ABCD"[cal["top_choice"][idx]],
+            "difficulty": round(float(cal["b"][idx]), 2),
+            "discrimination": round(float(cal["a"][idx]), 2),
+            "responses": int(cal["n"][idx]),
+            "correct": f"{cal['p_correct'][idx]:.0%}",
+            "subject": meta.get("subject", ""), "grade": meta.get("grade", ""), "topic": meta.get("topic", ""),
+        })
+    rows.sort(key=lambda row: (row["discrimination"], -row["responses"]))
+    return rows
+
+
+def save_calibration(cal, path=CALIBRATION_FILE):
+    np.savez_compressed(path, **{k: np.asarray(v) for k, v in cal.items()})
+
+
+def load_calibration(path=CALIBRATION_FILE):
+    """The last saved calibration, or None."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        cal = {k: data[k] for k in data.files}
+    cal["model"] = str(cal["model"])
+    return cal
+
+
+def target_difficulty(theta=0.0, a=1.0, success=TARGET_SUCCESS) -> float:
+    """The difficulty b at which a student of ability theta succeeds with probability `success`."""
+    return theta - np.log(success / (1 - success)) / a
+
+
+def _pool_key(subject, grade, topic):
+    return subject, grade, " ".join(str(topic).lower().split())
+
+
+class ItemPool:
+    """Calibrated, unflagged items in BIN_WIDTH difficulty bins per (subject, grade, topic)."""
+
+    def __init__(self, cal, items_meta, bin_width=BIN_WIDTH):
+        self.bin_width = bin_width
+        self.n_bins = int(round((B_RANGE[1] - B_RANGE[0]) / bin_width))
+        self.bins = {}
+        usable = (cal["n"] >= MIN_RESPONSES) & ~flag_items(cal)["any"]
+        for idx in np.flatnonzero(usable):
+            meta = items_meta.get(int(cal["items"][idx]))
+            if meta is None:
+                continue
+            bins = self.bins.setdefault(_pool_key(meta["subject"], meta["grade"], meta["topic"]),
+                                        [[] for _ in range(self.n_bins)])
+            bins[self._bin(cal["b"][idx])].append({**meta, "b": float(cal["b"][idx])})
+
+    def _bin(self, b):
+        return min(self.n_bins - 1, max(0, int((b - B_RANGE[0]) // self.bin_width)))
+
+    def size(self, subject, grade, topic) -> int:
+        return sum(len(b) for b in self.bins.get(_pool_key(subject, grade, topic), ()))
+
+    def pick(self, subject, grade, topic, target=0.0, k=5, rng=None) -> list:
+        """
+        Up to k items as close to difficulty `target` as the pool allows:
+        the target's bin first, then its neighbours outward.
+        """
+        bins = self.bins.get(_pool_key(subject, grade, topic))
+        if not bins:
+            return []
+        rng = rng or random
+        center = self._bin(target)
+        picked = []
+        for offset in range(self.n_bins):
+            for j in {center - offset, center + offset}:
+                if 0 <= j < self.n_bins and bins[j]:
+                    need = k - len(picked)
+                    picked.extend(rng.sample(bins[j], min(need, len(bins[j]))))
+                    if len(picked) == k:
+                        return picked
+        return picked
+
+
+_pool = {"mtime": None, "pool": None}
+
+
+def get_item_pool():
+    """ItemPool from CALIBRATION_FILE, rebuilt when the job writes a new one; None before the first run."""
+    mtime = os.path.getmtime(CALIBRATION_FILE) if os.path.exists(CALIBRATION_FILE) else None
+    if mtime != _pool["mtime"]:
+        cal = load_calibration()
+        _pool.update(mtime=mtime, pool=ItemPool(cal, load_items()) if cal is not None else None)
+    return _pool["pool"]
+
+
+def pool_quiz(subject, grade_label, topic, target=None, k=5):
+    """
+    A quiz of calibrated questions near `target` (default: what an average
+    student gets right TARGET_SUCCESS of the time), in the usual "1: B"
+    answer-key format. None if the pool doesn't have k questions for this topic.
+    """
+    pool = get_item_pool()
+    picked = pool.pick(subject, grade_label, topic, target_difficulty() if target is None else target, k) \
+        if pool else []
+    if len(picked) < k:
+        return None
+    lines = [f"Practice quiz ({subject}, {grade_label})"]
+    for n, item in enumerate(picked, 1):
+        lines.append(f"Q{n}. {item['question']}")
+        lines.extend(item["options"])
+    lines.append("")
+    lines.append("Answers")
+    lines.extend(f"{n}: {item['key']}" for n, item in enumerate(picked, 1))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Calibrate quiz questions from item-level responses.")
+    parser.add_argument("--model", choices=["1pl", "2pl"], default="2pl")
+    args = parser.parse_args()
+
+    responses = load_responses()
+    if not len(responses):
+        raise SystemExit("No item responses yet.")
+    t0 = time.perf_counter()
+    cal = calibrate(responses, args.model)
+    save_calibration(cal)
+    print(f"{len(responses):,} responses, {len(cal['items']):,} items, {len(cal['students']):,} students: "
+          f"{args.model} fit in {time.perf_counter() - t0:.1f} s ({cal['iterations']} iterations) "
+          f"-> {CALIBRATION_FILE}")
+    for row in flagged_items(cal):
+        print(f"  [{row['problems']}] {row['question'][:70]}  (b {row['difficulty']}, a {row['discrimination']}, "
+              f"{row['correct']} of {row['responses']} correct)")
@@ -0,0 +1,103 @@
+"""
+Background generation jobs.
+
+Slow OpenAI work (photo check, lesson, quiz) runs on a small shared thread
+pool instead of the Streamlit script thread. Each job gets an ID and its
+status/result is kept in the shared backend (get_backend(), key "job:<id>"),
+so the page can poll from any replica, and a browser refresh can pick the
+result up again from the ID in the URL.
+
+While a job is queued or running, the process that owns it rewrites its
+heartbeat every HEARTBEAT_SECONDS. A poll only reports it "lost" once the
+heartbeat is older than LOST_AFTER, i.e. the owning process died or hung.
+
+Server thread usage stays at MAX_WORKERS no matter how many students click
+"Generate Help" at once; extra jobs wait in the queue, and past MAX_PENDING
+new jobs are refused so the queue can't grow without bound.
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import get_backend
+
+MAX_WORKERS = 8
+MAX_PENDING = 1000
+KEEP_SECONDS = 24 * 3600
+HEARTBEAT_SECONDS = 5
+LOST_AFTER = 30           # seconds without a heartbeat before an unfinished job counts as lost
+
+
+class JobPool:
+    def __init__(self, store=None, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        self.store = store or get_backend()
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="slp-job")
+        self.active = {}      # job ID -> job dict, queued or running in this process
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        threading.Thread(target=self._heartbeat, name="slp-job-heartbeat", daemon=True).start()
+
+    def _save(self, job_id, **changes):
+        """
+        Apply changes to an active job and store it with a fresh heartbeat.
+        Store writes go one at a time (self._write_lock), each with the job as
+        it is at that moment, so a slow heartbeat can never put back an older
+        state. self._lock is only held to copy the job, never during the write.
+        """
+        with self._write_lock:
+            with self._lock:
+                job = self.active.get(job_id)
+                if job is None:
+                    return
+                job.update(changes, heartbeat=time.time())
+                if job["status"] in ("done", "failed"):
+                    del self.active[job_id]
+                job = dict(job)
+            self.store.set(f"job:{job_id}", json.dumps(job), ttl=KEEP_SECONDS)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                job_ids = list(self.active)
+            for job_id in job_ids:
+                try:
+                    self._save(job_id)
+                except Exception:
+                    pass  # store briefly unreachable; the next beat tries again
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs). Returns the job ID, or None if the queue is full."""
+        with self._lock:
+            if len(self.active) >= self.max_pending:
+                return None
+            job_id = uuid.uuid4().hex
+            self.active[job_id] = {"id": job_id, "kind": kind, "status": "queued", "created": time.time(),
+                                   "result": None, "error": None}
+        self._save(job_id)
+        self.executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._save(job_id, status="running", started=time.time())
+        try:
+            result, status, error = fn(*args, **kwargs), "done", None
+        except Exception as e:
+            result, status, error = None, "failed", f"{type(e).__name__}: {e}"
+        self._save(job_id, result=result, status=status, error=error, finished=time.time())
+
+    def status(self, job_id):
+        """Job dict, or {"status": "missing"}; unfinished jobs whose heartbeat stopped show as "lost"."""
+        try:
+            job = json.loads(self.store.get(f"job:{job_id}") or "")
+        except ValueError:
+            return {"id": job_id, "status": "missing"}
+        if job["status"] in ("queued", "running") and time.time() - job.get("heartbeat", 0) > LOST_AFTER:
+            job["status"] = "lost"
+        return job
+
+    def pending(self):
+        return len(self.active)
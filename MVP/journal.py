@@ -0,0 +1,505 @@
+"""
+Journal backend (SLP_BACKEND=journal): every record write is an event
+appended to a write-ahead log, and the tables are rebuilt on startup from
+the latest snapshot plus the events written after it.
+
+The CSV backend rewrites a whole file for each update (resolving a help
+request, approving a tutor), so a write costs O(table size) and a crash in
+the middle of one can lose the table. Here a write is one small append,
+whatever the table size, and is acknowledged only once it is on disk.
+
+SLP_JOURNAL_DIR (default "journal") holds:
+
+    events-<first seq>.log   events framed as [crc32][length][op, row, table, JSON]
+    snapshot-<seq>.snap      every table as of event <seq>
+    LOCK                     flock()ed by the process that is writing
+
+Writes are group-committed: concurrent append/update/replace calls queue
+their events, one caller writes the whole queue and fsyncs once, and every
+call returns after its own event is durable. Rows are kept in memory as
+JSON bytes in one buffer per table (10M quiz rows take about 1 GB), so
+replaying an appended row is a copy, not a parse.
+
+Once the log since the last snapshot reaches SNAPSHOT_RATIO of the
+snapshot's size (and at least SNAPSHOT_MIN_BYTES), the writer starts a new
+log and a background thread saves a snapshot of everything before it; the
+old logs are deleted once the snapshot is on disk. That keeps replay short
+without holding up writes while a large snapshot is written. An event cut
+off at the end of the log (a crash mid-write, never acknowledged) is
+dropped on the next start.
+
+Several processes may share the directory (app.py replicas on one host,
+api.py, tenants.py moves): a writer takes LOCK and first applies what the
+others wrote; readers pick up new events whenever they read. The cache and
+counters stay in-process, as with the local backend.
+
+The first start with an empty journal imports progress.csv,
+help_requests.csv and tutors.csv from the working directory.
+
+    python journal.py status
+    python journal.py snapshot
+"""
+import array
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:      # Windows: no cross-process lock, so one process per journal
+    fcntl = None
+
+from backend import TABLE_FILES, LocalBackend, MemoryKV
+
+JOURNAL_DIR = "journal"
+SNAPSHOT_MIN_BYTES = 64 * 1024 * 1024
+SNAPSHOT_RATIO = 0.25
+READ_CHUNK = 16 * 1024 * 1024
+
+FRAME = struct.Struct("<II")          # crc32(body), len(body)
+EVENT = struct.Struct("<BQH")         # op, row index, len(table name); then the name and the JSON
+SNAP_HEADER = struct.Struct("<8sQI")  # magic, seq, number of tables
+SNAP_TABLE = struct.Struct("<HQQQ")   # len(name), rows, heap bytes, table version
+SNAP_MAGIC, SNAP_END = b"SLPSNAP1", b"SLPEND01"
+APPEND, UPDATE, REPLACE = 1, 2, 3
+SEGMENT_RE = re.compile(r"events-(\d+)\.log$")
+SNAPSHOT_RE = re.compile(r"snapshot-(\d+)\.snap$")
+
+
+class JournalError(Exception):
+    pass
+
+
+def _encode(record):
+    return json.dumps(record).encode("utf-8")
+
+
+class _Table:
+    """Rows as JSON bytes in one buffer; starts/lengths point at each row's current copy."""
+
+    __slots__ = ("heap", "starts", "lengths", "garbage", "seq")
+
+    def __init__(self):
+        self.heap = bytearray()
+        self.starts = array.array("Q")
+        self.lengths = array.array("I")
+        self.garbage = 0     # bytes of old row copies left behind by updates
+        self.seq = 0         # last event that wrote the table: its version
+
+    def add(self, data):
+        self.starts.append(len(self.heap))
+        self.lengths.append(len(data))
+        self.heap += data
+
+    def get(self, i):
+        start = self.starts[i]
+        return json.loads(self.heap[start:start + self.lengths[i]])
+
+    def put(self, i, data):
+        self.garbage += self.lengths[i]
+        self.starts[i] = len(self.heap)
+        self.lengths[i] = len(data)
+        self.heap += data
+
+    def compact(self):
+        heap, starts, view = bytearray(), array.array("Q"), memoryview(self.heap)
+        for start, length in zip(self.starts, self.lengths):
+            starts.append(len(heap))
+            heap += view[start:start + length]
+        view.release()
+        self.heap, self.starts, self.garbage = heap, starts, 0
+
+
+class _Pending:
+    __slots__ = ("op", "table", "index", "payload", "rows", "result", "error", "done")
+
+    def __init__(self, op, table, index=0, payload=b"", rows=0):
+        self.op, self.table, self.index, self.payload, self.rows = op, table, index, payload, rows
+        self.result = self.error = None
+        self.done = False
+
+
+class JournalBackend(MemoryKV):
+    def __init__(self, path=JOURNAL_DIR, sync=True, import_from=None):
+        super().__init__()
+        self.path = path
+        self.sync = sync                 # False skips fsync (bulk loads, benchmarks)
+        self.tables = {}
+        self.seq = 0                     # last event applied
+        self.snapshot_bytes = 0
+        self.tail_bytes = 0              # log bytes since the last snapshot
+        self.stats = {"events": 0, "commits": 0, "snapshots": 0, "dropped_bytes": 0}
+        self._state = threading.RLock()  # tables and the read position
+        self._writer = threading.Lock()  # one writing thread per process (LOCK covers processes)
+        self._cond = threading.Condition()
+        self._queue, self._flushing, self._writing = [], False, False
+        self._snapshotting, self._snapshot_thread = False, None
+        self._fd, self._first, self._next, self._pos = None, 0, 1, 0
+        self._dir_mtime = None
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, "LOCK"), os.O_RDWR | os.O_CREAT, 0o644)
+        with self._file_lock(), self._state:
+            if import_from is not None and not self._list(SNAPSHOT_RE) and not self._list(SEGMENT_RE):
+                self._import_csv(import_from)
+            self._load()
+            self._catch_up(repair=True)
+
+    # ---------- files ----------
+    def _list(self, pattern):
+        return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(self.path)) if m)
+
+    def _file(self, kind, seq):
+        return os.path.join(self.path, f"events-{seq:012d}.log" if kind == "log" else f"snapshot-{seq:012d}.snap")
+
+    @contextmanager
+    def _file_lock(self):
+        with self._writer:
+            if fcntl:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _fsync_dir(self):
+        if self.sync and hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _open_segment(self, first):
+        if first > self.seq + 1:
+            # We fell behind a snapshot and the events in between are gone: start from it
+            return self._load()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self._file("log", first), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._first, self._next, self._pos = first, first, 0
+        self.tail_bytes = 0           # a new log starts at a snapshot cut
+        if os.path.exists(self._file("snap", first - 1)):
+            self.snapshot_bytes = os.path.getsize(self._file("snap", first - 1))
+
+    def _load(self):
+        """Tables from the newest snapshot, positioned at the log that follows it."""
+        self.tables, self.seq = {}, 0
+        snapshots = self._list(SNAPSHOT_RE)
+        if snapshots:
+            self._read_snapshot(snapshots[-1])
+        segments = [s for s in self._list(SEGMENT_RE) if s <= self.seq + 1]
+        self._open_segment(segments[-1] if segments else self.seq + 1)
+
+    def _read_snapshot(self, seq):
+        with open(self._file("snap", seq), "rb") as fh:
+            magic, self.seq, count = SNAP_HEADER.unpack(fh.read(SNAP_HEADER.size))
+            if magic != SNAP_MAGIC:
+                raise JournalError(f"{fh.name} is not a journal snapshot")
+            for _ in range(count):
+                name_len, rows, heap_len, table_seq = SNAP_TABLE.unpack(fh.read(SNAP_TABLE.size))
+                table = self.tables[fh.read(name_len).decode("utf-8")] = _Table()
+                table.starts.fromfile(fh, rows)
+                table.lengths.fromfile(fh, rows)
+                table.heap = bytearray(heap_len)
+                fh.readinto(table.heap)
+                table.seq = table_seq
+            if fh.read(len(SNAP_END)) != SNAP_END:
+                raise JournalError(f"{fh.name} is truncated")
+
+    def _cut(self):
+        """Freeze what the next snapshot holds and start a new log. Cheap; runs under LOCK."""
+        frozen = []
+        for name, table in self.tables.items():
+            if table.garbage > len(table.heap) // 4:
+                table.compact()
+            # Heaps only grow, so the first len(heap) bytes stay as they are while the file is written
+            frozen.append((name, table.heap, len(table.heap), array.array("Q", table.starts),
+                           array.array("I", table.lengths), table.seq))
+        if self._first != self.seq + 1:
+            self._open_segment(self.seq + 1)
+            self._fsync_dir()
+        return self.seq, frozen
+
+    def _save_snapshot(self, seq, frozen):
+        """Write a cut to snapshot-<seq>.snap, then delete the logs and snapshots it replaces."""
+        path = self._file("snap", seq)
+        with open(path + ".tmp", "wb") as fh:
+            fh.write(SNAP_HEADER.pack(SNAP_MAGIC, seq, len(frozen)))
+            for name, heap, heap_len, starts, lengths, table_seq in frozen:
+                encoded = name.encode("utf-8")
+                fh.write(SNAP_TABLE.pack(len(encoded), len(starts), heap_len, table_seq))
+                fh.write(encoded)
+                starts.tofile(fh)
+                lengths.tofile(fh)
+                for i in range(0, heap_len, READ_CHUNK):
+                    with self._state:     # appends may resize the heap; copy a chunk at a time
+                        chunk = heap[i:min(i + READ_CHUNK, heap_len)]
+                    fh.write(chunk)
+            fh.write(SNAP_END)
+            fh.flush()
+            if self.sync:
+                os.fsync(fh.fileno())
+        os.replace(path + ".tmp", path)
+        self._fsync_dir()
+        self.snapshot_bytes = os.path.getsize(path)
+        for old in self._list(SEGMENT_RE):
+            if old <= seq:
+                os.remove(self._file("log", old))
+        for old in self._list(SNAPSHOT_RE):
+            if old < seq:
+                os.remove(self._file("snap", old))
+        self.stats["snapshots"] += 1
+
+    def _save_in_background(self, seq, frozen):
+        try:
+            self._save_snapshot(seq, frozen)
+        except Exception as e:
+            # The log still holds every event, so nothing is lost; the next cut tries again
+            print(f"journal: snapshot {seq} failed: {e}", file=sys.stderr)
+        finally:
+            self._snapshotting = False
+
+    def _import_csv(self, data_dir):
+        csvs = LocalBackend(data_dir)
+        for table in TABLE_FILES:
+            rows = csvs.rows(table)
+            if rows:
+                self.tables[table] = _Table()
+                for row in rows:
+                    self.tables[table].add(_encode(row))
+        if self.tables:
+            self._save_snapshot(*self._cut())
+
+    # ---------- replay ----------
+    def _apply(self, op, name, index, payload):
+        table = self.tables.get(name)
+        if table is None or op == REPLACE:
+            table = self.tables[name] = _Table()
+        result = None
+        if op == APPEND:
+            result = len(table.starts)
+            table.add(payload)
+        elif op == UPDATE:
+            row = table.get(index)
+            row.update(json.loads(bytes(payload)))
+            table.put(index, _encode(row))
+        else:
+            for row in json.loads(bytes(payload)):
+                table.add(_encode(row))
+        table.seq = self._next
+        return result
+
+    def _apply_frames(self, data, results=None):
+        """Apply the complete, intact frames at the start of data. Returns (bytes used, hit a bad frame)."""
+        view, pos, end = memoryview(data), 0, len(data)
+        unpack_frame, unpack_event, crc32 = FRAME.unpack_from, EVENT.unpack_from, zlib.crc32
+        head = FRAME.size + EVENT.size
+        while pos + FRAME.size <= end:
+            checksum, size = unpack_frame(data, pos)
+            stop = pos + FRAME.size + size
+            if stop > end:
+                break
+            body = view[pos + FRAME.size:stop]
+            if crc32(body) != checksum:
+                return pos, True
+            if self._next > self.seq:          # events up to self.seq are already in the snapshot
+                op, index, name_len = unpack_event(body)
+                name = str(body[EVENT.size:EVENT.size + name_len], "utf-8")
+                result = self._apply(op, name, index, body[EVENT.size + name_len:])
+                if results is not None:
+                    results.append(result)
+                self.seq = self._next
+            self._next += 1
+            pos = stop
+        self.tail_bytes += pos
+        return pos, False
+
+    def _read_events(self, end, repair):
+        while self._pos < end:
+            data = os.pread(self._fd, min(READ_CHUNK, end - self._pos), self._pos)
+            used, bad = self._apply_frames(data)
+            if used == 0 and not bad and len(data) >= FRAME.size:
+                size = FRAME.size + FRAME.unpack_from(data)[1]
+                if self._pos + size <= end:    # a single event bigger than a chunk (a large replace)
+                    used, bad = self._apply_frames(os.pread(self._fd, size, self._pos))
+            self._pos += used
+            if used == 0:
+                break
+        if repair and self._pos < end:
+            # Only the writer holding LOCK repairs, so this is a write that never finished
+            print(f"journal: dropping {end - self._pos} bytes of an unfinished write "
+                  f"at the end of {self._file('log', self._first)}", file=sys.stderr)
+            self.stats["dropped_bytes"] += end - self._pos
+            os.ftruncate(self._fd, self._pos)
+
+    def _newer_segment(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        # Directory mtimes are coarse: re-list while the last change is recent
+        if mtime == self._dir_mtime and time.time_ns() - mtime > 1_000_000_000:
+            return None
+        self._dir_mtime = mtime
+        later = [s for s in self._list(SEGMENT_RE) if s > self._first]
+        return later[0] if later else None
+
+    def _catch_up(self, repair=False):
+        """Apply events written after our read position (by other processes, or before a restart)."""
+        with self._state:
+            if self._writing:
+                return                         # our own batch is in flight; it is applied once durable
+            while True:
+                self._read_events(os.fstat(self._fd).st_size, repair)
+                newer = self._newer_segment()
+                if newer is None:
+                    return
+                # A newer log exists, so this one is finished: read its last events, then move on
+                self._read_events(os.fstat(self._fd).st_size, repair)
+                self._open_segment(newer)
+
+    # ---------- group commit ----------
+    def _submit(self, pending):
+        with self._cond:
+            self._queue.append(pending)
+            while not pending.done:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                # Nobody is writing: this thread writes everything queued so far
+                self._flushing = True
+                batch, self._queue = self._queue, []
+                self._cond.release()
+                try:
+                    self._flush(batch)
+                except BaseException as e:
+                    for p in batch:
+                        if p.error is None and p.result is None:
+                            p.error = e
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                    for p in batch:
+                        p.done = True
+                    self._cond.notify_all()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _flush(self, batch):
+        with self._file_lock():
+            self._catch_up(repair=True)
+            frames, kept, counts = [], [], {}
+            with self._state:
+                for p in batch:
+                    table = self.tables.get(p.table)
+                    n = counts.get(p.table, len(table.starts) if table else 0)
+                    if p.op == UPDATE:
+                        try:
+                            p.index = range(n)[p.index]
+                        except IndexError:
+                            p.error = IndexError(f"{p.table} has no row {p.index}")
+                            continue
+                    counts[p.table] = n + 1 if p.op == APPEND else p.rows if p.op == REPLACE else n
+                    name = p.table.encode("utf-8")
+                    body = EVENT.pack(p.op, p.index, len(name)) + name + p.payload
+                    frames.append(FRAME.pack(zlib.crc32(body), len(body)) + body)
+                    kept.append(p)
+                if not frames:
+                    return
+                self._writing = True
+            try:
+                data = b"".join(frames)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self._fd, view):]
+                if self.sync:
+                    os.fsync(self._fd)
+            finally:
+                with self._state:
+                    self._writing = False
+            with self._state:
+                # Durable now: apply through the same code as replay
+                results = []
+                used, _ = self._apply_frames(data, results)
+                self._pos += used
+                for p, result in zip(kept, results):
+                    p.result = result
+                self.stats["events"] += len(kept)
+                self.stats["commits"] += 1
+                if not self._snapshotting and \
+                        self.tail_bytes >= max(SNAPSHOT_MIN_BYTES, SNAPSHOT_RATIO * self.snapshot_bytes):
+                    # Writing a big snapshot takes seconds: do it off the write path
+                    self._snapshotting = True
+                    self._snapshot_thread = threading.Thread(
+                        target=self._save_in_background, args=self._cut(), name="journal-snapshot")
+                    self._snapshot_thread.start()
+
+    # ---------- records ----------
+    def append(self, table, record):
+        return self._submit(_Pending(APPEND, table, payload=_encode(record)))
+
+    def update(self, table, index, fields):
+        self._submit(_Pending(UPDATE, table, index, _encode(fields)))
+
+    def replace(self, table, records):
+        records = list(records)
+        self._submit(_Pending(REPLACE, table, payload=_encode(records), rows=len(records)))
+
+    def rows(self, table, start=0, limit=None):
+        self._catch_up()
+        with self._state:
+            t = self.tables.get(table)
+            if t is None:
+                return []
+            end = None if limit is None else start + limit
+            heap, loads = t.heap, json.loads
+            return [loads(heap[s:s + n]) for s, n in zip(t.starts[start:end], t.lengths[start:end])]
+
+    def count(self, table):
+        self._catch_up()
+        with self._state:
+            t = self.tables.get(table)
+            return len(t.starts) if t else 0
+
+    def version(self, table):
+        self._catch_up()
+        with self._state:
+            t = self.tables.get(table)
+            return str(t.seq) if t else "0"
+
+    def snapshot(self):
+        self._wait_for_snapshot()
+        with self._file_lock(), self._state:
+            self._catch_up(repair=True)
+            cut = self._cut()
+        self._save_snapshot(*cut)
+
+    def _wait_for_snapshot(self):
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+
+    def close(self):
+        self._wait_for_snapshot()
+        with self._state:
+            for fd in (self._fd, self._lock_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._fd = self._lock_fd = None
+
+
+if __name__ == "__main__":
+    journal = JournalBackend(os.getenv("SLP_JOURNAL_DIR", JOURNAL_DIR), import_from=".")
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "snapshot":
+        journal.snapshot()
+    elif command != "status":
+        sys.exit("usage: python journal.py [status|snapshot]")
+    print(f"event {journal.seq:,}; snapshot {journal.snapshot_bytes / 1e6:.1f} MB, "
+          f"{journal.tail_bytes / 1e6:.1f} MB of log since")
+    for name, table in sorted(journal.tables.items()):
+        print(f"  {name}: {len(table.starts):,} rows")
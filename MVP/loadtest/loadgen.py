@@ -0,0 +1,314 @@
+"""
+Multi-session load generator for a running app.py.
+
+Opens many concurrent Streamlit websocket sessions (the same protocol the
+browser speaks), replays a mix of KG taps, Generate Help, Submit Quiz and
+dashboard views, and ramps concurrency step by step. For each step it
+reports throughput, p50/p95/p99 latency, error rate and server RSS, and at
+the end a capacity number per CPU core.
+
+Easiest run (starts the stub OpenAI server and the app itself):
+    python loadtest/loadgen.py --launch --levels 1,4,16,32 --step-seconds 30
+
+Against an already running server:
+    python loadtest/loadgen.py --url ws://localhost:8501 --server-pid 12345
+
+Needs `websockets` and Streamlit's protobufs (installed with streamlit).
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+MVP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MVP_DIR)
+
+# scenario -> weight (what a 9am school login looks like)
+DEFAULT_MIX = {"kg_tap": 0.35, "generate_help": 0.3, "submit_quiz": 0.15, "dashboard": 0.2}
+TOPICS = ["fractions", "decimals", "place value", "area", "time", "money", "multiplication"]
+STEP_TIMEOUT = 60
+
+
+class ScriptError(Exception):
+    pass
+
+
+class Session:
+    """One browser tab: keeps widget values, sends reruns, waits for script_finished."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/") + "/_stcore/stream"
+        self.ws = None
+        self.widgets = {}      # label -> (id, element type, options)
+        self.values = {}       # widget id -> (field, value)
+        self.query_string = ""
+        self.texts = []
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        await self.rerun()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def rerun(self, trigger_id=None, wait_for=None):
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        for wid, (field, value) in self.values.items():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = wid
+            setattr(state, field, value)
+        if trigger_id:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = trigger_id
+            state.trigger_value = True
+        await self.ws.send(msg.SerializeToString())
+        await self._read_until_finished(wait_for)
+
+    async def _read_until_finished(self, wait_for):
+        deadline = time.monotonic() + STEP_TIMEOUT
+        self.texts = []
+        while True:
+            raw = await asyncio.wait_for(self.ws.recv(), timeout=max(0.1, deadline - time.monotonic()))
+            fm = ForwardMsg()
+            fm.ParseFromString(raw)
+            kind = fm.WhichOneof("type")
+            if kind == "page_info_changed":
+                self.query_string = fm.page_info_changed.query_string
+            elif kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                self._record(fm.delta.new_element)
+            elif kind == "script_finished":
+                done = wait_for is None or any(wait_for in t for t in self.texts)
+                if done:
+                    return
+                # The app is polling a job (sleep + st.rerun) — keep reading
+                self.texts = []
+
+    def _record(self, element):
+        kind = element.WhichOneof("type")
+        el = getattr(element, kind)
+        if kind == "exception":
+            raise ScriptError(el.message)
+        if kind == "markdown":
+            self.texts.append(el.body)
+        elif kind == "alert":
+            self.texts.append(el.body)
+        label = getattr(el, "label", None)
+        wid = getattr(el, "id", None)
+        if label and wid and label not in self.widgets:
+            self.widgets[label] = (wid, kind, list(getattr(el, "options", [])))
+
+    def _widget(self, label):
+        if label not in self.widgets:
+            raise ScriptError(f"widget not rendered: {label!r}")
+        return self.widgets[label]
+
+    async def set(self, label, value, wait_for=None):
+        wid, kind, options = self._widget(label)
+        if kind in ("radio", "selectbox"):
+            if value not in options:
+                raise ScriptError(f"{value!r} not an option of {label!r}")
+        self.values[wid] = ("string_value", value)
+        self.widgets.clear()
+        await self.rerun(wait_for=wait_for)
+
+    async def click(self, label, wait_for=None):
+        wid, _, _ = self._widget(label)
+        self.widgets.clear()
+        await self.rerun(trigger_id=wid, wait_for=wait_for)
+
+
+# ---------- scenarios: each returns a list of step latencies (seconds) ----------
+async def timed(coro, out):
+    t0 = time.perf_counter()
+    await coro
+    out.append(time.perf_counter() - t0)
+
+
+async def scenario_kg_tap(s, user):
+    lat = []
+    await timed(s.set("Select one:", "Kindergarten"), lat)
+    for _ in range(3):
+        await timed(s.click(str(random.randint(1, 10))), lat)
+    return lat
+
+
+async def _generate(s, user, lat):
+    await timed(s.set("Select one:", "Grade 5"), lat)
+    await timed(s.click("📘 Today’s Lesson"), lat)
+    await timed(s.set("Student name", f"loadtest-{user}"), lat)
+    await timed(s.set("Topic (e.g. fractions, linear equations)", random.choice(TOPICS)), lat)
+    await timed(s.click("Generate Help / Explanation", wait_for="Concept Snapshot"), lat)
+
+
+async def scenario_generate_help(s, user):
+    lat = []
+    await _generate(s, user, lat)
+    return lat
+
+
+async def scenario_submit_quiz(s, user):
+    lat = []
+    await _generate(s, user, lat)
+    for q in range(1, 6):
+        await timed(s.set(f"Answer Q{q}", random.choice("ABCD")), lat)
+    await timed(s.click("Submit Quiz", wait_for="Your score"), lat)
+    return lat
+
+
+async def scenario_dashboard(s, user):
+    lat = []
+    await timed(s.set("Select one:", "Grade 3"), lat)
+    await timed(s.click("✏️ Practice"), lat)
+    await timed(s.set("Navigate", "Parent Dashboard"), lat)
+    return lat
+
+
+SCENARIOS = {
+    "kg_tap": scenario_kg_tap,
+    "generate_help": scenario_generate_help,
+    "submit_quiz": scenario_submit_quiz,
+    "dashboard": scenario_dashboard,
+}
+
+
+async def virtual_user(url, user, mix, stop_at, results):
+    names, weights = zip(*mix.items())
+    while time.monotonic() < stop_at:
+        name = random.choices(names, weights)[0]
+        s = Session(url)
+        try:
+            await s.connect()
+            results["latencies"].extend(await SCENARIOS[name](s, user))
+            results["ok"] += 1
+        except Exception as e:
+            results["errors"] += 1
+            results["error_kinds"][type(e).__name__] = results["error_kinds"].get(type(e).__name__, 0) + 1
+        finally:
+            await s.close()
+
+
+def rss_mb(pid):
+    """Resident memory of the server process and its children, in MB."""
+    if not pid:
+        return None
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        return sum(p.memory_info().rss for p in [proc] + proc.children(recursive=True)) / 1e6
+    except ImportError:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1000
+    except Exception:
+        return None
+
+
+def pct(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))] if sorted_values else float("nan")
+
+
+async def run_level(url, users, seconds, mix, server_pid):
+    results = {"latencies": [], "ok": 0, "errors": 0, "error_kinds": {}}
+    stop_at = time.monotonic() + seconds
+    t0 = time.perf_counter()
+    peak_rss = 0.0
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while time.monotonic() < stop_at:
+            peak_rss = max(peak_rss, rss_mb(server_pid) or 0.0)
+            await asyncio.sleep(1)
+
+    await asyncio.gather(sample_rss(), *(virtual_user(url, u, mix, stop_at, results) for u in range(users)))
+    took = time.perf_counter() - t0
+    lat = sorted(results["latencies"])
+    scenarios = results["ok"] + results["errors"]
+    return {
+        "users": users,
+        "actions_per_s": len(lat) / took,
+        "scenarios_per_s": results["ok"] / took,
+        "p50_ms": 1000 * pct(lat, 0.5),
+        "p95_ms": 1000 * pct(lat, 0.95),
+        "p99_ms": 1000 * pct(lat, 0.99),
+        "error_rate": results["errors"] / scenarios if scenarios else 0.0,
+        "error_kinds": results["error_kinds"],
+        "rss_mb": peak_rss or None,
+    }
+
+
+def launch(port, stub_port, latency_ms):
+    """Start the stub OpenAI server and `streamlit run app.py`; returns the app process."""
+    from loadtest.stub_openai import StubState, serve
+    serve(stub_port, StubState(latency_ms), background=True)
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1", OPENAI_API_KEY="stub")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=MVP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    import urllib.request
+    for _ in range(60):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc
+        except Exception:
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError("streamlit did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://127.0.0.1:8501")
+    parser.add_argument("--levels", default="1,4,16,32", help="concurrent sessions per step")
+    parser.add_argument("--step-seconds", type=float, default=30)
+    parser.add_argument("--slo-ms", type=float, default=5000, help="p95 limit used for the capacity number")
+    parser.add_argument("--cores", type=int, default=os.cpu_count())
+    parser.add_argument("--server-pid", type=int)
+    parser.add_argument("--launch", action="store_true", help="start stub OpenAI + app.py locally")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--stub-port", type=int, default=8787)
+    parser.add_argument("--stub-latency-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    proc = None
+    if args.launch:
+        proc = launch(args.port, args.stub_port, args.stub_latency_ms)
+        args.url = f"ws://127.0.0.1:{args.port}"
+        args.server_pid = proc.pid
+
+    rows = []
+    try:
+        print(f"{'users':>5} {'act/s':>7} {'scen/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'err %':>6} {'RSS MB':>7}")
+        for users in [int(x) for x in args.levels.split(",")]:
+            row = asyncio.run(run_level(args.url, users, args.step_seconds, DEFAULT_MIX, args.server_pid))
+            rows.append(row)
+            rss = f"{row['rss_mb']:.0f}" if row["rss_mb"] else "-"
+            print(f"{users:>5} {row['actions_per_s']:7.1f} {row['scenarios_per_s']:7.2f} {row['p50_ms']:7.0f} "
+                  f"{row['p95_ms']:7.0f} {row['p99_ms']:7.0f} {100 * row['error_rate']:6.1f} {rss:>7}"
+                  + (f"  {row['error_kinds']}" if row["error_kinds"] else ""))
+    finally:
+        if proc is not None:
+            proc.terminate()
+
+    healthy = [r for r in rows if r["p95_ms"] <= args.slo_ms and r["error_rate"] < 0.01]
+    if healthy:
+        best = max(healthy, key=lambda r: r["actions_per_s"])
+        print(f"\nCapacity: {best['actions_per_s'] / args.cores:.1f} actions/s per core "
+              f"({best['users']} sessions, p95 {best['p95_ms']:.0f} ms ≤ {args.slo_ms:.0f} ms, {args.cores} cores)")
+    else:
+        print("\nNo level met the SLO — capacity below the smallest level tested.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Stub OpenAI server for load tests and local benchmarks.
+
+Implements POST /v1/chat/completions with canned lesson / quiz / photo-check
+answers after a simulated model latency. With "stream": true the answer is
+sent as server-sent events spread over that latency (the first chunk after
+STREAM_FIRST_CHUNK of it), and a client that hangs up early is counted in
+state.cancelled. Point the app at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=stub streamlit run app.py
+
+Run from the MVP folder:
+    python loadtest/stub_openai.py [--port 8787] [--latency-ms 800]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LESSON = """STUB LESSON
+### 1) Concept Snapshot
+A fraction shows a part of a whole.
+
+### 2) Plan / Method
+1. Split the whole into equal parts.
+2. Count the parts you take.
+
+### 3) Step-by-step Solution
+1. 8 ÷ 4 = 2
+2. 1 part is 2
+
+### 4) Common Mistakes
+- Unequal parts
+- Adding top and bottom
+
+### 5) Quick Check Question
+What is 1/3 of 9?"""
+
+QUIZ = "\n".join(
+    f"{i}. Stub question {i}?\nA) 1  B) 2  C) 3  D) 4\n{i}: {'ABCD'[i % 4]}" for i in range(1, 6)
+)
+
+PHOTO = json.dumps({
+    "question_text": "Solve 3x + 4 = 19", "readable": True, "multiple_questions": False,
+    "worksheet_or_exam": False, "looks_like_math": True,
+})
+PHOTO_REJECTED = json.dumps({
+    "question_text": "Solve 3x + 4 = 19", "readable": True, "multiple_questions": True,
+    "worksheet_or_exam": False, "looks_like_math": True,
+})
+
+STREAM_FIRST_CHUNK = 0.2     # share of the latency before the first streamed chunk
+STREAM_CHUNK_CHARS = 8
+
+
+class StubState:
+    def __init__(self, latency_ms=800, jitter=0.3, model_latency=None, error_rate=0.0, reject_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.model_latency = model_latency or {}
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate   # share of photo checks that find several questions
+        self.calls = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    def delay(self, model):
+        base = self.model_latency.get(model, self.latency_ms)
+        return max(0.0, random.gauss(base, base * self.jitter)) / 1000
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = body.get("model", "")
+            text = json.dumps(body.get("messages", []))
+            with state.lock:
+                state.calls += 1
+
+            delay = state.delay(model)
+            stream = bool(body.get("stream"))
+            time.sleep(delay * STREAM_FIRST_CHUNK if stream else delay)
+            if random.random() < state.error_rate:
+                self.send_response(500)
+                self.end_headers()
+                return
+
+            if "multiple choice" in text:
+                content = QUIZ
+            elif "homework-photo validator" in text:
+                content = PHOTO_REJECTED if random.random() < state.reject_rate else PHOTO
+            else:
+                content = LESSON
+
+            if stream:
+                self.stream(model, content, delay * (1 - STREAM_FIRST_CHUNK))
+                return
+
+            payload = json.dumps({
+                "id": f"stub-{state.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(text) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(text) + len(content)) // 4},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def stream(self, model, content, seconds):
+            pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            try:
+                for n, piece in enumerate(pieces):
+                    if n:
+                        time.sleep(seconds / len(pieces))
+                    chunk = {"id": f"stub-{state.calls}", "object": "chat.completion.chunk",
+                             "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece},
+                                          "finish_reason": "stop" if n == len(pieces) - 1 else None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                with state.lock:
+                    state.cancelled += 1
+
+    return Handler
+
+
+def serve(port=8787, state=None, background=False):
+    state = state or StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    parser.add_argument("--model-latency", action="append", default=[],
+                        help="per-model latency, e.g. gpt-4o=2500 (repeatable)")
+    args = parser.parse_args()
+    per_model = {m: float(ms) for m, ms in (item.split("=", 1) for item in args.model_latency)}
+    print(f"Stub OpenAI on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, StubState(args.latency_ms, model_latency=per_model, error_rate=args.error_rate,
+                                       reject_rate=args.reject_rate))
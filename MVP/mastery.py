@@ -0,0 +1,149 @@
+"""
+Per-student, per-topic mastery from the quiz history (Bayesian Knowledge Tracing).
+
+Each saved quiz is treated as QUIZ_QUESTIONS observations with `score`
+correct answers. All (student, topic) pairs are updated together with NumPy:
+the k-th quiz of every pair is applied in one vectorized step, so the Python
+loop only runs "most quizzes any pair has taken" times.
+
+The engine is incremental — refresh() only folds in progress rows added
+to the store since the last call (rows_seen counts archived rows too), and
+the backends seek straight to those rows rather than parsing the table — so
+one cached instance can serve the Parent Dashboard and the practice topic
+suggestion on every rerun.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from archive import DATE_FORMAT, archive_dir_for, archived_rows, query_archive
+
+QUIZ_QUESTIONS = 5
+
+# BKT parameters (same for every topic for now)
+P_INIT = 0.3      # P(L0): knows the topic before the first quiz
+P_LEARN = 0.15    # P(T): learns it between quizzes
+P_SLIP = 0.1      # P(S): knows it but answers wrong
+P_GUESS = 0.25    # P(G): 4-option multiple choice
+
+MASTERED = 0.95
+
+
+def bkt_update(p, correct, total=QUIZ_QUESTIONS):
+    """Vectorized BKT posterior + learning step for `correct` out of `total` answers."""
+    p = np.asarray(p, dtype=np.float64)
+    correct = np.asarray(correct, dtype=np.float64)
+    wrong = total - correct
+    # Work in log space so 5-question likelihoods don't underflow for tiny P(L)
+    log_known = np.log(p) + correct * np.log(1 - P_SLIP) + wrong * np.log(P_SLIP)
+    log_unknown = np.log1p(-p) + correct * np.log(P_GUESS) + wrong * np.log(1 - P_GUESS)
+    posterior = 1.0 / (1.0 + np.exp(log_unknown - log_known))
+    return posterior + (1 - posterior) * P_LEARN
+
+
+def _apply_by_rank(p, attempts, pair_codes, correct):
+    """Apply quizzes in order: all pairs' 1st new quiz, then all 2nd quizzes, ..."""
+    if len(pair_codes) == 0:
+        return
+    rank = pd.Series(pair_codes).groupby(pair_codes, sort=False).cumcount().to_numpy()
+    order = np.argsort(rank, kind="stable")
+    rank, codes, correct = rank[order], pair_codes[order], correct[order]
+    bounds = np.searchsorted(rank, np.arange(rank[-1] + 2))
+    for r in range(rank[-1] + 1):
+        sl = slice(bounds[r], bounds[r + 1])
+        idx = codes[sl]
+        p[idx] = bkt_update(p[idx], correct[sl])
+    np.add.at(attempts, pair_codes, 1)
+
+
+class MasteryEngine:
+    def __init__(self, backend=None):
+        self.backend = backend   # the store this engine follows (None: the shared store)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pairs = pd.MultiIndex.from_arrays([[], []], names=["student", "topic"])
+        self.p = np.empty(0)
+        self.attempts = np.empty(0, dtype=np.int64)
+        self.last_date = np.empty(0, dtype=object)
+        self.rows_seen = 0
+        self.version = 0
+
+    def update(self, records: pd.DataFrame):
+        """Fold new quiz rows (student, topic, score, date) into the state."""
+        if records.empty:
+            return
+        if "date" in records and pd.api.types.is_datetime64_any_dtype(records["date"]):
+            # Archived rows come back typed; keep the CSV's string format
+            records = records.assign(date=records["date"].dt.strftime(DATE_FORMAT))
+        records = records.sort_values("date", kind="stable") if "date" in records else records
+        keys = pd.MultiIndex.from_arrays(
+            [records["student"].astype(str), records["topic"].fillna("").astype(str)],
+            names=["student", "topic"],
+        )
+        new_pairs = keys.unique().difference(self.pairs, sort=False) if len(self.pairs) else keys.unique()
+        if len(new_pairs):
+            self.pairs = self.pairs.append(new_pairs)
+            grow = len(new_pairs)
+            self.p = np.concatenate([self.p, np.full(grow, P_INIT)])
+            self.attempts = np.concatenate([self.attempts, np.zeros(grow, dtype=np.int64)])
+            self.last_date = np.concatenate([self.last_date, np.full(grow, "", dtype=object)])
+
+        codes = self.pairs.get_indexer(keys)
+        correct = pd.to_numeric(records["score"], errors="coerce").fillna(0).clip(0, QUIZ_QUESTIONS).to_numpy()
+        _apply_by_rank(self.p, self.attempts, codes, correct)
+        if "date" in records:
+            # Rows are date-sorted, so the last write per pair wins
+            self.last_date[codes] = records["date"].astype(str).to_numpy()
+        self.version += 1
+
+    def refresh(self, backend=None):
+        """Fold in only the progress rows added since the last refresh (of the engine's own store by default)."""
+        from backend import get_backend
+        # `is None`, not `or`: LocalBackend has a len() (its key-value cache), so an empty one is falsy
+        if backend is None:
+            backend = self.backend if self.backend is not None else get_backend()
+        with self._lock:
+            # The shared store and each school have their own archive
+            archive_dir = archive_dir_for(backend)
+            archived = archived_rows("progress", archive_dir)
+            if self.rows_seen < archived:
+                # Rows we never saw were compacted into the archive — rebuild once
+                self._reset()
+                self.update(query_archive("progress", columns=["student", "topic", "score", "date"],
+                                          archive_dir=archive_dir))
+                self.rows_seen = archived
+            new = pd.DataFrame(backend.rows("progress", start=self.rows_seen - archived))
+            if len(new):
+                self.rows_seen += len(new)
+                self.update(new)
+        return self
+
+    def table(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {"mastery": self.p, "quizzes": self.attempts, "last_quiz": self.last_date},
+            index=self.pairs,
+        )
+
+    def student_mastery(self, student: str) -> pd.DataFrame:
+        """Topics for one student, weakest first."""
+        students = self.pairs.levels[0]
+        if student not in students:
+            return pd.DataFrame(columns=["topic", "mastery", "quizzes", "last_quiz"])
+        # Compare integer codes instead of slicing the MultiIndex (much faster at scale)
+        rows = np.flatnonzero(self.pairs.codes[0] == students.get_loc(student))
+        df = pd.DataFrame({
+            "topic": self.pairs.levels[1].take(self.pairs.codes[1][rows]),
+            "mastery": (self.p[rows] * 100).round(0),
+            "quizzes": self.attempts[rows],
+            "last_quiz": self.last_date[rows],
+        })
+        return df.sort_values("mastery").reset_index(drop=True)
+
+    def next_topic(self, student: str):
+        """Weakest topic the student hasn't mastered yet, or None."""
+        df = self.student_mastery(student)
+        df = df[(df["mastery"] < MASTERED * 100) & (df["topic"] != "")]
+        return None if df.empty else df.iloc[0]["topic"]
@@ -0,0 +1,217 @@
+"""
+Full-text index over resolved help requests, so tutor notes get reused.
+
+Each resolved request (topic, message, homework_text, tutor_notes) is
+indexed in an SQLite FTS5 table and ranked with BM25. The index is kept up
+to date incrementally: "Mark as Resolved" calls add(), and sync() picks up
+anything resolved elsewhere (another replica, the archive) without
+re-indexing what is already there.
+
+    index = get_notes_index()
+    index.search("adding fractions with different denominators", subject="Math")
+    index.strong_match(message, subject, grade)   # for auto-answering
+
+The index lives in its own SQLite file (SLP_NOTES_DB, default notes_index.db)
+whatever the record backend is, and can be rebuilt at any time:
+    python notes_index.py
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+NOTES_DB = "notes_index.db"
+FIELDS = ("topic", "message", "homework_text", "tutor_notes")
+# BM25 column weights: match on what the student asked more than on the answer
+WEIGHTS = (3.0, 2.0, 2.0, 1.0)
+AUTO_ANSWER_SCORE = 12.0   # BM25 score a match needs before it is shown as an automatic answer
+MAX_QUERY_TERMS = 6        # the rarest terms carry nearly all of the BM25 score
+MAX_TERM_SHARE = 0.2       # terms in more than this share of notes are dropped from queries...
+PRUNE_MIN_NOTES = 1000     # ...once there are enough notes for "common" to mean something
+
+_WORD = re.compile(r"[\w']+", re.UNICODE)
+
+
+def request_key(record) -> str:
+    """Stable ID for a help request, independent of its row position."""
+    raw = "|".join(_clean(record.get(f)) for f in ("student", "time", "message", "homework_text"))
+    school = _clean(record.get("school"))
+    if school and school != "default":
+        raw += f"|{school}"   # same student name and minute in two schools are two requests
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _clean(value):
+    return "" if value is None or value != value else str(value)   # value != value: NaN from pandas
+
+
+def to_query(terms, op="OR") -> str:
+    """Terms -> an FTS5 query of quoted terms (never a syntax error)."""
+    return f" {op} ".join(f'"{t}"' for t in terms)
+
+
+def _words(text):
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) > 1 and word not in words:
+            words.append(word)
+    return words
+
+
+class NotesIndex:
+    def __init__(self, path=NOTES_DB):
+        self.path = path
+        self._local = threading.local()
+        self._count_cache, self._counted_at = 1, 0.0
+        conn = self._conn()
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS notes USING fts5("
+            "topic, message, homework_text, tutor_notes, subject UNINDEXED, grade UNINDEXED, "
+            # No stemmer, so query words can be looked up in notes_vocab as they are
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS indexed (key TEXT PRIMARY KEY, note_id INTEGER)")
+        # Document frequency per word, kept next to the index so queries can skip very common words
+        conn.execute("CREATE TABLE IF NOT EXISTS doc_freq (term TEXT PRIMARY KEY, df INTEGER) WITHOUT ROWID")
+        # ORDER BY rank lets FTS5 score with these weights inside the index scan
+        conn.execute("INSERT INTO notes (notes, rank) VALUES ('rank', 'bm25(%s)')" % ", ".join(map(str, WEIGHTS)))
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_many(self, records):
+        """Index resolved requests (dicts); a request already indexed is replaced. Returns count added."""
+        conn = self._conn()
+        added = 0
+        with conn:
+            for record in records:
+                if _clean(record.get("status")) != "Resolved" or not _clean(record.get("tutor_notes")).strip():
+                    continue
+                if _clean(record.get("resolved_by")) == "auto-match":
+                    continue   # a reused answer, already indexed under the original request
+                key = request_key(record)
+                old = conn.execute("SELECT note_id FROM indexed WHERE key = ?", (key,)).fetchone()
+                if old:
+                    old_text = conn.execute(
+                        "SELECT topic, message, homework_text, tutor_notes FROM notes WHERE rowid = ?", old
+                    ).fetchone()
+                    conn.executemany("UPDATE doc_freq SET df = df - 1 WHERE term = ?",
+                                     [(w,) for w in _words(" ".join(old_text or ()))])
+                    conn.execute("DELETE FROM notes WHERE rowid = ?", old)
+                values = [_clean(record.get(f)) for f in FIELDS]
+                cur = conn.execute(
+                    "INSERT INTO notes (topic, message, homework_text, tutor_notes, subject, grade) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    values + [_clean(record.get("subject")), _clean(record.get("grade"))],
+                )
+                conn.executemany(
+                    "INSERT INTO doc_freq (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    [(w,) for w in _words(" ".join(values))],
+                )
+                conn.execute("INSERT OR REPLACE INTO indexed (key, note_id) VALUES (?, ?)", (key, cur.lastrowid))
+                added += 1
+        return added
+
+    def add(self, record):
+        return self.add_many([record])
+
+    def sync(self, backend=None):
+        """Index resolved requests from a store (and its archive) that aren't indexed yet."""
+        from backend import get_backend
+        backend = backend or get_backend()
+        records = list(backend.rows("help_requests"))
+        try:
+            from archive import archive_dir_for, query_archive
+            archived = query_archive("help_requests", archive_dir=archive_dir_for(backend))
+            if not archived.empty:
+                archived["time"] = archived["time"].dt.strftime("%Y-%m-%d %H:%M")
+                records += archived.astype(object).to_dict("records")
+        except ImportError:
+            pass
+        return self._add_new(records)
+
+    def _add_new(self, records):
+        known = {k for (k,) in self._conn().execute("SELECT key FROM indexed")}
+        return self.add_many(r for r in records if request_key(r) not in known)
+
+    def _query_terms(self, text):
+        """The rarest words of text, skipping ones so common they barely rank anything."""
+        words = _words(text or "")
+        if not words:
+            return []
+        conn = self._conn()
+        total = self._total()
+        marks = ", ".join("?" * len(words))
+        df = dict(conn.execute(f"SELECT term, df FROM doc_freq WHERE term IN ({marks})", words).fetchall())
+        # Words no note contains can't match anything
+        present = [w for w in words if df.get(w, 0) > 0]
+        kept = present
+        if total >= PRUNE_MIN_NOTES:
+            kept = [w for w in present if df[w] <= MAX_TERM_SHARE * total] or present
+        kept.sort(key=lambda w: df[w])
+        return kept[:MAX_QUERY_TERMS]
+
+    def _match(self, query, subject, grade, limit):
+        sql = (
+            "SELECT rowid, topic, message, homework_text, tutor_notes, subject, grade, -rank AS score "
+            "FROM notes WHERE notes MATCH ?"
+        )
+        params = [query]
+        if subject:
+            sql += " AND subject = ?"
+            params.append(subject)
+        if grade:
+            sql += " AND grade = ?"
+            params.append(str(grade))
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return self._conn().execute(sql, params).fetchall()
+
+    def search(self, text, subject=None, grade=None, limit=5):
+        """Best prior resolutions for text, as dicts with a BM25 score (higher is better)."""
+        terms = self._query_terms(text)
+        if not terms:
+            return []
+        # Notes containing every term first: a small intersection, so this is the fast path.
+        # Only when nothing has them all do we rank the (much larger) any-term set.
+        rows = self._match(to_query(terms, "AND"), subject, grade, limit) if len(terms) > 1 else []
+        if not rows:
+            rows = self._match(to_query(terms), subject, grade, limit)
+        columns = (*FIELDS, "subject", "grade", "score")
+        return [dict(zip(columns, row[1:])) for row in rows]
+
+    def strong_match(self, text, subject, grade, min_score=AUTO_ANSWER_SCORE):
+        """The top resolution for the same subject and grade if it scores high enough, else None."""
+        hits = self.search(text, subject=subject, grade=grade, limit=1)
+        return hits[0] if hits and hits[0]["score"] >= min_score else None
+
+    def _total(self, max_age=60):
+        """Indexed note count, re-counted at most once a minute (only used to judge common words)."""
+        now = time.time()
+        if now - self._counted_at > max_age:
+            self._count_cache = self.count() or 1
+            self._counted_at = now
+        return self._count_cache
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM indexed").fetchone()[0]
+
+
+@lru_cache(maxsize=1)
+def get_notes_index():
+    return NotesIndex(os.getenv("SLP_NOTES_DB", NOTES_DB))
+
+
+if __name__ == "__main__":
+    index = get_notes_index()
+    print(f"indexed {index.sync()} new resolved requests ({index.count()} total) in {index.path}")
@@ -0,0 +1,155 @@
+"""
+Local OCR pre-pass for homework photos.
+
+Runs Tesseract on the CPU to pull out the text, count question-like lines
+and spot worksheet/exam layouts. Clear single-question photos (and clear
+worksheets: several numbered questions or many lines) are decided here;
+anything ambiguous is escalated to the vision model in analyze_homework_photo.
+Words like "total" or "marks" show up in ordinary questions, so wording
+alone never rejects a photo; a worksheet-style header (Name:, Date:, ...)
+on an otherwise single question is escalated instead.
+
+Needs the `tesseract` binary (packages.txt) plus pytesseract and Pillow.
+If they are missing every photo is escalated, same as before.
+"""
+import io
+import re
+import threading
+import time
+from collections import deque
+
+try:
+    import pytesseract
+    from PIL import Image, ImageOps
+except ImportError:  # OCR is optional — fall back to the vision model
+    pytesseract = None
+
+# Tuning knobs
+MIN_MEAN_CONFIDENCE = 70     # Tesseract word confidence (0–100) for a "clear" photo
+MIN_WORDS = 2
+WORKSHEET_MIN_QUESTIONS = 3  # numbered questions on one page → worksheet
+WORKSHEET_MIN_LINES = 10
+
+NUMBERED_LINE = re.compile(r"^\s*(q\s*\d+|\d+\s*[.)]|\(?[a-h]\)|[ivx]+\))\s*", re.IGNORECASE)
+WORKSHEET_HEADER = re.compile(r"\b(worksheet|name\s*:|date\s*:|class\s*:|section [a-d]\b)", re.IGNORECASE)
+MATH_HINT = re.compile(r"(\d\s*[-+×x*/÷=^%]\s*\d|[a-z]\s*=|=\s*\d|\d+\s*/\s*\d+|\bsolve\b|\bsimplify\b|\bfind\b)",
+                       re.IGNORECASE)
+
+# Rolling stats for reporting (per process); photos are checked on worker threads
+_latencies_ms = deque(maxlen=1000)
+_counts = {"photos": 0, "escalated": 0, "local_ok": 0, "local_reject": 0}
+_stats_lock = threading.Lock()
+
+
+def ocr_available() -> bool:
+    return pytesseract is not None
+
+
+def _read_lines(image_bytes: bytes):
+    """Return [(line_text, mean_conf)] in reading order."""
+    img = Image.open(io.BytesIO(image_bytes))
+    img = ImageOps.exif_transpose(img).convert("L")
+    # Phone photos are big; Tesseract is faster and just as accurate at ~1600px
+    if max(img.size) > 1600:
+        img.thumbnail((1600, 1600))
+
+    data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append((word, conf))
+
+    out = []
+    for key in sorted(lines):
+        words = lines[key]
+        out.append((" ".join(w for w, _ in words), sum(c for _, c in words) / len(words)))
+    return out
+
+
+def _classify(lines):
+    """Turn OCR lines into (decided, result dict, details)."""
+    words = [w for text, _ in lines for w in text.split()]
+    mean_conf = (sum(c * len(t.split()) for t, c in lines) / len(words)) if words else 0.0
+    numbered = [t for t, _ in lines if NUMBERED_LINE.match(t)]
+    question_lines = [t for t, _ in lines if NUMBERED_LINE.match(t) or MATH_HINT.search(t) or t.rstrip().endswith("?")]
+    text = "\n".join(t for t, _ in lines)
+
+    details = {
+        "text": text,
+        "lines": len(lines),
+        "question_lines": len(question_lines),
+        "mean_confidence": round(mean_conf, 1),
+    }
+
+    clear = len(words) >= MIN_WORDS and mean_conf >= MIN_MEAN_CONFIDENCE
+    if not clear:
+        # Could be blurry, could be neat handwriting Tesseract can't read — ask the vision model
+        return False, None, details
+
+    if len(numbered) >= WORKSHEET_MIN_QUESTIONS or len(lines) >= WORKSHEET_MIN_LINES:
+        return True, {"ok": False, "reason": "worksheet", "question_text": ""}, details
+
+    if WORKSHEET_HEADER.search(text):
+        # Looks like the top of a worksheet, but only one question is visible — let the model decide
+        return False, None, details
+
+    if len(question_lines) == 1 and MATH_HINT.search(question_lines[0]):
+        qtext = NUMBERED_LINE.sub("", " ".join(t for t, _ in lines)).strip()
+        return True, {"ok": True, "reason": "ok", "question_text": qtext}, details
+
+    return False, None, details
+
+
+def ocr_prepass(image_bytes: bytes) -> dict:
+    """
+    Try to validate a homework photo locally.
+
+    Returns dict:
+      {
+        "decided": bool,          # False → escalate to the vision model
+        "result": dict | None,    # same shape as analyze_homework_photo()
+        "details": {...},         # text, line counts, confidence
+        "latency_ms": float
+      }
+    """
+    t0 = time.perf_counter()
+    decided, result, details = False, None, {}
+
+    if pytesseract is not None:
+        try:
+            decided, result, details = _classify(_read_lines(image_bytes))
+        except Exception:
+            # Unreadable file, tesseract binary missing, etc.
+            decided, result = False, None
+
+    latency_ms = (time.perf_counter() - t0) * 1000
+    with _stats_lock:
+        _latencies_ms.append(latency_ms)
+        _counts["photos"] += 1
+        if not decided:
+            _counts["escalated"] += 1
+        elif result["ok"]:
+            _counts["local_ok"] += 1
+        else:
+            _counts["local_reject"] += 1
+
+    return {"decided": decided, "result": result, "details": details, "latency_ms": latency_ms}
+
+
+def ocr_stats() -> dict:
+    """Per-photo latency and escalation rate since the process started."""
+    with _stats_lock:
+        lat = sorted(_latencies_ms)
+        counts = dict(_counts)
+    photos = counts["photos"]
+    return {
+        **counts,
+        "escalation_rate": (counts["escalated"] / photos) if photos else 0.0,
+        "p50_ms": lat[len(lat) // 2] if lat else 0.0,
+        "p95_ms": lat[int(len(lat) * 0.95)] if lat else 0.0,
+    }
@@ -0,0 +1,216 @@
+"""
+Speculative prefetch of the next lesson and quiz.
+
+TransitionModel learns, per grade, how often students go from one topic to
+the next (consecutive progress rows of the same student). The same topic
+again means they moved on to practising it. It reads the shared store and
+every school's shard (tenants.py), each only from where it stopped last time.
+
+When a student gets a lesson, Prefetcher.after_generation() looks up the
+most likely next step and, if it is likely enough, generates it in the
+background into the normal generation cache. When the student gets there
+the answer is a cache hit. The lookup uses the model as it is; reading new
+progress rows into it happens on the prefetch pool, at most every
+REFRESH_SECONDS, so the script thread never waits for the store.
+
+Prefetching is low priority and capped:
+- it runs on its own small pool (PREFETCH_WORKERS), never on the
+  interactive job pool, and is skipped while that pool is backed up;
+- a daily budget (DAILY_BUDGET_USD / EST_COST_USD generations, counted in
+  the shared backend) stops it before it costs too much.
+
+Counters live in the shared backend so every replica adds to the same
+numbers: issued, hits, skipped (budget / busy / already cached), failed.
+Wasted spend is estimated as (issued - hits) * EST_COST_USD.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import get_backend
+from tenants import DEFAULT_SCHOOL, get_shard_router, get_tenant_backend
+
+PREFETCH_WORKERS = 2
+MIN_PROBABILITY = 0.3      # don't spend money on a guess less likely than this
+MIN_OBSERVATIONS = 5       # transitions seen from a topic before we trust it
+DAILY_BUDGET_USD = 2.0
+EST_COST_USD = 0.002       # one lesson + quiz on the fast tier
+MARK_TTL = 7 * 24 * 3600   # same as the generation cache
+REFRESH_SECONDS = 30       # how stale the transition model may get
+
+COUNTERS = ("issued", "hits", "skipped_budget", "skipped_busy", "skipped_cached", "failed")
+
+
+def _norm(topic):
+    return " ".join(str(topic).lower().split())
+
+
+class TransitionModel:
+    """(grade, topic) -> Counter of the next topic, learned incrementally."""
+
+    def __init__(self):
+        self._reset()
+        self._lock = threading.Lock()           # held only while rows are folded in or read out
+        self._refresh_lock = threading.Lock()   # one refresh at a time, held while it reads the stores
+
+    def _reset(self):
+        self.counts = defaultdict(Counter)
+        self.last = {}          # (school, student) -> (grade, topic) of their latest row
+        self.rows_seen = {}     # school -> progress rows of its store folded in so far
+
+    def update(self, records, school=DEFAULT_SCHOOL):
+        """Fold in progress rows (dicts) of one school, oldest first."""
+        for row in records:
+            student, grade, topic = row.get("student"), str(row.get("grade", "")), _norm(row.get("topic", ""))
+            if not student or not topic:
+                continue
+            previous = self.last.get((school, student))
+            if previous is not None and previous[0] == grade:
+                self.counts[previous][topic] += 1
+            self.last[(school, student)] = (grade, topic)
+
+    def refresh(self):
+        """
+        Read only the progress rows added since the last refresh: from the
+        shared store (after its archive) and from every school's shard, each
+        from where the previous refresh stopped.
+        """
+        from archive import archive_dir_for, archived_rows, query_archive
+        with self._refresh_lock:
+            schools = [DEFAULT_SCHOOL, *sorted(get_shard_router().shard_map())]
+            archive_dirs = {school: archive_dir_for(get_tenant_backend(school)) for school in schools}
+            archived = {school: archived_rows("progress", archive_dirs[school]) for school in schools}
+            if any(self.rows_seen.get(school, 0) < archived[school] for school in schools):
+                # Rows we never saw were compacted into an archive — rebuild once
+                old = {school: query_archive("progress", columns=["student", "grade", "topic", "date"],
+                                             archive_dir=archive_dirs[school]) for school in schools}
+                with self._lock:
+                    self._reset()
+                    for school in schools:
+                        if not old[school].empty:
+                            self.update(old[school].sort_values("date").astype(str).to_dict("records"), school)
+                        self.rows_seen[school] = archived[school]
+            for school in schools:
+                seen = self.rows_seen.get(school, 0)
+                new = get_tenant_backend(school).rows("progress", start=seen - archived[school])
+                with self._lock:
+                    self.rows_seen[school] = seen + len(new)
+                    self.update(new, school)
+        return self
+
+    def predict(self, grade_label, topic, k=1):
+        """Most likely next topics as [(topic, probability)], best first."""
+        with self._lock:
+            counts = self.counts.get((str(grade_label), _norm(topic)))
+            if not counts:
+                return []
+            total = sum(counts.values())
+            if total < MIN_OBSERVATIONS:
+                return []
+            return [(t, n / total) for t, n in counts.most_common(k)]
+
+
+def _count(name, amount=1):
+    get_backend().incr(f"prefetch:{name}", amount)
+
+
+def record_hit(cache_key):
+    """Called by generate_help on a cache hit; counts it once if prefetch made that entry."""
+    backend = get_backend()
+    if backend.get(f"prefetched:{cache_key}") and backend.incr(f"prefetch:hit:{cache_key}", ttl=MARK_TTL) == 1:
+        _count("hits")
+
+
+class Prefetcher:
+    def __init__(self, generate, cache_key, model=None, busy=None, workers=PREFETCH_WORKERS,
+                 min_probability=MIN_PROBABILITY, daily_budget_usd=DAILY_BUDGET_USD,
+                 cost_usd=EST_COST_USD):
+        """
+        generate(subject, grade, mode, topic, homework_text) -> result dict
+        cache_key(subject, grade, mode, topic, homework_text) -> generation cache key
+        busy() -> True while interactive work is backed up (prefetch is skipped)
+        """
+        self.generate = generate
+        self.cache_key = cache_key
+        self.model = model or TransitionModel()
+        self.busy = busy or (lambda: False)
+        self.min_probability = min_probability
+        self.max_per_day = int(daily_budget_usd / cost_usd)
+        self.cost_usd = cost_usd
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="slp-prefetch")
+        self._refreshing, self._refreshed_at = False, 0.0
+        self._refresh_state = threading.Lock()
+        self.refresh_later()                  # load the model before the first lesson asks
+
+    def refresh_later(self):
+        """Queue a model refresh on the prefetch pool, unless one is queued or ran recently."""
+        with self._refresh_state:
+            if self._refreshing or time.time() - self._refreshed_at < REFRESH_SECONDS:
+                return
+            self._refreshing = True
+        self.executor.submit(self._refresh)
+
+    def _refresh(self):
+        try:
+            self.model.refresh()
+        except Exception:
+            pass  # store unreachable: predict from what we have and try again later
+        finally:
+            with self._refresh_state:
+                self._refreshing, self._refreshed_at = False, time.time()
+
+    def next_step(self, grade_label, mode, topic):
+        """(mode, topic, probability) of the most likely next request, or None."""
+        if mode not in ("lesson", "practice") or not topic:
+            return None
+        self.refresh_later()
+        predictions = self.model.predict(grade_label, topic)
+        if not predictions or predictions[0][1] < self.min_probability:
+            return None
+        next_topic, probability = predictions[0]
+        next_mode = "practice" if next_topic == _norm(topic) else "lesson"
+        return next_mode, next_topic, probability
+
+    def after_generation(self, subject, grade_label, mode, topic):
+        """Queue the likely next lesson + quiz. Returns the predicted step or None."""
+        step = self.next_step(grade_label, mode, topic)
+        if step is None:
+            return None
+        next_mode, next_topic, _ = step
+        key = self.cache_key(subject, grade_label, next_mode, next_topic, "")
+        backend = get_backend()
+        if backend.get(key):
+            _count("skipped_cached")
+            return None
+        if self.busy():
+            _count("skipped_busy")
+            return None
+        day = time.strftime("%Y-%m-%d")
+        if backend.incr(f"prefetch:spend:{day}", ttl=2 * 24 * 3600) > self.max_per_day:
+            _count("skipped_budget")
+            return None
+        self.executor.submit(self._run, key, subject, grade_label, next_mode, next_topic)
+        return step
+
+    def _run(self, key, subject, grade_label, mode, topic):
+        try:
+            result = self.generate(subject, grade_label, mode, topic, "")
+        except Exception:
+            result = None
+        _count("issued")
+        if result and result.get("ok") and not result.get("degraded"):
+            get_backend().set(f"prefetched:{key}", "1", ttl=MARK_TTL)
+        else:
+            _count("failed")
+
+    def metrics(self) -> dict:
+        backend = get_backend()
+        stats = {name: int(backend.get(f"prefetch:{name}") or 0) for name in COUNTERS}
+        useful = stats["issued"] - stats["failed"]
+        stats["hit_rate"] = stats["hits"] / useful if useful else 0.0
+        stats["spend_usd"] = round(stats["issued"] * self.cost_usd, 4)
+        stats["wasted_usd"] = round((stats["issued"] - stats["hits"]) * self.cost_usd, 4)
+        stats["requested_today"] = int(backend.get(f"prefetch:spend:{time.strftime('%Y-%m-%d')}") or 0)
+        stats["daily_cap"] = self.max_per_day
+        return stats
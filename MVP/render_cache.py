@@ -0,0 +1,146 @@
+"""
+Lesson and quiz display cache.
+
+Lessons and quizzes are shown with st.markdown, so math ($A = l \\times w$)
+goes through KaTeX, nested lists and tables render as usual, and raw HTML
+from the model is not rendered (unsafe_allow_html stays off). The cache keeps
+the markdown as prepared by prepare_markdown(), per content hash, in a
+per-process LRU bounded by MAX_BYTES. app.py keeps the hash next to
+lesson_text / quiz_text in session_state. So the reruns on each quiz answer
+neither reload a spilled lesson (session_memory.py) nor prepare it again.
+
+prepare_markdown() fixes the one thing markdown gets wrong in our lessons:
+the ASCII sketches the K–5 prompt asks for (a cube, a number line). As plain
+markdown their lines were run together or read as list items. Two or more
+drawing lines in a row are wrapped in a code fence so they keep their
+spacing. Everything else, including code blocks and tables, is passed
+through unchanged.
+
+    text = get_render_cache().markdown(lesson_text)
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+MAX_BYTES = 64 * 1024 * 1024
+
+FENCE = re.compile(r"^\s*(```|~~~)")
+TABLE_RULE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+SKETCH_CHARS = set("+-|/\\_=<>^v.:*#[]()'`")
+EMPHASIS = re.compile(r"(\*\*|__)(.+?)\1")
+# Leading list / answer-option markers: "- ", "* ", "1. ", "2) ", "A)", "(b)"
+MARKERS = re.compile(r"^\s*(?:[-*]\s+|\d+[.)]\s+|\(?[A-Za-z]\)\s*)+")
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _is_sketch(line: str) -> bool:
+    """
+    Mostly drawing characters, e.g. "+----+", "|    | +", "0---1---2".
+    Bold and list/option markers don't count, so "**A)** 3/4" is text.
+    """
+    chars = MARKERS.sub("", EMPHASIS.sub(r"\2", line)).replace(" ", "")
+    drawing = sum(c in SKETCH_CHARS for c in chars)
+    return drawing >= 2 and drawing * 2 >= len(chars)
+
+
+def _is_table_row(line: str) -> bool:
+    return line.strip().startswith("|") and line.strip().endswith("|") and line.count("|") >= 2
+
+
+def prepare_markdown(text: str) -> str:
+    """Lesson/quiz markdown with ASCII sketches fenced; nothing else is changed."""
+    lines = (text or "").replace("\r\n", "\n").split("\n")
+    out = []
+    fence = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        if fence is not None:
+            # Inside the model's own code block: copy as is
+            out.append(line)
+            if line.strip().startswith(fence):
+                fence = None
+            i += 1
+            continue
+        opener = FENCE.match(line)
+        if opener:
+            fence = opener.group(1)
+            out.append(line)
+            i += 1
+            continue
+
+        if _is_table_row(line) and i + 1 < len(lines) and TABLE_RULE.match(lines[i + 1]):
+            while i < len(lines) and (_is_table_row(lines[i]) or TABLE_RULE.match(lines[i])):
+                out.append(lines[i])
+                i += 1
+            continue
+
+        # Two or more drawing lines in a row are a sketch; keep its spacing exactly
+        if _is_sketch(line) and i + 1 < len(lines) and _is_sketch(lines[i + 1]):
+            sketch = []
+            while i < len(lines) and lines[i].strip() and (
+                    _is_sketch(lines[i]) or (lines[i].startswith(" ") and len(lines[i].split()) <= 3)):
+                sketch.append(lines[i].rstrip())
+                i += 1
+            out += ["```text", *sketch, "```"]
+            continue
+
+        out.append(line)
+        i += 1
+    return "\n".join(out)
+
+
+class RenderCache:
+    """content hash -> prepared markdown, least recently used evicted past max_bytes."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        """Cached markdown for a content_key(), or None."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.stats["hits"] += 1
+            return value
+
+    def markdown(self, text: str, key=None) -> str:
+        """Prepared markdown for text, from the cache when possible."""
+        key = key or content_key(text)
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = prepare_markdown(text)
+        with self._lock:
+            self.stats["misses"] += 1
+            if key not in self._items:
+                self._items[key] = value
+                self._bytes += len(value)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= len(old)
+                self.stats["evictions"] += 1
+        return value
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "entries": len(self._items), "mb": round(self._bytes / 1e6, 1),
+                    "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+
+@lru_cache(maxsize=1)
+def get_render_cache():
+    """One cache per process, shared by every session."""
+    return RenderCache()
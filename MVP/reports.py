@@ -0,0 +1,331 @@
+"""
+Weekly parent reports, generated in one batch for every student.
+
+Instead of running the Parent Dashboard once per student (a full read of
+the progress table each time), one pass streams the week's progress and
+help requests, plus the week before for comparison, and aggregates them
+per student with pandas group-bys:
+
+  1. progress and help requests are read in CHUNK_ROWS chunks (CSV files
+     through pandas' chunked reader, other backends one rows(start, limit)
+     page at a time);
+     rows outside the two weeks are dropped straight away and each chunk
+     is reduced to per-(student, topic) sums before the next one is read,
+     so memory grows with the number of students, not the table size;
+  2. the partial sums are combined into one row per student;
+  3. reports are rendered as HTML (and optionally PDF) by a process pool,
+     BATCH_STUDENTS per task with a bounded number of tasks in flight.
+
+Output, with an index.csv (school, student, files) for whatever mails them
+out:
+
+    reports/<week start>/<school>/<student>-<hash>.html (.pdf)
+
+Students with no quizzes or help requests in either week get no report.
+Rows compacted into the store's archive (archive.py; the shared store's or
+the school's own) are read from there, one week's partitions only.
+
+Run weekly (e.g. Monday-morning cron):
+    python reports.py                    # last full week (Mon-Sun), every school
+    python reports.py 2025-03-03 --pdf   # the week starting that day, HTML + PDF
+"""
+import csv
+import hashlib
+import html
+import os
+import re
+import sys
+import textwrap
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from archive import DATE_FORMAT, archive_dir_for, query_archive
+from backend import TABLE_FILES, LocalBackend
+from tenants import DEFAULT_SCHOOL, TenantBackend, get_shard_router, get_tenant_backend
+
+REPORTS_DIR = "reports"
+CHUNK_ROWS = 200_000
+BATCH_STUDENTS = 1000
+MAX_SCORE = 5
+NEEDS_WORK = 3.5          # a topic averaging below this (out of MAX_SCORE) is suggested for practice
+PDF_LINES = 50            # text lines per PDF page
+
+PROGRESS_COLUMNS = ["student", "topic", "score", "date"]
+HELP_COLUMNS = ["student", "time", "topic", "status", "tutor_notes"]
+
+
+# ---------- streaming ----------
+def _source(store, table):
+    """(backend, table name) that actually hold a table: a school's shard for TenantBackend."""
+    if isinstance(store, TenantBackend):
+        return store.router.store(store.router.locate(store.school)), f"{store.school}/{table}"
+    return store, table
+
+
+def _store_chunks(store, table, columns):
+    backend, name = _source(store, table)
+    if isinstance(backend, LocalBackend):
+        path = os.path.join(backend.data_dir, TABLE_FILES.get(name, f"{name}.csv"))
+        try:
+            yield from pd.read_csv(path, chunksize=CHUNK_ROWS, dtype=str, keep_default_na=False,
+                                   usecols=lambda c: c in columns)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            pass
+        return
+    start = 0
+    while True:
+        # One page in memory at a time, however big the table is
+        page = backend.rows(name, start, CHUNK_ROWS)
+        if not page:
+            return
+        yield pd.DataFrame(page)
+        start += len(page)
+
+
+def _chunks(store, table, columns, date_col, start, end):
+    """The table's rows dated in [start, end) as DataFrames of string columns, CHUNK_ROWS at a time."""
+    # Only the two weeks' partitions of the store's archive are opened
+    archived = query_archive(table, start, end, archive_dir=archive_dir_for(store))
+    if not archived.empty:
+        archived[date_col] = archived[date_col].dt.strftime(DATE_FORMAT)
+        yield archived.reindex(columns=columns).fillna("").astype(str)
+    low, high = start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT)
+    for chunk in _store_chunks(store, table, columns):
+        chunk = chunk.reindex(columns=columns).fillna("").astype(str)
+        # DATE_FORMAT sorts as text, so the date filter needs no parsing
+        yield chunk[(chunk[date_col] >= low) & (chunk[date_col] < high)]
+
+
+def weekly_summary(store, week_start):
+    """One row per student active in the week or the week before, and their per-topic rows."""
+    week_end, prev_start = week_start + timedelta(days=7), week_start - timedelta(days=7)
+    this_week = week_start.strftime(DATE_FORMAT)
+    partial, days = [], []
+    for chunk in _chunks(store, "progress", PROGRESS_COLUMNS, "date", prev_start, week_end):
+        if chunk.empty:
+            continue   # nothing in the two weeks (an empty group-by has no "size"/"sum" to unstack)
+        chunk = chunk.assign(score=pd.to_numeric(chunk["score"], errors="coerce").fillna(0),
+                             current=chunk["date"] >= this_week)
+        partial.append(chunk.groupby(["student", "topic", "current"])["score"].agg(["size", "sum"]))
+        active = chunk[chunk["current"]]
+        days.append(active.assign(day=active["date"].str[:10])[["student", "day"]].drop_duplicates())
+        if len(partial) >= 8:
+            # Fold the partial sums together so they stay one row per (student, topic, week)
+            partial = [pd.concat(partial).groupby(level=[0, 1, 2]).sum()]
+            days = [pd.concat(days).drop_duplicates()]
+    notes, asked = [], []
+    for chunk in _chunks(store, "help_requests", HELP_COLUMNS, "time", week_start, week_end):
+        chunk = chunk.assign(resolved=chunk["status"] == "Resolved")
+        asked.append(chunk.groupby("student")["resolved"].agg(["size", "sum"]))
+        with_note = chunk[chunk["tutor_notes"].str.strip() != ""]
+        notes.append(with_note.sort_values("time").drop_duplicates("student", keep="last"))
+
+    topics = pd.DataFrame(columns=["student", "topic", "quizzes", "avg_score"])
+    students = pd.DataFrame(columns=["quizzes", "avg_score", "prev_quizzes", "prev_avg_score"])
+    if partial:
+        sums = pd.concat(partial).groupby(level=[0, 1, 2]).sum()
+        by_week = sums.groupby(level=[0, 2]).sum().unstack("current", fill_value=0)
+        students = pd.DataFrame(index=by_week.index)
+        for flag, prefix in ((True, ""), (False, "prev_")):
+            n = by_week["size"].get(flag, pd.Series(0, index=by_week.index))
+            total = by_week["sum"].get(flag, pd.Series(0, index=by_week.index))
+            students[f"{prefix}quizzes"] = n.astype(int)
+            students[f"{prefix}avg_score"] = (total / n.where(n > 0)).round(1)
+        current = sums.xs(True, level="current") if True in sums.index.get_level_values(2) else sums.iloc[:0]
+        topics = current.reset_index().rename(columns={"size": "quizzes"})
+        topics = topics.assign(avg_score=(topics["sum"] / topics["quizzes"]).round(1))[
+            ["student", "topic", "quizzes", "avg_score"]]
+        topics = topics.sort_values(["student", "avg_score", "topic"], ascending=[True, False, True])
+    students.index.name = "student"
+    if days:
+        students = students.join(pd.concat(days).drop_duplicates().groupby("student").size().rename("days_active"),
+                                 how="outer")
+    if asked:
+        help_counts = pd.concat(asked).groupby(level=0).sum()
+        students = students.join(help_counts.rename(columns={"size": "help_requests", "sum": "help_resolved"}),
+                                 how="outer")
+    if notes:
+        latest = pd.concat(notes).sort_values("time").drop_duplicates("student", keep="last").set_index("student")
+        students = students.join(latest[["topic", "tutor_notes"]].rename(columns={"topic": "note_topic"}),
+                                 how="outer")
+    for col in ("quizzes", "prev_quizzes", "days_active", "help_requests", "help_resolved"):
+        students[col] = students[col].fillna(0).astype(int) if col in students else 0
+    for col in ("note_topic", "tutor_notes"):
+        students[col] = students[col].fillna("") if col in students else ""
+    students = students[students.index != ""]
+    return students.sort_index(), topics[topics["student"] != ""]
+
+
+def _reports(students, topics):
+    """Plain dicts (picklable, one per student) with the student's topics, best first."""
+    per_student = {}
+    for row in topics.itertuples(index=False):
+        per_student.setdefault(row.student, []).append((row.topic, row.quizzes, row.avg_score))
+    for student, row in zip(students.index, students.to_dict("records")):
+        yield {"student": student, **row, "topics": per_student.get(student, [])}
+
+
+# ---------- rendering ----------
+def _number(value):
+    return "-" if value is None or value != value else f"{value:g}"
+
+
+def report_lines(report, school, week_start):
+    """The report as (heading?, text) lines; the HTML and the PDF are both made from these."""
+    week_end = week_start + timedelta(days=6)
+    topics = report["topics"]
+    lines = [(True, f"Weekly progress report: {report['student']}"),
+             (False, f"Week of {week_start:%a %d %b} to {week_end:%a %d %b %Y}"
+                     + ("" if school == DEFAULT_SCHOOL else f" - {school}")),
+             (False, "")]
+    if report["quizzes"]:
+        lines += [
+            (False, f"Quizzes this week: {report['quizzes']} (week before: {report['prev_quizzes']})"),
+            (False, f"Average score: {_number(report['avg_score'])} / {MAX_SCORE} "
+                    f"(week before: {_number(report['prev_avg_score'])})"),
+            (False, f"Days practised: {report['days_active']} of 7"),
+        ]
+        best, worst = topics[0], topics[-1]
+        lines.append((False, f"Strongest topic: {best[0] or 'general'} ({_number(best[2])} / {MAX_SCORE})"))
+        if len(topics) > 1 and worst[2] < NEEDS_WORK:
+            lines.append((False, f"Worth practising: {worst[0] or 'general'} ({_number(worst[2])} / {MAX_SCORE})"))
+    else:
+        lines.append((False, f"No quizzes this week (week before: {report['prev_quizzes']})."))
+    if report["help_requests"]:
+        lines.append((False, f"Asked a tutor for help {report['help_requests']} time(s), "
+                             f"{report['help_resolved']} answered."))
+    if report["tutor_notes"]:
+        lines += [(False, ""), (True, f"Latest tutor note ({report['note_topic'] or 'general'})")]
+        lines += [(False, part) for part in textwrap.wrap(report["tutor_notes"], 90)]
+    return lines
+
+
+def render_html(report, school, week_start):
+    lines = report_lines(report, school, week_start)
+    body = [f"<h1>{html.escape(lines[0][1])}</h1>", f"<p>{html.escape(lines[1][1])}</p>"]
+    for heading, text in lines[2:]:
+        if text:
+            body.append(f"<h2>{html.escape(text)}</h2>" if heading else f"<p>{html.escape(text)}</p>")
+    if report["topics"]:
+        rows = "".join(f"<tr><td>{html.escape(topic or 'general')}</td><td>{n}</td><td>{_number(avg)}</td></tr>"
+                       for topic, n, avg in report["topics"])
+        body.append(f"<table><tr><th>Topic</th><th>Quizzes</th><th>Average / {MAX_SCORE}</th></tr>{rows}</table>")
+    return ("<!doctype html><html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(lines[0][1])}</title>"
+            "<style>body{font-family:sans-serif;max-width:40em;margin:2em auto}"
+            "td,th{padding:.2em 1em;text-align:left}</style></head><body>"
+            + "\n".join(body) + "<p><small>SLP | Smart Learning Platform</small></p></body></html>")
+
+
+def _pdf_text(text):
+    raw = text.encode("cp1252", "replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def render_pdf(report, school, week_start) -> bytes:
+    """A plain text PDF (Helvetica, A4) written by hand, so no PDF library is needed."""
+    lines = report_lines(report, school, week_start)
+    if report["topics"]:
+        lines += [(False, ""), (True, "Topics this week")]
+        lines += [(False, f"{topic or 'general'}: {n} quiz(zes), average {_number(avg)} / {MAX_SCORE}")
+                  for topic, n, avg in report["topics"]]
+    pages = [lines[i:i + PDF_LINES] for i in range(0, len(lines), PDF_LINES)]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in pages:
+        stream = b"BT 50 800 Td " + b"".join(
+            b"/F1 %d Tf %d TL T* (%s) Tj " % ((15, 21, _pdf_text(text)) if heading else (11, 15, _pdf_text(text)))
+            for heading, text in page) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _file_stem(student):
+    # Names can collide once made filename-safe ("Ann B" / "ann-b"), so add a short hash
+    slug = re.sub(r"[^a-z0-9]+", "-", student.lower()).strip("-")[:40] or "student"
+    return f"{slug}-{hashlib.sha1(student.encode('utf-8')).hexdigest()[:8]}"
+
+
+def render_batch(out_dir, school, week_start, reports, pdf=False):
+    """Write one batch of reports (runs in a worker process). Returns index rows."""
+    os.makedirs(out_dir, exist_ok=True)
+    index = []
+    for report in reports:
+        stem = os.path.join(out_dir, _file_stem(report["student"]))
+        with open(stem + ".html", "w", encoding="utf-8") as fh:
+            fh.write(render_html(report, school, week_start))
+        files = [stem + ".html"]
+        if pdf:
+            with open(stem + ".pdf", "wb") as fh:
+                fh.write(render_pdf(report, school, week_start))
+            files.append(stem + ".pdf")
+        index.append((school, report["student"], " ".join(files)))
+    return index
+
+
+# ---------- batch ----------
+def last_week_start(today=None):
+    """Monday of the last full Monday-Sunday week."""
+    today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=today.weekday() + 7)
+
+
+def generate(week_start=None, schools=None, out_dir=REPORTS_DIR, pdf=False, workers=None):
+    """Write every student's report for the week starting week_start. Returns {school: reports written}."""
+    week_start = week_start or last_week_start()
+    schools = schools or [DEFAULT_SCHOOL] + [s for s in get_shard_router().schools() if s != DEFAULT_SCHOOL]
+    week_dir = os.path.join(out_dir, f"{week_start:%Y-%m-%d}")
+    written, index = {}, []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for school in schools:
+            students, topics = weekly_summary(get_tenant_backend(school), week_start)
+            batch, pending = [], set()
+
+            def submit(batch):
+                nonlocal pending
+                if len(pending) >= 2 * workers:
+                    # Keep only a few batches queued, so memory stays bounded
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index.extend(future.result())
+                pending.add(pool.submit(render_batch, os.path.join(week_dir, school), school, week_start, batch, pdf))
+
+            for report in _reports(students, topics):
+                batch.append(report)
+                if len(batch) == BATCH_STUDENTS:
+                    submit(batch)
+                    batch = []
+            if batch:
+                submit(batch)
+            for future in wait(pending).done:
+                index.extend(future.result())
+            written[school] = len(students)
+    os.makedirs(week_dir, exist_ok=True)
+    with open(os.path.join(week_dir, "index.csv"), "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["school", "student", "files"])
+        writer.writerows(sorted(index))
+    return written
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--pdf"]
+    week = datetime.strptime(args[0], "%Y-%m-%d") if args else None
+    for school, n in generate(week, pdf="--pdf" in sys.argv).items():
+        print(f"{school}: {n} reports")
@@ -0,0 +1,149 @@
+"""
+Item-level quiz responses.
+
+Submit Quiz used to keep only the score out of 5. Now every answered
+question is also one fixed-size record appended to RESPONSES_FILE:
+
+    student  u8   hash of school + student name
+    item     u8   hash of question + options + answer key
+    time     u4   unix seconds
+    correct  u1   1 if the chosen letter matched the key
+    choice   u1   0–3 for A–D
+
+That is 22 bytes per answer, so ten million answers are about 220 MB.
+load_responses() maps the file as a NumPy array without copying it. Each
+append is a single O_APPEND write, so replicas on one machine can share
+the file. A torn last record from a crash is ignored.
+
+The question text, options and key go to ITEMS_FILE (JSON lines) the first
+time this process sees an item, so the calibration job (irt.py) can show
+which questions are bad and rebuild quizzes from good ones. Items are filed
+under the quiz's topic, or its homework question when there is no topic —
+the same key pool_quiz() looks them up by.
+
+Which items are already in ITEMS_FILE is remembered per process, so each
+replica (and each restart) may append its own copy of an item line — at
+most one per item per process. load_items() keeps the first copy, so the
+duplicates only cost file space.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+RESPONSES_FILE = "item_responses.bin"
+ITEMS_FILE = "quiz_items.jsonl"
+
+RECORD = np.dtype([("student", "<u8"), ("item", "<u8"), ("time", "<u4"), ("correct", "u1"), ("choice", "u1")])
+
+# "1. What is ...?", "Q3) ...": a question; "1: B": its answer key (the format bank_quiz uses too)
+QUESTION = re.compile(r"^\s*(?:Q\s*)?(\d{1,2})\s*[.)]\s+(\S.*)$", re.IGNORECASE)
+ANSWER = re.compile(r"^\s*(\d{1,2})\s*:\s*([A-D])\b", re.IGNORECASE)
+OPTION = re.compile(r"(?:^|\s)[A-D]\)\s*\S")
+
+_known_items = None          # item ids already in ITEMS_FILE (per process)
+_lock = threading.Lock()
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+
+
+def student_id(school, student) -> int:
+    return _hash64(f"{school}\n{student}")
+
+
+def item_id(question, options, key) -> int:
+    """Same question, options and key -> same id, whatever the spacing or case."""
+    return _hash64(" ".join(f"{question} | {' '.join(options)} | {key}".lower().split()))
+
+
+def parse_quiz(quiz_text: str) -> list:
+    """
+    Questions in order, as dicts {"number", "question", "options", "key"}.
+    Questions without an answer-key line are left out.
+    """
+    questions, keys, current = [], {}, None
+    for line in (quiz_text or "").splitlines():
+        answer = ANSWER.match(line)
+        if answer:
+            keys[int(answer.group(1))] = answer.group(2).upper()
+            current = None
+            continue
+        question = QUESTION.match(line)
+        if question:
+            current = {"number": int(question.group(1)), "question": question.group(2).strip(), "options": []}
+            questions.append(current)
+        elif current is not None and OPTION.search(line):
+            current["options"].append(" ".join(line.split()))
+    for q in questions:
+        q["key"] = keys.get(q["number"])
+    return [q for q in questions if q["key"]]
+
+
+def _remember_items(items):
+    """Append item text for ids this process hasn't seen in ITEMS_FILE yet."""
+    global _known_items
+    if _known_items is None:
+        _known_items = set(load_items())
+    new = {int(item["item"], 16): item for item in items if int(item["item"], 16) not in _known_items}
+    if new:
+        with open(ITEMS_FILE, "a", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(item) + "\n" for item in new.values()))
+        _known_items.update(new)
+
+
+def record_quiz(school, student, quiz_text, answers, subject="", grade="", topic="", now=None) -> int:
+    """
+    Save one response per answered question (answers[i] is the letter picked for question i+1).
+    Returns how many were saved.
+    """
+    answered = [(q, answers[q["number"] - 1]) for q in parse_quiz(quiz_text) if 1 <= q["number"] <= len(answers)]
+    if not answered:
+        return 0
+    sid = student_id(school, student)
+    now = int(time.time() if now is None else now)
+    records = np.zeros(len(answered), dtype=RECORD)
+    items = []
+    for n, (q, chosen) in enumerate(answered):
+        iid = item_id(q["question"], q["options"], q["key"])
+        records[n] = (sid, iid, now, chosen == q["key"], "ABCD".index(chosen))
+        items.append({"item": f"{iid:016x}", "question": q["question"], "options": q["options"], "key": q["key"],
+                      "subject": subject, "grade": grade, "topic": " ".join(str(topic).lower().split())})
+
+    with _lock:
+        _remember_items(items)
+        fd = os.open(RESPONSES_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, records.tobytes())
+        finally:
+            os.close(fd)
+    return len(records)
+
+
+def load_responses(path=RESPONSES_FILE):
+    """All responses as a read-only structured array (memory-mapped; empty if there are none)."""
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    count = size // RECORD.itemsize
+    if not count:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+
+def load_items(path=ITEMS_FILE) -> dict:
+    """item id (int) -> {"question", "options", "key", "subject", "grade", "topic"}; the first copy wins."""
+    items = {}
+    if not os.path.exists(path):
+        return items
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue                       # torn last line
+            items.setdefault(int(item.pop("item"), 16), item)
+    return items
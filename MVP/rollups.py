@@ -0,0 +1,233 @@
+"""
+Tutor SLA and workload rollups, maintained as help requests come and go.
+
+Every "Request Live Help" and "Mark as Resolved" calls observe(record), which
+folds just that event into small aggregate tables:
+
+    queue        open requests per subject (the queue depth)
+    ttr          time-to-resolve histograms per day (and all time), for the
+                 whole service and per school, subject, grade, request hour and tutor
+    throughput   requests resolved per tutor per day
+    daily        requests opened / resolved / auto-answered per day
+
+Time-to-resolve goes into log-spaced buckets (about 13% wide), so
+percentiles come from summing a few hundred counters instead of re-reading
+and re-parsing every request. The ops view costs the same with a week of
+history or five years of it.
+
+observe() is idempotent (each request's open and resolve events are applied
+once), so sync() can replay the shared store to pick up requests handled on
+other replicas. Like the notes index, the rollups live in their own SQLite
+file (SLP_ROLLUPS_DB, default rollups.db) and can be rebuilt at any time:
+    python rollups.py
+"""
+import math
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from notes_index import request_key
+
+ROLLUPS_DB = "rollups.db"
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+BUCKETS_PER_E = 8            # histogram resolution: bucket b covers log1p(minutes) in [b/8, (b+1)/8)
+DIMENSIONS = ("all", "school", "subject", "grade", "hour", "tutor")
+PERCENTILES = (0.5, 0.9, 0.95)
+AUTO_MATCH = "auto-match"    # resolved from the notes index, not by a tutor
+ALL_TIME = "*"               # ttr "day" of the all-time histograms (sorts before every date)
+
+
+def _clean(value):
+    return "" if value is None or value != value else str(value)   # value != value: NaN from pandas
+
+
+def _parse(value):
+    try:
+        return datetime.strptime(_clean(value), DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def bucket(minutes) -> int:
+    return int(math.log1p(max(0.0, minutes)) * BUCKETS_PER_E)
+
+
+def bucket_minutes(b) -> float:
+    """Representative value (geometric middle) of a bucket, in minutes."""
+    return math.expm1((b + 0.5) / BUCKETS_PER_E)
+
+
+def percentile(histogram, q):
+    """q-th percentile (minutes) from sorted (bucket, count) pairs."""
+    total = sum(n for _, n in histogram)
+    if not total:
+        return None
+    target, seen = q * total, 0
+    for b, n in histogram:
+        seen += n
+        if seen >= target:
+            return bucket_minutes(b)
+    return bucket_minutes(histogram[-1][0])
+
+
+class Rollups:
+    def __init__(self, path=ROLLUPS_DB):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS applied (event TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS queue (subject TEXT PRIMARY KEY, open INTEGER) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS ttr (
+                dim TEXT, day TEXT, value TEXT, bucket INTEGER, n INTEGER,
+                PRIMARY KEY (dim, day, value, bucket)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS throughput (
+                tutor TEXT, day TEXT, resolved INTEGER, minutes REAL,
+                PRIMARY KEY (tutor, day)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS daily (
+                day TEXT PRIMARY KEY, opened INTEGER, resolved INTEGER, auto_answered INTEGER) WITHOUT ROWID;
+        """)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- write ----------
+    def observe(self, record):
+        """Fold one help request (as just appended or just resolved) into the rollups."""
+        return self.observe_many([record])
+
+    def observe_many(self, records):
+        """Apply the open / resolve events of these requests not applied yet. Returns events applied."""
+        conn = self._conn()
+        applied = 0
+        with conn:
+            for record in records:
+                key = request_key(record)
+                subject = _clean(record.get("subject"))
+                if self._first(conn, f"{key}:open"):
+                    opened = _parse(record.get("time"))
+                    day = opened.strftime("%Y-%m-%d") if opened else ""
+                    self._bump(conn, "queue", ("subject",), (subject,), open=1)
+                    self._bump(conn, "daily", ("day",), (day,), opened=1, resolved=0, auto_answered=0)
+                    applied += 1
+                if _clean(record.get("status")) == "Resolved" and self._first(conn, f"{key}:resolved"):
+                    self._resolved(conn, record, subject)
+                    applied += 1
+        return applied
+
+    def _first(self, conn, event):
+        return conn.execute("INSERT OR IGNORE INTO applied (event) VALUES (?)", (event,)).rowcount == 1
+
+    def _bump(self, conn, table, key_cols, key, **amounts):
+        cols = key_cols + tuple(amounts)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in amounts)
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT ({', '.join(key_cols)}) DO UPDATE SET {updates}",
+            (*key, *amounts.values()),
+        )
+
+    def _resolved(self, conn, record, subject):
+        opened, resolved = _parse(record.get("time")), _parse(record.get("resolved_time"))
+        tutor = _clean(record.get("resolved_by")) or "unknown"
+        day = (resolved or opened).strftime("%Y-%m-%d") if (resolved or opened) else ""
+        self._bump(conn, "queue", ("subject",), (subject,), open=-1)
+        if tutor == AUTO_MATCH:
+            # Answered instantly from earlier notes: not tutor work, and it would flatter the SLA
+            self._bump(conn, "daily", ("day",), (day,), opened=0, resolved=1, auto_answered=1)
+            return
+        self._bump(conn, "daily", ("day",), (day,), opened=0, resolved=1, auto_answered=0)
+        if opened is None or resolved is None:
+            return
+        minutes = max(0.0, (resolved - opened).total_seconds() / 60)
+        self._bump(conn, "throughput", ("tutor", "day"), (tutor, day), resolved=1, minutes=minutes)
+        b = bucket(minutes)
+        for dim, value in (("all", ""), ("school", _clean(record.get("school")) or "default"),
+                           ("subject", subject), ("grade", _clean(record.get("grade"))),
+                           ("hour", f"{opened.hour:02d}"), ("tutor", tutor)):
+            # Per day for recent windows, plus an all-time row so "All time" never sums every day
+            for d in (day, ALL_TIME):
+                self._bump(conn, "ttr", ("dim", "day", "value", "bucket"), (dim, d, value, b), n=1)
+
+    def sync(self, backend=None):
+        """Apply events from the shared store that this file hasn't seen (other replicas, restarts)."""
+        from backend import get_backend
+        backend = backend or get_backend()
+        return self.observe_many(backend.rows("help_requests"))
+
+    # ---------- read ----------
+    def _since(self, days):
+        """First day of a window of `days` calendar days ending today (days=1 is just today)."""
+        return (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d") if days else ""
+
+    def queue_depth(self):
+        """Open requests in total and per subject."""
+        rows = self._conn().execute("SELECT subject, open FROM queue WHERE open > 0 ORDER BY open DESC").fetchall()
+        return {"open": sum(n for _, n in rows), "by_subject": dict(rows)}
+
+    def time_to_resolve(self, dim="all", days=7):
+        """Per value of dim: resolved count and time-to-resolve percentiles (minutes) over the last
+        `days` calendar days, today included (None or 0: all time)."""
+        day_filter = "day >= ?" if days else "day = ?"
+        rows = self._conn().execute(
+            f"SELECT value, bucket, SUM(n) FROM ttr WHERE dim = ? AND {day_filter} "
+            "GROUP BY value, bucket ORDER BY value, bucket",
+            (dim, self._since(days) if days else ALL_TIME),
+        ).fetchall()
+        histograms = {}
+        for value, b, n in rows:
+            histograms.setdefault(value, []).append((b, n))
+        table = []
+        for value, histogram in histograms.items():
+            row = {dim: value, "resolved": sum(n for _, n in histogram)}
+            for q in PERCENTILES:
+                row[f"p{round(q * 100)}_min"] = round(percentile(histogram, q), 1)
+            table.append(row)
+        return table
+
+    def tutor_throughput(self, days=7):
+        """Per tutor: requests resolved, per active day, and mean minutes to resolve."""
+        rows = self._conn().execute(
+            "SELECT tutor, SUM(resolved), COUNT(*), SUM(minutes) FROM throughput WHERE day >= ? "
+            "GROUP BY tutor ORDER BY SUM(resolved) DESC",
+            (self._since(days),),
+        ).fetchall()
+        return [
+            {"tutor": tutor, "resolved": n, "per_active_day": round(n / active, 1),
+             "mean_min": round(minutes / n, 1)}
+            for tutor, n, active, minutes in rows
+        ]
+
+    def daily(self, days=7):
+        rows = self._conn().execute(
+            "SELECT day, opened, resolved, auto_answered FROM daily WHERE day >= ? ORDER BY day",
+            (self._since(days),),
+        ).fetchall()
+        return [dict(zip(("day", "opened", "resolved", "auto_answered"), row)) for row in rows]
+
+    def report(self, days=7):
+        return {
+            "queue": self.queue_depth(),
+            "time_to_resolve": {dim: self.time_to_resolve(dim, days) for dim in DIMENSIONS},
+            "tutors": self.tutor_throughput(days),
+            "daily": self.daily(days),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_rollups():
+    return Rollups(os.getenv("SLP_ROLLUPS_DB", ROLLUPS_DB))
+
+
+if __name__ == "__main__":
+    rollups = get_rollups()
+    print(f"applied {rollups.sync()} new events; {rollups.queue_depth()['open']} requests open")
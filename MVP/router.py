@@ -0,0 +1,256 @@
+"""
+Latency-aware model routing.
+
+Every OpenAI call names a task ("lesson", "quiz" or "photo") and the
+student's grade / subject / mode. ROUTES maps that to an ordered list of
+model tiers, best quality first. The router keeps a rolling window of
+latency and errors per model and skips a tier while its p95 is over the
+task's SLO or its error rate is too high, so traffic fails over to the
+next (faster) tier. Old samples age out of the window, so a slow model is
+tried again after a while. Each model also sits behind a circuit breaker
+(breaker.py), so a model that keeps failing is skipped without waiting.
+
+    model = get_router().choose("Grade 11", "Physics", "homework", "lesson")
+    resp = get_router().complete(client, "Grade 11", "Physics", "homework", "lesson",
+                                 messages=[...])
+
+Streamed completions (stream=True) are judged when the stream ends: their
+full latency and success or error are recorded then, like any other call.
+Time to the first chunk is kept apart (metrics()["time_to_first_chunk"]),
+so it doesn't pull down the p95 the failover decision uses.
+
+Stats are per process. Try it against the stub server with different
+per-model latencies:
+    python benchmarks/bench_router.py
+"""
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from breaker import TIMEOUTS, CircuitOpen, get_breaker, is_outage
+
+FAST = "gpt-4o-mini"
+STRONG = "gpt-4o"
+
+# (grade band, subject, mode, task) -> model tiers, first match wins; "*" matches anything
+ROUTES = [
+    ("high", "*", "homework", "lesson", [STRONG, FAST]),
+    ("high", "Math", "*", "lesson", [STRONG, FAST]),
+    ("high", "Physics", "*", "lesson", [STRONG, FAST]),
+    ("middle", "*", "homework", "lesson", [STRONG, FAST]),
+    ("*", "*", "*", "photo", [FAST]),
+    ("*", "*", "*", "quiz", [FAST]),
+    ("*", "*", "*", "*", [FAST]),
+]
+
+# p95 latency limit per task, in milliseconds
+SLO_MS = {"lesson": 8000, "quiz": 5000, "photo": 4000}
+MAX_ERROR_RATE = 0.2
+MIN_SAMPLES = 5          # don't judge a model on fewer calls than this
+WINDOW_SECONDS = 300
+WINDOW_SIZE = 200
+
+
+def grade_band(grade_label) -> str:
+    """kg / primary / middle / high, same bands as build_system_prompt."""
+    if not grade_label or grade_label == "Kindergarten":
+        return "kg"
+    g = int(str(grade_label).split()[-1])
+    if g <= 5:
+        return "primary"
+    if g <= 8:
+        return "middle"
+    return "high"
+
+
+class ModelStats:
+    """Rolling window of (time, latency ms, ok) for one model."""
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, size=WINDOW_SIZE):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=size)
+
+    def record(self, latency_ms, ok, now=None):
+        self.samples.append((now or time.time(), latency_ms, ok))
+
+    def _recent(self, now=None):
+        cutoff = (now or time.time()) - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def summary(self, now=None) -> dict:
+        recent = self._recent(now)
+        if not recent:
+            return {"calls": 0, "p50_ms": None, "p95_ms": None, "error_rate": 0.0}
+        latencies = sorted(lat for _, lat, ok in recent if ok)
+        errors = sum(1 for _, _, ok in recent if not ok)
+
+        def pct(q):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))]) if latencies else None
+
+        return {"calls": len(recent), "p50_ms": pct(0.5), "p95_ms": pct(0.95),
+                "error_rate": errors / len(recent)}
+
+
+class _Stream:
+    """
+    A streamed completion that records its stats as it goes: time to the
+    first chunk, then latency and success, or the error, once the last chunk
+    arrives or the stream raises. Other attributes pass through.
+    """
+
+    def __init__(self, stream, router, model, breaker, t0):
+        self.stream, self.router, self.model, self.breaker, self.t0 = stream, router, model, breaker, t0
+        self.first_chunk = False
+        self.done = False
+
+    def _ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def __iter__(self):
+        try:
+            for chunk in self.stream:
+                if not self.first_chunk:
+                    self.first_chunk = True
+                    self.router.record_ttft(self.model, self._ms())
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._finish(None)
+
+    def _finish(self, error):
+        if self.done:
+            return
+        self.done = True
+        if error is None:
+            self.breaker.success()
+            self.router.record(self.model, self._ms(), True)
+        elif is_outage(error):
+            self.router.record(self.model, self._ms(), False)
+            self.breaker.failure(error)
+        else:
+            self.breaker.success()
+
+    def close(self):
+        if not self.done:
+            # Stopped by the caller (a cancelled speculative lesson): no latency sample
+            self.done = True
+            if self.first_chunk:
+                self.breaker.success()
+            else:
+                self.breaker.release()
+        self.stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Router:
+    def __init__(self, routes=ROUTES, slo_ms=SLO_MS, max_error_rate=MAX_ERROR_RATE,
+                 min_samples=MIN_SAMPLES, window_seconds=WINDOW_SECONDS):
+        self.routes = routes
+        self.slo_ms = slo_ms
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.window_seconds = window_seconds
+        self.stats = {}
+        self.ttft = {}           # streamed calls: time to the first chunk, kept out of self.stats
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def tiers(self, grade_label, subject, mode, task):
+        key = (grade_band(grade_label), subject, mode, task)
+        for *pattern, models in self.routes:
+            if all(p == "*" or p == k for p, k in zip(pattern, key)):
+                return list(models)
+        return [FAST]
+
+    def _stats(self, model, table=None):
+        table = self.stats if table is None else table
+        with self._lock:
+            if model not in table:
+                table[model] = ModelStats(self.window_seconds)
+            return table[model]
+
+    def healthy(self, model, task) -> bool:
+        summary = self._stats(model).summary()
+        if summary["calls"] < self.min_samples:
+            return True
+        if summary["error_rate"] > self.max_error_rate:
+            return False
+        slo = self.slo_ms.get(task)
+        return slo is None or summary["p95_ms"] is None or summary["p95_ms"] <= slo
+
+    def choose(self, grade_label, subject, mode, task) -> str:
+        """First healthy tier; the last (fastest) tier if none are."""
+        tiers = self.tiers(grade_label, subject, mode, task)
+        for model in tiers:
+            if self.healthy(model, task):
+                return model
+        return tiers[-1]
+
+    def record(self, model, latency_ms, ok):
+        self._stats(model).record(latency_ms, ok)
+
+    def record_ttft(self, model, latency_ms):
+        self._stats(model, self.ttft).record(latency_ms, True)
+
+    def complete(self, client, grade_label, subject, mode, task, **kwargs):
+        """
+        chat.completions.create() on the chosen model, with the task timeout.
+        If the call fails with an outage error (breaker.is_outage) the next
+        tier is tried; models whose circuit breaker is open are skipped. Other
+        errors (a 400 for a malformed request, a bad API key) are raised
+        straight away and don't count against the model. Raises the last
+        error (CircuitOpen if every tier was open) when no tier answered.
+        With stream=True the result is a _Stream, judged when it ends.
+        """
+        tiers = self.tiers(grade_label, subject, mode, task)
+        first = self.choose(grade_label, subject, mode, task)
+        order = tiers[tiers.index(first):]
+        kwargs.setdefault("timeout", TIMEOUTS.get(task, 30))
+        error = CircuitOpen(f"all models open for {task}")
+        for model in order:
+            breaker = get_breaker(model)
+            if not breaker.allow():
+                continue
+            t0 = time.perf_counter()
+            try:
+                resp = client.chat.completions.create(model=model, **kwargs)
+            except Exception as e:
+                if not is_outage(e):
+                    # The model answered; another tier would reject the request too
+                    breaker.success()
+                    raise
+                self.record(model, (time.perf_counter() - t0) * 1000, False)
+                breaker.failure(e)
+                error = e
+                continue
+            if model != tiers[0]:
+                with self._lock:
+                    self.failovers += 1
+            if kwargs.get("stream"):
+                # create() returns at the first bytes; success and latency are recorded at the end
+                return _Stream(resp, self, model, breaker, t0)
+            breaker.success()
+            self.record(model, (time.perf_counter() - t0) * 1000, True)
+            return resp
+        raise error
+
+    def metrics(self) -> dict:
+        with self._lock:
+            models, streamed = list(self.stats), list(self.ttft)
+        return {
+            "failovers": self.failovers,
+            "models": {m: self._stats(m).summary() for m in models},
+            "time_to_first_chunk": {m: self._stats(m, self.ttft).summary() for m in streamed},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_router():
+    """One router per process, shared by the script thread and the job pool."""
+    return Router()
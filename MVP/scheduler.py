@@ -0,0 +1,347 @@
+"""
+Spaced-repetition scheduler (SM-2) for practice items.
+
+Per (student, item) state lives in flat NumPy arrays (ease, interval,
+repetitions, due) indexed by a slot number, so a million pairs take ~25 MB
+of state. Each student has a heap of (due, slot) entries; reviewing an item
+pushes a fresh entry and the old one is skipped lazily, so both review() and
+next_item() are O(log n).
+
+On disk a schedule is a snapshot ("<path>", plain NumPy arrays with
+students and items as strings, so load() never unpickles) plus an append
+log ("<path>.log", one JSON line per pair). save() only appends the pairs
+reviewed since the last save, so it costs O(changed pairs) however big the
+schedule is. Several app.py replicas can share the files: save() takes an
+flock on "<path>.lock" and first applies what the others appended (for each
+pair the most recent review wins).
+
+Once the log holds COMPACT_AFTER lines, a background thread folds it into a
+new snapshot and starts a fresh log. The log's first line is a random ID,
+so a replica notices the log was replaced and re-reads the snapshot. A line
+cut off by a crash mid-append is ignored.
+
+Used for KG Math Fun (counting 1–5, short intervals in minutes) and for the
+grade-level Practice mode (topics, intervals in days).
+"""
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: save() is only locked within this process
+    fcntl = None
+
+DAY = 86400
+MINUTE = 60
+
+START_EASE = 2.5
+MIN_EASE = 1.3
+
+COMPACT_AFTER = 50_000     # log lines before the log is folded into the snapshot
+
+
+@contextmanager
+def _flock(lock_path, blocking=True):
+    """Exclusive flock on lock_path; yields False if not blocking and someone else holds it."""
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+    finally:
+        os.close(fd)  # closing releases the flock
+
+
+def _read_log_id(path):
+    """ID at the start of the log, or "" if there is no log yet."""
+    try:
+        with open(path + ".log", "rb") as fh:
+            header = fh.readline().split()
+    except FileNotFoundError:
+        return ""
+    return header[0].decode() if header else ""
+
+
+class Scheduler:
+    def __init__(self, unit_seconds=DAY, capacity=1024):
+        self.unit = unit_seconds
+        self.ease = np.full(capacity, START_EASE, dtype=np.float32)
+        self.interval = np.zeros(capacity, dtype=np.float32)
+        self.reps = np.zeros(capacity, dtype=np.int16)
+        self.due = np.zeros(capacity, dtype=np.float64)
+        self.reviewed = np.zeros(capacity, dtype=np.float64)   # when the pair was last reviewed
+        self.size = 0
+        self.slots = {}       # student -> {item: slot}
+        self.items = []       # slot -> item
+        self.students = []    # slot -> student
+        self.queues = {}      # student -> [(due, slot)]
+        self.dirty = set()    # slots reviewed since the last save()
+        self._log_id = None   # ID of the log read so far (None: the files were never read)
+        self._log_pos = 0     # bytes of that log already applied
+        self._log_lines = 0
+        self._compacting = False
+        self._lock = threading.Lock()
+
+    def _grow(self):
+        cap = len(self.due) * 2
+        self.ease = np.resize(self.ease, cap)
+        self.interval = np.resize(self.interval, cap)
+        self.reps = np.resize(self.reps, cap)
+        self.due = np.resize(self.due, cap)
+        self.reviewed = np.resize(self.reviewed, cap)
+
+    def _slot(self, student, item):
+        student_slots = self.slots.setdefault(student, {})
+        slot = student_slots.get(item)
+        if slot is None:
+            if self.size == len(self.due):
+                self._grow()
+            slot = self.size
+            self.size += 1
+            self.ease[slot] = START_EASE
+            self.interval[slot] = 0
+            self.reps[slot] = 0
+            self.reviewed[slot] = 0
+            student_slots[item] = slot
+            self.items.append(item)
+            self.students.append(student)
+        return slot
+
+    def review(self, student, item, quality, now=None):
+        """Record an answer. quality is 0–5 (SM-2): <3 means forgotten."""
+        now = time.time() if now is None else now
+        quality = max(0, min(5, int(quality)))
+        with self._lock:
+            slot = self._slot(student, item)
+            if quality < 3:
+                self.reps[slot] = 0
+                self.interval[slot] = 1
+            else:
+                self.reps[slot] += 1
+                if self.reps[slot] == 1:
+                    self.interval[slot] = 1
+                elif self.reps[slot] == 2:
+                    self.interval[slot] = 6
+                else:
+                    self.interval[slot] = round(float(self.interval[slot]) * float(self.ease[slot]))
+            self.ease[slot] = max(MIN_EASE, self.ease[slot] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+            due = now + float(self.interval[slot]) * self.unit
+            self.due[slot] = due
+            self.reviewed[slot] = now
+            self.dirty.add(slot)
+            heapq.heappush(self.queues.setdefault(student, []), (due, slot))
+        return due
+
+    def _peek(self, student):
+        queue = self.queues.get(student)
+        while queue:
+            due, slot = queue[0]
+            if due == self.due[slot]:
+                return due, slot
+            heapq.heappop(queue)  # stale entry from an earlier review
+        return None
+
+    def next_item(self, student, new_items=(), now=None, early=True):
+        """
+        Next item to practise:
+        1. the most overdue item, else
+        2. the first of `new_items` the student has never seen, else
+        3. (if early) the item coming due soonest.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            top = self._peek(student)
+            if top is not None and top[0] <= now:
+                return self.items[top[1]]
+            seen = self.slots.get(student, {})
+            for item in new_items:
+                if item not in seen:
+                    return item
+            if top is not None and early:
+                return self.items[top[1]]
+        return None
+
+    def due_count(self, student, now=None):
+        now = time.time() if now is None else now
+        slots = list(self.slots.get(student, {}).values())
+        return int((self.due[slots] <= now).sum()) if slots else 0
+
+    def _apply(self, student, item, ease, interval, reps, due, reviewed):
+        """Take one pair's state unless ours was reviewed at least as recently. Call with self._lock held."""
+        ours = self.slots.get(student, {}).get(item)
+        if ours is not None and self.reviewed[ours] >= reviewed:
+            return
+        slot = self._slot(student, item)
+        self.ease[slot] = ease
+        self.interval[slot] = interval
+        self.reps[slot] = reps
+        self.due[slot] = due
+        self.reviewed[slot] = reviewed
+        heapq.heappush(self.queues.setdefault(student, []), (float(due), slot))
+
+    def merge(self, other):
+        """Take every (student, item) from other that was reviewed more recently than here."""
+        with self._lock:
+            for student, student_slots in other.slots.items():
+                for item, theirs in student_slots.items():
+                    self._apply(student, item, other.ease[theirs], other.interval[theirs], other.reps[theirs],
+                                other.due[theirs], other.reviewed[theirs])
+
+    def _catch_up(self, path):
+        """Apply the log lines written since we last read it (by us or another process)."""
+        try:
+            fh = open(path + ".log", "rb")
+        except FileNotFoundError:
+            fh = None
+        header = fh.readline().split() if fh else []
+        body = fh.tell() if fh else 0
+        log_id = header[0].decode() if header else ""
+        if log_id != self._log_id:
+            if len(header) == 3 and header[1].decode() == self._log_id and int(header[2]) <= self._log_pos:
+                # Compacted from the log we were reading, which now starts at its old byte header[2]
+                self._log_pos = body + self._log_pos - int(header[2])
+            else:
+                # New log, or we missed lines that only the snapshot holds now
+                if os.path.exists(path):
+                    self.merge(Scheduler._load_snapshot(path))
+                self._log_pos = body
+            self._log_id, self._log_lines = log_id, 0
+        self._log_pos = max(self._log_pos, body)
+        if fh is None:
+            return
+        with fh:
+            fh.seek(self._log_pos)
+            data = fh.read()
+        end = data.rfind(b"\n") + 1     # a line still being written (or cut off by a crash) waits
+        rows = [json.loads(line) for line in data[:end].splitlines()]
+        with self._lock:
+            for row in rows:
+                self._apply(*row)
+        self._log_pos += end
+        self._log_lines += len(rows)
+
+    def _new_log(self, path, body=b"", compacted_from=""):
+        """
+        Replace the log with a fresh one holding body; call with the flock held.
+        The header is "<new ID>", or "<new ID> <old ID> <old offset>" when body
+        is the old log from that offset on. Returns the new ID and header size.
+        """
+        log_id = uuid.uuid4().hex
+        header = f"{log_id} {compacted_from}".strip().encode() + b"\n"
+        tmp = path + ".log.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(header + body)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path + ".log")
+        return log_id, len(header)
+
+    def save(self, path):
+        """Append the pairs reviewed since the last save to the log, under an flock on "<path>.lock"."""
+        with _flock(path + ".lock"):
+            self._catch_up(path)
+            if not self._log_id:
+                self._log_id, self._log_pos = self._new_log(path)
+                self._log_lines = 0
+            with self._lock:
+                if not self.dirty:
+                    return
+                lines = [
+                    json.dumps([str(self.students[slot]), str(self.items[slot]), float(self.ease[slot]),
+                                float(self.interval[slot]), int(self.reps[slot]), float(self.due[slot]),
+                                float(self.reviewed[slot])]) + "\n"
+                    for slot in sorted(self.dirty)
+                ]
+                self.dirty.clear()
+            data = "".join(lines).encode()
+            with open(path + ".log", "ab") as fh:
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._log_pos += len(data)
+            self._log_lines += len(lines)
+        if self._log_lines >= COMPACT_AFTER and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_in_background, args=(path,), name="slp-schedule-compact",
+                             daemon=True).start()
+
+    def _compact_in_background(self, path):
+        try:
+            self.compact(path)
+        finally:
+            self._compacting = False
+
+    def compact(self, path):
+        """
+        Fold the log into a new snapshot. The snapshot is built without the
+        save() lock, which is only taken to carry over the lines appended in
+        the meantime. One process compacts at a time ("<path>.compact.lock").
+        """
+        with _flock(path + ".compact.lock", blocking=False) as locked:
+            if not locked:
+                return
+            snap = Scheduler.load(path, unit_seconds=self.unit)
+            snap._write_snapshot(path + ".compact")
+            with _flock(path + ".lock"):
+                with open(path + ".log", "rb") as fh:
+                    fh.seek(snap._log_pos)
+                    tail = fh.read()
+                tail = tail[:tail.rfind(b"\n") + 1]
+                os.replace(path + ".compact", path)
+                self._new_log(path, tail, f"{snap._log_id} {snap._log_pos}")
+
+    def _write_snapshot(self, dest):
+        with self._lock:
+            n = self.size
+            students = np.array([str(student) for student in self.students[:n]], dtype=str)
+            items = np.array([str(item) for item in self.items[:n]], dtype=str)
+            arrays = dict(unit=self.unit, ease=self.ease[:n].copy(), interval=self.interval[:n].copy(),
+                          reps=self.reps[:n].copy(), due=self.due[:n].copy(), reviewed=self.reviewed[:n].copy())
+        slots = np.arange(n, dtype=np.int64)
+        with open(dest, "wb") as fh:
+            np.savez_compressed(fh, students=students, items=items, slots=slots, **arrays)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    @classmethod
+    def _load_snapshot(cls, path):
+        data = np.load(path, allow_pickle=False)
+        n = len(data["due"])
+        sched = cls(unit_seconds=float(data["unit"]), capacity=max(1024, n))
+        sched.ease[:n] = data["ease"]
+        sched.interval[:n] = data["interval"]
+        sched.reps[:n] = data["reps"]
+        sched.due[:n] = data["due"]
+        if "reviewed" in data:
+            sched.reviewed[:n] = data["reviewed"]
+        sched.size = n
+        sched.students, sched.items = [None] * n, [None] * n
+        for student, item, slot in zip(data["students"].tolist(), data["items"].tolist(), data["slots"].tolist()):
+            sched.slots.setdefault(student, {})[item] = slot
+            sched.students[slot] = student
+            sched.items[slot] = item
+            sched.queues.setdefault(student, []).append((float(sched.due[slot]), slot))
+        for queue in sched.queues.values():
+            heapq.heapify(queue)
+        return sched
+
+    @classmethod
+    def load(cls, path, unit_seconds=DAY):
+        """Scheduler saved by save(): the snapshot plus the log. Students and items come back as strings."""
+        # Read the log ID first: if a compaction swaps both files in between, _catch_up() sees a new ID
+        log_id = _read_log_id(path)
+        sched = cls._load_snapshot(path) if os.path.exists(path) else cls(unit_seconds=unit_seconds)
+        sched._log_id = log_id
+        sched._catch_up(path)
+        return sched
@@ -0,0 +1,225 @@
+"""
+Per-session memory accounting and eviction for st.session_state.
+
+track() runs once per script run. It records the size of every
+session_state key for the current session and enforces the caps:
+
+- a session over SESSION_CAP_BYTES spills its largest app-owned blobs
+  (lesson_text, quiz_text, ...) out of memory;
+- sessions idle for IDLE_SECONDS have all their spillable blobs spilled;
+- sessions that Streamlit reports as closed are dropped and their spill
+  files removed.
+
+Spilled values are pickled to SPILL_DIR on disk. A Streamlit session lives in
+one process, so there is nothing to gain from a shared backend here (and the
+default local backend keeps its cache in this process's memory, which would
+free nothing). A spilled key holds a small Spilled placeholder and get()
+reloads it transparently.
+
+Sessions are tracked by session ID only. Streamlit hands every rerun a new
+session_state wrapper, so nothing from an earlier run is kept here: another
+session's state is looked up through the Streamlit runtime when it is needed,
+and that lookup is also how we learn the session has been closed.
+
+Widget values (uploaded photos, the drawing canvas) are owned by Streamlit
+and can't be evicted from here — they are counted so they show up in the
+admin view.
+"""
+import os
+import pickle
+import sys
+import threading
+import time
+
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+SESSION_CAP_BYTES = 2 * 1024 * 1024
+SPILL_MIN_BYTES = 16 * 1024           # not worth spilling anything smaller
+IDLE_SECONDS = 15 * 60
+SPILL_DIR = "spill"
+SPILLABLE = ("lesson_text", "quiz_text", "job_homework_text")
+
+_sessions = {}   # session_id -> {"last_seen", "sizes", "spilled", "over_cap"}
+_lock = threading.Lock()
+
+
+class Spilled:
+    """Placeholder left in session_state for a value that was moved out of memory."""
+
+    def __init__(self, session_id, key, value):
+        self.key = key
+        self.size = deep_size(value)
+        self.where = _spill_path(session_id, key)
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        tmp = f"{self.where}.tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.where)
+
+    def load(self):
+        """The spilled value, or None if its file is gone."""
+        try:
+            with open(self.where, "rb") as fh:
+                return pickle.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def discard(self):
+        _remove(self.where)
+
+
+def _spill_path(session_id, key):
+    return os.path.join(SPILL_DIR, f"{session_id}-{key}.pkl")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def deep_size(obj, _depth=0):
+    """Approximate bytes held by a session_state value."""
+    if isinstance(obj, Spilled):
+        return 0
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if hasattr(obj, "nbytes"):                 # numpy arrays (canvas image_data)
+        return int(obj.nbytes)
+    if hasattr(obj, "size") and hasattr(obj, "getvalue"):   # UploadedFile
+        return int(obj.size)
+    if _depth < 4 and isinstance(obj, dict):
+        return sum(deep_size(k, _depth + 1) + deep_size(v, _depth + 1) for k, v in obj.items())
+    if _depth < 4 and isinstance(obj, (list, tuple, set)):
+        return sum(deep_size(v, _depth + 1) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def _sizes(state):
+    # filtered_state: user keys and keyed widget values, without internal IDs
+    return {str(key): deep_size(value) for key, value in state.filtered_state.items()}
+
+
+def _live_state(session_id):
+    """The session's persistent state, or None if Streamlit has no such session."""
+    if not Runtime.exists():
+        return None
+    info = Runtime.instance()._session_mgr.get_session_info(session_id)
+    return info.session.session_state if info else None
+
+
+def _closed(session_id):
+    # Without a running server (bare scripts, AppTest) there is nobody to ask,
+    # so a session never counts as closed and its files are kept.
+    return Runtime.exists() and _live_state(session_id) is None
+
+
+def _spill(session_id, entry, keys, state):
+    if state is None:
+        return
+    for key in keys:
+        try:
+            value = state[key]
+        except KeyError:
+            continue
+        if isinstance(value, Spilled) or deep_size(value) < SPILL_MIN_BYTES:
+            continue
+        state[key] = Spilled(session_id, key, value)
+        entry["spilled"].add(key)
+        entry["sizes"][key] = 0
+
+
+def track():
+    """Account the current session, enforce its cap and sweep idle sessions."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    now = time.time()
+    with _lock:
+        entry = _sessions.setdefault(ctx.session_id, {"spilled": set()})
+        entry["last_seen"] = now
+        entry["sizes"] = _sizes(ctx.session_state)
+
+        total = sum(entry["sizes"].values())
+        entry["over_cap"] = total > SESSION_CAP_BYTES
+        if entry["over_cap"]:
+            biggest = sorted(SPILLABLE, key=lambda k: entry["sizes"].get(k, 0), reverse=True)
+            for key in biggest:
+                if total <= SESSION_CAP_BYTES:
+                    break
+                total -= entry["sizes"].get(key, 0)
+                _spill(ctx.session_id, entry, [key], ctx.session_state)
+
+        _sweep(now, ctx.session_id)
+
+
+def _sweep(now, current_id):
+    for session_id, entry in list(_sessions.items()):
+        if session_id == current_id:
+            continue
+        if _closed(session_id):
+            # The files are named after the session, so they can go even though the state is gone
+            for key in entry["spilled"]:
+                _remove(_spill_path(session_id, key))
+            del _sessions[session_id]
+        elif now - entry["last_seen"] > IDLE_SECONDS:
+            _spill(session_id, entry, SPILLABLE, _live_state(session_id))
+
+
+def get(key, default=None):
+    """
+    st.session_state.get() that reloads spilled values.
+
+    A returning idle session gets the value back in memory; a session that is
+    over its cap only borrows it for this run, so it stays spilled.
+    """
+    placeholder = st.session_state.get(key, default)
+    if not isinstance(placeholder, Spilled):
+        return placeholder
+    value = placeholder.load()
+    if value is None:
+        return default
+    ctx = get_script_run_ctx()
+    entry = _sessions.get(ctx.session_id) if ctx else None
+    if not (entry and entry.get("over_cap")):
+        st.session_state[key] = value
+        placeholder.discard()
+        if entry:
+            entry["spilled"].discard(key)
+    return value
+
+
+def report(top=20):
+    """Largest sessions and keys, for the admin view."""
+    now = time.time()
+    with _lock:
+        rows = []
+        for session_id, entry in _sessions.items():
+            sizes = entry.get("sizes", {})
+            largest = sorted(sizes.items(), key=lambda kv: kv[1], reverse=True)[:3]
+            rows.append({
+                "session": session_id[:8],
+                "total_kb": round(sum(sizes.values()) / 1024, 1),
+                "idle_min": round((now - entry["last_seen"]) / 60, 1),
+                "spilled_keys": len(entry["spilled"]),
+                "largest_keys": ", ".join(f"{k} ({v // 1024} KB)" for k, v in largest),
+            })
+    rows.sort(key=lambda r: r["total_kb"], reverse=True)
+    return {
+        "sessions": len(rows),
+        "total_kb": round(sum(r["total_kb"] for r in rows), 1),
+        "top": rows[:top],
+    }
+
+
+def spill_idle_now():
+    """Admin action: spill every other session's blobs right away."""
+    ctx = get_script_run_ctx()
+    current = ctx.session_id if ctx else None
+    with _lock:
+        for session_id, entry in _sessions.items():
+            if session_id != current:
+                _spill(session_id, entry, SPILLABLE, _live_state(session_id))
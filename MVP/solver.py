@@ -0,0 +1,408 @@
+"""
+Local step-by-step solver for simple math homework.
+
+Handles linear equations in one variable ("Solve 2x + 5 = 17"), plain
+arithmetic, fractions ("What is 1/4 of 8?") and percentages ("20% of 50")
+without a model call. Anything it cannot parse returns None so the caller
+falls back to the LLM.
+"""
+import re
+from fractions import Fraction
+
+# Words that often wrap the actual math ("Solve ...", "What is ...?")
+LEAD_WORDS = re.compile(
+    r"^(please\s+)?(solve|find|calculate|evaluate|simplify|work out|what is|what's)\s*(for\s+[a-z]\s*)?[:,]?\s*",
+    re.IGNORECASE,
+)
+TRAIL_WORDS = re.compile(r"\s*(,?\s*(solve\s+)?for\s+[a-z])?\s*[?.!]*\s*$", re.IGNORECASE)
+TOKEN_RE = re.compile(r"\s*(\d+\.\d+|\d+|of\b|[a-z]|[-+*/()%^=])")
+
+
+class _Lin:
+    """a*x + b with exact fractions (a == 0 means a plain number)."""
+
+    def __init__(self, a, b):
+        self.a = Fraction(a)
+        self.b = Fraction(b)
+
+    @property
+    def is_const(self):
+        return self.a == 0
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _fmt(value: Fraction) -> str:
+    if value.denominator == 1:
+        return str(value.numerator)
+    return f"{value.numerator}/{value.denominator}"
+
+
+def _fmt_lin(lin: _Lin, var: str) -> str:
+    if lin.a == 0:
+        return _fmt(lin.b)
+    if lin.a == 1:
+        head = var
+    elif lin.a == -1:
+        head = f"-{var}"
+    elif lin.a.denominator != 1:
+        head = f"({_fmt(lin.a)}){var}"
+    else:
+        head = f"{_fmt(lin.a)}{var}"
+    if lin.b == 0:
+        return head
+    sign = "+" if lin.b > 0 else "-"
+    return f"{head} {sign} {_fmt(abs(lin.b))}"
+
+
+class _Parser:
+    """Tiny recursive-descent parser that records arithmetic steps as it evaluates."""
+
+    def __init__(self, tokens, var):
+        self.tokens = tokens
+        self.pos = 0
+        self.var = var
+        self.steps = []
+        self.kinds = set()
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, expected=None):
+        tok = self.peek()
+        if tok is None or (expected is not None and tok != expected):
+            raise _Unsupported(f"expected {expected!r}, got {tok!r}")
+        self.pos += 1
+        return tok
+
+    def expr(self):
+        left = self.term()
+        while self.peek() in ("+", "-"):
+            op = self.take()
+            right = self.term()
+            left = self._combine(left, op, right)
+        return left
+
+    def term(self):
+        left = self.unary()
+        while True:
+            tok = self.peek()
+            if tok in ("*", "/", "of"):
+                op = self.take()
+                right = self.unary()
+            elif tok is not None and (tok == "(" or tok == self.var):
+                # Implicit multiplication: 2x, 3(x + 1). Never before a number: "3 4" is a typo, not 12
+                op = "*"
+                right = self.unary()
+            else:
+                return left
+            left = self._combine(left, op, right)
+
+    def unary(self):
+        if self.peek() == "-":
+            self.take()
+            value = self.unary()
+            return _Lin(-value.a, -value.b)
+        if self.peek() == "+":
+            self.take()
+        return self.power()
+
+    def power(self):
+        base = self.postfix()
+        if self.peek() == "^":
+            self.take()
+            exp = self.unary()
+            if not (base.is_const and exp.is_const and exp.b.denominator == 1 and 0 <= exp.b <= 10):
+                raise _Unsupported("only small whole-number powers of numbers")
+            result = base.b ** int(exp.b)
+            self.steps.append(f"{_fmt(base.b)}^{_fmt(exp.b)} = {_fmt(result)}")
+            return _Lin(0, result)
+        return base
+
+    def postfix(self):
+        value = self.primary()
+        if self.peek() == "%":
+            self.take()
+            if not value.is_const:
+                raise _Unsupported("percent of a variable")
+            self.kinds.add("percentage")
+            result = value.b / 100
+            self.steps.append(f"{_fmt(value.b)}% means {_fmt(value.b)}/100 = {_fmt(result)}")
+            return _Lin(0, result)
+        return value
+
+    def primary(self):
+        tok = self.peek()
+        if tok is None:
+            raise _Unsupported("unexpected end")
+        if tok == "(":
+            self.take()
+            value = self.expr()
+            self.take(")")
+            return value
+        if tok == self.var:
+            self.take()
+            return _Lin(1, 0)
+        if tok[0].isdigit():
+            self.take()
+            return _Lin(0, Fraction(tok))
+        raise _Unsupported(f"unexpected token {tok!r}")
+
+    def _combine(self, left, op, right):
+        var = self.var
+        if op in ("+", "-"):
+            sign = 1 if op == "+" else -1
+            result = _Lin(left.a + sign * right.a, left.b + sign * right.b)
+            if left.is_const and right.is_const:
+                self.steps.append(f"{_fmt(left.b)} {op} {_fmt(right.b)} = {_fmt(result.b)}")
+            return result
+
+        if op in ("*", "of"):
+            if not left.is_const and not right.is_const:
+                raise _Unsupported("not linear")
+            k, lin = (left.b, right) if left.is_const else (right.b, left)
+            result = _Lin(k * lin.a, k * lin.b)
+            if left.is_const and right.is_const:
+                if op == "of":
+                    self.kinds.add("fraction")
+                    self.steps.append(
+                        f"{_fmt(left.b)} of {_fmt(right.b)} means {_fmt(left.b)} × {_fmt(right.b)} = {_fmt(result.b)}"
+                    )
+                else:
+                    self.steps.append(f"{_fmt(left.b)} × {_fmt(right.b)} = {_fmt(result.b)}")
+            elif not (lin.b == 0 and (k == 1 or lin.a == 1)):
+                self.steps.append(f"Multiply out: {_fmt(k)} × ({_fmt_lin(lin, var)}) = {_fmt_lin(result, var)}")
+            return result
+
+        # Division
+        if not right.is_const or right.b == 0:
+            raise _Unsupported("division by a variable or zero")
+        result = _Lin(left.a / right.b, left.b / right.b)
+        if left.is_const:
+            if left.b.denominator == 1 and right.b.denominator == 1 and result.b.denominator != 1:
+                self.kinds.add("fraction")
+            self.steps.append(f"{_fmt(left.b)} ÷ {_fmt(right.b)} = {_fmt(result.b)}")
+        return result
+
+
+def _normalize(text: str) -> str:
+    text = text.strip().lower()
+    text = text.replace("×", "*").replace("÷", "/").replace("−", "-").replace("–", "-")
+    text = text.replace("percent", "%")
+    text = LEAD_WORDS.sub("", text)
+    text = TRAIL_WORDS.sub("", text)
+    return text
+
+
+def _tokenize(text: str):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            return None
+        tokens.append(m.group(1))
+        pos = m.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return tokens
+
+
+def _find_variable(tokens):
+    letters = {t for t in tokens if len(t) == 1 and t.isalpha()}
+    if len(letters) > 1:
+        return None, False
+    return (letters.pop() if letters else None), True
+
+
+def _parse_side(tokens, var):
+    p = _Parser(tokens, var)
+    value = p.expr()
+    if p.peek() is not None:
+        raise _Unsupported(f"trailing token {p.peek()!r}")
+    return value, p
+
+
+def _solve_equation(left_tokens, right_tokens, var):
+    left, lp = _parse_side(left_tokens, var)
+    right, rp = _parse_side(right_tokens, var)
+
+    a = left.a - right.a
+    if a == 0:
+        # No solution or every number works — let the model explain that case
+        return None
+
+    steps = lp.steps + rp.steps
+    steps.append(f"Start with: {_fmt_lin(left, var)} = {_fmt_lin(right, var)}")
+
+    cur_left = _Lin(left.a, left.b)
+    cur_right = _Lin(right.a, right.b)
+
+    if cur_right.a != 0:
+        move = _Lin(cur_right.a, 0)
+        verb = "Subtract" if move.a > 0 else "Add"
+        cur_left = _Lin(cur_left.a - move.a, cur_left.b)
+        cur_right = _Lin(0, cur_right.b)
+        steps.append(
+            f"{verb} {_fmt_lin(_Lin(abs(move.a), 0), var)} on both sides: "
+            f"{_fmt_lin(cur_left, var)} = {_fmt(cur_right.b)}"
+        )
+
+    if cur_left.b != 0:
+        verb = "Subtract" if cur_left.b > 0 else "Add"
+        amount = abs(cur_left.b)
+        cur_right = _Lin(0, cur_right.b - cur_left.b)
+        cur_left = _Lin(cur_left.a, 0)
+        steps.append(
+            f"{verb} {_fmt(amount)} on both sides: {_fmt_lin(cur_left, var)} = {_fmt(cur_right.b)}"
+        )
+
+    solution = cur_right.b / cur_left.a
+    if cur_left.a != 1:
+        steps.append(f"Divide both sides by {_fmt(cur_left.a)}: {var} = {_fmt(solution)}")
+
+    check_left = left.a * solution + left.b
+    check_right = right.a * solution + right.b
+    check = f"Put {var} = {_fmt(solution)} back in: left side = {_fmt(check_left)}, right side = {_fmt(check_right)} ✓"
+
+    return {
+        "kind": "linear_equation",
+        "answer": f"{var} = {_fmt(solution)}",
+        "value": solution,
+        "steps": steps,
+        "check": check,
+        "coeffs": (a, right.b - left.b),
+        "var": var,
+    }
+
+
+def _solve_expression(tokens):
+    value, p = _parse_side(tokens, None)
+    if not p.steps:
+        # A bare number is not a question
+        return None
+    if "percentage" in p.kinds:
+        kind = "percentage"
+    elif "fraction" in p.kinds:
+        kind = "fraction"
+    else:
+        kind = "arithmetic"
+    return {
+        "kind": kind,
+        "answer": _fmt(value.b),
+        "value": value.b,
+        "steps": p.steps,
+        "check": "",
+    }
+
+
+def parse_problem(text: str):
+    """Parse and solve a homework question. Returns a solution dict or None."""
+    if not text or len(text) > 200:
+        return None
+
+    norm = _normalize(text)
+    tokens = _tokenize(norm)
+    if not tokens:
+        return None
+
+    var, ok = _find_variable(tokens)
+    if not ok:
+        return None
+
+    try:
+        if "=" in tokens:
+            if tokens.count("=") != 1 or var is None:
+                return None
+            eq = tokens.index("=")
+            return _solve_equation(tokens[:eq], tokens[eq + 1:], var)
+        if var is not None:
+            return None
+        return _solve_expression(tokens)
+    except (_Unsupported, ZeroDivisionError):
+        return None
+
+
+# ---- Rendering in the same 5-section format build_system_prompt asks for ----
+CONCEPTS = {
+    "linear_equation": (
+        "An equation is like a balance. Whatever we do to one side, we do to the other side, "
+        "until the letter is alone.",
+        ["Move the letter terms to one side.", "Move the plain numbers to the other side.",
+         "Divide to get the letter on its own.", "Check by putting the answer back in."],
+        ["Changing only one side of the equation.", "Forgetting to flip the sign when moving a term across."],
+    ),
+    "fraction": (
+        "A fraction shows a part of a whole. \"1/4 of 8\" means split 8 into 4 equal parts and take 1 part.",
+        ["Write \"of\" as multiply.", "Multiply the numbers.", "Simplify the answer."],
+        ["Adding the top and bottom numbers instead of multiplying.", "Forgetting to simplify the fraction."],
+    ),
+    "percentage": (
+        "Percent means \"out of 100\". 20% is the same as 20/100.",
+        ["Change the percent into a fraction over 100.", "Multiply by the amount.", "Simplify the answer."],
+        ["Forgetting to divide by 100.", "Finding the percent of the wrong number."],
+    ),
+    "arithmetic": (
+        "Work out brackets first, then × and ÷, then + and − (left to right).",
+        ["Look for brackets.", "Do × and ÷ next.", "Finish with + and −."],
+        ["Working strictly left to right and ignoring × before +.", "Dropping a minus sign."],
+    ),
+}
+
+
+def _quick_check(result) -> str:
+    kind = result["kind"]
+    if kind == "linear_equation":
+        var = result["var"]
+        x = result["value"] + 1
+        a = result["coeffs"][0] if result["coeffs"][0] > 0 else -result["coeffs"][0]
+        return f"Try this one: solve {_fmt(a)}{var} + 3 = {_fmt(a * x + 3)}"
+    if kind == "fraction":
+        return "Try this one: what is 1/3 of 12?"
+    if kind == "percentage":
+        return "Try this one: what is 10% of 70?"
+    return "Try this one: what is 6 + 4 × 2?"
+
+
+def render_solution(result, grade_label: str) -> str:
+    """Format a parsed solution as markdown in the tutor's 5-section format."""
+    from_grade = 0 if grade_label == "Kindergarten" else int(str(grade_label).split()[-1])
+    concept, plan, mistakes = CONCEPTS[result["kind"]]
+
+    lines = ["### 1) Concept Snapshot", concept, "", "### 2) Plan / Method"]
+    lines += [f"{i}. {step}" for i, step in enumerate(plan, start=1)]
+    lines += ["", "### 3) Step-by-step Solution"]
+    steps = list(result["steps"])
+    if result["check"]:
+        steps.append(result["check"])
+    lines += [f"{i}. {step}" for i, step in enumerate(steps, start=1)]
+    lines += ["", f"**Answer:** {result['answer']}", ""]
+
+    # Very young learners skip the mistakes section
+    if from_grade > 2:
+        lines += ["### 4) Common Mistakes"]
+        lines += [f"- {m}" for m in mistakes]
+        lines += [""]
+
+    lines += ["### 5) Quick Check Question", _quick_check(result)]
+    return "\n".join(lines)
+
+
+def solve_locally(text: str, grade_label: str):
+    """
+    Try to answer a homework question without the model.
+
+    Returns dict {"kind", "answer", "lesson_text"} or None if the question
+    is not simple enough to solve locally.
+    """
+    result = parse_problem(text)
+    if result is None:
+        return None
+    return {
+        "kind": result["kind"],
+        "answer": result["answer"],
+        "lesson_text": render_solution(result, grade_label),
+    }
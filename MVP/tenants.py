@@ -0,0 +1,288 @@
+"""
+Per-school storage: each school's progress, help requests and tutors live
+together on one shard, so a school's dashboards only ever read its own rows.
+
+    records = get_tenant_backend("lincoln-high")
+    records.append("progress", {...})      # -> "lincoln-high/progress" on its shard
+    records.rows("help_requests")
+
+Shards are named in SLP_SHARDS (default "shard0") and use the configured
+SLP_BACKEND:
+
+    local   tenants/<shard>/<school>/<table>.csv
+    sqlite  <SLP_SQLITE_PATH stem>-<shard>.db
+    redis   SLP_REDIS_URL_<SHARD> (falls back to SLP_REDIS_URL)
+    journal <SLP_JOURNAL_DIR>-<shard>/
+
+Where each school lives is kept in an append-only "shard_map" table in the
+shared store (get_backend()); a school's latest row wins. A new school is
+placed by rendezvous hashing its ID over SLP_SHARDS, so replicas that see
+the same new school at once agree on where it goes. Adding a shard moves
+nobody by itself — use "rebalance" to move schools onto it.
+
+The "default" school (no school code given) stays in the shared store,
+next to the archive and everything written before sharding.
+
+Moving a school:
+  1. mark it moving: writes on every replica fail fast with SchoolMoving
+     (the page asks the user to try again in a minute) instead of tying up
+     the script thread,
+  2. wait MAP_TTL so every replica has seen that,
+  3. copy its tables to the new shard (holding a local shard's table locks,
+     so archive.py can't swap a CSV mid-copy) and point the map there,
+  4. wait MAP_TTL again, then drop the old copy.
+Run moves from one admin process at a time:
+
+    python tenants.py status                 # schools, shards and row counts
+    python tenants.py plan                   # moves that would even out the shards
+    python tenants.py rebalance              # ...and run them
+    python tenants.py move <school> <shard>
+"""
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from functools import lru_cache
+
+from backend import LocalBackend, RedisBackend, SQLiteBackend, get_backend
+
+DEFAULT_SCHOOL = "default"
+TENANT_TABLES = ("progress", "help_requests", "tutors")
+TENANT_DIR = "tenants"
+MAP_TABLE = "shard_map"
+MAP_TTL = 5              # seconds a replica may route with a cached shard map
+REBALANCE_SLACK = 0.1    # plan() stops once the busiest shard is within 10% of the mean
+
+
+class SchoolMoving(RuntimeError):
+    """A write to a school whose tables are being copied to another shard."""
+
+
+def school_id(text) -> str:
+    """A school code as a safe ID (it ends up in file and key names)."""
+    cleaned = re.sub(r"[^a-z0-9_-]+", "-", str(text or "").strip().lower()).strip("-")
+    return cleaned[:64] or DEFAULT_SCHOOL
+
+
+def shard_names():
+    return [s.strip() for s in os.getenv("SLP_SHARDS", "shard0").split(",") if s.strip()]
+
+
+def open_shard(shard):
+    """Backend for one shard, of the same kind as the shared backend."""
+    kind = os.getenv("SLP_BACKEND", "local").lower()
+    if kind == "sqlite":
+        stem, ext = os.path.splitext(os.getenv("SLP_SQLITE_PATH", "slp.db"))
+        return SQLiteBackend(f"{stem}-{shard}{ext or '.db'}")
+    if kind == "redis":
+        import redis
+        url = os.getenv(f"SLP_REDIS_URL_{shard.upper()}") or os.getenv("SLP_REDIS_URL", "redis://localhost:6379/0")
+        return RedisBackend(redis.Redis.from_url(url))
+    if kind == "journal":
+        from journal import JournalBackend
+        return JournalBackend(f"{os.getenv('SLP_JOURNAL_DIR', 'journal')}-{shard}")
+    return LocalBackend(os.path.join(TENANT_DIR, shard))
+
+
+def place(school, shards):
+    """Rendezvous hashing: the shard with the highest hash of (shard, school)."""
+    return max(shards, key=lambda s: hashlib.blake2b(f"{s}|{school}".encode("utf-8"), digest_size=8).digest())
+
+
+class ShardRouter:
+    def __init__(self, base=None, shards=None, opener=open_shard):
+        self.base = base or get_backend()
+        self.shards = list(shards or shard_names())
+        self._open = opener
+        self._stores = {}
+        self._map, self._loaded_at = {}, 0.0
+        self._lock = threading.Lock()
+
+    def store(self, shard):
+        with self._lock:
+            if shard not in self._stores:
+                self._stores[shard] = self._open(shard)
+            return self._stores[shard]
+
+    def shard_map(self, fresh=False):
+        """school -> its latest map row, re-read at most every MAP_TTL seconds."""
+        if fresh or time.time() - self._loaded_at > MAP_TTL:
+            latest = {}
+            for row in self.base.rows(MAP_TABLE):
+                latest[row["school"]] = row
+            self._map, self._loaded_at = latest, time.time()
+        return self._map
+
+    def _record(self, school, shard, moving_to=""):
+        self.base.append(MAP_TABLE, {
+            "school": school, "shard": shard, "moving_to": moving_to,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        self.shard_map(fresh=True)
+
+    def locate(self, school, for_write=False):
+        """The shard holding school. Writes register new schools and raise SchoolMoving during a move."""
+        entry = self.shard_map().get(school) or self.shard_map(fresh=True).get(school)
+        if entry is None:
+            shard = place(school, self.shards)
+            if for_write:
+                self._record(school, shard)
+            return shard
+        if for_write and entry.get("moving_to"):
+            raise SchoolMoving(f"school {school!r} is being moved to another shard; try again shortly")
+        return entry["shard"]
+
+    def schools(self):
+        return sorted(self.shard_map(fresh=True))
+
+    def status(self):
+        """Per school: shard and row count per table."""
+        return [
+            {"school": school, "shard": self.locate(school),
+             **{table: TenantBackend(school, self).count(table) for table in TENANT_TABLES}}
+            for school in self.schools()
+        ]
+
+    def plan(self):
+        """Moves (school, from, to) that drain unlisted shards and even out rows per shard."""
+        sizes, where = {}, {}
+        for row in self.status():
+            sizes[row["school"]] = sum(row[t] for t in TENANT_TABLES)
+            where[row["school"]] = row["shard"]
+        load = {shard: 0 for shard in self.shards}
+        for school, n in sizes.items():
+            load[where[school]] = load.get(where[school], 0) + n
+        moves = []
+
+        def move(school, target):
+            moves.append((school, where[school], target))
+            load[where[school]] -= sizes[school]
+            load[target] += sizes[school]
+            where[school] = target
+
+        # Schools on shards no longer in SLP_SHARDS go first
+        for school in sorted(sizes, key=sizes.get, reverse=True):
+            if where[school] not in self.shards:
+                move(school, min(self.shards, key=load.get))
+        mean = sum(load.values()) / len(self.shards)
+        while True:
+            heavy = max(self.shards, key=load.get)
+            light = min(self.shards, key=load.get)
+            gap = load[heavy] - load[light]
+            if load[heavy] <= mean * (1 + REBALANCE_SLACK):
+                break
+            # The biggest school that still narrows the gap
+            candidates = [s for s in sizes if where[s] == heavy and 0 < sizes[s] < gap]
+            if not candidates:
+                break
+            move(max(candidates, key=sizes.get), light)
+        return moves
+
+    def move(self, school, target, pause=None):
+        """Move one school's tables to target. Returns rows copied."""
+        pause = MAP_TTL + 1 if pause is None else pause
+        if school == DEFAULT_SCHOOL:
+            raise ValueError("the default school lives in the shared store and is not moved")
+        if target not in self.shards:
+            raise ValueError(f"unknown shard {target!r} (SLP_SHARDS is {','.join(self.shards)})")
+        source = self.locate(school)
+        if source == target:
+            return 0
+        self._record(school, source, moving_to=target)
+        time.sleep(pause)
+        src, dst = self.store(source), self.store(target)
+        copied = 0
+        try:
+            for table in TENANT_TABLES:
+                name = f"{school}/{table}"
+                with src.locked(name) if isinstance(src, LocalBackend) else nullcontext():
+                    rows = src.rows(name)
+                    dst.replace(name, rows)
+                copied += len(rows)
+        except Exception:
+            self._record(school, source)      # unfreeze where it was
+            raise
+        self._record(school, target)
+        time.sleep(pause)                     # nobody reads the old copy any more
+        for table in TENANT_TABLES:
+            src.replace(f"{school}/{table}", [])
+        return copied
+
+
+class TenantBackend:
+    """One school's record tables on its shard. Cache and counters stay on the shared backend."""
+
+    def __init__(self, school, router):
+        self.school = school
+        self.router = router
+
+    def shard_table(self, table, write=False):
+        """(shard backend, table name on it) for one of this school's tables."""
+        return self.router.store(self.router.locate(self.school, for_write=write)), f"{self.school}/{table}"
+
+    def append(self, table, record):
+        store, name = self.shard_table(table, write=True)
+        return store.append(name, record)
+
+    def rows(self, table, start=0, limit=None):
+        store, name = self.shard_table(table)
+        return store.rows(name, start, limit)
+
+    def update(self, table, index, fields):
+        store, name = self.shard_table(table, write=True)
+        store.update(name, index, fields)
+
+    def count(self, table):
+        store, name = self.shard_table(table)
+        return store.count(name)
+
+    def version(self, table):
+        shard = self.router.locate(self.school)
+        return f"{shard}:{self.router.store(shard).version(f'{self.school}/{table}')}"
+
+    def get(self, key):
+        return self.router.base.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.router.base.set(key, value, ttl=ttl)
+
+    def incr(self, key, amount=1, ttl=None):
+        return self.router.base.incr(key, amount, ttl=ttl)
+
+
+@lru_cache(maxsize=1)
+def get_shard_router():
+    return ShardRouter()
+
+
+@lru_cache(maxsize=1024)
+def get_tenant_backend(school=DEFAULT_SCHOOL):
+    """Record store for a school; the default school uses the shared backend itself."""
+    school = school_id(school)
+    if school == DEFAULT_SCHOOL:
+        return get_backend()
+    return TenantBackend(school, get_shard_router())
+
+
+if __name__ == "__main__":
+    router = get_shard_router()
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "status":
+        for row in router.status():
+            print("  ".join(f"{k}={v}" for k, v in row.items()))
+    elif command in ("plan", "rebalance"):
+        moves = router.plan()
+        for school, source, target in moves:
+            print(f"{school}: {source} -> {target}")
+            if command == "rebalance":
+                print(f"  copied {router.move(school, target)} rows")
+        if not moves:
+            print("shards are balanced")
+    elif command == "move" and len(sys.argv) == 4:
+        print(f"copied {router.move(school_id(sys.argv[2]), sys.argv[3])} rows")
+    else:
+        print("usage: python tenants.py [status|plan|rebalance|move <school> <shard>]")
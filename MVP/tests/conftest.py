@@ -0,0 +1,5 @@
+"""Tests import the app modules from the MVP folder, e.g. `python -m pytest -q` run there."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
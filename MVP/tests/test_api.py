@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+from api import Api, ApiError, encode_cursor
+from backend import SQLiteBackend
+
+AUTH = {b"authorization": b"Bearer secret"}
+
+
+class CountingStore(SQLiteBackend):
+    """Counts version() reads, to check one response reads it once."""
+
+    versions = 0
+
+    def version(self, table):
+        self.versions += 1
+        return super().version(table)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = CountingStore(str(tmp_path / "slp.db"))
+    monkeypatch.setattr(api, "get_tenant_backend", lambda school: store)
+    for n in range(5):
+        store.append("progress", {"student": "ann", "score": str(n)})
+        store.append("progress", {"student": "bob", "score": str(10 + n)})
+    return store
+
+
+def get(server, path, query=b"", headers=AUTH):
+    """One request through the ASGI app: (status, headers, json body or None)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query,
+             "headers": list(headers.items())}
+    asyncio.run(server(scope, receive, send))
+    body = sent[1]["body"]
+    return sent[0]["status"], dict(sent[0]["headers"]), json.loads(body) if body else None
+
+
+def test_pages_follow_the_cursor_to_the_end(store):
+    server = Api(token="secret")
+    seen, cursor = [], ""
+    while True:
+        query = b"limit=2" + (b"&cursor=" + cursor.encode() if cursor else b"")
+        status, _, body = get(server, "/v1/students/ann/progress", query)
+        assert status == 200 and len(body["items"]) <= 2
+        seen += [item["score"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["0", "1", "2", "3", "4"]
+
+
+def test_rows_written_later_do_not_shift_a_page(store):
+    server = Api(token="secret")
+    _, _, first = get(server, "/v1/students/ann/progress", b"limit=2")
+    store.append("progress", {"student": "ann", "score": "5"})
+    _, _, second = get(server, "/v1/students/ann/progress", b"limit=2&cursor=" + first["next_cursor"].encode())
+    assert [item["score"] for item in second["items"]] == ["2", "3"]
+
+
+def test_if_none_match_gets_a_304_until_the_table_changes(store):
+    server = Api(token="secret")
+    status, headers, _ = get(server, "/v1/students/ann/progress")
+    etag = headers[b"etag"]
+    status, _, body = get(server, "/v1/students/ann/progress", headers={**AUTH, b"if-none-match": etag})
+    assert (status, body) == (304, None)
+    assert server.stats["not_modified"] == 1
+
+    store.append("progress", {"student": "ann", "score": "5"})
+    status, headers, body = get(server, "/v1/students/ann/progress", headers={**AUTH, b"if-none-match": etag})
+    assert status == 200 and headers[b"etag"] != etag
+    assert len(body["items"]) == 6
+
+
+def test_a_render_reads_the_version_once(store):
+    server = Api(token="secret")
+    store.versions = 0
+    status, etag, _ = server.render("/v1/students/ann/progress", b"")
+    assert status == 200 and store.versions == 1
+    assert server.lookup("GET", "/v1/students/ann/progress", b"", AUTH) == (200, etag, server._cache[etag])
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor!!", encode_cursor(["2024-01-01", "key"])[:5]])
+def test_bad_cursors_are_a_400(store, cursor):
+    server = Api(token="secret")
+    status, _, body = get(server, "/v1/students/ann/progress", b"cursor=" + cursor.encode())
+    assert status == 400 and "cursor" in body["error"]
+
+
+def test_a_cursor_from_another_list_is_a_400(store):
+    store.append("help_requests", {"student": "ann", "time": "2024-01-01 10:00", "message": "help"})
+    store.append("help_requests", {"student": "ann", "time": "2024-01-02 10:00", "message": "again"})
+    server = Api(token="secret")
+    _, _, body = get(server, "/v1/students/ann/help-requests", b"limit=1")
+    status, _, body = get(server, "/v1/students/ann/progress", b"cursor=" + body["next_cursor"].encode())
+    assert status == 400
+
+
+@pytest.mark.parametrize("path, query, headers, status", [
+    ("/v1/students/ann/progress", b"", {}, 401),
+    ("/v1/students/ann/grades", b"", AUTH, 404),
+    ("/v1/students/ann/progress", b"limit=0", AUTH, 400),
+    ("/v1/students/ann/progress", b"limit=lots", AUTH, 400),
+    ("/healthz", b"", {}, 200),
+])
+def test_errors(store, path, query, headers, status):
+    assert get(Api(token="secret"), path, query, headers)[0] == status
+
+
+def test_no_token_configured_is_a_503(store):
+    with pytest.raises(ApiError) as error:
+        Api(token="").lookup("GET", "/v1/students/ann/progress", b"", AUTH)
+    assert error.value.status == 503
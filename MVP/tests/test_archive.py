@@ -0,0 +1,159 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import archive
+from backend import LocalBackend
+
+pytest.importorskip("pyarrow")
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = LocalBackend(str(tmp_path))
+    monkeypatch.setattr(archive, "get_backend", lambda: store)
+    return store
+
+
+def progress_rows():
+    rows = []
+    for n, date in enumerate(["2025-12-03 09:00", "2026-01-10 10:30", "2026-01-20 16:45", "2026-02-25 08:15",
+                              "2026-02-28 19:00"]):
+        rows.append({"student": f"s{n % 2}", "grade": f"Grade {3 + n % 2}", "topic": "fractions",
+                     "score": n, "comment": "ok, \"quoted\"", "date": date})
+    return rows
+
+
+def as_strings(df):
+    df = df.assign(date=pd.to_datetime(df["date"]).dt.strftime(archive.DATE_FORMAT))
+    return df[["student", "grade", "topic", "score", "date"]].astype(str).sort_values("date").reset_index(drop=True)
+
+
+def test_round_trip(store):
+    rows = progress_rows()
+    for row in rows:
+        store.append("progress", row)
+
+    assert archive.compact("progress", keep_days=30, now=NOW) == 3
+    assert archive.archived_rows("progress") == 3
+    assert [r["date"] for r in store.rows("progress")] == ["2026-02-25 08:15", "2026-02-28 19:00"]
+    assert len(os.listdir("archive/progress/month=2026-01")) == 2      # one partition per grade
+
+    archived = archive.query_archive("progress")
+    pd.testing.assert_frame_equal(as_strings(archived), as_strings(pd.DataFrame(rows[:3])))
+    assert set(archived["comment"]) == {"ok, \"quoted\""}
+    # Everything reads back, archived and hot, as before compaction
+    pd.testing.assert_frame_equal(as_strings(archive.load_history("progress")), as_strings(pd.DataFrame(rows)))
+    # A month range opens only the matching partitions
+    january = archive.query_archive("progress", start=datetime(2026, 1, 1), end=datetime(2026, 2, 1))
+    assert sorted(january["score"]) == [1, 2]
+    assert archive.list_students("progress") == ["s0", "s1"]
+    # Nothing left to move
+    assert archive.compact("progress", keep_days=30, now=NOW) == 0
+
+
+def test_progress_keeps_row_order(store):
+    rows = progress_rows()
+    rows[1]["date"] = "2026-02-27 10:00"           # a recent row early on stops the old prefix there
+    for row in rows:
+        store.append("progress", row)
+    assert archive.compact("progress", keep_days=30, now=NOW) == 1
+    assert [r["score"] for r in store.rows("progress")] == ["1", "2", "3", "4"]
+
+
+def test_crash_before_swap_is_rolled_back(store, monkeypatch):
+    rows = progress_rows()
+    for row in rows:
+        store.append("progress", row)
+    replace = os.replace
+
+    def crash_on_swap(src, dst):
+        if dst.endswith("progress.csv"):
+            raise OSError("killed")
+        replace(src, dst)
+
+    monkeypatch.setattr(archive.os, "replace", crash_on_swap)
+    with pytest.raises(OSError):
+        archive.compact("progress", keep_days=30, now=NOW)
+    monkeypatch.setattr(archive.os, "replace", replace)
+
+    # Half-written archive files stay hidden and the hot CSV still has every row
+    assert archive.archived_rows("progress") == 0
+    assert archive.query_archive("progress").empty
+    assert len(store.rows("progress")) == 5
+
+    assert archive.compact("progress", keep_days=30, now=NOW) == 3
+    pd.testing.assert_frame_equal(as_strings(archive.load_history("progress")), as_strings(pd.DataFrame(rows)))
+
+
+def test_crash_after_swap_is_finished(store, monkeypatch):
+    rows = progress_rows()
+    for row in rows:
+        store.append("progress", row)
+    finish, calls = archive._finish, []
+
+    def crash_after_swap(table, archive_dir):
+        calls.append(table)
+        if len(calls) == 2:
+            raise OSError("killed")
+        finish(table, archive_dir)
+
+    monkeypatch.setattr(archive, "_finish", crash_after_swap)
+    with pytest.raises(OSError):
+        archive.compact("progress", keep_days=30, now=NOW)
+    monkeypatch.setattr(archive, "_finish", finish)
+
+    assert archive.archived_rows("progress") == 3
+    assert len(store.rows("progress")) == 2
+    assert archive.compact("progress", keep_days=30, now=NOW) == 0   # makes the moved rows visible
+    pd.testing.assert_frame_equal(as_strings(archive.load_history("progress")), as_strings(pd.DataFrame(rows)))
+
+
+def test_only_resolved_help_requests_are_archived(store):
+    for n, status in enumerate(["Resolved", "Open", "Resolved"]):
+        store.append("help_requests", {"student": f"s{n}", "grade": "Grade 4", "subject": "Math", "mode": "lesson",
+                                       "topic": "area", "message": "help", "time": f"2026-01-0{n + 1} 10:00",
+                                       "status": status})
+    assert archive.compact("help_requests", keep_days=30, now=NOW) == 2
+    assert [r["status"] for r in store.rows("help_requests")] == ["Open"]
+    assert sorted(archive.query_archive("help_requests")["student"].astype(str)) == ["s0", "s2"]
+
+
+@pytest.fixture
+def school(store, tmp_path):
+    from tenants import ShardRouter, TenantBackend
+    router = ShardRouter(base=store, shards=["a", "b"], opener=lambda shard: LocalBackend(str(tmp_path / shard)))
+    router._record("lincoln", "a")
+    return TenantBackend("lincoln", router)
+
+
+def test_a_school_is_compacted_into_its_own_archive(school):
+    rows = progress_rows()
+    for row in rows:
+        school.append("progress", row)
+
+    assert archive.compact("progress", keep_days=30, now=NOW, backend=school) == 3
+    assert archive.archive_dir_for(school) == os.path.join("archive", "schools", "lincoln")
+    assert archive.archived_rows("progress", archive.archive_dir_for(school)) == 3
+    assert archive.archived_rows("progress") == 0                  # the shared store's archive is untouched
+    assert len(school.rows("progress")) == 2
+    pd.testing.assert_frame_equal(as_strings(archive.load_history("progress", backend=school)),
+                                  as_strings(pd.DataFrame(rows)))
+
+    # The archive belongs to the school, not the shard, so it follows a move
+    school.router.move("lincoln", "b", pause=0)
+    assert len(archive.load_history("progress", backend=school)) == 5
+    assert archive.list_students("progress", backend=school) == ["s0", "s1"]
+
+
+def test_a_school_being_moved_is_left_alone(school):
+    for row in progress_rows():
+        school.append("progress", row)
+    school.router._record("lincoln", "a", moving_to="b")
+    assert archive.compact("progress", keep_days=30, now=NOW, backend=school) == 0
+    assert school.count("progress") == 5
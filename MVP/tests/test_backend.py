@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+import backend
+from backend import LocalBackend, MemoryKV, RedisBackend, SQLiteBackend
+from journal import JournalBackend
+
+
+@pytest.fixture(params=["local", "sqlite", "redis", "journal"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    if request.param == "local":
+        return LocalBackend(str(tmp_path))
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "slp.db"))
+    if request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        return RedisBackend(fakeredis.FakeRedis())
+    return JournalBackend(str(tmp_path / "journal"))
+
+
+def test_incr_counts_from_zero(store):
+    assert store.incr("rate:ann") == 1
+    assert store.incr("rate:ann") == 2
+    assert store.incr("rate:ann", 5) == 7
+    assert int(store.get("rate:ann")) == 7
+    assert store.incr("rate:bob") == 1
+
+
+def test_set_get_and_missing_keys(store):
+    assert store.get("lesson") is None
+    store.set("lesson", "text")
+    assert store.get("lesson") == "text"
+    store.set("lesson", "new text")
+    assert store.get("lesson") == "new text"
+
+
+def test_ttl_expires_values_and_counters(store):
+    store.set("cache", "text", ttl=1)
+    assert store.incr("window", ttl=1) == 1
+    store.set("forever", "text")
+    time.sleep(0.6)
+    # A fixed window: later increments don't push the expiry back
+    assert store.incr("window", ttl=1) == 2
+    time.sleep(0.6)
+    assert store.get("cache") is None
+    assert store.get("window") is None
+    assert store.incr("window", ttl=1) == 1        # a new window starts from zero
+    assert store.get("forever") == "text"
+
+
+def test_rows_append_count_and_update(store):
+    for n in range(5):
+        assert store.append("progress", {"student": f"s{n}", "score": str(n)}) == n
+    assert store.count("progress") == 5
+    assert [r["student"] for r in store.rows("progress", 3)] == ["s3", "s4"]
+    assert [r["student"] for r in store.rows("progress", 1, 2)] == ["s1", "s2"]
+    version = store.version("progress")
+    store.update("progress", 2, {"score": "9"})
+    assert store.rows("progress", 2, 1)[0]["score"] == "9"
+    assert store.version("progress") != version
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_kv_drops_expired_keys_on_write(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(backend.time, "time", clock)
+    kv = MemoryKV()
+    for minute in range(100):
+        kv.incr(f"rate:ann:{minute}", ttl=120)   # one key per minute, never read again
+        clock.now += 60
+    assert len(kv) <= 3
+
+
+def test_memory_kv_evicts_oldest_writes_past_max_bytes():
+    kv = MemoryKV(max_bytes=10_000)
+    for n in range(100):
+        kv.set(f"lesson:{n}", "x" * 500)
+    assert kv.get("lesson:0") is None
+    assert kv.get("lesson:99") == "x" * 500
+    assert kv._bytes <= 10_000
+
+
+def test_local_rows_survive_quoted_newlines(tmp_path):
+    store = LocalBackend(str(tmp_path))
+    for n in range(3000):
+        store.append("progress", {"n": str(n), "comment": "line one\nline two" if n % 7 == 0 else "ok"})
+    assert store.count("progress") == 3000
+    assert [r["n"] for r in store.rows("progress", 2047, 3)] == ["2047", "2048", "2049"]
+    assert store.rows("progress", 2996, 1)[0]["comment"] == "line one\nline two"
+    assert [r["n"] for r in store.rows("progress", -2)] == ["2998", "2999"]
+    # A second process sees the same rows
+    assert LocalBackend(str(tmp_path)).rows("progress", 2999)[0]["n"] == "2999"
+
+
+def test_local_reads_stay_consistent_while_another_thread_appends(tmp_path):
+    import threading
+    store = LocalBackend(str(tmp_path))
+    store.append("progress", {"n": "0"})
+    done, errors = threading.Event(), []
+
+    def read():
+        while not done.is_set():
+            rows = store.rows("progress", 0)
+            if [r["n"] for r in rows] != [str(n) for n in range(len(rows))]:
+                errors.append(len(rows))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for n in range(1, 3000):
+        store.append("progress", {"n": str(n)})
+    done.set()
+    for reader in readers:
+        reader.join()
+    assert not errors
+    assert store.count("progress") == 3000
+
+
+def test_redis_counters_get_their_ttl_once():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    store = RedisBackend(client)
+    assert store.incr("rate:ann", ttl=120) == 1
+    assert 0 < client.ttl("slp:rate:ann") <= 120
+    client.expire("slp:rate:ann", 5)
+    assert store.incr("rate:ann", ttl=120) == 2
+    assert client.ttl("slp:rate:ann") <= 5          # the window is not pushed back by later hits
+    assert store.incr("plain") == 1
+    assert client.ttl("slp:plain") == -1
@@ -0,0 +1,129 @@
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, is_outage
+
+
+def test_opens_after_threshold_failures_in_a_row():
+    breaker = CircuitBreaker("m", failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        assert breaker.allow(now=100)
+        breaker.failure(TimeoutError("slow"), now=100)
+    assert breaker.state == CLOSED
+    breaker.success()                          # a success resets the run
+    for _ in range(3):
+        breaker.failure(now=100)
+    assert breaker.state == OPEN
+    assert not breaker.allow(now=129)
+    assert breaker.metrics()["rejected"] == 1
+    assert breaker.metrics()["opened"] == 1
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_seconds=30)
+    breaker.failure(now=100)
+    assert breaker.allow(now=130)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(now=130)          # only one probe at a time
+    breaker.success()
+    assert breaker.state == CLOSED
+    assert breaker.allow(now=131) and breaker.allow(now=131)
+
+
+def test_failed_probe_opens_again():
+    breaker = CircuitBreaker("m", failure_threshold=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.failure(now=100)
+    assert breaker.allow(now=130)
+    breaker.failure(ConnectionError("reset"), now=130)   # one failure is enough in half-open
+    assert breaker.state == OPEN
+    assert not breaker.allow(now=159)
+    assert breaker.allow(now=160)
+    assert breaker.metrics()["opened"] == 2
+    assert breaker.metrics()["last_error"] == "ConnectionError: reset"
+
+
+def test_released_probe_frees_the_slot():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_seconds=30)
+    breaker.failure(now=100)
+    assert breaker.allow(now=130)
+    breaker.release()                          # stream closed before any reply: no verdict
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow(now=130)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    """Named like openai's, which carries no status code."""
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class SubclassedTimeout(APITimeoutError):
+    pass
+
+
+@pytest.mark.parametrize("error, outage", [
+    (StatusError(429), True),
+    (StatusError(500), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (StatusError(404), False),
+    (TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (APITimeoutError(), True),
+    (APIConnectionError(), True),
+    (SubclassedTimeout(), True),
+    (ValueError("bad prompt"), False),
+])
+def test_is_outage(error, outage):
+    assert is_outage(error) is outage
+
+
+class FakeClient:
+    """client.chat.completions.create() that raises the given error for a model."""
+
+    def __init__(self, errors):
+        self.errors, self.calls = errors, []
+        self.chat = self.completions = self
+
+    def create(self, model, **kwargs):
+        self.calls.append(model)
+        if model in self.errors:
+            raise self.errors[model]
+        return f"reply from {model}"
+
+
+@pytest.fixture
+def router(monkeypatch):
+    import breaker
+    from router import Router
+    monkeypatch.setattr(breaker, "_breakers", {})
+    return Router()
+
+
+def test_router_fails_over_on_outage(router):
+    from breaker import get_breaker
+    client = FakeClient({"gpt-4o": StatusError(503)})
+    assert router.complete(client, "Grade 8", "Math", "homework", "lesson", messages=[]) == "reply from gpt-4o-mini"
+    assert client.calls == ["gpt-4o", "gpt-4o-mini"]
+    assert router.failovers == 1
+    assert get_breaker("gpt-4o").failures == 1
+
+
+def test_router_raises_request_errors_without_tripping_the_breaker(router):
+    from breaker import get_breaker
+    client = FakeClient({"gpt-4o": StatusError(400)})
+    for _ in range(10):
+        with pytest.raises(StatusError):
+            router.complete(client, "Grade 8", "Math", "homework", "lesson", messages=[])
+    assert client.calls == ["gpt-4o"] * 10       # another tier would reject it too
+    assert get_breaker("gpt-4o").state == CLOSED
+    assert get_breaker("gpt-4o").failures == 0
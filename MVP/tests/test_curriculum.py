@@ -0,0 +1,49 @@
+import pytest
+
+from curriculum import ContentPack, build
+
+
+def entry(grade, subject, topic):
+    return {"grade": grade, "subject": subject, "topic": topic, "title": f"{topic} ({grade})",
+            "lesson": f"All about {topic}.", "examples": [], "checks": []}
+
+
+@pytest.fixture
+def pack(tmp_path):
+    path = str(tmp_path / "test.pack")
+    build([
+        entry("Kindergarten", "Math", "Counting"),
+        entry("Grade 3", "Science", "Plants"),
+        entry("Grade 4", "Coding", "Loops"),
+        entry("Grade 5", "Science", "Magnets"),
+        entry("Grade 6", "Science", "Cells"),
+    ], path)
+    return ContentPack(path)
+
+
+def test_lessons_are_found_by_grade_subject_and_topic(pack):
+    assert pack.count == 5
+    assert pack.lesson("Grade 4", "Coding", "  LOOPS ")["title"] == "Loops (Grade 4)"
+    assert pack.lesson("Grade 4", "Coding", "Variables") is None
+    assert pack.lesson("Grade 5", "Coding", "Loops") is None
+    assert pack.subjects("Grade 5") == ["Science"]
+    assert pack.topics("Grade 3", "Science") == ["Plants"]
+
+
+def test_nearest_grade_prefers_the_grade_below(pack):
+    assert pack.nearest_grade("Grade 5", "Science") == "Grade 5"
+    assert pack.nearest_grade("Grade 4", "Science") == "Grade 3"
+    assert pack.nearest_grade("Grade 7", "Science") == "Grade 6"
+
+
+def test_nothing_is_borrowed_from_more_than_a_grade_away(pack):
+    assert pack.nearest_grade("Kindergarten", "Coding") is None      # Grade 4 is too far
+    assert pack.nearest_grade("Grade 2", "Math") is None
+    assert pack.nearest_grade("Grade 1", "Math") == "Kindergarten"
+    assert pack.nearest_grade("Grade 9", "Science") is None
+    assert pack.nearest_grade("Kindergarten", "Coding", max_distance=4) == "Grade 4"
+
+
+def test_duplicate_lessons_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        build([entry("Grade 1", "Math", "Counting"), entry("Grade 1", "Math", "counting ")], str(tmp_path / "x"))
@@ -0,0 +1,28 @@
+import json
+
+from fallback import bank_quiz
+
+
+def answer_key(quiz):
+    return [line.split(":")[1].strip() for line in quiz.splitlines() if line[:1].isdigit() and ":" in line]
+
+
+def test_math_quizzes_are_generated_for_the_grade():
+    quiz = bank_quiz("Math", "Grade 4", "fractions", seed=1)
+    assert quiz.startswith("Practice quiz (Math, Grade 4)")
+    assert len(answer_key(quiz)) == 5
+    assert bank_quiz("Math", "Grade 4", "fractions", seed=1) == quiz
+
+
+def test_other_subjects_draw_from_the_bank():
+    with open("assets/quiz_bank.json", encoding="utf-8") as fh:
+        bank = {q["q"] for q in json.load(fh)["Science"]}
+    quiz = bank_quiz("Science", "Grade 6", "plants", seed=2)
+    asked = [line.split(". ", 1)[1] for line in quiz.splitlines() if line.startswith("Q")]
+    assert len(asked) == 5 and set(asked) <= bank
+    assert all(letter in "ABCD" for letter in answer_key(quiz))
+
+
+def test_a_subject_without_enough_bank_questions_gets_no_quiz():
+    assert bank_quiz("English", "Grade 6", "poems") is None
+    assert bank_quiz("History", "Grade 9") is None
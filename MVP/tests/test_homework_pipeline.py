@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+import homework_pipeline
+from homework_pipeline import CancelEvent, Cancelled, commit, pipelined_help, same_question
+
+
+def test_commit_writes_only_while_not_cancelled():
+    cache = {}
+    commit(None, lambda: cache.update(plain=1))
+    cancel = CancelEvent()
+    commit(cancel, lambda: cache.update(first=1))
+    cancel.set()
+    with pytest.raises(Cancelled):
+        commit(cancel, lambda: cache.update(second=1))
+    assert cache == {"plain": 1, "first": 1}
+
+
+def test_a_cancel_waits_for_a_write_in_progress():
+    cancel = CancelEvent()
+    writing, release, order = threading.Event(), threading.Event(), []
+
+    def write():
+        writing.set()
+        release.wait(5)
+        order.append("written")
+
+    writer = threading.Thread(target=commit, args=(cancel, write))
+    writer.start()
+    writing.wait(5)
+    canceller = threading.Thread(target=lambda: (cancel.set(), order.append("cancelled")))
+    canceller.start()
+    time.sleep(0.1)
+    assert not cancel.is_set()                 # set() is blocked behind the write
+    release.set()
+    writer.join()
+    canceller.join()
+    assert order == ["written", "cancelled"]
+
+
+def fake_check(result, question):
+    def check_photo(client, image_bytes, grade_label="", subject="Math", on_question=None):
+        on_question(question)
+        time.sleep(0.2)                        # the verdict arrives while the explanation runs
+        return result
+    return check_photo
+
+
+def test_a_rejected_photo_leaves_nothing_in_the_cache(monkeypatch):
+    cache = {}
+    finished = []
+
+    def explain(question, cancel):
+        try:
+            cancel.wait(5)
+            commit(cancel, lambda: cache.update({question: "answer"}))
+        except Cancelled:
+            finished.append("cancelled")
+            raise
+
+    monkeypatch.setattr(homework_pipeline, "check_photo", fake_check(
+        {"ok": False, "reason": "worksheet", "question_text": ""}, "2x + 1 = 5"))
+    check, answer = pipelined_help(None, b"", "Grade 6", "Math", explain)
+    assert (check["reason"], answer) == ("worksheet", None)
+    time.sleep(0.1)
+    assert finished == ["cancelled"]
+    assert cache == {}
+
+
+def test_the_speculative_answer_is_used_for_the_same_question(monkeypatch):
+    calls = []
+
+    def explain(question, cancel):
+        calls.append(cancel is not None)
+        return f"answer to {question}"
+
+    monkeypatch.setattr(homework_pipeline, "check_photo", fake_check(
+        {"ok": True, "reason": "ok", "question_text": "Solve 2x+1=5."}, "solve 2x + 1 = 5"))
+    check, answer = pipelined_help(None, b"", "Grade 6", "Math", explain)
+    assert check["ok"] and answer == "answer to solve 2x + 1 = 5"
+    assert calls == [True]
+
+
+def test_same_question_ignores_case_spacing_and_punctuation():
+    assert same_question("Solve 3x+4=19.", "solve 3x + 4 = 19")
+    assert not same_question("", "")
+    assert not same_question("3x+4=19", "3x+4=18")
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+import irt
+import responses
+from responses import RECORD, load_items, load_responses, parse_quiz, record_quiz
+
+STUDENTS, ITEMS, PER_STUDENT = 3000, 60, 20
+WRONG_KEY, NO_SIGNAL, TOO_EASY, TOO_HARD = 0, 1, 2, 3
+
+
+def simulate(model_a=True, seed=5):
+    """Responses from a known 2PL model, with one bad question of each kind."""
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(0, 1, STUDENTS)
+    b = rng.uniform(-1.5, 1.5, ITEMS)
+    a = rng.uniform(0.8, 2.0, ITEMS) if model_a else np.ones(ITEMS)
+    a[NO_SIGNAL] = 0.0
+    b[TOO_EASY], b[TOO_HARD] = -4.5, 4.5
+    answer = rng.integers(0, 4, ITEMS)
+    key = answer.copy()
+    key[WRONG_KEY] = (answer[WRONG_KEY] + 1) % 4
+
+    s = np.repeat(np.arange(STUDENTS), PER_STUDENT)
+    i = np.concatenate([rng.choice(ITEMS, PER_STUDENT, replace=False) for _ in range(STUDENTS)])
+    knows = rng.random(len(s)) < 1 / (1 + np.exp(-a[i] * (theta[s] - b[i])))
+    choice = np.where(knows, answer[i], (answer[i] + rng.integers(1, 4, len(s))) % 4)
+    records = np.zeros(len(s), dtype=RECORD)
+    records["student"], records["item"] = s + 1000, i + 1   # ids sort like the indexes
+    records["choice"], records["correct"] = choice, choice == key[i]
+    return records, theta, a, b, answer
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    records, theta, a, b, answer = simulate()
+    return irt.calibrate(records, "2pl"), theta, a, b, answer
+
+
+def test_recovers_abilities_and_item_parameters(fitted):
+    cal, theta, a, b, _ = fitted
+    good = np.arange(ITEMS) > TOO_HARD
+    assert np.corrcoef(cal["theta"], theta)[0, 1] > 0.85
+    assert np.corrcoef(cal["b"][good], b[good])[0, 1] > 0.95
+    assert np.abs(cal["b"][good] - b[good]).mean() < 0.3
+    assert np.corrcoef(cal["a"][good], a[good])[0, 1] > 0.7
+    assert cal["iterations"] < irt.MAX_ITER
+
+
+def test_flags_each_kind_of_bad_question(fitted):
+    cal, answer = fitted[0], fitted[4]
+    flags = irt.flag_items(cal)
+    assert flags["wrong key?"][WRONG_KEY]
+    assert flags["doesn't discriminate"][NO_SIGNAL]
+    assert flags["too easy"][TOO_EASY]
+    assert flags["too hard"][TOO_HARD]
+    assert cal["top_choice"][WRONG_KEY] == answer[WRONG_KEY]    # strong students pick the real answer
+    # ...and (almost) nothing else
+    assert flags["any"][TOO_HARD + 1:].sum() <= 2
+    assert not flags["wrong key?"][TOO_HARD + 1:].any()
+
+
+def test_1pl_fit_keeps_difficulty_order():
+    records, _, _, b, _ = simulate(model_a=False)
+    cal = irt.calibrate(records, "1pl")
+    good = np.arange(ITEMS) > TOO_HARD
+    assert np.all(cal["a"] == 1)
+    assert np.corrcoef(cal["b"][good], b[good])[0, 1] > 0.95
+
+
+def test_item_pool_picks_near_the_target(fitted):
+    cal = fitted[0]
+    meta = {int(item): {"question": f"q{item}", "options": [], "key": "A", "subject": "Math",
+                        "grade": "Grade 4", "topic": "Fractions"} for item in cal["items"]}
+    pool = irt.ItemPool(cal, meta)
+    assert pool.size("Math", "Grade 4", " fractions ") == (~irt.flag_items(cal)["any"]).sum()
+    picked = pool.pick("Math", "Grade 4", "fractions", target=0.0, k=5)
+    assert len(picked) == 5
+    assert all(abs(item["b"]) < 1.0 for item in picked)
+    assert pool.pick("Math", "Grade 4", "decimals") == []
+
+
+QUIZ = """Quiz
+1. What is 1/2 of 10?
+A) 2  B) 5  C) 10  D) 20
+2. What is 3 + 4?
+A) 6
+B) 7
+C) 8
+D) 9
+3. A question without a key
+A) 1  B) 2
+
+Answers
+1: B
+2: B
+"""
+
+
+def test_record_quiz_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(responses, "_known_items", None)
+    assert [q["number"] for q in parse_quiz(QUIZ)] == [1, 2]
+    assert record_quiz("lincoln", "ann", QUIZ, ["B", "C", "A"], "Math", "Grade 4", "Halves  of Numbers",
+                       now=1_700_000_000) == 2
+    assert record_quiz("lincoln", "bob", QUIZ, ["B", "B"], "Math", "Grade 4", "halves of numbers") == 2
+    saved = load_responses()
+    assert list(saved["correct"]) == [1, 0, 1, 1]
+    assert list(saved["choice"]) == [1, 2, 1, 1]
+    assert saved["time"][0] == 1_700_000_000
+    items = load_items()
+    assert len(items) == 2                      # each item's text is written once
+    assert {item["topic"] for item in items.values()} == {"halves of numbers"}
+    # A torn last record (crash mid-write) is ignored
+    with open(responses.RESPONSES_FILE, "ab") as fh:
+        fh.write(b"\x00" * 7)
+    assert len(load_responses()) == 4
@@ -0,0 +1,75 @@
+import json
+import threading
+import time
+
+import pytest
+
+import jobs
+from backend import LocalBackend
+from jobs import JobPool
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.02)
+    monkeypatch.setattr(jobs, "LOST_AFTER", 0.3)
+    return JobPool(store=LocalBackend(str(tmp_path)), max_workers=2, max_pending=4)
+
+
+def wait_for(pool, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = pool.status(job_id)
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job still {job['status']}")
+
+
+def test_a_job_runs_and_its_result_is_stored(pool):
+    job_id = pool.submit("add", lambda a, b: a + b, 2, 3)
+    job = wait_for(pool, job_id)
+    assert job["status"] == "done" and job["result"] == 5 and job["kind"] == "add"
+    assert pool.pending() == 0
+
+
+def test_a_failing_job_records_the_error(pool):
+    def boom():
+        raise ValueError("no network")
+    job = wait_for(pool, pool.submit("boom", boom))
+    assert job["status"] == "failed"
+    assert job["error"] == "ValueError: no network"
+
+
+def test_the_queue_is_bounded(pool):
+    release = threading.Event()
+    ids = [pool.submit("wait", release.wait) for _ in range(4)]
+    assert all(ids)
+    assert pool.submit("wait", release.wait) is None
+    release.set()
+    for job_id in ids:
+        assert wait_for(pool, job_id)["status"] == "done"
+
+
+def test_heartbeats_keep_a_long_job_alive(pool):
+    release = threading.Event()
+    job_id = pool.submit("slow", release.wait)
+    time.sleep(jobs.LOST_AFTER * 2)
+    assert pool.status(job_id)["status"] == "running"
+    release.set()
+    assert wait_for(pool, job_id)["status"] == "done"
+
+
+def test_a_job_whose_heartbeat_stopped_is_lost(pool):
+    stale = {"id": "gone", "kind": "x", "status": "running", "heartbeat": time.time() - 60}
+    pool.store.set("job:gone", json.dumps(stale))
+    assert pool.status("gone")["status"] == "lost"
+    assert pool.status("never-submitted") == {"id": "never-submitted", "status": "missing"}
+
+
+def test_heartbeats_never_put_back_an_unfinished_state(pool):
+    ids = [pool.submit("n", lambda n=n: n) for n in range(4)]
+    for job_id in ids:
+        wait_for(pool, job_id)
+    time.sleep(jobs.HEARTBEAT_SECONDS * 5)
+    assert [pool.status(job_id)["status"] for job_id in ids] == ["done"] * 4
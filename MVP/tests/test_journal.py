@@ -0,0 +1,85 @@
+import glob
+import os
+
+import pytest
+
+from backend import LocalBackend
+from journal import JournalBackend
+
+
+def log_file(path):
+    return sorted(glob.glob(os.path.join(path, "events-*.log")))[-1]
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    path = str(tmp_path / "journal")
+    journal = JournalBackend(path)
+    for n in range(3):
+        journal.append("progress", {"student": f"s{n}", "score": n})
+    journal.close()
+    return path
+
+
+def test_reopen_replays_every_event(journal_dir):
+    journal = JournalBackend(journal_dir)
+    journal.update("progress", 1, {"score": 5})
+    journal.replace("tutors", [{"name": "Ms Lee"}])
+    journal.close()
+    journal = JournalBackend(journal_dir)
+    assert journal.rows("progress") == [{"student": "s0", "score": 0}, {"student": "s1", "score": 5},
+                                        {"student": "s2", "score": 2}]
+    assert journal.rows("tutors") == [{"name": "Ms Lee"}]
+
+
+@pytest.mark.parametrize("damage", ["cut last event", "partial header", "bad checksum"])
+def test_torn_tail_is_dropped_and_the_log_stays_usable(journal_dir, damage):
+    path = log_file(journal_dir)
+    size = os.path.getsize(path)
+    with open(path, "r+b") as fh:
+        if damage == "cut last event":
+            fh.truncate(size - 5)
+        elif damage == "partial header":
+            fh.seek(size)
+            fh.write(b"\x01\x02\x03")
+        else:
+            fh.seek(size - 1)
+            last = fh.read(1)
+            fh.seek(size - 1)
+            fh.write(bytes([last[0] ^ 0xFF]))
+    journal = JournalBackend(journal_dir)
+    kept = 3 if damage == "partial header" else 2
+    assert [r["student"] for r in journal.rows("progress")] == [f"s{n}" for n in range(kept)]
+    assert journal.stats["dropped_bytes"] > 0
+    # The torn bytes are cut off, so new events follow the last good one
+    assert journal.append("progress", {"student": "new", "score": 1}) == kept
+    journal.close()
+    journal = JournalBackend(journal_dir)
+    assert journal.stats["dropped_bytes"] == 0
+    assert [r["student"] for r in journal.rows("progress")][-1] == "new"
+    assert journal.count("progress") == kept + 1
+
+
+def test_snapshot_then_more_events(journal_dir):
+    journal = JournalBackend(journal_dir)
+    journal.snapshot()
+    journal.append("progress", {"student": "s3", "score": 3})
+    journal.update("progress", 0, {"score": 4})
+    journal.close()
+    assert glob.glob(os.path.join(journal_dir, "snapshot-*.snap"))
+    journal = JournalBackend(journal_dir)
+    assert [r["score"] for r in journal.rows("progress")] == [4, 1, 2, 3]
+
+
+def test_readers_see_another_processs_writes(journal_dir):
+    writer, reader = JournalBackend(journal_dir), JournalBackend(journal_dir)
+    writer.append("progress", {"student": "s3", "score": 3})
+    assert reader.count("progress") == 4
+    assert reader.rows("progress", 3) == [{"student": "s3", "score": 3}]
+
+
+def test_first_start_imports_the_csvs(tmp_path):
+    csvs = LocalBackend(str(tmp_path))
+    csvs.append("progress", {"student": "ann", "score": "4"})
+    journal = JournalBackend(str(tmp_path / "journal"), import_from=str(tmp_path))
+    assert journal.rows("progress") == [{"student": "ann", "score": "4"}]
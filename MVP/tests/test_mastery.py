@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import LocalBackend
+from mastery import P_GUESS, P_INIT, P_LEARN, P_SLIP, MasteryEngine, bkt_update
+
+
+def reference_update(p, correct, total=5):
+    """Textbook BKT: posterior from `correct` of `total` answers, then the learning step."""
+    known = p * (1 - P_SLIP) ** correct * P_SLIP ** (total - correct)
+    unknown = (1 - p) * P_GUESS ** correct * (1 - P_GUESS) ** (total - correct)
+    posterior = known / (known + unknown)
+    return posterior + (1 - posterior) * P_LEARN
+
+
+@pytest.mark.parametrize("p", [0.01, P_INIT, 0.9])
+@pytest.mark.parametrize("correct", range(6))
+def test_update_matches_textbook_formula(p, correct):
+    assert bkt_update(p, correct) == pytest.approx(reference_update(p, correct))
+
+
+def test_more_correct_answers_mean_more_mastery():
+    after = bkt_update(np.full(6, P_INIT), np.arange(6))
+    assert np.all(np.diff(after) > 0)
+    # Even a bad quiz leaves room to learn: never below the learning step
+    assert after.min() >= P_LEARN
+
+
+def test_tiny_probabilities_do_not_underflow():
+    p = 1e-300
+    for _ in range(20):
+        p = bkt_update(p, 0)
+    assert math.isfinite(p) and 0 < p < 1
+
+
+def quizzes():
+    return pd.DataFrame([
+        {"student": "ann", "topic": "fractions", "score": 2, "date": "2026-01-01 10:00"},
+        {"student": "ann", "topic": "fractions", "score": 5, "date": "2026-01-02 10:00"},
+        {"student": "ann", "topic": "area", "score": 5, "date": "2026-01-01 11:00"},
+        {"student": "bob", "topic": "fractions", "score": 0, "date": "2026-01-03 09:00"},
+        {"student": "ann", "topic": "fractions", "score": 4, "date": "2026-01-03 10:00"},
+    ])
+
+
+def test_engine_applies_each_pairs_quizzes_in_date_order():
+    engine = MasteryEngine()
+    engine.update(quizzes().sample(frac=1, random_state=3))
+    table = engine.table()
+    p = P_INIT
+    for score in (2, 5, 4):
+        p = reference_update(p, score)
+    assert table.loc[("ann", "fractions"), "mastery"] == pytest.approx(p)
+    assert table.loc[("ann", "fractions"), "quizzes"] == 3
+    assert table.loc[("ann", "fractions"), "last_quiz"] == "2026-01-03 10:00"
+    assert table.loc[("bob", "fractions"), "mastery"] == pytest.approx(reference_update(P_INIT, 0))
+
+
+def test_next_topic_is_the_weakest_unmastered_one():
+    engine = MasteryEngine()
+    engine.update(pd.DataFrame([
+        {"student": "ann", "topic": "area", "score": 1, "date": "2026-01-01"},
+        {"student": "ann", "topic": "fractions", "score": 3, "date": "2026-01-01"},
+        {"student": "ann", "topic": "decimals", "score": 5, "date": "2026-01-01"},
+        {"student": "ann", "topic": "decimals", "score": 5, "date": "2026-01-02"},
+    ]))
+    assert list(engine.student_mastery("ann")["topic"]) == ["area", "fractions", "decimals"]
+    assert engine.next_topic("ann") == "area"
+    assert engine.next_topic("nobody") is None
+    engine.update(pd.DataFrame([{"student": "ann", "topic": "area", "score": 5, "date": "2026-01-03"}] * 3))
+    assert engine.next_topic("ann") == "fractions"
+
+
+def test_refresh_only_folds_in_new_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = LocalBackend(str(tmp_path))
+    rows = quizzes().to_dict("records")
+    for row in rows[:3]:
+        store.append("progress", row)
+    engine = MasteryEngine().refresh(store)
+    assert engine.rows_seen == 3
+    for row in rows[3:]:
+        store.append("progress", row)
+    engine.refresh(store)
+    assert engine.rows_seen == 5
+    engine.refresh(store)
+    assert engine.rows_seen == 5
+
+    once = MasteryEngine()
+    once.update(quizzes())
+    pd.testing.assert_frame_equal(engine.table().sort_index(), once.table().sort_index(), check_dtype=False)
+
+
+def test_an_engine_follows_the_store_it_was_made_for(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    school, other = LocalBackend(str(tmp_path / "school")), LocalBackend(str(tmp_path / "other"))
+    for row in quizzes().to_dict("records"):
+        school.append("progress", row)
+    other.append("progress", {"student": "zed", "topic": "Angles", "score": "5", "date": "2025-01-01 10:00"})
+    engine = MasteryEngine(school).refresh()
+    assert engine.rows_seen == 5
+    assert "zed" not in set(engine.table().index.get_level_values("student"))
@@ -0,0 +1,84 @@
+import pytest
+
+from backend import SQLiteBackend
+from notes_index import NotesIndex, request_key
+
+
+def resolved(n, message, notes, subject="Math", grade="Grade 5", **fields):
+    return {"student": f"s{n}", "time": f"2024-03-01 10:{n:02d}", "subject": subject, "grade": grade,
+            "topic": "", "message": message, "homework_text": "", "status": "Resolved",
+            "resolved_by": "Ms. Lee", "tutor_notes": notes, **fields}
+
+
+NOTES = [
+    resolved(0, "How do I add fractions with different denominators?",
+             "Find a common denominator first, then add the numerators."),
+    resolved(1, "What is the area of a triangle?", "Half of base times height."),
+    resolved(2, "How do I multiply decimals?", "Multiply as whole numbers, then place the point."),
+    resolved(3, "Why do plants need sunlight?", "Photosynthesis makes their food.", subject="Science"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    index.add_many(NOTES)
+    return index
+
+
+def test_search_ranks_the_matching_note_first(index):
+    hits = index.search("adding fractions with different denominators", subject="Math")
+    assert hits[0]["message"] == NOTES[0]["message"]
+    assert hits[0]["score"] > 0
+    assert index.search("fractions", subject="Science") == []
+
+
+def test_strong_match_needs_the_score_threshold(index):
+    question = "How do I add fractions with different denominators?"
+    score = index.search(question, subject="Math", grade="Grade 5")[0]["score"]
+    assert index.strong_match(question, "Math", "Grade 5", min_score=score)["tutor_notes"] == NOTES[0]["tutor_notes"]
+    assert index.strong_match(question, "Math", "Grade 5", min_score=score + 0.01) is None
+    assert index.strong_match(question, "Math", "Grade 6", min_score=0) is None     # another grade
+    assert index.strong_match("dinosaurs", "Math", "Grade 5", min_score=0) is None
+
+
+def test_a_loose_match_is_not_strong_enough_by_default(index):
+    assert index.search("triangle", subject="Math")
+    assert index.strong_match("triangle", "Math", "Grade 5") is None
+
+
+def test_only_resolved_requests_with_notes_are_indexed(tmp_path):
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    added = index.add_many([
+        {**NOTES[0], "status": "Open"},
+        {**NOTES[1], "tutor_notes": "  "},
+        {**NOTES[2], "resolved_by": "auto-match"},
+        NOTES[3],
+    ])
+    assert (added, index.count()) == (1, 1)
+
+
+def test_re_adding_a_request_replaces_its_note(index):
+    index.add({**NOTES[1], "tutor_notes": "Base times height, divided by two."})
+    assert index.count() == len(NOTES)
+    (hit,) = index.search("triangle divided", subject="Math")
+    assert hit["tutor_notes"] == "Base times height, divided by two."
+
+
+def test_sync_indexes_each_request_once(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "slp.db"))
+    for record in NOTES:
+        store.append("help_requests", record)
+    store.append("help_requests", {**NOTES[0], "student": "s9", "status": "Open", "tutor_notes": ""})
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    assert index.sync(store) == len(NOTES)
+    assert index.sync(store) == 0
+    store.append("help_requests", resolved(4, "How do I round to the nearest ten?", "Look at the ones digit."))
+    assert index.sync(store) == 1
+    assert index.count() == len(NOTES) + 1
+    assert len(index.search("round nearest ten")) == 1
+
+
+def test_request_key_separates_schools():
+    assert request_key(NOTES[0]) == request_key({**NOTES[0], "school": "default"})
+    assert request_key(NOTES[0]) != request_key({**NOTES[0], "school": "lincoln"})
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import ocr
+
+
+def lines(*texts, conf=92.0):
+    return [(text, conf) for text in texts]
+
+
+@pytest.mark.parametrize("texts", [
+    ("What is 3 + 4?",),
+    ("Sam has 12 marks in total and gets 5 more.", "How many is that? 12 + 5 = ?"),
+    ("On the test, solve 2x + 3 = 11",),
+    ("Quiz: 3/4 + 1/8 =",),
+])
+def test_a_clear_single_question_is_accepted_locally(texts):
+    decided, result, details = ocr._classify(lines(*texts))
+    assert decided and result["ok"]
+    assert result["question_text"]
+    assert details["question_lines"] == 1
+
+
+@pytest.mark.parametrize("texts", [
+    ("1. 3 + 4 =", "2. 5 + 6 =", "3. 7 + 8 ="),
+    tuple(f"Line {n} of the story" for n in range(ocr.WORKSHEET_MIN_LINES)),
+])
+def test_a_clear_worksheet_is_rejected_locally(texts):
+    decided, result, _ = ocr._classify(lines(*texts))
+    assert decided and not result["ok"]
+    assert result["reason"] == "worksheet"
+
+
+@pytest.mark.parametrize("found", [
+    lines("What is 3 + 4?", conf=40.0),                       # blurry or handwriting
+    lines("Name: ____  Date: ____", "What is 3 + 4?"),         # a worksheet header on one question
+    lines("Draw a picture of your family"),                    # nothing that looks like maths
+    lines("Why?", "What is 2 + 2?", "Find x: x = 4"),           # several questions, not numbered
+])
+def test_anything_unsure_is_escalated_to_the_model(found):
+    decided, result, _ = ocr._classify(found)
+    assert not decided and result is None
+
+
+def test_stats_count_every_photo_across_threads(monkeypatch):
+    monkeypatch.setattr(ocr, "pytesseract", None)                # everything escalates
+    monkeypatch.setattr(ocr, "_counts", dict.fromkeys(ocr._counts, 0))
+    workers = [threading.Thread(target=lambda: [ocr.ocr_prepass(b"") for _ in range(500)]) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stats = ocr.ocr_stats()
+    assert stats["photos"] == stats["escalated"] == 4000
+    assert stats["escalation_rate"] == 1.0
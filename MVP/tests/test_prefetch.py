@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+import prefetch
+from backend import MemoryKV
+from prefetch import Prefetcher, TransitionModel
+
+
+def rows(student, *topics, grade="Grade 5"):
+    return [{"student": student, "grade": grade, "topic": topic} for topic in topics]
+
+
+def trained():
+    model = TransitionModel()
+    for n in range(4):
+        model.update(rows(f"s{n}", "Fractions", "decimals"))
+    model.update(rows("s9", "fractions", "Area"))
+    return model
+
+
+def test_the_model_counts_each_students_next_topic():
+    model = trained()
+    assert model.predict("Grade 5", "fractions") == [("decimals", 0.8)]
+    assert model.predict("Grade 6", "fractions") == []
+    # Fewer than MIN_OBSERVATIONS transitions: no guess
+    assert model.predict("Grade 5", "decimals") == []
+
+
+class SlowModel(TransitionModel):
+    """Refreshes take a while and note which thread ran them."""
+
+    def __init__(self):
+        super().__init__()
+        self.refreshed_on, self.release = [], threading.Event()
+
+    def refresh(self):
+        self.refreshed_on.append(threading.current_thread().name)
+        self.release.wait(5)
+        for n in range(5):
+            self.update(rows(f"new{n}", "area", "perimeter"))
+        return self
+
+
+@pytest.fixture
+def store(monkeypatch):
+    kv = MemoryKV()
+    monkeypatch.setattr(prefetch, "get_backend", lambda: kv)
+    return kv
+
+
+def make(model, generate=None, **kwargs):
+    return Prefetcher(generate or (lambda *args: {"ok": True}), lambda *args: "|".join(args), model=model,
+                      **kwargs)
+
+
+def wait_until(check, timeout=5):
+    deadline = time.time() + timeout
+    while not check():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_next_step_predicts_from_the_cached_model_while_it_refreshes(store):
+    model = SlowModel()
+    model.counts = trained().counts
+    prefetcher = make(model)
+    began = time.perf_counter()
+    assert prefetcher.next_step("Grade 5", "lesson", "Fractions") == ("lesson", "decimals", 0.8)
+    assert time.perf_counter() - began < 1
+    assert prefetcher.next_step("Grade 5", "lesson", "area") is None      # not read in yet
+    model.release.set()
+    wait_until(lambda: not prefetcher._refreshing)
+    assert model.refreshed_on == ["slp-prefetch_0"]
+    assert prefetcher.next_step("Grade 5", "lesson", "area") == ("lesson", "perimeter", 1.0)
+
+
+def test_refreshes_are_spaced_out(store, monkeypatch):
+    model = SlowModel()
+    model.release.set()
+    prefetcher = make(model)
+    wait_until(lambda: not prefetcher._refreshing)
+    for _ in range(20):
+        prefetcher.next_step("Grade 5", "lesson", "area")
+    assert len(model.refreshed_on) == 1
+    monkeypatch.setattr(prefetch, "REFRESH_SECONDS", 0)
+    prefetcher.next_step("Grade 5", "lesson", "area")
+    wait_until(lambda: len(model.refreshed_on) == 2)
+
+
+def test_after_generation_queues_the_next_lesson_within_budget(store):
+    model = SlowModel()
+    model.release.set()
+    generated = []
+    prefetcher = make(model, generate=lambda *args: generated.append(args) or {"ok": True},
+                      daily_budget_usd=prefetch.EST_COST_USD)
+    wait_until(lambda: not prefetcher._refreshing)
+    assert prefetcher.after_generation("Math", "Grade 5", "lesson", "area") == ("lesson", "perimeter", 1.0)
+    wait_until(lambda: prefetcher.metrics()["issued"] == 1)
+    assert generated == [("Math", "Grade 5", "lesson", "perimeter", "")]
+    # The day's budget is one generation
+    assert prefetcher.after_generation("Math", "Grade 5", "lesson", "area") is None
+    assert store.get("prefetch:skipped_budget") == 1
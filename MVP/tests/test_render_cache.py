@@ -0,0 +1,62 @@
+import pytest
+
+from render_cache import RenderCache, content_key, prepare_markdown
+
+CUBE = "Here is a cube:\n+----+\n|    |\n+----+\nCount the sides."
+
+
+def test_sketches_are_fenced_so_their_spacing_survives():
+    assert prepare_markdown(CUBE) == "Here is a cube:\n```text\n+----+\n|    |\n+----+\n```\nCount the sides."
+
+
+@pytest.mark.parametrize("text", [
+    "Area is $A = l \\times w$, so $3 \\times 4 = 12$.",
+    "1. Add the tens\n   - 20 + 30 = 50\n   - then the ones\n2. Done",
+    "| Shape | Sides |\n|---|---|\n| Square | 4 |\n| Triangle | 3 |",
+    "```python\n+----+\n|    |\n```",
+    "A single line like 0---1---2 stays as it is",
+    # Answer options and numbered parts are text, however many slashes they have
+    "**A)** 3/4\n**B)** 1/2",
+    "1. (a) 1/2\n2. (b) 3/4",
+    "- 1/2\n- 3/4",
+    # Raw HTML is left as text: st.markdown (unsafe_allow_html off) shows it escaped
+    "<script>alert('hi')</script> and <b>bold</b> & <i>",
+    "",
+])
+def test_everything_else_is_passed_through(text):
+    assert prepare_markdown(text) == text
+
+
+def test_sketches_drawn_under_a_list_item_are_still_fenced():
+    assert prepare_markdown("1. Look:\n+--+\n|  |") == "1. Look:\n```text\n+--+\n|  |\n```"
+
+
+def test_windows_line_endings_are_normalised():
+    assert prepare_markdown(CUBE.replace("\n", "\r\n")) == prepare_markdown(CUBE)
+
+
+def test_html_inside_a_sketch_ends_up_in_the_code_block():
+    out = prepare_markdown("<b>--</b>\n|<i>|--|\nafter")
+    assert out.startswith("```text\n<b>--</b>\n|<i>|--|\n```")
+
+
+def test_cache_hits_by_content_hash():
+    cache = RenderCache()
+    first = cache.markdown(CUBE)
+    assert cache.markdown(CUBE) is first
+    assert cache.get(content_key(CUBE)) is first
+    assert cache.get(content_key("something else")) is None
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["entries"]) == (2, 1, 1)
+
+
+def test_cache_evicts_least_recently_used_past_max_bytes():
+    cache = RenderCache(max_bytes=250)
+    texts = [f"lesson {n} " + "x" * 100 for n in range(3)]
+    cache.markdown(texts[0])
+    cache.markdown(texts[1])
+    cache.markdown(texts[0])                 # 0 is now the most recently used
+    cache.markdown(texts[2])
+    assert cache.get(content_key(texts[1])) is None
+    assert cache.get(content_key(texts[0])) is not None
+    assert cache.metrics()["evictions"] == 1
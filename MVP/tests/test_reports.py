@@ -0,0 +1,107 @@
+import re
+from datetime import datetime
+
+import pytest
+
+import reports
+from backend import LocalBackend, SQLiteBackend
+from reports import last_week_start, render_html, render_pdf, weekly_summary, _reports
+
+WEEK = datetime(2025, 3, 3)          # a Monday
+
+
+@pytest.fixture(params=["local", "sqlite"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(reports, "CHUNK_ROWS", 2)     # several chunks even for a few rows
+    if request.param == "local":
+        store = LocalBackend(str(tmp_path / "data"))
+    else:
+        store = SQLiteBackend(str(tmp_path / "slp.db"))
+    quizzes = [
+        ("ann", "Fractions", 5, "2025-03-03 09:00"),
+        ("ann", "Fractions", 4, "2025-03-04 09:00"),
+        ("ann", "Decimals", 2, "2025-03-04 18:00"),
+        ("ann", "Fractions", 3, "2025-02-25 09:00"),      # the week before
+        ("ann", "Fractions", 1, "2025-02-23 23:59"),      # too early for either week
+        ("bob", "Angles", 2, "2025-02-26 10:00"),         # only the week before
+        ("bob", "Angles", 5, "2025-03-10 00:00"),         # the next week
+    ]
+    for student, topic, score, date in quizzes:
+        store.append("progress", {"student": student, "topic": topic, "score": str(score), "date": date})
+    for student, time, status, notes in [
+        ("cat", "2025-03-05 16:00", "Resolved", "Remember to carry the one."),
+        ("cat", "2025-03-06 16:00", "Open", ""),
+        ("ann", "2025-02-27 16:00", "Resolved", "Last week's note"),
+    ]:
+        store.append("help_requests", {"student": student, "time": time, "topic": "Adding",
+                                       "status": status, "tutor_notes": notes})
+    return store
+
+
+def test_week_windows_and_the_previous_week(store):
+    students, topics = weekly_summary(store, WEEK)
+    ann = students.loc["ann"]
+    assert (ann["quizzes"], ann["avg_score"]) == (3, 3.7)
+    assert (ann["prev_quizzes"], ann["prev_avg_score"]) == (1, 3.0)
+    assert ann["days_active"] == 2
+    assert ann["help_requests"] == 0                  # last week's request isn't this week's
+    bob = students.loc["bob"]
+    assert (bob["quizzes"], bob["prev_quizzes"], bob["prev_avg_score"]) == (0, 1, 2.0)
+    assert list(topics[topics["student"] == "ann"]["topic"]) == ["Fractions", "Decimals"]
+    assert "bob" not in set(topics["student"])
+
+
+def test_help_only_students_get_a_report(store):
+    students, _ = weekly_summary(store, WEEK)
+    assert sorted(students.index) == ["ann", "bob", "cat"]
+    cat = students.loc["cat"]
+    assert (cat["quizzes"], cat["prev_quizzes"], cat["help_requests"], cat["help_resolved"]) == (0, 0, 2, 1)
+    assert cat["tutor_notes"] == "Remember to carry the one."
+    (report,) = [r for r in _reports(*weekly_summary(store, WEEK)) if r["student"] == "cat"]
+    page = render_html(report, "default", WEEK)
+    assert "No quizzes this week" in page and "carry the one" in page
+
+
+def test_a_quiet_week_has_no_students(store):
+    students, topics = weekly_summary(store, datetime(2024, 1, 1))
+    assert students.empty and topics.empty
+
+
+def test_last_week_start_is_the_previous_monday():
+    assert last_week_start(datetime(2025, 3, 12, 15, 30)) == datetime(2025, 3, 3)
+    assert last_week_start(datetime(2025, 3, 10)) == datetime(2025, 3, 3)
+    assert last_week_start(datetime(2025, 3, 9)) == datetime(2025, 2, 24)
+
+
+def parse_pdf(data):
+    """Check the PDF's structure: header, xref offsets, trailer. Returns the objects by number."""
+    assert data.startswith(b"%PDF-1.4\n") and data.endswith(b"%%EOF\n")
+    startxref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+    assert data[startxref:].startswith(b"xref\n")
+    count = int(re.match(rb"xref\n0 (\d+)\n", data[startxref:]).group(1))
+    offsets = [int(o) for o in re.findall(rb"(\d{10}) 00000 n \n", data[startxref:])]
+    assert len(offsets) == count - 1
+    assert int(re.search(rb"/Size (\d+)", data).group(1)) == count
+    objects = {}
+    for number, offset in enumerate(offsets, 1):
+        match = re.match(rb"%d 0 obj\n(.*?)\nendobj\n" % number, data[offset:], re.S)
+        assert match, f"object {number} is not at its xref offset"
+        objects[number] = match.group(1)
+    for obj in objects.values():
+        stream = re.match(rb"<< /Length (\d+) >>\nstream\n(.*)\nendstream$", obj, re.S)
+        if stream:
+            assert int(stream.group(1)) == len(stream.group(2))
+    return objects
+
+
+def test_render_pdf_output_parses():
+    report = {"student": "Ann (B) \\ Ünal", "quizzes": 3, "prev_quizzes": 1, "avg_score": 3.7,
+              "prev_avg_score": 3.0, "days_active": 2, "help_requests": 0, "help_resolved": 0,
+              "note_topic": "", "tutor_notes": "",
+              "topics": [(f"Topic {n}", 1, 4.0) for n in range(60)]}         # more than one page
+    objects = parse_pdf(render_pdf(report, "default", WEEK))
+    pages = [obj for obj in objects.values() if obj.startswith(b"<< /Type /Page ")]
+    kids = re.search(rb"/Kids \[(.*?)\] /Count (\d+)", objects[2])
+    assert len(pages) == int(kids.group(2)) == 2
+    assert rb"Ann \(B\) \\ " + "Ü".encode("cp1252") in b"".join(objects.values())
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from rollups import AUTO_MATCH, Rollups, bucket, bucket_minutes, percentile
+
+FMT = "%Y-%m-%d %H:%M"
+
+
+def request(n, opened, minutes=None, tutor="Ms. Lee", subject="Math"):
+    record = {"student": f"s{n}", "time": opened.strftime(FMT), "subject": subject,
+              "grade": "Grade 6", "question": f"question {n}", "status": "Open"}
+    if minutes is not None:
+        record.update(status="Resolved", resolved_by=tutor,
+                      resolved_time=(opened + timedelta(minutes=minutes)).strftime(FMT))
+    return record
+
+
+@pytest.fixture
+def rollups(tmp_path):
+    return Rollups(str(tmp_path / "rollups.db"))
+
+
+def test_observe_many_applies_each_event_once(rollups):
+    now = datetime.now().replace(second=0, microsecond=0)
+    opened = [request(n, now) for n in range(3)]
+    assert rollups.observe_many(opened) == 3
+    assert rollups.observe_many(opened) == 0
+    assert rollups.queue_depth() == {"open": 3, "by_subject": {"Math": 3}}
+
+    resolved = [request(0, now, 10), request(1, now, 0, tutor=AUTO_MATCH)]
+    assert rollups.observe_many(resolved) == 2
+    assert rollups.observe_many(opened + resolved) == 0          # a full replay changes nothing
+    assert rollups.queue_depth()["open"] == 1
+    today = rollups.daily(1)
+    assert [(d["opened"], d["resolved"], d["auto_answered"]) for d in today] == [(3, 2, 1)]
+    assert [t["tutor"] for t in rollups.tutor_throughput(1)] == ["Ms. Lee"]   # auto-matches aren't tutor work
+
+
+def test_a_request_resolved_before_it_was_seen_still_counts_as_opened(rollups):
+    now = datetime.now().replace(second=0, microsecond=0)
+    assert rollups.observe(request(0, now, 5)) == 2
+    assert rollups.queue_depth()["open"] == 0
+    assert rollups.daily(1)[0]["opened"] == 1
+
+
+def test_buckets_are_log_spaced_and_contain_their_values():
+    for minutes in (0, 1, 3, 10, 45, 120, 600, 5000):
+        b = bucket(minutes)
+        low, high = bucket_minutes(b - 0.5), bucket_minutes(b + 0.5)     # the bucket's edges
+        assert low <= minutes < high
+        if minutes >= 10:
+            assert high / low < 1.15
+    assert bucket(-5) == bucket(0) == 0
+
+
+def test_percentiles_come_from_the_buckets(rollups):
+    assert percentile([], 0.5) is None
+    now = datetime.now().replace(second=0, microsecond=0) - timedelta(hours=1)
+    minutes = [5] * 50 + [30] * 40 + [240] * 10
+    rollups.observe_many([request(n, now, m) for n, m in enumerate(minutes)])
+    (row,) = rollups.time_to_resolve("all", 7)
+    assert row["resolved"] == 100
+    assert row["p50_min"] == pytest.approx(5, rel=0.15)
+    assert row["p90_min"] == pytest.approx(30, rel=0.15)
+    assert row["p95_min"] == pytest.approx(240, rel=0.15)
+
+
+def test_windows_are_calendar_days_including_today(rollups):
+    today = datetime.now().replace(hour=0, minute=5, second=0, microsecond=0)
+    rollups.observe_many([
+        request(0, today, 10),
+        request(1, today - timedelta(days=1), 10),
+        request(2, today - timedelta(days=6), 10),
+        request(3, today - timedelta(days=7), 10),
+    ])
+    assert rollups.time_to_resolve("all", 1)[0]["resolved"] == 1       # yesterday isn't "today"
+    assert rollups.time_to_resolve("all", 7)[0]["resolved"] == 3
+    assert rollups.time_to_resolve("all", None)[0]["resolved"] == 4
+    assert len(rollups.daily(1)) == 1
+    assert rollups.tutor_throughput(1)[0]["resolved"] == 1
+    assert rollups.tutor_throughput(7)[0]["resolved"] == 3
+
+
+def test_time_to_resolve_splits_by_dimension(rollups):
+    now = datetime.now().replace(second=0, microsecond=0) - timedelta(hours=1)
+    rollups.observe_many([request(0, now, 10, subject="Math"), request(1, now, 20, subject="Science"),
+                          request(2, now, 20, subject="Science")])
+    by_subject = {row["subject"]: row["resolved"] for row in rollups.time_to_resolve("subject", 7)}
+    assert by_subject == {"Math": 1, "Science": 2}
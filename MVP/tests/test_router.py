@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from router import FAST, STRONG, ModelStats, Router, grade_band
+
+
+@pytest.fixture
+def router(monkeypatch):
+    import breaker
+    monkeypatch.setattr(breaker, "_breakers", {})
+    return Router()
+
+
+def slow(router, model, ms, n=10, ok=True):
+    for _ in range(n):
+        router.record(model, ms, ok)
+
+
+@pytest.mark.parametrize("grade, band", [
+    ("Kindergarten", "kg"), ("Grade 1", "primary"), ("Grade 5", "primary"),
+    ("Grade 6", "middle"), ("Grade 8", "middle"), ("Grade 9", "high"), ("Grade 12", "high"),
+])
+def test_grade_band(grade, band):
+    assert grade_band(grade) == band
+
+
+def test_tiers_follow_the_first_matching_route(router):
+    assert router.tiers("Grade 10", "History", "homework", "lesson") == [STRONG, FAST]
+    assert router.tiers("Grade 10", "History", "learn", "lesson") == [FAST]
+    assert router.tiers("Grade 3", "Math", "homework", "lesson") == [FAST]
+    assert router.tiers("Grade 10", "Math", "learn", "quiz") == [FAST]
+
+
+def test_a_tier_over_its_p95_slo_is_skipped(router):
+    slow(router, STRONG, 5000, n=39)
+    slow(router, STRONG, 9000, n=1)          # one slow call in forty is under the p95
+    assert router.choose("Grade 10", "Math", "learn", "lesson") == STRONG
+    slow(router, STRONG, 9000, n=5)
+    assert router.choose("Grade 10", "Math", "learn", "lesson") == FAST
+
+
+def test_the_last_tier_is_used_when_no_tier_is_healthy(router):
+    slow(router, STRONG, 20000)
+    slow(router, FAST, 20000)
+    assert router.choose("Grade 10", "Math", "learn", "lesson") == FAST
+
+
+def test_too_few_samples_are_not_judged(router):
+    slow(router, STRONG, 20000, n=4)
+    assert router.choose("Grade 10", "Math", "learn", "lesson") == STRONG
+
+
+def test_a_high_error_rate_fails_over_even_when_fast(router):
+    slow(router, STRONG, 100, n=7)
+    slow(router, STRONG, 100, n=3, ok=False)
+    assert router.choose("Grade 10", "Math", "learn", "lesson") == FAST
+
+
+def test_complete_starts_at_the_chosen_tier(router):
+    from test_breaker import FakeClient
+    slow(router, STRONG, 20000)
+    client = FakeClient({})
+    assert router.complete(client, "Grade 10", "Math", "learn", "lesson", messages=[]) == f"reply from {FAST}"
+    assert client.calls == [FAST]
+    assert router.failovers == 1
+
+
+def test_old_samples_age_out_of_the_window():
+    stats = ModelStats(window_seconds=60)
+    now = time.time()
+    for _ in range(10):
+        stats.record(20000, True, now=now - 120)
+    stats.record(100, True, now=now)
+    assert stats.summary(now=now)["calls"] == 1
+    assert stats.summary(now=now)["p95_ms"] == 100
+
+
+class Chunk:
+    choices = ()
+
+
+class FakeStream:
+    def __init__(self, chunks, delay=0.0):
+        self.chunks, self.delay, self.closed = chunks, delay, False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingClient:
+    def __init__(self, stream):
+        self.stream = stream
+        self.chat = self.completions = self
+
+    def create(self, model, **kwargs):
+        return self.stream
+
+
+def test_a_stream_is_judged_on_its_full_latency_not_its_first_chunk(router):
+    stream = router.complete(StreamingClient(FakeStream([Chunk()] * 3, delay=0.05)),
+                             "Grade 3", "Math", "learn", "lesson", stream=True, messages=[])
+    list(stream)
+    metrics = router.metrics()
+    assert metrics["models"][FAST]["p95_ms"] >= 140
+    assert metrics["time_to_first_chunk"][FAST]["p95_ms"] < 140
+
+
+def test_a_stream_closed_early_leaves_no_sample(router):
+    fake = FakeStream([Chunk()] * 3)
+    stream = router.complete(StreamingClient(fake), "Grade 3", "Math", "learn", "lesson", stream=True, messages=[])
+    stream.close()
+    assert fake.closed
+    assert router.metrics()["models"].get(FAST, {"calls": 0})["calls"] == 0
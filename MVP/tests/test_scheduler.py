@@ -0,0 +1,171 @@
+import time
+
+import pytest
+
+from scheduler import DAY, MIN_EASE, START_EASE, Scheduler
+
+
+def intervals(sched, student, item, qualities, now=0.0):
+    out = []
+    for quality in qualities:
+        due = sched.review(student, item, quality, now=now)
+        out.append((due - now) / sched.unit)
+        now = due
+    return out
+
+
+def test_sm2_intervals_for_perfect_answers():
+    sched = Scheduler()
+    # 1 day, 6 days, then the previous interval times the (growing) ease
+    assert intervals(sched, "ann", "fractions", [5, 5, 5, 5]) == [1, 6, 16, 45]
+    slot = sched.slots["ann"]["fractions"]
+    assert sched.ease[slot] == pytest.approx(START_EASE + 0.4)
+
+
+def test_forgetting_resets_the_interval_and_lowers_ease():
+    sched = Scheduler()
+    assert intervals(sched, "ann", "area", [5, 5, 1, 4]) == [1, 6, 1, 1]
+    slot = sched.slots["ann"]["area"]
+    assert sched.reps[slot] == 1
+    assert sched.ease[slot] < START_EASE
+
+
+def test_ease_never_drops_below_the_floor():
+    sched = Scheduler()
+    intervals(sched, "ann", "area", [0] * 20)
+    assert sched.ease[sched.slots["ann"]["area"]] == pytest.approx(MIN_EASE)
+
+
+def test_quality_is_clamped():
+    a, b = Scheduler(), Scheduler()
+    assert intervals(a, "s", "t", [9, 9, 9]) == intervals(b, "s", "t", [5, 5, 5])
+
+
+def test_next_item_prefers_overdue_then_new_then_soonest():
+    sched = Scheduler()
+    sched.review("ann", "area", 5, now=0)             # due day 1
+    sched.review("ann", "fractions", 5, now=0)
+    sched.review("ann", "fractions", 5, now=DAY)      # due day 7
+    assert sched.next_item("ann", new_items=["decimals"], now=2 * DAY) == "area"
+    sched.review("ann", "area", 5, now=2 * DAY)       # due day 8
+    assert sched.next_item("ann", new_items=["area", "decimals"], now=2 * DAY) == "decimals"
+    assert sched.next_item("ann", now=2 * DAY) == "fractions"
+    assert sched.next_item("ann", now=2 * DAY, early=False) is None
+    assert sched.due_count("ann", now=7 * DAY) == 1
+    assert sched.next_item("nobody") is None
+
+
+def test_grows_past_its_capacity():
+    sched = Scheduler(capacity=4)
+    for n in range(50):
+        sched.review(f"s{n % 3}", f"item{n}", 4, now=n)
+    assert sched.size == 50
+    assert sched.items[sched.slots["s1"]["item49"]] == "item49"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "schedule.npz")
+    sched = Scheduler()
+    intervals(sched, "ann", "fractions", [5, 5, 3])
+    sched.review("bob", "area", 1, now=100)
+    sched.save(path)
+    loaded = Scheduler.load(path)
+    for student, item in (("ann", "fractions"), ("bob", "area")):
+        a, b = sched.slots[student][item], loaded.slots[student][item]
+        for name in ("ease", "interval", "reps", "due", "reviewed"):
+            assert getattr(loaded, name)[b] == getattr(sched, name)[a]
+    assert loaded.next_item("bob", now=0) == "area"
+
+
+def test_concurrent_writers_merge_and_latest_review_wins(tmp_path):
+    path = str(tmp_path / "schedule.npz")
+    a, b = Scheduler(), Scheduler()
+    a.review("ann", "fractions", 5, now=100)
+    a.save(path)
+    b.review("bob", "area", 5, now=200)
+    b.review("ann", "fractions", 1, now=300)
+    b.save(path)
+    a.review("cy", "decimals", 4, now=400)
+    a.save(path)                                      # a's stale copy of ann must not win
+    loaded = Scheduler.load(path)
+    assert set(loaded.slots) == {"ann", "bob", "cy"}
+    assert loaded.reviewed[loaded.slots["ann"]["fractions"]] == 300
+    assert loaded.reps[loaded.slots["ann"]["fractions"]] == 0
+
+
+def log_lines(path):
+    with open(path + ".log") as fh:
+        return len(fh.read().splitlines()) - 1     # minus the header
+
+
+def test_save_appends_only_the_pairs_reviewed_since_the_last_save(tmp_path):
+    path = str(tmp_path / "schedule.npz")
+    sched = Scheduler()
+    for n in range(100):
+        sched.review(f"s{n}", "area", 4, now=n)
+    sched.save(path)
+    assert log_lines(path) == 100
+    sched.review("s7", "area", 5, now=500)
+    sched.save(path)
+    sched.save(path)                                  # nothing new: nothing written
+    assert log_lines(path) == 101
+    loaded = Scheduler.load(path)
+    assert loaded.reviewed[loaded.slots["s7"]["area"]] == 500
+
+
+def test_a_line_cut_off_mid_write_is_ignored(tmp_path):
+    path = str(tmp_path / "schedule.npz")
+    sched = Scheduler()
+    sched.review("ann", "area", 5, now=100)
+    sched.save(path)
+    with open(path + ".log", "a") as fh:
+        fh.write('["bob", "are')
+    loaded = Scheduler.load(path)
+    assert set(loaded.slots) == {"ann"}
+
+
+def test_compaction_folds_the_log_into_the_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "schedule.npz")
+    a, b = Scheduler(), Scheduler.load(path)
+    for n in range(10):
+        a.review("ann", f"item{n}", 4, now=n)
+    a.save(path)
+    b.save(path)                                      # b has read the whole log
+    a.compact(path)
+    assert log_lines(path) == 0
+    assert Scheduler.load(path).size == 10
+
+    # b continues from the compacted log without re-reading the snapshot
+    monkeypatch.setattr(Scheduler, "_load_snapshot", classmethod(lambda cls, p: pytest.fail("snapshot re-read")))
+    a.review("bob", "area", 5, now=50)
+    a.save(path)
+    b.review("cy", "area", 5, now=60)
+    b.save(path)
+    assert set(b.slots) == {"ann", "bob", "cy"}
+
+
+def test_a_replica_that_fell_behind_a_compaction_reads_the_snapshot(tmp_path):
+    path = str(tmp_path / "schedule.npz")
+    a, b = Scheduler(), Scheduler()
+    a.review("ann", "area", 4, now=10)
+    a.save(path)
+    a.compact(path)
+    b.review("bob", "area", 4, now=20)
+    b.save(path)
+    assert set(b.slots) == {"ann", "bob"}
+    assert set(Scheduler.load(path).slots) == {"ann", "bob"}
+
+
+def test_save_compacts_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr("scheduler.COMPACT_AFTER", 5)
+    path = str(tmp_path / "schedule.npz")
+    sched = Scheduler()
+    for n in range(6):
+        sched.review("ann", f"item{n}", 4, now=n)
+    sched.save(path)
+    for _ in range(100):
+        if not sched._compacting:
+            break
+        time.sleep(0.05)
+    assert log_lines(path) == 0
+    assert Scheduler.load(path).size == 6
@@ -0,0 +1,109 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import session_memory
+from session_memory import Spilled
+
+BIG = "x" * 48 * 1024
+
+
+class Wrapper:
+    """Stands in for the SafeSessionState wrapper Streamlit builds anew on every run."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, key):
+        return self.store[key]
+
+    def __setitem__(self, key, value):
+        self.store[key] = value
+
+    def get(self, key, default=None):
+        return self.store.get(key, default)
+
+    @property
+    def filtered_state(self):
+        return dict(self.store)
+
+
+class FakeRuntime:
+    """Runtime.exists()/instance() with a session manager that knows the `live` sessions."""
+
+    def __init__(self):
+        self.live = {}     # session_id -> persistent state
+        self._session_mgr = self
+
+    def exists(self):
+        return True
+
+    def instance(self):
+        return self
+
+    def get_session_info(self, session_id):
+        if session_id not in self.live:
+            return None
+        return SimpleNamespace(session=SimpleNamespace(session_state=Wrapper(self.live[session_id])))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_memory, "SPILL_DIR", str(tmp_path))
+    monkeypatch.setattr(session_memory, "SESSION_CAP_BYTES", 32 * 1024)
+    monkeypatch.setattr(session_memory, "_sessions", {})
+    runtime = FakeRuntime()
+    monkeypatch.setattr(session_memory, "Runtime", runtime)
+
+    def rerun(session_id, **values):
+        """One script run of `session_id` with a brand-new wrapper, like Streamlit does."""
+        store = runtime.live.setdefault(session_id, {})
+        store.update(values)
+        ctx = SimpleNamespace(session_id=session_id, session_state=Wrapper(store))
+        monkeypatch.setattr(session_memory, "get_script_run_ctx", lambda: ctx)
+        monkeypatch.setattr(session_memory, "st", SimpleNamespace(session_state=ctx.session_state))
+        session_memory.track()
+        return store
+
+    return SimpleNamespace(rerun=rerun, runtime=runtime)
+
+
+def test_a_session_over_its_cap_spills_on_every_rerun(app):
+    store = app.rerun("a", lesson_text=BIG, quiz_text="short")
+    assert isinstance(store["lesson_text"], Spilled)
+    assert not isinstance(store["quiz_text"], Spilled)
+
+    store = app.rerun("a", quiz_text=BIG + BIG)
+    assert isinstance(store["quiz_text"], Spilled)
+    assert session_memory.get("lesson_text") == BIG
+    assert session_memory.get("quiz_text") == BIG + BIG
+
+
+def test_another_session_keeps_its_spill_files_while_it_is_open(app):
+    store = app.rerun("a", lesson_text=BIG)
+    app.rerun("a")
+    path = store["lesson_text"].where
+    assert os.path.exists(path)
+
+    app.rerun("b")
+    assert os.path.exists(path)
+    assert "a" in session_memory._sessions
+
+    app.runtime.live.pop("a")
+    app.rerun("b")
+    assert not os.path.exists(path)
+    assert "a" not in session_memory._sessions
+
+
+def test_idle_sessions_are_spilled_through_their_live_state(app):
+    store = app.rerun("a", lesson_text="x" * 20 * 1024)
+    assert store["lesson_text"] == "x" * 20 * 1024      # under the cap
+    session_memory._sessions["a"]["last_seen"] -= session_memory.IDLE_SECONDS + 1
+
+    app.rerun("b")
+    assert isinstance(store["lesson_text"], Spilled)
+
+    app.rerun("a")
+    assert session_memory.get("lesson_text") == "x" * 20 * 1024
+    assert store["lesson_text"] == "x" * 20 * 1024      # restored in memory for a returning session
@@ -0,0 +1,63 @@
+from fractions import Fraction
+
+import pytest
+
+from solver import parse_problem, solve_locally
+
+
+@pytest.mark.parametrize("question, kind, answer", [
+    ("Solve 2x + 5 = 17", "linear_equation", "x = 6"),
+    ("3(x - 2) = x + 4", "linear_equation", "x = 5"),
+    ("What is 1/4 of 8?", "fraction", "2"),
+    ("20% of 50", "percentage", "10"),
+    ("6 + 4 * 2", "arithmetic", "14"),
+    ("2^3 - 1", "arithmetic", "7"),
+    ("2(3 + 1)", "arithmetic", "8"),
+])
+def test_parses_and_answers(question, kind, answer):
+    result = parse_problem(question)
+    assert result["kind"] == kind
+    assert result["answer"] == answer
+
+
+def test_answers_are_exact_fractions():
+    assert parse_problem("3x = 2")["value"] == Fraction(2, 3)
+    assert parse_problem("3x = 2")["answer"] == "x = 2/3"
+
+
+def test_equation_check_puts_the_answer_back():
+    result = parse_problem("Solve 2x + 5 = 17")
+    assert result["steps"][0] == "Start with: 2x + 5 = 17"
+    assert result["check"].endswith("left side = 17, right side = 17 ✓")
+
+
+@pytest.mark.parametrize("question", [
+    "x + 1 = x + 2",            # no solution: left to the model
+    "Explain photosynthesis",
+    "x/0 = 1",
+    "1/0",
+    "2x = ",
+    "7",                        # a bare number is not a question
+    "",
+    "1 + " * 100,
+    "3 4",                      # two numbers in a row are a typo, not 3 × 4
+    "1 2",
+    "10 % 3",                   # remainder, not 10% × 3
+    "x 2 = 4",
+])
+def test_falls_back_to_the_model(question):
+    assert parse_problem(question) is None
+    assert solve_locally(question, "Grade 5") is None
+
+
+def test_lesson_uses_the_five_sections():
+    lesson = solve_locally("Solve 2x + 5 = 17", "Grade 5")["lesson_text"]
+    for heading in ("### 1) Concept Snapshot", "### 2) Plan / Method", "### 3) Step-by-step Solution",
+                    "### 4) Common Mistakes", "### 5) Quick Check Question"):
+        assert heading in lesson
+    assert "**Answer:** x = 6" in lesson
+
+
+def test_young_learners_skip_common_mistakes():
+    assert "Common Mistakes" not in solve_locally("6 + 4 * 2", "Grade 1")["lesson_text"]
+    assert "Common Mistakes" not in solve_locally("6 + 4 * 2", "Kindergarten")["lesson_text"]
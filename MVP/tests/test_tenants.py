@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+import tenants
+from backend import LocalBackend
+from tenants import SchoolMoving, ShardRouter, TenantBackend
+
+
+@pytest.fixture
+def router(tmp_path):
+    return ShardRouter(base=LocalBackend(str(tmp_path / "base")), shards=["a", "b"],
+                       opener=lambda shard: LocalBackend(str(tmp_path / shard)))
+
+
+def put(router, school, shard, quizzes):
+    router._record(school, shard)
+    records = TenantBackend(school, router)
+    for n in range(quizzes):
+        records.append("progress", {"student": f"s{n}", "score": n})
+    records.append("tutors", {"name": "Ms Lee"})
+    return records
+
+
+def test_move_copies_every_table_and_repoints_the_school(router):
+    records = put(router, "lincoln", "a", 3)
+    assert router.move("lincoln", "b", pause=0) == 4
+    assert router.locate("lincoln") == "b"
+    assert [r["score"] for r in records.rows("progress")] == ["0", "1", "2"]
+    assert records.rows("tutors") == [{"name": "Ms Lee"}]
+    assert router.store("a").count("lincoln/progress") == 0
+    records.append("progress", {"student": "s9", "score": 9})
+    assert router.store("b").count("lincoln/progress") == 4
+
+
+def test_move_rejects_the_default_school_and_unknown_shards(router):
+    put(router, "lincoln", "a", 1)
+    with pytest.raises(ValueError):
+        router.move(tenants.DEFAULT_SCHOOL, "b", pause=0)
+    with pytest.raises(ValueError):
+        router.move("lincoln", "c", pause=0)
+    assert router.move("lincoln", "a", pause=0) == 0
+
+
+def test_writes_fail_fast_while_the_school_moves(router):
+    records = put(router, "lincoln", "a", 2)
+    router._record("lincoln", "a", moving_to="b")
+    began = time.time()
+    with pytest.raises(SchoolMoving):
+        records.append("progress", {"student": "s0", "score": 1})
+    assert time.time() - began < 1
+    assert len(records.rows("progress")) == 2        # reads carry on from the old shard
+
+
+def test_a_failed_copy_unfreezes_the_school_where_it_was(router, tmp_path):
+    records = put(router, "lincoln", "a", 2)
+
+    class Broken(LocalBackend):
+        def replace(self, table, records):
+            raise OSError("disk full")
+
+    router._stores["b"] = Broken(str(tmp_path / "b"))
+    with pytest.raises(OSError):
+        router.move("lincoln", "b", pause=0)
+    assert router.locate("lincoln", for_write=True) == "a"
+    records.append("progress", {"student": "s2", "score": 2})
+    assert records.count("progress") == 3
+
+
+def test_plan_evens_out_the_shards_and_rebalance_runs_it(router):
+    for school, quizzes in (("big", 8), ("mid", 5), ("small", 3), ("tiny", 1)):
+        put(router, school, "a", quizzes)
+    moves = router.plan()
+    assert moves and all(source == "a" and target == "b" for _, source, target in moves)
+    for school, _, target in moves:
+        router.move(school, target, pause=0)
+    load = {"a": 0, "b": 0}
+    for row in router.status():
+        load[row["shard"]] += row["progress"] + row["tutors"]
+    assert load == {"a": 10, "b": 11}
+    assert router.plan() == []
+
+
+def test_schools_on_a_dropped_shard_are_moved_first(router):
+    put(router, "lincoln", "old", 2)
+    assert router.plan() == [("lincoln", "old", "a")]